@@ -0,0 +1,107 @@
+"""Compares gathering the futures of many small commands against sending
+them as a batch, using a local mock CDP websocket server running in
+a separate process. Besides the elapsed time the CPU time used by the
+client process is reported, as the elapsed time is bound by the mock server.
+
+Usage: python -m benchmarks.bench_batch [number of commands]
+"""
+import asyncio
+import sys
+from multiprocessing import Process, Queue
+from time import perf_counter, process_time
+from typing import Any, Awaitable, Callable, Tuple
+
+import websockets
+from ujson import dumps, loads
+
+from cripy import Connection
+from cripy.protocol.dom import DOM
+
+
+async def describe_node_server(ws: Any, path: str) -> None:
+    """Answers every DOM.describeNode command with a small node"""
+    try:
+        async for frame in ws:
+            msg = loads(frame)
+            node_id = msg["params"]["nodeId"]
+            await ws.send(
+                dumps(
+                    {
+                        "id": msg["id"],
+                        "result": {
+                            "node": {
+                                "nodeId": node_id,
+                                "backendNodeId": node_id,
+                                "nodeType": 1,
+                                "nodeName": "DIV",
+                                "localName": "div",
+                                "nodeValue": "",
+                                "childNodeCount": 0,
+                            }
+                        },
+                    }
+                )
+            )
+    except websockets.ConnectionClosed:
+        pass
+
+
+async def with_gather(conn: Connection, commands: int) -> None:
+    dom = DOM(conn)
+    await asyncio.gather(*[dom.describeNode(nodeId=i) for i in range(commands)])
+
+
+async def with_batch(conn: Connection, commands: int) -> None:
+    async with conn.batch() as batch:
+        dom = DOM(batch)
+        for i in range(commands):
+            dom.describeNode(nodeId=i)
+
+
+def serve(ports: Queue) -> None:
+    """Runs the mock CDP server, reporting the port it listens on"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = loop.run_until_complete(
+        websockets.serve(
+            describe_node_server, "127.0.0.1", 0, max_size=None, compression=None
+        )
+    )
+    ports.put(server.sockets[0].getsockname()[1])
+    loop.run_forever()
+
+
+async def main(commands: int) -> None:
+    loop = asyncio.get_event_loop()
+    ports: Queue = Queue()
+    server = Process(target=serve, args=(ports,), daemon=True)
+    server.start()
+    port = ports.get()
+    runs: Tuple[Tuple[str, Callable[[Connection, int], Awaitable[None]]], ...] = (
+        ("gather", with_gather),
+        ("batch", with_batch),
+    )
+    try:
+        for name, run in runs:
+            conn = Connection(f"ws://127.0.0.1:{port}", loop=loop)
+            await conn.connect()
+            await run(conn, 100)  # warm up
+            start = perf_counter()
+            start_cpu = process_time()
+            await run(conn, commands)
+            elapsed = perf_counter() - start
+            cpu = process_time() - start_cpu
+            await conn.dispose()
+            print(
+                f"{name:>6}: {commands} commands in {elapsed:.4f}s "
+                f"({commands / elapsed:,.0f} commands/s), client cpu {cpu:.4f}s "
+                f"({cpu / commands * 1e6:.1f}us/command)"
+            )
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
+    )
@@ -0,0 +1,124 @@
+"""Microbenchmark of the available JSON codecs over realistic CDP payloads.
+
+Usage: python -m benchmarks.bench_codec [iterations]
+"""
+import base64
+import os
+import sys
+from time import perf_counter
+from typing import Any, Callable, Dict, List
+
+from cripy.codec import available_codecs
+
+
+def network_event() -> Dict[str, Any]:
+    return {
+        "method": "Network.requestWillBeSent",
+        "params": {
+            "requestId": "1000.12",
+            "loaderId": "D2B7A4C1A2F3E8A4B4E3A9B5A1C2D3E4",
+            "documentURL": "https://example.com/",
+            "request": {
+                "url": "https://example.com/static/app.js?v=12345",
+                "method": "GET",
+                "headers": {
+                    "Referer": "https://example.com/",
+                    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                    "(KHTML, like Gecko) HeadlessChrome/77.0.3865.75 Safari/537.36",
+                },
+                "mixedContentType": "none",
+                "initialPriority": "High",
+                "referrerPolicy": "no-referrer-when-downgrade",
+            },
+            "timestamp": 2_143_242.123_456,
+            "wallTime": 1_570_000_000.123_456,
+            "initiator": {
+                "type": "parser",
+                "url": "https://example.com/",
+                "lineNumber": 12,
+            },
+            "type": "Script",
+            "frameId": "7A2F3E8A4B4E3A9B5A1C2D3E4D2B7A4C",
+            "hasUserGesture": False,
+        },
+        "sessionId": "6B3E1F3C0D1A4A1B9E2C7F6D5A4B3C2D",
+    }
+
+
+def dom_tree(depth: int = 6, breadth: int = 5) -> Dict[str, Any]:
+    node_id = 0
+
+    def make_node(level: int) -> Dict[str, Any]:
+        nonlocal node_id
+        node_id += 1
+        node: Dict[str, Any] = {
+            "nodeId": node_id,
+            "backendNodeId": node_id + 10000,
+            "nodeType": 1,
+            "nodeName": "DIV",
+            "localName": "div",
+            "nodeValue": "",
+            "childNodeCount": breadth if level < depth else 0,
+            "attributes": ["class", f"c{node_id} item", "data-idx", str(node_id)],
+        }
+        if level < depth:
+            node["children"] = [make_node(level + 1) for _ in range(breadth)]
+        return node
+
+    return {"id": 42, "result": {"root": make_node(0)}}
+
+
+def screenshot() -> Dict[str, Any]:
+    data = base64.b64encode(os.urandom(1024 * 1024)).decode("ascii")
+    return {"id": 43, "result": {"data": data}}
+
+
+def console_event_with_surrogates() -> Dict[str, Any]:
+    return {
+        "method": "Runtime.consoleAPICalled",
+        "params": {
+            "type": "log",
+            "args": [{"type": "string", "value": "status \U0001F600 \U0001F680 ok"}],
+            "executionContextId": 1,
+            "timestamp": 1_570_000_000_123.456,
+        },
+    }
+
+
+def timeit(fn: Callable[[], Any], iterations: int) -> float:
+    start = perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (perf_counter() - start) / iterations
+
+
+def main(iterations: int) -> None:
+    payloads = {
+        "Network.requestWillBeSent": (network_event(), iterations),
+        "DOM.getDocument (~19k nodes)": (dom_tree(), max(1, iterations // 1000)),
+        "Page.captureScreenshot (1MB)": (screenshot(), max(1, iterations // 500)),
+        "Runtime.consoleAPICalled (emoji)": (
+            console_event_with_surrogates(),
+            iterations,
+        ),
+    }
+    stdlib = available_codecs()["json"]()
+    rows: List[str] = []
+    for payload_name, (payload, its) in payloads.items():
+        text = stdlib.dumps(payload)
+        data = text.encode("utf-8")
+        rows.append(f"{payload_name} ({len(data):,} bytes, {its} iterations)")
+        for codec_name, clazz in available_codecs().items():
+            codec = clazz()
+            loads_s = timeit(lambda codec=codec, text=text: codec.loads(text), its)
+            loads_b = timeit(lambda codec=codec, data=data: codec.loads(data), its)
+            dumps = timeit(lambda codec=codec, obj=payload: codec.dumps(obj), its)
+            rows.append(
+                f"  {codec_name:>7}: loads(str) {loads_s * 1e6:10.1f}us  "
+                f"loads(bytes) {loads_b * 1e6:10.1f}us  dumps {dumps * 1e6:10.1f}us"
+            )
+    print("\n".join(rows))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,172 @@
+"""Shows when permessage-deflate compression pays off, using a mock browser
+running in a separate process that answers with a synthetic DOMSnapshot.captureSnapshot
+response (~1MB of JSON) or Page.captureScreenshot response (~1MB of base64).
+The loopback time includes the time the mock browser spends compressing.
+
+For each response and transport the loopback time, the client CPU time and the
+bytes received per response are measured with and without compression. The
+estimated time per response at a given bandwidth is the client CPU time plus
+the time needed to transfer the received bytes, the break-even bandwidth is the
+bandwidth below which compression is faster.
+
+Usage: python -m benchmarks.bench_compression [number of responses]
+"""
+import asyncio
+import random
+import sys
+from base64 import b64encode
+from multiprocessing import Process, Queue
+from time import perf_counter, process_time
+from typing import Any, Dict, Tuple
+
+import websockets
+from ujson import dumps, loads
+
+from cripy import Connection, Deflate
+
+BANDWIDTHS_MBIT = (10, 100, 1000)
+
+
+def snapshot_result(nodes: int = 20000) -> Dict:
+    rand = random.Random(1)
+    strings = [f"string-{i}" for i in range(2000)] + ["DIV", "SPAN", "A", "#text"]
+    return {
+        "documents": [
+            {
+                "nodes": {
+                    "parentIndex": [
+                        max(i - rand.randint(1, 20), -1) for i in range(nodes)
+                    ],
+                    "nodeType": [rand.choice((1, 3)) for _ in range(nodes)],
+                    "nodeName": [rand.randint(2000, 2003) for _ in range(nodes)],
+                    "nodeValue": [rand.randint(-1, 1999) for _ in range(nodes)],
+                    "backendNodeId": list(range(1, nodes + 1)),
+                    "attributes": [
+                        [rand.randint(0, 1999) for _ in range(rand.randint(0, 6))]
+                        for _ in range(nodes)
+                    ],
+                },
+                "layout": {
+                    "nodeIndex": list(range(0, nodes, 2)),
+                    "bounds": [
+                        [rand.randint(0, 1280), rand.randint(0, 8000), 100.5, 20.25]
+                        for _ in range(0, nodes, 2)
+                    ],
+                    "text": [rand.randint(-1, 1999) for _ in range(0, nodes, 2)],
+                },
+            }
+        ],
+        "strings": strings,
+    }
+
+
+def screenshot_result(size: int = 768 * 1024) -> Dict:
+    # PNG data is already deflated, random bytes approximate it
+    return {
+        "data": b64encode(
+            random.Random(2).getrandbits(8 * size).to_bytes(size, "big")
+        ).decode("ascii")
+    }
+
+
+async def browser(ws: Any, path: str, results: Dict[str, str]) -> None:
+    try:
+        async for frame in ws:
+            msg = loads(frame)
+            await ws.send('{"id":%d,"result":%s}' % (msg["id"], results[msg["method"]]))
+    except websockets.ConnectionClosed:
+        pass
+
+
+def serve(ports: Queue) -> None:
+    """Runs the mock browser, which accepts compression, reporting the port it listens on"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    results = {
+        "DOMSnapshot.captureSnapshot": dumps(snapshot_result()),
+        "Page.captureScreenshot": dumps(screenshot_result()),
+    }
+    server = loop.run_until_complete(
+        websockets.serve(
+            lambda ws, path: browser(ws, path, results),
+            "127.0.0.1",
+            0,
+            max_size=None,
+            compression="deflate",
+        )
+    )
+    ports.put(server.sockets[0].getsockname()[1])
+    loop.run_forever()
+
+
+async def measure(
+    url: str, transport: str, method: str, compression: bool, responses: int
+) -> Tuple[float, float, Dict[str, Any]]:
+    """Returns the loopback time and client CPU time per response and the connection stats"""
+    conn = Connection(
+        url,
+        websocket_transport=transport,
+        compression=Deflate() if compression else None,
+        flatten_sessions=True,
+    )
+    await conn.connect()
+    await conn.send(method)  # warm up
+    start = perf_counter()
+    start_cpu = process_time()
+    for _ in range(responses):
+        await conn.send(method)
+    elapsed = (perf_counter() - start) / responses
+    cpu = (process_time() - start_cpu) / responses
+    stats = conn.stats()
+    await conn.dispose()
+    return elapsed, cpu, stats
+
+
+def report(name: str, elapsed: float, cpu: float, received: float) -> None:
+    estimates = ", ".join(
+        f"{mbit}Mbit/s {(cpu + received * 8 / (mbit * 1e6)) * 1e3:.1f}ms"
+        for mbit in BANDWIDTHS_MBIT
+    )
+    print(
+        f"  {name:>7}: {received / 1024:7.1f}KiB, loopback {elapsed * 1e3:6.2f}ms, "
+        f"client cpu {cpu * 1e3:6.2f}ms, estimated {estimates}"
+    )
+
+
+async def main(responses: int) -> None:
+    ports: Queue = Queue()
+    server = Process(target=serve, args=(ports,), daemon=True)
+    server.start()
+    url = f"ws://127.0.0.1:{ports.get()}"
+    try:
+        for method in ("DOMSnapshot.captureSnapshot", "Page.captureScreenshot"):
+            for transport in ("raw", "websockets"):
+                print(f"{method} ({transport})")
+                elapsed, cpu, _ = await measure(
+                    url, transport, method, False, responses
+                )
+                d_elapsed, d_cpu, stats = await measure(
+                    url, transport, method, True, responses
+                )
+                messages = stats["compression_messages_received"]
+                raw = stats["compression_received_raw"] / messages
+                wire = stats["compression_received_wire"] / messages
+                report("none", elapsed, cpu, raw)
+                report("deflate", d_elapsed, d_cpu, wire)
+                saved_bits = (raw - wire) * 8
+                extra_cpu = d_cpu - cpu
+                if saved_bits <= 0:
+                    print("  compression never pays off")
+                elif extra_cpu <= 0:
+                    print("  compression always pays off")
+                else:
+                    mbits = saved_bits / extra_cpu / 1e6
+                    print(f"  compression pays off below {mbits:,.0f}Mbit/s")
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
+    )
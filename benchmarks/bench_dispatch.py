@@ -0,0 +1,123 @@
+"""Compares the latency of commands sent while the remote browser floods the
+connection with events, with events delivered while receiving them and with
+events deferred to the event dispatcher, using a mock browser running in a
+separate process that precedes every response with a burst of events.
+
+Every event has a listener that busy waits, mimicking listener work. The commands
+are sent at a fixed interval, long enough for the listeners to keep up on average.
+
+Usage: python -m benchmarks.bench_dispatch [number of commands] [events per command]
+    [listener microseconds] [interval milliseconds]
+"""
+import asyncio
+import sys
+from multiprocessing import Process, Queue
+from statistics import median
+from time import perf_counter
+from typing import Any, List
+
+import websockets
+from ujson import dumps, loads
+
+from cripy import Connection
+
+EVENT = dumps(
+    {
+        "method": "Network.dataReceived",
+        "params": {"requestId": "1000.1", "timestamp": 1.5, "dataLength": 1024},
+    }
+)
+
+
+async def browser(ws: Any, path: str) -> None:
+    try:
+        async for frame in ws:
+            msg = loads(frame)
+            for _ in range(msg["params"]["events"]):
+                await ws.send(EVENT)
+            await ws.send(dumps({"id": msg["id"], "result": {}}))
+    except websockets.ConnectionClosed:
+        pass
+
+
+def serve(ports: Queue) -> None:
+    """Runs the mock browser, reporting the port it listens on"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = loop.run_until_complete(
+        websockets.serve(browser, "127.0.0.1", 0, max_size=None, compression=None)
+    )
+    ports.put(server.sockets[0].getsockname()[1])
+    loop.run_forever()
+
+
+async def measure(
+    url: str,
+    defer_events: bool,
+    commands: int,
+    events: int,
+    listener_us: float,
+    interval_ms: float,
+) -> None:
+    conn = Connection(url, defer_events=defer_events)
+    await conn.connect()
+    listener_seconds = listener_us / 1e6
+
+    def listener(event: Any) -> None:
+        end = perf_counter() + listener_seconds
+        while perf_counter() < end:
+            pass
+
+    conn.on("Network.dataReceived", listener)
+    times: List[float] = []
+    start = perf_counter()
+    for _ in range(commands):
+        sent = perf_counter()
+        await conn.send("Test.flood", {"events": events})
+        times.append(perf_counter() - sent)
+        await asyncio.sleep(max(interval_ms / 1e3 - times[-1], 0))
+    while conn.stats().get("event_queue_depth"):
+        await asyncio.sleep(0.001)
+    elapsed = perf_counter() - start
+    stats = conn.stats()
+    await conn.dispose()
+    times.sort()
+    lag = ""
+    if defer_events:
+        lag_mean = stats["event_lag_total"] / stats["events_delivered"]
+        lag = (
+            f", event lag mean {lag_mean * 1e3:.2f}ms "
+            f"max {stats['event_lag_max'] * 1e3:.2f}ms, "
+            f"queue peak {stats['event_queue_peak']}"
+        )
+    mode = "deferred" if defer_events else "inline"
+    print(
+        f"{mode:>8}: command latency median {median(times) * 1e3:.2f}ms "
+        f"p99 {times[int(len(times) * 0.99)] * 1e3:.2f}ms, total {elapsed:.2f}s{lag}"
+    )
+
+
+async def main(
+    commands: int, events: int, listener_us: float, interval_ms: float
+) -> None:
+    ports: Queue = Queue()
+    server = Process(target=serve, args=(ports,), daemon=True)
+    server.start()
+    url = f"ws://127.0.0.1:{ports.get()}"
+    try:
+        for defer_events in (False, True):
+            await measure(url, defer_events, commands, events, listener_us, interval_ms)
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    asyncio.get_event_loop().run_until_complete(
+        main(
+            int(args[0]) if len(args) > 0 else 200,
+            int(args[1]) if len(args) > 1 else 100,
+            float(args[2]) if len(args) > 2 else 100,
+            float(args[3]) if len(args) > 3 else 25,
+        )
+    )
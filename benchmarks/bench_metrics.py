@@ -0,0 +1,74 @@
+"""Measures the overhead of the connection metrics, using a mock browser running
+in a separate process that answers every command with an empty result preceded
+by an event that has a listener.
+
+Usage: python -m benchmarks.bench_metrics [number of commands]
+"""
+import asyncio
+import sys
+from multiprocessing import Process, Queue
+from time import perf_counter, process_time
+from typing import Any
+
+import websockets
+from ujson import dumps, loads
+
+from cripy import Connection, Metrics
+
+EVENT = dumps({"method": "Network.dataReceived", "params": {"requestId": "1"}})
+
+
+async def browser(ws: Any, path: str) -> None:
+    try:
+        async for frame in ws:
+            await ws.send(EVENT)
+            await ws.send(dumps({"id": loads(frame)["id"], "result": {}}))
+    except websockets.ConnectionClosed:
+        pass
+
+
+def serve(ports: Queue) -> None:
+    """Runs the mock browser, reporting the port it listens on"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = loop.run_until_complete(
+        websockets.serve(browser, "127.0.0.1", 0, max_size=None, compression=None)
+    )
+    ports.put(server.sockets[0].getsockname()[1])
+    loop.run_forever()
+
+
+async def measure(url: str, name: str, metrics: Any, commands: int) -> None:
+    conn = Connection(url, websocket_transport="raw", metrics=metrics)
+    await conn.connect()
+    conn.on("Network.dataReceived", lambda event: None)
+    await asyncio.gather(*[conn.send("Page.enable") for _ in range(100)])  # warm up
+    start = perf_counter()
+    start_cpu = process_time()
+    await asyncio.gather(*[conn.send("Page.enable") for _ in range(commands)])
+    cpu = process_time() - start_cpu
+    elapsed = perf_counter() - start
+    await conn.dispose()
+    print(
+        f"{name:>8}: {commands / elapsed:,.0f} commands/s, "
+        f"client cpu {cpu / commands * 1e6:.2f}us/command"
+    )
+
+
+async def main(commands: int) -> None:
+    ports: Queue = Queue()
+    server = Process(target=serve, args=(ports,), daemon=True)
+    server.start()
+    url = f"ws://127.0.0.1:{ports.get()}"
+    try:
+        for _ in range(2):
+            await measure(url, "off", None, commands)
+            await measure(url, "on", Metrics(), commands)
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
+    )
@@ -0,0 +1,144 @@
+"""Measures the per message cost of non-flat sessions nested 1 to 3 deep,
+compared to a flat session (depth 0).
+
+For each depth the cost of sending a command, of receiving its response and
+of receiving an event that has a listener and one that does not is reported,
+the payload size sets the length of the string carried by each message.
+The "full decode" rows decode every envelope and message as was done before
+messages were scanned, the "scan" rows use the default behavior.
+
+Usage: python -m benchmarks.bench_nesting [number of messages] [payload size]
+"""
+import asyncio
+import sys
+from time import perf_counter
+from typing import Callable, List, Union
+
+from ujson import dumps
+
+from cripy import CDPSession, Connection
+
+
+class FullDecodeConnection(Connection):
+    """Decodes every envelope it receives"""
+
+    def _forward_envelope(self, message: Union[str, bytes]) -> bool:
+        return False
+
+    def _new_session(self, target_type: str, session_id: str) -> CDPSession:
+        return FullDecodeSession(
+            self, target_type, session_id, flat_session=self._flatten_sessions
+        )
+
+
+class FullDecodeSession(CDPSession):
+    """Decodes every message it receives"""
+
+    def _wants_message(self, message: Union[str, bytes], info: tuple) -> bool:
+        return True
+
+    def create_session(self, target_type: str, session_id: str) -> CDPSession:
+        session = FullDecodeSession(self, target_type, session_id)
+        self._sessions[session_id] = session
+        return session
+
+
+def wrap(message: str, depth: int) -> str:
+    """Wraps the message in depth Target.receivedMessageFromTarget envelopes"""
+    for level in range(depth, 0, -1):
+        message = dumps(
+            {
+                "method": "Target.receivedMessageFromTarget",
+                "params": {
+                    "sessionId": f"S{level}",
+                    "message": message,
+                    "targetId": f"T{level}",
+                },
+            }
+        )
+    return message
+
+
+def make_session(conn: Connection, depth: int) -> CDPSession:
+    if depth == 0:
+        session = conn._new_session("page", "S0")
+        conn.add_session(session)
+        return session
+    session = conn._new_session("page", "S1")
+    conn.add_session(session)
+    for level in range(2, depth + 1):
+        session = session.create_session("page", f"S{level}")
+    return session
+
+
+def timed(fn: Callable[[], None], messages: int) -> float:
+    start = perf_counter()
+    fn()
+    return (perf_counter() - start) / messages * 1e6
+
+
+def run(conn_class: type, depth: int, messages: int, size: int) -> List[float]:
+    loop = asyncio.get_event_loop()
+    conn = conn_class(loop=loop, flatten_sessions=depth == 0)
+    # no websocket, the frames are discarded from the send queue
+    conn._connected = True
+    session = make_session(conn, depth)
+    session.on("Page.loadEventFired", lambda event: None)
+    params = {"expression": "document.title", "returnByValue": True}
+    futures = []
+
+    def send() -> None:
+        for _ in range(messages):
+            futures.append(session.send("Runtime.evaluate", params))
+        conn._scheduler.clear()
+
+    send_cost = timed(send, messages)
+    first_id = futures[0].id
+    sid = ',"sessionId":"S0"' if depth == 0 else ""
+    body = '"result":{"result":{"type":"string","value":"%s"}}' % ("x" * size)
+    responses = [
+        wrap('{"id":%d,%s%s}' % (first_id + i, body, sid), depth)
+        for i in range(messages)
+    ]
+    event = '{"method":"%s","params":{"timestamp":1,"data":"%s"}%s}'
+    observed = wrap(event % ("Page.loadEventFired", "x" * size, sid), depth)
+    unobserved = wrap(event % ("Network.dataReceived", "x" * size, sid), depth)
+    on_message = conn._on_message
+
+    def receive(frames: List[str]) -> Callable[[], None]:
+        def inner() -> None:
+            for frame in frames:
+                on_message(frame)
+
+        return inner
+
+    response_cost = timed(receive(responses), messages)
+    observed_cost = timed(receive([observed] * messages), messages)
+    unobserved_cost = timed(receive([unobserved] * messages), messages)
+    assert all(future.done() for future in futures)
+    return [send_cost, response_cost, observed_cost, unobserved_cost]
+
+
+def main(messages: int, size: int) -> None:
+    print(
+        f"{'':>18} {'send':>9} {'response':>9} {'event':>9} {'unobserved':>11}  (us/message)"
+    )
+    for depth in range(4):
+        for name, clazz in (
+            ("full decode", FullDecodeConnection),
+            ("scan", Connection),
+        ):
+            if depth == 0 and clazz is FullDecodeConnection:
+                continue
+            send, response, observed, unobserved = run(clazz, depth, messages, size)
+            print(
+                f"depth {depth} {name:>11}: {send:9.2f} {response:9.2f} "
+                f"{observed:9.2f} {unobserved:11.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200,
+    )
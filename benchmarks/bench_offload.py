@@ -0,0 +1,144 @@
+"""Measures how long the event loop is stalled by decoding large responses, when
+decoded on the event loop and when offloaded to a thread or process pool, using
+a mock browser running in a separate process that answers with either an object
+heavy response (~10MB, like DOMSnapshot.captureSnapshot) or a string heavy
+response (~20MB, like Network.getResponseBody).
+
+While the responses are received a ticker task sleeps 1ms at a time, the stall
+is how much later than requested it wakes up.
+
+Usage: python -m benchmarks.bench_offload [number of responses]
+"""
+import asyncio
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import Process, Queue
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+
+import websockets
+from ujson import dumps, loads
+
+from cripy import Connection
+
+TICK = 0.001
+
+
+def objects_result(nodes: int = 100000) -> Dict:
+    return {
+        "nodes": [
+            {
+                "nodeId": i,
+                "nodeName": "DIV",
+                "attributes": ["class", "x"],
+                "bounds": [1.5, 2, 3, 4],
+            }
+            for i in range(nodes)
+        ]
+    }
+
+
+def string_result(lines: int = 500000) -> Dict:
+    return {
+        "body": '<div class="x">hello é world</div>\n' * lines,
+        "base64Encoded": False,
+    }
+
+
+async def browser(ws: Any, path: str, results: Dict[str, str]) -> None:
+    try:
+        async for frame in ws:
+            msg = loads(frame)
+            await ws.send('{"id":%d,"result":%s}' % (msg["id"], results[msg["method"]]))
+    except websockets.ConnectionClosed:
+        pass
+
+
+def serve(ports: Queue) -> None:
+    """Runs the mock browser, reporting the port it listens on"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    results = {
+        "DOMSnapshot.captureSnapshot": dumps(objects_result()),
+        "Network.getResponseBody": dumps(string_result()),
+    }
+    server = loop.run_until_complete(
+        websockets.serve(
+            lambda ws, path: browser(ws, path, results),
+            "127.0.0.1",
+            0,
+            max_size=None,
+            compression=None,
+        )
+    )
+    ports.put(server.sockets[0].getsockname()[1])
+    loop.run_forever()
+
+
+async def ticker(stalls: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = perf_counter()
+        await asyncio.sleep(TICK)
+        stalls.append(perf_counter() - start - TICK)
+
+
+async def measure(
+    url: str, method: str, responses: int, executor: Optional[Executor], offload: bool
+) -> str:
+    conn = Connection(
+        url,
+        flatten_sessions=True,
+        offload_decode_size=1 << 20 if offload else None,
+        decode_executor=executor,
+    )
+    await conn.connect()
+    await conn.send(method)  # warm up
+    stalls: List[float] = []
+    stop = asyncio.Event()
+    tick_task = asyncio.get_event_loop().create_task(ticker(stalls, stop))
+    start = perf_counter()
+    for _ in range(responses):
+        await conn.send(method)
+    elapsed = (perf_counter() - start) / responses
+    stop.set()
+    await tick_task
+    stats = conn.stats()
+    await conn.dispose()
+    stalls.sort()
+    offloaded = stats.get("decode_offloaded_seconds", 0)
+    return (
+        f"{elapsed * 1e3:7.1f}ms/response, stall max {stalls[-1] * 1e3:6.1f}ms "
+        f"p99 {stalls[int(len(stalls) * 0.99)] * 1e3:6.1f}ms, "
+        f"offloaded {offloaded / responses * 1e3:6.1f}ms/response"
+    )
+
+
+async def main(responses: int) -> None:
+    ports: Queue = Queue()
+    server = Process(target=serve, args=(ports,), daemon=True)
+    server.start()
+    url = f"ws://127.0.0.1:{ports.get()}"
+    threads = ThreadPoolExecutor(1)
+    processes = ProcessPoolExecutor(1)
+    processes.submit(int).result()
+    try:
+        for method in ("DOMSnapshot.captureSnapshot", "Network.getResponseBody"):
+            print(method)
+            for name, executor, offload in (
+                ("loop", None, False),
+                ("thread", threads, True),
+                ("process", processes, True),
+            ):
+                print(
+                    f"  {name:>7}: {await measure(url, method, responses, executor, offload)}"
+                )
+    finally:
+        server.terminate()
+        threads.shutdown()
+        processes.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
+    )
@@ -0,0 +1,105 @@
+"""Measures the throughput of receiving, dispatching and delivering events to
+listeners by replaying a wire recording at full speed, no browser involved.
+
+Without a recording one is synthesized: a flat session receiving bursts of
+network events, each burst preceded by a command and followed by its response.
+Recordings of real traffic are made by creating a connection with recorder=path.
+
+Usage: python -m benchmarks.bench_replay [recording] [repetitions]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from time import perf_counter, process_time
+from typing import Optional
+
+from ujson import dumps
+
+from cripy import Connection, ConnectionEvents, ReplayTransport
+from cripy.recording import read_wire_records, WireRecorder
+
+SESSION_ID = "8A3C5C2C0A4C4A0E9B6E1D9A2F8B7C61"
+
+
+def synthesize(path: str, commands: int = 1000, events: int = 20) -> None:
+    recorder = WireRecorder(path)
+    for _id in range(1, commands + 1):
+        recorder.record(
+            dumps({"id": _id, "method": "Network.enable", "params": {}}), False
+        )
+        for event in range(events):
+            recorder.record(
+                dumps(
+                    {
+                        "method": "Network.dataReceived",
+                        "params": {
+                            "requestId": f"{_id}.{event}",
+                            "timestamp": 1.5,
+                            "dataLength": 1024,
+                            "encodedDataLength": 512,
+                        },
+                        "sessionId": SESSION_ID,
+                    }
+                ),
+                True,
+            )
+        recorder.record(dumps({"id": _id, "result": {}, "sessionId": SESSION_ID}), True)
+    recorder.close()
+
+
+async def replay(path: str, session_ids: set) -> None:
+    conn = Connection(flatten_sessions=True)
+    received = 0
+
+    def listener(event: dict) -> None:
+        nonlocal received
+        received += 1
+
+    conn.on("Network.dataReceived", listener)
+    for session_id in session_ids:
+        session = conn._new_session("page", session_id)
+        conn.add_session(session)
+        session.on("Network.dataReceived", listener)
+    transport = ReplayTransport(path, follow_sends=False)
+    closed = asyncio.Future()
+    conn.on(ConnectionEvents.Disconnected, lambda: closed.set_result(None))
+    start = perf_counter()
+    start_cpu = process_time()
+    await conn.connect(transport=transport)
+    await closed
+    elapsed = perf_counter() - start
+    cpu = process_time() - start_cpu
+    print(
+        f"{transport.replayed:,} frames in {elapsed * 1e3:.1f}ms: "
+        f"{transport.replayed / elapsed:,.0f} frames/s, {received:,} events delivered, "
+        f"client cpu {cpu / transport.replayed * 1e6:.2f}us/frame"
+    )
+
+
+async def main(path: Optional[str], repetitions: int) -> None:
+    tmp = None
+    if path is None:
+        fd, tmp = tempfile.mkstemp(suffix=".rec")
+        os.close(fd)
+        os.unlink(tmp)
+        synthesize(tmp)
+        path = tmp
+    try:
+        session_ids = {
+            record.session_id
+            for record in read_wire_records(path)
+            if record.session_id is not None
+        }
+        for _ in range(repetitions):
+            await replay(path, session_ids)
+    finally:
+        if tmp is not None:
+            os.unlink(tmp)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    asyncio.get_event_loop().run_until_complete(
+        main(args[0] if args else None, int(args[1]) if len(args) > 1 else 3)
+    )
@@ -0,0 +1,90 @@
+"""Compares the send throughput of the single writer task against the
+previous one task per message approach.
+
+Usage: python -m benchmarks.bench_send [number of commands]
+"""
+import asyncio
+import sys
+from asyncio import AbstractEventLoop
+from time import perf_counter
+from typing import Dict, Type
+
+from ujson import dumps
+
+from cripy import Connection
+
+
+class NullWebSocket:
+    """Websocket that accepts and discards every frame written to it"""
+
+    def __init__(self, loop: AbstractEventLoop) -> None:
+        self.frames: int = 0
+        self.closed: bool = False
+        self._closed = loop.create_future()
+
+    async def send(self, data: str) -> None:
+        self.frames += 1
+
+    async def recv(self) -> str:
+        await self._closed
+        return ""
+
+    async def close(self) -> None:
+        self.closed = True
+        if not self._closed.done():
+            self._closed.set_result(True)
+
+
+class TaskPerMessageConnection(Connection):
+    """Reproduces the send path used before the introduction of the writer task"""
+
+    def _raw_send(self, msg: Dict, priority: int = 1) -> int:
+        self._lastId += 1
+        _id = self._lastId
+        msg["id"] = _id
+        self._loop.create_task(self._send_async(dumps(msg)))
+        return _id
+
+    async def _send_async(self, msg: str) -> None:
+        while not self._connected:
+            await asyncio.sleep(0)
+        await self._ws.send(msg)
+
+
+async def run(conn_class: Type[Connection], commands: int) -> float:
+    loop = asyncio.get_event_loop()
+    conn = conn_class(loop=loop)
+    ws = NullWebSocket(loop)
+    conn._ws = ws
+    await conn._start_loops()
+    params = {"expression": "document.title", "returnByValue": True}
+    start = perf_counter()
+    for _ in range(commands):
+        conn.send("Runtime.evaluate", params)
+    while ws.frames < commands:
+        await asyncio.sleep(0)
+    elapsed = perf_counter() - start
+    # no responses are coming, discard the futures rather than fail them on dispose
+    for callback in list(conn._callbacks.values()):
+        callback.cancel()
+    conn._callbacks.clear()
+    await conn.dispose()
+    return elapsed
+
+
+async def main(commands: int) -> None:
+    for name, clazz in (
+        ("task per message", TaskPerMessageConnection),
+        ("writer task", Connection),
+    ):
+        elapsed = await run(clazz, commands)
+        print(
+            f"{name:>16}: {commands} commands in {elapsed:.4f}s "
+            f"({commands / elapsed:,.0f} commands/s)"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
+    )
@@ -0,0 +1,129 @@
+"""Compares the websocket transports and the pipe (--remote-debugging-pipe) transport using
+a mock browser, running in a separate process, that answers every command with
+an empty result. Both mock browsers use asyncio and the same JSON library.
+
+The round-trip latency is measured by sending commands one at a time, the
+throughput by sending all of them at once and gathering their results.
+
+Usage: python -m benchmarks.bench_transport [number of commands]
+"""
+import asyncio
+import os
+import sys
+from multiprocessing import Process, Queue
+from statistics import median
+from time import perf_counter, process_time
+from typing import Any, Awaitable, Callable, List
+
+import websockets
+from ujson import dumps, loads
+
+from cripy import Connection, PipeTransport, launch_chrome_pipe
+from cripy.transport import available_transports
+
+SERVE_PIPE = "--serve-pipe"
+
+
+def respond(frame: Any) -> str:
+    return dumps({"id": loads(frame)["id"], "result": {}})
+
+
+async def ws_server(ws: Any, path: str) -> None:
+    try:
+        async for frame in ws:
+            await ws.send(respond(frame))
+    except websockets.ConnectionClosed:
+        pass
+
+
+def serve_ws(ports: Queue) -> None:
+    """Runs the mock websocket browser, reporting the port it listens on"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = loop.run_until_complete(
+        websockets.serve(ws_server, "127.0.0.1", 0, max_size=None, compression=None)
+    )
+    ports.put(server.sockets[0].getsockname()[1])
+    loop.run_forever()
+
+
+async def serve_pipe() -> None:
+    """Runs the mock pipe browser, reading from fd 3 and writing to fd 4"""
+    pipe = await PipeTransport.open(3, 4)
+    try:
+        while 1:
+            await pipe.send(respond(await pipe.recv()))
+    except ConnectionError:
+        pass
+
+
+async def latency(conn: Connection, commands: int) -> List[float]:
+    times = []
+    for _ in range(commands):
+        start = perf_counter()
+        await conn.send("Runtime.runIfWaitingForDebugger")
+        times.append(perf_counter() - start)
+    return times
+
+
+async def throughput(conn: Connection, commands: int) -> float:
+    start = perf_counter()
+    await asyncio.gather(
+        *[conn.send("Runtime.runIfWaitingForDebugger") for _ in range(commands)]
+    )
+    return perf_counter() - start
+
+
+async def measure(name: str, conn: Connection, commands: int) -> None:
+    await throughput(conn, 100)  # warm up
+    times = await latency(conn, commands)
+    times.sort()
+    start_cpu = process_time()
+    elapsed = await throughput(conn, commands)
+    cpu = process_time() - start_cpu
+    print(
+        f"{name:>10}: latency median {median(times) * 1e6:.1f}us "
+        f"p99 {times[int(len(times) * 0.99)] * 1e6:.1f}us, "
+        f"throughput {commands / elapsed:,.0f} commands/s "
+        f"(client cpu {cpu / commands * 1e6:.1f}us/command)"
+    )
+
+
+async def main(commands: int) -> None:
+    loop = asyncio.get_event_loop()
+    ports: Queue = Queue()
+    server = Process(target=serve_ws, args=(ports,), daemon=True)
+    server.start()
+    port = ports.get()
+    try:
+        for name in sorted(available_transports()):
+            conn = Connection(
+                f"ws://127.0.0.1:{port}", loop=loop, websocket_transport=name
+            )
+            await conn.connect()
+            await measure(name, conn, commands)
+            await conn.dispose()
+    finally:
+        server.terminate()
+    process, transport = await launch_chrome_pipe(
+        sys.executable,
+        ["-m", "benchmarks.bench_transport", SERVE_PIPE],
+        loop=loop,
+        env=dict(os.environ, PYTHONPATH=os.getcwd()),
+    )
+    conn = Connection(loop=loop)
+    await conn.connect(transport=transport)
+    await measure("pipe", conn, commands)
+    await conn.dispose()
+    await process.wait()
+
+
+def run(coro: Callable[..., Awaitable[None]], *args: Any) -> None:
+    asyncio.get_event_loop().run_until_complete(coro(*args))
+
+
+if __name__ == "__main__":
+    if SERVE_PIPE in sys.argv:
+        run(serve_pipe)
+    else:
+        run(main, int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,312 @@
+"""Runs the benchmarks of the hot paths of cripy against the fake browser
+(tests/helpers/fake_browser.py), running in a separate process, and writes
+the results as JSON so that they can be compared across releases.
+
+Benchmarks:
+    - import: time to import cripy in a fresh interpreter
+    - generate_domains: time of dynamically_generate_domains for the bundled protocol
+    - construction: cost of creating a Connection, Client, CDPSession and TargetSession
+    - commands: round trip latency (sequential) and throughput (concurrent) of commands
+    - events: rate events are received and delivered to one and to ten listeners
+    - sessions: command latency and throughput, and event rate, of flat and non-flat sessions
+
+Usage: python -m benchmarks.suite [--output results.json] [--compare previous.json]
+    [--quick] [--only commands,events]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+from multiprocessing import Process, Queue
+from statistics import median
+from time import perf_counter, process_time, time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cripy import CDPSession, Client, Connection, TargetSession
+from cripy.protogen.generate import dynamically_generate_domains
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROTOCOL_PATH = os.path.join(ROOT, "data", "protocol.json")
+
+Results = Dict[str, Any]
+#: The http URL and browser websocket URL of the fake browser,
+#: the id and websocket URL of its page
+URLs = Tuple[str, str, str, str]
+
+
+def serve(ports: Queue) -> None:
+    """Runs the fake browser, reporting the port it listens on. Benchmark.flood
+    emits params.events events of params.size characters to the channel it was
+    received on before being responded to
+    """
+    sys.path.insert(0, ROOT)
+    from tests.helpers.fake_browser import FakeBrowser
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    browser = FakeBrowser(loop=loop)
+
+    def flood(params: Dict, channel: Any) -> Dict:
+        event = {"requestId": "1000.1", "data": "x" * params.get("size", 0)}
+        for _ in range(params["events"]):
+            channel.emit("Network.dataReceived", event)
+        return {}
+
+    browser.respond("Benchmark.flood", flood)
+    loop.run_until_complete(browser.start())
+    ports.put((browser.http_url, browser.ws_url, browser.page.id, browser.page.ws_url))
+    loop.run_forever()
+
+
+def percentile(values: List[float], percent: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * percent / 100), len(values) - 1)]
+
+
+async def bench_import(urls: URLs, scale: float) -> Results:
+    times = []
+    for _ in range(max(int(5 * scale), 3)):
+        out = subprocess.check_output(
+            [
+                sys.executable,
+                "-c",
+                "from time import perf_counter; s = perf_counter(); import cripy; "
+                "print(perf_counter() - s)",
+            ],
+            cwd=ROOT,
+        )
+        times.append(float(out))
+    return {"seconds_median": median(times), "seconds_min": min(times)}
+
+
+async def bench_generate_domains(urls: URLs, scale: float) -> Results:
+    with open(PROTOCOL_PATH, "r") as file:
+        protocol = json.load(file)
+    times = []
+    for _ in range(max(int(5 * scale), 2)):
+        start = perf_counter()
+        domains = await dynamically_generate_domains(protocol)
+        times.append(perf_counter() - start)
+    return {
+        "domains": len(domains),
+        "seconds_median": median(times),
+        "seconds_min": min(times),
+    }
+
+
+async def bench_construction(urls: URLs, scale: float) -> Results:
+    count = int(2000 * scale)
+    conn = Connection()
+
+    def per_instance(factory: Callable[[], Any]) -> float:
+        start = perf_counter()
+        for _ in range(count):
+            factory()
+        return (perf_counter() - start) / count
+
+    return {
+        "connection_us": per_instance(Connection) * 1e6,
+        "client_us": per_instance(Client) * 1e6,
+        "cdp_session_us": per_instance(lambda: CDPSession(conn, "page", "S1", True))
+        * 1e6,
+        "target_session_us": per_instance(
+            lambda: TargetSession(conn, "page", "S1", True)
+        )
+        * 1e6,
+    }
+
+
+async def measure_commands(send: Callable[..., Any], scale: float) -> Results:
+    for _ in range(100):  # warm up
+        await send("Page.enable")
+    latencies = []
+    for _ in range(int(2000 * scale)):
+        start = perf_counter()
+        await send("Page.enable")
+        latencies.append(perf_counter() - start)
+    count = int(20000 * scale)
+    start = perf_counter()
+    start_cpu = process_time()
+    await asyncio.gather(*[send("Page.enable") for _ in range(count)])
+    cpu = process_time() - start_cpu
+    elapsed = perf_counter() - start
+    return {
+        "latency_median_us": median(latencies) * 1e6,
+        "latency_p99_us": percentile(latencies, 99) * 1e6,
+        "throughput_per_s": count / elapsed,
+        "client_cpu_us": cpu / count * 1e6,
+    }
+
+
+async def measure_events(
+    emitter: Any, send: Callable[..., Any], listeners: int, scale: float
+) -> Results:
+    delivered = 0
+
+    def listener(event: Dict) -> None:
+        nonlocal delivered
+        delivered += 1
+
+    emitter.on("Network.dataReceived", listener)
+    for _ in range(1, listeners):
+        # a distinct function each time, an emitter registers a function once per event
+        emitter.on("Network.dataReceived", lambda event: None)
+    events = int(20000 * scale)
+    start = perf_counter()
+    await send("Benchmark.flood", {"events": events, "size": 64})
+    elapsed = perf_counter() - start
+    emitter.remove_all_listeners("Network.dataReceived")
+    assert delivered == events, (delivered, events)
+    return {"events_per_s": events / elapsed}
+
+
+async def bench_commands(urls: URLs, scale: float) -> Results:
+    results = {}
+    for transport in ("websockets", "raw"):
+        conn = Connection(urls[3], websocket_transport=transport)
+        await conn.connect()
+        results[transport] = await measure_commands(conn.send, scale)
+        await conn.dispose()
+    return results
+
+
+async def bench_events(urls: URLs, scale: float) -> Results:
+    results = {}
+    conn = Connection(urls[3])
+    await conn.connect()
+    for listeners in (1, 10):
+        results[f"listeners_{listeners}"] = await measure_events(
+            conn, conn.send, listeners, scale
+        )
+    await conn.dispose()
+    return results
+
+
+async def bench_sessions(urls: URLs, scale: float) -> Results:
+    results = {}
+    for flat in (True, False):
+        conn = Connection(urls[1], flatten_sessions=flat)
+        await conn.connect()
+        session = await conn.create_session(urls[2])
+        result = await measure_commands(session.send, scale)
+        result.update(await measure_events(session, session.send, 1, scale))
+        results["flat" if flat else "non_flat"] = result
+        await conn.dispose()
+    return results
+
+
+def environment() -> Dict[str, Optional[str]]:
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL
+        )
+        revision: Optional[str] = commit.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    try:
+        import pkg_resources
+
+        version: Optional[str] = pkg_resources.get_distribution("cripy").version
+    except Exception:
+        version = None
+    return {
+        "cripy": version,
+        "revision": revision,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "loop": type(asyncio.get_event_loop()).__module__,
+    }
+
+
+async def run(names: List[str], scale: float) -> Results:
+    results: Results = {}
+    ports: Queue = Queue()
+    server = Process(target=serve, args=(ports,), daemon=True)
+    server.start()
+    urls = ports.get(timeout=30)
+    try:
+        for name in names:
+            start = perf_counter()
+            results[name] = await BENCHMARKS[name](urls, scale)
+            print(
+                f"{name} ({perf_counter() - start:.1f}s): {json.dumps(results[name])}"
+            )
+    finally:
+        server.terminate()
+    return results
+
+
+def flatten(results: Results, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(results: Results, baseline_path: str) -> None:
+    """Prints the change of every metric relative to a previous results file"""
+    with open(baseline_path, "r") as file:
+        baseline = flatten(json.load(file)["results"])
+    for metric, value in flatten(results).items():
+        before = baseline.get(metric)
+        if before:
+            print(
+                f"{metric:<45} {before:>14.2f} -> {value:>14.2f} {value / before - 1:+.1%}"
+            )
+
+
+BENCHMARKS = {
+    "import": bench_import,
+    "generate_domains": bench_generate_domains,
+    "construction": bench_construction,
+    "commands": bench_commands,
+    "events": bench_events,
+    "sessions": bench_sessions,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks the hot paths of cripy")
+    parser.add_argument(
+        "--output", default="benchmark-results.json", help="The JSON results file"
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="Run a tenth of the iterations"
+    )
+    parser.add_argument(
+        "--compare", help="A previous results file to print the changes against"
+    )
+    parser.add_argument(
+        "--only", help=f"Comma separated benchmarks, of {', '.join(BENCHMARKS)}"
+    )
+    args = parser.parse_args()
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks {unknown}")
+    scale = 0.1 if args.quick else 1.0
+    started = time()
+    results = asyncio.get_event_loop().run_until_complete(run(names, scale))
+    report = {
+        "started": started,
+        "duration": time() - started,
+        "scale": scale,
+        "environment": environment(),
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+    print(f"results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,76 @@
 from typing import Union
 
-from .cdp import CDP, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_URL, connect
+from .batch import Batch
+from .cdp import CDP, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_URL, connect, connect_pipe
 from .cdp_session import CDPSession
 from .client import Client, ClientDynamic
+from .codec import Codec, RawJSON, RawJSONCache, get_codec
+from .compression import CompressionStats, Deflate
 from .connection import Connection
-from .errors import ClientError, NetworkError, ProtocolError
+from .errors import (
+    ClientError,
+    CommandTimeoutError,
+    EventTimeoutError,
+    NetworkError,
+    ProtocolError,
+    TransportError,
+)
 from .events import ConnectionEvents, SessionEvents
+from .listeners import ListenerAccounting
+from .metrics import Metrics, MetricsHook
+from .pipe import PipeTransport, launch_chrome_pipe
+from .recording import ReplayTransport, WireRecorder
+from .reducers import EventReducer
+from .scheduler import Priority
+from .streams import EventStream, StreamPolicy
+from .subscriptions import SessionEvent
 from .target_session import TargetSession, TargetSessionDynamic
+from .transport import Transport
 
 ConnectionType = Union[Client, Connection, ClientDynamic]
 SessionType = Union[TargetSession, CDPSession, TargetSessionDynamic]
 
 __all__ = [
+    "Batch",
     "CDP",
     "CDPSession",
     "Client",
     "ClientDynamic",
     "ClientError",
+    "Codec",
+    "CommandTimeoutError",
+    "CompressionStats",
     "connect",
+    "connect_pipe",
     "Connection",
     "ConnectionEvents",
     "ConnectionType",
     "DEFAULT_HOST",
     "DEFAULT_PORT",
     "DEFAULT_URL",
+    "Deflate",
+    "EventReducer",
+    "EventStream",
+    "EventTimeoutError",
+    "get_codec",
+    "launch_chrome_pipe",
+    "ListenerAccounting",
+    "Metrics",
+    "MetricsHook",
     "NetworkError",
+    "PipeTransport",
+    "Priority",
     "ProtocolError",
+    "RawJSON",
+    "RawJSONCache",
+    "ReplayTransport",
+    "SessionEvent",
     "SessionEvents",
     "SessionType",
+    "StreamPolicy",
     "TargetSession",
     "TargetSessionDynamic",
+    "Transport",
+    "TransportError",
+    "WireRecorder",
 ]
@@ -0,0 +1,256 @@
+from asyncio import CancelledError, Future, TimerHandle
+from typing import Any, Dict, List, Optional, TYPE_CHECKING, Tuple, Union, cast
+
+from .cdp_result_future import CDPResultFuture
+from .errors import (
+    ClientError,
+    CommandTimeoutError,
+    NetworkError,
+    create_protocol_error,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from cripy import ConnectionType, SessionType  # noqa: F401
+
+__all__ = ["Batch", "BatchItem"]
+
+#: The value of the result of a batch item that has not received a response
+PENDING: Any = object()
+
+
+class BatchItem:
+    """Stands in for the future of a command sent as part of a batch.
+
+    Implements the parts of the CDPResultFuture interface used by the connection,
+    its sessions and the command windows so that it can take the place of the
+    future, without being awaitable or waking up anything when resolved.
+    """
+
+    __slots__ = ["batch", "method", "result", "id", "registry", "windows", "sent_at"]
+
+    def __init__(self, batch: "Batch", method: str) -> None:
+        self.batch: "Batch" = batch
+        self.method: str = method
+        #: The result of the command, an exception if it failed
+        self.result: Any = PENDING
+        self.id: Optional[int] = None
+        self.registry: Optional[Dict[int, Any]] = None
+        self.windows: List[Any] = []
+        self.sent_at: float = 0.0
+
+    def done(self) -> bool:
+        return self.result is not PENDING
+
+    def resolve(self, msg: Dict) -> None:
+        if self.result is not PENDING:
+            return
+        if "error" in msg:
+            self.result = create_protocol_error(self.method, msg)
+        else:
+            self.result = msg.get("result")
+        self.batch._item_done()
+
+    def set_exception(self, exception: BaseException) -> None:
+        if self.result is not PENDING:
+            return
+        self.result = exception
+        self.batch._item_done()
+
+    def release_windows(self) -> None:
+        windows = self.windows
+        while windows:
+            windows.pop().release()
+
+    def clear_timeout(self) -> None:
+        """Batch items have no timeout of their own, the batch does"""
+
+    def forget(self) -> None:
+        """Removes this item from the items awaiting a response"""
+        if self.id is not None and self.registry is not None:
+            self.registry.pop(self.id, None)
+        self.release_windows()
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(method={self.method}, id={self.id})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class Batch:
+    """A batch of commands written in one burst whose results are collected
+    in the order the commands were added.
+
+    Commands added to the batch are not sent until the batch is executed,
+    at which point all of them are written and the task executing the batch
+    is woken up once, when the last response is received, rather than once per command.
+    A failed command does not fail the batch, the exception is its result instead.
+
+    Usage:
+        async with session.batch() as batch:
+            for node_id in node_ids:
+                batch.send("DOM.describeNode", {"nodeId": node_id})
+        for result in batch.results:
+            ...
+
+    The generated domain classes can be used to add commands,
+    e.g. DOM(batch).describeNode(nodeId=1), in which case the return value of
+    the domain method is the index of the command in the batch.
+    """
+
+    __slots__ = [
+        "_client",
+        "_commands",
+        "_future",
+        "_items",
+        "_pending",
+        "_priority",
+        "_root",
+        "_timeout",
+        "_timeout_handle",
+    ]
+
+    def __init__(
+        self,
+        client: Union["ConnectionType", "SessionType"],
+        root: "ConnectionType",
+        timeout: Optional[float] = None,
+        priority: Optional[int] = None,
+    ) -> None:
+        """Create a new Batch
+
+        :param client: The connection or session used to send the commands
+        :param root: The connection at the root of the clients session tree
+        :param timeout: Optional number of seconds the batch has to receive all responses.
+        Defaults to the connections command timeout
+        :param priority: Optional priority class of the batches commands
+        """
+        self._client: Union["ConnectionType", "SessionType"] = client
+        self._root: "ConnectionType" = root
+        self._timeout: Optional[float] = (
+            timeout if timeout is not None else root.command_timeout
+        )
+        self._priority: Optional[int] = priority
+        self._commands: List[Tuple[str, Optional[Dict]]] = []
+        self._items: Optional[List[BatchItem]] = None
+        self._future: Optional[Future] = None
+        self._pending: int = 0
+        self._timeout_handle: Optional[TimerHandle] = None
+
+    @property
+    def executed(self) -> bool:
+        """Returns T/F indicating if the batch has been executed"""
+        return self._items is not None
+
+    @property
+    def results(self) -> List[Any]:
+        """Returns the results of the commands, in the order they were added.
+        The result of a command that failed is the exception it failed with
+        """
+        if self._items is None:
+            raise ClientError("The batch has not been executed")
+        return [item.result for item in self._items]
+
+    @property
+    def errors(self) -> Dict[int, BaseException]:
+        """Returns the exceptions of the failed commands keyed by the commands index"""
+        return {
+            idx: result
+            for idx, result in enumerate(self.results)
+            if isinstance(result, BaseException)
+        }
+
+    def send(self, method: str, params: Optional[Dict] = None) -> int:
+        """Adds a command to the batch
+
+        :param method: The method of the command
+        :param params: The optional parameters of the command
+        :return: The index of the command in the batch
+        """
+        if self._items is not None:
+            raise ClientError("Can not add commands to an executed batch")
+        self._commands.append((method, params))
+        return len(self._commands) - 1
+
+    async def execute(self) -> List[Any]:
+        """Sends the commands of the batch, resolving once all of them received a response,
+        failed or the batch timed out
+
+        :return: The results of the commands, in the order they were added
+        """
+        if self._items is not None:
+            raise ClientError("The batch has already been executed")
+        root = self._root
+        if root._lastId and not root._connected:
+            raise NetworkError("Connection is closed")
+        loop = root.loop
+        self._future = loop.create_future()
+        items: List[BatchItem] = []
+        self._items = items
+        self._pending = len(self._commands)
+        if not self._commands:
+            return []
+        if self._timeout is not None:
+            self._timeout_handle = loop.call_later(self._timeout, self._on_timeout)
+        submit = self._client._submit
+        priority = self._priority
+        for method, params in self._commands:
+            item = BatchItem(self, method)
+            items.append(item)
+            # the item takes the place of the future of the command
+            submit(cast(CDPResultFuture, item), method, params, priority)
+        self._commands.clear()
+        try:
+            await self._future
+        except CancelledError:
+            self._forget_pending()
+            raise
+        return self.results
+
+    def _item_done(self) -> None:
+        """Accounts for an item having received its result"""
+        self._pending -= 1
+        if self._pending == 0:
+            if self._timeout_handle is not None:
+                self._timeout_handle.cancel()
+                self._timeout_handle = None
+            if not self._future.done():
+                self._future.set_result(None)
+
+    def _on_timeout(self) -> None:
+        """Fails the items that did not receive a response within the batches timeout"""
+        self._timeout_handle = None
+        for item in self._items:
+            if not item.done():
+                item.forget()
+                self._root._commands_timed_out += 1
+                item.set_exception(
+                    CommandTimeoutError(
+                        f"{item.method}: No response received within {self._timeout} seconds"
+                    )
+                )
+
+    def _forget_pending(self) -> None:
+        """Forgets the items still awaiting a response once the batch was cancelled"""
+        if self._timeout_handle is not None:
+            self._timeout_handle.cancel()
+            self._timeout_handle = None
+        for item in self._items:
+            if not item.done():
+                item.forget()
+                self._root._commands_cancelled += 1
+                item.set_exception(CancelledError())
+
+    async def __aenter__(self) -> "Batch":
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        if exc_type is None:
+            await self.execute()
+
+    def __str__(self) -> str:
+        size = len(self._items) if self._items is not None else len(self._commands)
+        return f"{self.__class__.__name__}(commands={size}, executed={self.executed})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -1,7 +1,17 @@
 import asyncio
 import re
 from asyncio import AbstractEventLoop
-from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Pattern,
+    Sequence,
+    Tuple,
+    Union,
+)
 from urllib.parse import urljoin, urlparse
 
 import ujson
@@ -10,6 +20,7 @@ from aiohttp import AsyncResolver, ClientSession, TCPConnector
 from .client import Client, ClientDynamic
 from .connection import Connection
 from .errors import ClientError
+from .pipe import launch_chrome_pipe
 from .protogen.generate import dynamically_generate_domains
 
 __all__ = [
@@ -18,6 +29,7 @@ __all__ = [
     "DEFAULT_URL",
     "CDP",
     "connect",
+    "connect_pipe",
     "ensure_cdp_url_endswith",
     "fetch_ws_url",
     "fetch_and_gen_proto_classes",
@@ -67,8 +79,9 @@ async def connect(
     url: Optional[str] = DEFAULT_URL,
     protocol: Optional[ProtocolDef] = None,
     remote: bool = False,
-    flatten_sessions: bool = False,
+    flatten_sessions: Optional[bool] = None,
     loop: Optional[AbstractEventLoop] = None,
+    **kwargs: Any,
 ) -> Union[Client, ClientDynamic]:
     """Convince function for creating an instance of the ChromeRemoteInterface and connecting it
     to the remote instance.
@@ -81,8 +94,10 @@ async def connect(
     version should be used. It has no effect if the protocol option is set. Defaults to false
     :param flatten_sessions: a boolean indicating whether to enables the "flat" access to the session
     via specifying sessionId attribute in the commands when targets are connected to via either TargetSession
-    or CDPSession
+    or CDPSession. Defaults to None, flat session mode is used if the
+    browser supports it
     :param loop: The event loop instance to use. Defaults to asyncio.get_event_loop
+    :param kwargs: Additional keyword arguments supplied to Connection (e.g. codec)
     :return: Client instance connected to the browser
     """
     if loop is None:
@@ -106,14 +121,69 @@ async def connect(
         proto_def = None
     if proto_def is not None:
         client = ClientDynamic(
-            ws_url, flatten_sessions=flatten_sessions, proto_def=proto_def, loop=loop
+            ws_url,
+            flatten_sessions=flatten_sessions,
+            proto_def=proto_def,
+            loop=loop,
+            **kwargs,
         )
     else:
-        client = Client(ws_url, flatten_sessions=flatten_sessions, loop=loop)
+        client = Client(ws_url, flatten_sessions=flatten_sessions, loop=loop, **kwargs)
     await client.connect()
     return client
 
 
+async def connect_pipe(
+    executable: str,
+    args: Optional[Sequence[str]] = None,
+    protocol: Optional[ProtocolDef] = None,
+    flatten_sessions: Optional[bool] = None,
+    loop: Optional[AbstractEventLoop] = None,
+    **kwargs: Any,
+) -> Union[Client, ClientDynamic]:
+    """Convince function for launching Chrome with --remote-debugging-pipe and connecting
+    an instance of the ChromeRemoteInterface to it over the pipe rather than a websocket.
+
+    The client is connected to the browser target, pages are reached using sessions.
+    The browser process is terminated once the client is disposed.
+
+    :param executable: The path to the Chrome executable
+    :param args: Optional additional command line arguments of the browser
+    :param protocol: Chrome Debugging Protocol descriptor. Defaults to the local version
+    :param flatten_sessions: a boolean indicating whether to enables the "flat" access
+    to the session. Defaults to None, flat session mode is used if the browser
+    supports it
+    :param loop: The event loop instance to use. Defaults to asyncio.get_event_loop
+    :param kwargs: Additional keyword arguments supplied to Connection (e.g. codec)
+    :return: Client instance connected to the browser
+    """
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    process, transport = await launch_chrome_pipe(executable, args, loop=loop)
+    if protocol is not None:
+        client = ClientDynamic(
+            flatten_sessions=flatten_sessions,
+            proto_def=await dynamically_generate_domains(protocol, loop=loop),
+            loop=loop,
+            **kwargs,
+        )
+    else:
+        client = Client(flatten_sessions=flatten_sessions, loop=loop, **kwargs)
+
+    async def terminate_browser() -> None:
+        if process.returncode is None:
+            process.terminate()
+            await process.wait()
+
+    client.set_close_callback(terminate_browser)
+    try:
+        await client.connect(transport=transport)
+    except Exception:
+        await client.dispose()
+        raise
+    return client
+
+
 def front_end_url(
     host: Optional[str] = DEFAULT_HOST,
     port: Optional[Union[int, str]] = DEFAULT_PORT,
@@ -292,8 +362,9 @@ class CDP:
         target: Optional[TargetArgT] = None,
         protocol: Optional[ProtocolDef] = None,
         remote: bool = False,
-        flatten_sessions: bool = False,
+        flatten_sessions: Optional[bool] = None,
         loop: Optional[AbstractEventLoop] = None,
+        **kwargs: Any,
     ) -> Union[Client, ClientDynamic]:
         """Returns a cripy.Client instance connected to the desired target.
 
@@ -322,8 +393,10 @@ class CDP:
         version should be used. It has no effect if the protocol option is set. Defaults to false
         :param flatten_sessions: a boolean indicating whether to enables the "flat" access to the session
         via specifying sessionId attribute in the commands when targets are connected to via either TargetSession
-        or CDPSession
+        or CDPSession. Defaults to None, flat session mode is used if the
+        browser supports it
         :param loop: The event loop instance to use. Defaults to asyncio.get_event_loop
+        :param kwargs: Additional keyword arguments supplied to Connection (e.g. codec)
         :return: A cripy.Client instance connected to the desired target
         """
         if loop is None:
@@ -343,9 +416,12 @@ class CDP:
                 flatten_sessions=flatten_sessions,
                 proto_def=proto_def,
                 loop=loop,
+                **kwargs,
             )
         else:
-            client = Client(ws_url, flatten_sessions=flatten_sessions, loop=loop)
+            client = Client(
+                ws_url, flatten_sessions=flatten_sessions, loop=loop, **kwargs
+            )
         await client.connect()
         return client
 
@@ -355,8 +431,9 @@ class CDP:
         port: Optional[Union[int, str]] = DEFAULT_PORT,
         secure: Optional[bool] = False,
         target: Optional[TargetArgT] = None,
-        flatten_sessions: bool = False,
+        flatten_sessions: Optional[bool] = None,
         loop: Optional[AbstractEventLoop] = None,
+        **kwargs: Any,
     ) -> Connection:
         """Returns a cripy.Connection instance connected to the desired target.
 
@@ -381,8 +458,10 @@ class CDP:
         :param target: Determines which target this client should attach to
         :param flatten_sessions: a boolean indicating whether to enables the "flat" access to the session
         via specifying sessionId attribute in the commands when targets are connected to via either TargetSession
-        or CDPSession
+        or CDPSession. Defaults to None, flat session mode is used if the
+        browser supports it
         :param loop: The event loop instance to use. Defaults to asyncio.get_event_loop
+        :param kwargs: Additional keyword arguments supplied to Connection (e.g. codec)
         :return: A cripy.Connection instance connected to the desired target
         """
         if loop is None:
@@ -391,7 +470,7 @@ class CDP:
             host=host, port=port, secure=secure, target=target, loop=loop
         )
         conn: Connection = Connection(
-            ws_url, flatten_sessions=flatten_sessions, loop=loop
+            ws_url, flatten_sessions=flatten_sessions, loop=loop, **kwargs
         )
         await conn.connect()
         return conn
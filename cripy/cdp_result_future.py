@@ -1,5 +1,7 @@
-from asyncio import AbstractEventLoop, Future
-from typing import Optional
+from asyncio import AbstractEventLoop, Future, TimerHandle
+from typing import Any, Dict, List, Optional
+
+from .errors import create_protocol_error
 
 __all__ = ["CDPResultFuture"]
 
@@ -10,3 +12,50 @@ class CDPResultFuture(Future):
     def __init__(self, method: str, loop: Optional[AbstractEventLoop] = None) -> None:
         super().__init__(loop=loop)
         self.method: str = method
+        #: The id of the command this future is the result of
+        self.id: Optional[int] = None
+        #: The dictionary of id to future this future is registered in
+        self.registry: Optional[Dict[int, "CDPResultFuture"]] = None
+        #: The connection that tracks this future, informed on cancellation
+        self.owner: Optional[Any] = None
+        self.timeout_handle: Optional[TimerHandle] = None
+        #: The command windows this futures command occupies a slot in
+        self.windows: List[Any] = []
+        #: When the command was sent, only recorded if the connection has metrics
+        self.sent_at: float = 0.0
+
+    def resolve(self, msg: Dict) -> None:
+        """Resolves this future using the supplied response message.
+
+        If the response message indicates an error a ProtocolError is set
+        as this futures exception otherwise its result is set.
+
+        :param msg: The response message received for this futures command
+        """
+        self.clear_timeout()
+        if self.done():
+            return
+        if "error" in msg:
+            self.set_exception(create_protocol_error(self.method, msg))
+        else:
+            self.set_result(msg.get("result"))
+
+    def release_windows(self) -> None:
+        """Frees the slots this futures command occupies in its command windows"""
+        windows = self.windows
+        while windows:
+            windows.pop().release()
+
+    def clear_timeout(self) -> None:
+        """Cancels this futures timeout, if it has one"""
+        if self.timeout_handle is not None:
+            self.timeout_handle.cancel()
+            self.timeout_handle = None
+
+    def cancel(self, *args: Any, **kwargs: Any) -> bool:
+        cancelled = super().cancel(*args, **kwargs)
+        if cancelled:
+            self.clear_timeout()
+            if self.owner is not None:
+                self.owner._forget_callback(self)
+        return cancelled
@@ -1,12 +1,21 @@
-from asyncio import AbstractEventLoop, get_event_loop
-from typing import ClassVar, Dict, Optional, TYPE_CHECKING, Type, Union
+from asyncio import AbstractEventLoop, Future, get_event_loop
+from itertools import chain
+from time import perf_counter
+from typing import Any, Callable, ClassVar, Dict, Optional, TYPE_CHECKING, Type, Union
 
-from ujson import dumps, loads
 from pyee2 import EventEmitterS
 
+from .batch import Batch
 from .cdp_result_future import CDPResultFuture
-from .errors import NetworkError, create_protocol_error
-from .events import SessionEvents
+from .codec import Codec, RawJSON
+from .errors import NetworkError
+from .events import SessionEvents, TARGET_EVENTS
+from .frames import FrameInfo, frame_has_error, scan_envelope, scan_frame
+from .nowait import NOWAIT_ID_FLAG, NowaitSender
+from .reducers import EventReducer, FlushCallback, Fold, ReducerKey
+from .streams import DEFAULT_STREAM_SIZE, CoalesceKey, EventStream, StreamPolicy
+from .subscriptions import DispatchTable, SubscriptionListener, Where
+from .window import CommandWindow
 
 if TYPE_CHECKING:  # pragma: no cover
     from cripy import ConnectionType, SessionType  # noqa: F401
@@ -21,6 +30,12 @@ class CDPSession(EventEmitterS):
         "_flat_session",
         "_callbacks",
         "_sessions",
+        "_codec",
+        "_root",
+        "_window",
+        "_nowait_methods",
+        "_nowait_sender",
+        "_subscriptions",
     ]
 
     Events: ClassVar[Type[SessionEvents]] = SessionEvents
@@ -51,12 +66,32 @@ class CDPSession(EventEmitterS):
         self._flat_session: bool = flat_session
         self._callbacks: Dict[int, CDPResultFuture] = {}
         self._sessions: Dict[str, SessionType] = {}
+        self._codec: Codec = connection.codec
+        # the Connection at the root of the session tree
+        self._root: "ConnectionType" = (
+            connection._root if isinstance(connection, CDPSession) else connection
+        )
+        self._window: CommandWindow = CommandWindow(
+            _loop, self._root._session_max_in_flight
+        )
+        # flat sessions share the id space of the connection
+        self._nowait_methods: Dict[int, str] = (
+            self._root._nowait_methods if flat_session else {}
+        )
+        self._nowait_sender: NowaitSender = NowaitSender(self)
+        # created by the first subscribe
+        self._subscriptions: Optional[DispatchTable] = None
 
     @property
     def loop(self) -> AbstractEventLoop:
         """Returns the instance of event loop"""
         return self._loop
 
+    @property
+    def codec(self) -> Codec:
+        """Returns the JSON codec used by the session"""
+        return self._codec
+
     @property
     def flat_session(self) -> bool:
         """Returns T/F indicating if flat session mode is enabled"""
@@ -72,11 +107,63 @@ class CDPSession(EventEmitterS):
         """Returns the type of the target"""
         return self._target_type
 
-    def send(self, method: str, params: Optional[Dict] = None) -> CDPResultFuture:
+    @property
+    def max_in_flight(self) -> Optional[int]:
+        """Returns the maximum number of commands awaiting a response"""
+        return self._window.limit
+
+    @max_in_flight.setter
+    def max_in_flight(self, value: Optional[int]) -> None:
+        """Sets the maximum number of commands awaiting a response
+
+        :param value: The maximum or None for no maximum
+        """
+        self._window.limit = value
+
+    @property
+    def nowait(self) -> NowaitSender:
+        """Returns a stand in for the session that sends commands using send_nowait,
+        for use with the generated domain classes"""
+        return self._nowait_sender
+
+    @property
+    def in_flight(self) -> int:
+        """Returns the number of commands awaiting a response"""
+        return self._window.in_flight
+
+    def raw_json(self, value: Any) -> RawJSON:
+        """Returns the pre-encoded form of a parameter value that is sent repeatedly,
+        cached by the connection. The value must be hashable, e.g. a str
+
+        :param value: The parameter value
+        :return: The pre-encoded value
+        """
+        return self._root.raw_json(value)
+
+    def stats(self) -> Dict[str, Union[int, float, None]]:
+        """Returns a snapshot of the sessions internal counters
+
+        :return: A dictionary of counter name to value
+        """
+        stats = self._window.stats()
+        stats["commands_pending"] = len(self._callbacks)
+        return stats
+
+    def send(
+        self,
+        method: str,
+        params: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        priority: Optional[int] = None,
+    ) -> CDPResultFuture:
         """Send message to the connected session.
 
         :param method: Protocol method name
         :param params: Optional method parameters
+        :param timeout: Optional number of seconds the command has to receive a response.
+        Defaults to the connections command timeout
+        :param priority: Optional priority class (see Priority) of the command.
+        Defaults to the priority of the commands domain
         :return: A future that resolves once a response has been received
         """
         if not self._connection:  # pragma: no cover
@@ -84,25 +171,156 @@ class CDPSession(EventEmitterS):
                 f"Protocol Error ({method}): Session closed. Most likely the "
                 f"target {self._target_type} has been closed."
             )
-        if params is None:
-            params = {}
+        callback = self._root._new_callback(method, timeout)
+        self._submit(callback, method, params, priority)
+        return callback
+
+    def batch(
+        self, timeout: Optional[float] = None, priority: Optional[int] = None
+    ) -> Batch:
+        """Returns a new batch of commands to be sent to the connected session.
+
+        The commands of the batch are written in one burst once it is executed,
+        either explicitly or when leaving its async context, and their results
+        are available in the order the commands were added.
+
+        :param timeout: Optional number of seconds the batch has to receive all responses.
+        Defaults to the connections command timeout
+        :param priority: Optional priority class (see Priority) of the batches commands.
+        Defaults to the priority of each commands domain
+        :return: The new batch
+        """
+        return Batch(self, self._root, timeout, priority)
+
+    def send_nowait(
+        self,
+        method: str,
+        params: Optional[Dict] = None,
+        priority: Optional[int] = None,
+    ) -> int:
+        """Send message to the connected session without awaiting its response.
+
+        No future is created for the command, its result is discarded and if it
+        fails the error is supplied to the connections nowait error hook, if there is one.
+        The command does not occupy a slot in the command windows.
+
+        :param method: Protocol method name
+        :param params: Optional method parameters
+        :param priority: Optional priority class (see Priority) of the command.
+        Defaults to the priority of the commands domain
+        :return: The id of the command
+        """
+        if not self._connection:
+            raise NetworkError(
+                f"Protocol Error ({method}): Session closed. Most likely the "
+                f"target {self._target_type} has been closed."
+            )
+        root = self._root
+        priority = root._command_priority(method, priority)
+        msg: Dict[str, Any] = {
+            "method": method,
+            "params": params if params is not None else {},
+        }
+        if self._flat_session:
+            msg["sessionId"] = self._session_id
+            return root._send_nowait(msg, priority)
+        self._lastId += 1
+        _id = self._lastId | NOWAIT_ID_FLAG
+        msg["id"] = _id
+        if root._nowait_error_hook is not None:
+            self._nowait_methods[_id] = method
+        root._nowait_sent += 1
+        self._connection.send_nowait(
+            "Target.sendMessageToTarget",
+            {
+                "sessionId": self._session_id,
+                "message": self._codec.dumps_message_literal(msg),
+            },
+            priority,
+        )
+        return _id
+
+    def _submit(
+        self,
+        callback: CDPResultFuture,
+        method: str,
+        params: Optional[Dict],
+        priority: Optional[int],
+    ) -> None:
+        """Submits a command to the sessions command window
+
+        :param callback: The future, or batch item, resolved with the commands response
+        :param method: The method of the command
+        :param params: The optional parameters of the command
+        :param priority: The priority class the command was sent with, if any
+        """
+        priority = self._root._command_priority(method, priority)
+        self._window.submit(
+            callback,
+            priority,
+            self._dispatch,
+            {"method": method, "params": params if params is not None else {}},
+            callback,
+            priority,
+        )
+
+    def _dispatch(self, msg: Dict, callback: CDPResultFuture, priority: int) -> None:
+        """Dispatches a command admitted by the sessions command window.
+
+        In flat session mode the command must also be admitted by the connections
+        command window, otherwise the command is sent wrapped by Target.sendMessageToTarget
+        which is subject to the window of the session or connection used to send it.
+
+        :param msg: The command message
+        :param callback: The future of the command
+        :param priority: The priority class of the command
+        """
         if self._flat_session:
-            _id = self._connection._raw_send(
-                {"method": method, "params": params, "sessionId": self.session_id}
+            msg["sessionId"] = self._session_id
+            self._root._window.submit(
+                callback, priority, self._write, msg, callback, priority
             )
-            callback = CDPResultFuture(method, self._loop)
-            self._callbacks[_id] = callback
-            return callback
+        else:
+            self._write(msg, callback, priority)
+
+    def _write(self, msg: Dict, callback: CDPResultFuture, priority: int) -> None:
+        """Sends the supplied command message to the target
+
+        :param msg: The command message
+        :param callback: The future of the command
+        :param priority: The priority class of the command
+        """
+        if not self._connection:
+            callback.release_windows()
+            callback.clear_timeout()
+            if not callback.done():
+                callback.set_exception(
+                    NetworkError(
+                        f"Network error {callback.method}: {self._target_type} closed."
+                    )
+                )
+            return
+        if self._flat_session:
+            self._root._send_command(self._callbacks, msg, callback, priority)
+            return
         self._lastId += 1
         _id = self._lastId
-        msg = dumps({"id": _id, "method": method, "params": params})
-        callback = CDPResultFuture(method, self._loop)
+        msg["id"] = _id
+        if self._root._metrics is not None:
+            callback.sent_at = perf_counter()
+        callback.id = _id
+        callback.registry = self._callbacks
         self._callbacks[_id] = callback
-        self._connection.send(
+        # the response of the envelope carries nothing, only the response
+        # of the wrapped command is awaited
+        self._connection.send_nowait(
             "Target.sendMessageToTarget",
-            {"sessionId": self._session_id, "message": msg},
+            {
+                "sessionId": self._session_id,
+                "message": self._codec.dumps_message_literal(msg),
+            },
+            priority=priority,
         )
-        return callback
 
     async def detach(self) -> None:
         """Detach session from target. Once detached, session won't emit any events and
@@ -132,29 +350,34 @@ class CDPSession(EventEmitterS):
             self._sessions[session_id] = session
         return session
 
-    def on_message(self, maybe_str_or_dict: Union[str, Dict]) -> None:
+    def on_message(self, maybe_str_or_dict: Union[str, bytes, Dict]) -> None:
         """Handles the recite of a message. Depending on if flat session
         mode is enabled the message supplied to this method will be either
         a string (non-flat more) or a dict (flat mode).
 
+        Messages received as strings are scanned before being decoded so that
+        unobserved events and responses no one is waiting for are discarded
+        without being decoded and the messages of child sessions are forwarded
+        without decoding their envelope.
+
         :param maybe_str_or_dict: The message received
         """
-        if isinstance(maybe_str_or_dict, str):
-            obj = loads(maybe_str_or_dict)
+        if isinstance(maybe_str_or_dict, (str, bytes)):
+            info = scan_frame(maybe_str_or_dict)
+            if info is not None and not self._wants_message(maybe_str_or_dict, info):
+                return
+            if self._root._metrics is not None:
+                obj = self._root._timed_loads(maybe_str_or_dict)
+            else:
+                obj = self._codec.loads(maybe_str_or_dict)
         else:
             obj = maybe_str_or_dict
         _id = obj.get("id")
-        if _id and _id in self._callbacks:
-            callback = self._callbacks.pop(_id)
-            if "error" in obj:
-                # Checking state of the future object.
-                # It can be canceled.
-                if callback and not callback.done():
-                    callback.set_exception(create_protocol_error(callback.method, obj))
+        if _id is not None:
+            if _id & NOWAIT_ID_FLAG:
+                self._root._on_nowait_response(self._nowait_methods, _id, obj)
             else:
-                result = obj.get("result")
-                if callback and not callback.done():
-                    callback.set_result(result)
+                self._root._resolve_callback(self._callbacks, _id, obj)
             return
         method = obj.get("method")
         params = obj.get("params")
@@ -170,24 +393,218 @@ class CDPSession(EventEmitterS):
                 if session is not None:
                     session.on_closed()
                     del self._sessions[session_id]
-            return
-        self.emit(method, params)
+                    return
+        self._root._emit_event(self, method, params)
+
+    def _wants_message(self, message: Union[str, bytes], info: FrameInfo) -> bool:
+        """Returns T/F indicating if a raw message must be decoded, accounting for
+        the messages that are not wanted in the connections counters.
+        The messages of child sessions are forwarded to them
+
+        :param message: The raw message
+        :param info: The id, method and sessionId of the message
+        :return: T/F indicating if the message is wanted
+        """
+        _id, method, _ = info
+        root = self._root
+        if method is not None:
+            if method == "Target.receivedMessageFromTarget" and not self._flat_session:
+                envelope = scan_envelope(message)
+                if envelope is None:
+                    return True
+                session = self._sessions.get(envelope[0])
+                if session is not None:
+                    session.on_message(self._codec.loads(envelope[1]))
+                return False
+            if method in TARGET_EVENTS or self._observes(method):
+                return True
+            root._events_unobserved += 1
+            if root._drop_unobserved_events:
+                root._events_dropped += 1
+                return False
+            return True
+        if _id & NOWAIT_ID_FLAG:
+            if frame_has_error(message):
+                return True
+            if self._nowait_methods:
+                self._nowait_methods.pop(_id, None)
+            root._nowait_discarded += 1
+            return False
+        if _id in self._callbacks:
+            return True
+        # late response for a command that timed out or was cancelled
+        root._orphaned_responses += 1
+        return False
+
+    def subscribe(
+        self,
+        pattern: str,
+        listener: Optional[SubscriptionListener] = None,
+        where: Optional[Where] = None,
+        once: bool = False,
+    ) -> Union[Callable[[], None], Future]:
+        """Subscribes to the events received by the session whose method matches the pattern
+        and params match the filter, see Connection.subscribe
+
+        :param pattern: The method of the events (e.g. Network.responseReceived),
+        Domain.* for every event of a domain or * for every event
+        :param listener: Optional listener called with the params of the events, or with
+        their method and params for Domain.* and *. If None the first matching event
+        resolves the returned future
+        :param where: Optional filter of the events
+        :param once: Should the listener be removed after its first event
+        :return: A function removing the subscription if a listener was supplied,
+        otherwise a future resolving with the params of the event or,
+        for Domain.* and *, its method and params
+        """
+        if self._subscriptions is None:
+            self._subscriptions = DispatchTable()
+        return self._subscriptions.subscribe(self._loop, pattern, listener, where, once)
+
+    def wait_for(
+        self,
+        method: str,
+        predicate: Optional[Where] = None,
+        timeout: Optional[float] = None,
+    ) -> Future:
+        """Returns a future resolving with the params of the first event of the method
+        received by the session that matches the predicate, a function of the params or
+        a filter (see subscribe). The waiter is removed once the future is done,
+        including when it is cancelled or times out.
+
+        Waiters whose filter requires a param to equal a value,
+        e.g. {"requestId": request_id}, are indexed by that value so that every event
+        is checked against its waiters only
+
+        :param method: The method of the event (e.g. Page.loadEventFired)
+        :param predicate: Optional function of the params or filter the event must match
+        :param timeout: Optional number of seconds after which the future fails
+        with EventTimeoutError
+        :return: The future
+        """
+        if self._subscriptions is None:
+            self._subscriptions = DispatchTable()
+        return self._subscriptions.wait(self._loop, method, predicate, timeout)
+
+    def reduce(
+        self,
+        pattern: str,
+        fold: Fold,
+        key: Optional[ReducerKey] = None,
+        initial: Any = None,
+        on_flush: Optional[FlushCallback] = None,
+        interval: Optional[float] = None,
+        where: Optional[Where] = None,
+    ) -> EventReducer:
+        """Folds the events received by the session whose method matches the pattern and
+        params match the filter into a state per key, see Connection.reduce
+
+        :param pattern: The method of the events, Domain.* or *
+        :param fold: Function folding an event into the state of its key,
+        see cripy.reducers count, total and latest
+        :param key: Optional function of an event returning the key its state is kept under.
+        Defaults to a single state for every event
+        :param initial: Optional state of a new key or function creating it, e.g. list
+        :param on_flush: Optional function called with the dictionary of key to state
+        when flushed
+        :param interval: Optional number of seconds between automatic flushes
+        :param where: Optional filter of the events
+        :return: The reducer, flush() flushes on demand and close() unsubscribes
+        """
+        return EventReducer(
+            self, pattern, fold, key, initial, on_flush, interval, where
+        )
+
+    def stream(
+        self,
+        pattern: str,
+        maxsize: int = DEFAULT_STREAM_SIZE,
+        policy: str = StreamPolicy.DropOldest,
+        where: Optional[Where] = None,
+        key: Optional[CoalesceKey] = None,
+    ) -> EventStream:
+        """Returns an async iterator over the events received by the session whose method
+        matches the pattern and params match the filter, see Connection.stream.
+        The block policy stops the connection of the session from reading
+
+        :param pattern: The method of the events, Domain.* or *
+        :param maxsize: The maximum number of buffered events
+        :param policy: One of drop_oldest (default), block or coalesce, see StreamPolicy
+        :param where: Optional filter of the events
+        :param key: Optional function of the event returning the key events are coalesced by.
+        Defaults to coalescing every event into the latest one
+        :return: The stream
+        """
+        return EventStream(self, self._root, pattern, maxsize, policy, where, key)
+
+    def on(
+        self, event: str, listener: Optional[Callable[..., Any]] = None
+    ) -> Callable[..., Any]:
+        """Register a listener for an event, see EventEmitterS.on. The listener is timed
+        if the connection of the session accounts listeners
+
+        :param event: The event to register the listener for
+        :param listener: The listener to be called when the event is emitted
+        :return: The listener or listener wrapper when used as a decorator
+        """
+        accounting = self._root._listener_accounting
+        if listener is None or accounting is None:
+            return super().on(event, listener)
+        super().on(event, accounting.timed(event, listener))
+        return listener
+
+    def once(
+        self, event: str, listener: Optional[Callable[..., Any]] = None
+    ) -> Callable[..., Any]:
+        """Register a one time listener for an event, see EventEmitterS.once. The listener
+        is timed if the connection of the session accounts listeners
+
+        :param event: The event to register the listener for
+        :param listener: The listener to be called when the event is emitted
+        :return: The listener or listener wrapper when used as a decorator
+        """
+        accounting = self._root._listener_accounting
+        if listener is None or accounting is None:
+            return super().once(event, listener)
+        super().once(event, accounting.timed(event, listener))
+        return listener
+
+    def _observes(self, method: str) -> bool:
+        """Returns T/F indicating if someone listens for or subscribed to an event,
+        including the subscriptions to the events of every session of the connection
+
+        :param method: The method of the event
+        :return: T/F indicating if the event is observed
+        """
+        if self.has_listeners(method):
+            return True
+        if self._subscriptions is not None and self._subscriptions.wants(method):
+            return True
+        session_subscriptions = self._root._session_subscriptions
+        return session_subscriptions is not None and session_subscriptions.wants(method)
 
     def on_closed(self) -> None:
         """Close this session"""
-        for cb in self._callbacks.values():
+        # releasing the window slots held by our commands may dispatch
+        # commands waiting on the connections window, including ours
+        self._connection = None
+        callbacks = list(chain(self._callbacks.values(), self._window.clear()))
+        self._callbacks.clear()
+        if not self._flat_session:
+            self._nowait_methods.clear()
+        for cb in callbacks:
+            cb.clear_timeout()
+            cb.release_windows()
             if not cb.done():
                 cb.set_exception(
                     NetworkError(
                         f"Network error {cb.method}: {self._target_type} closed."
                     )
                 )
-        self._callbacks.clear()
         for session in self._sessions.values():
             session.on_closed()
         self._sessions.clear()
-        self._connection = None
-        self.emit(SessionEvents.Disconnected)
+        self._root._emit_event(self, SessionEvents.Disconnected)
 
     def __str__(self) -> str:
         return f"{self.__class__.__name__}(target={self._target_type}, sessionId={self._session_id})"
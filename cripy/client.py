@@ -1,5 +1,5 @@
 from asyncio import AbstractEventLoop
-from typing import Dict, Optional, Union
+from typing import Any, Dict, Optional, Union
 
 from .connection import Connection
 from .protocol import (
@@ -103,17 +103,19 @@ class Client(Connection):
     def __init__(
         self,
         ws_url: Optional[str] = None,
-        flatten_sessions: bool = False,
+        flatten_sessions: Optional[bool] = False,
         loop: Optional[AbstractEventLoop] = None,
+        **kwargs: Any,
     ) -> None:
         """Construct a new instance of the ChromeRemoteInterface Client.
 
         :param ws_url: The WS endpoint of the remote instance
         :param flatten_sessions: Enables "flat" access to the session via specifying sessionId
-        attribute in the commands
+        attribute in the commands. If None it is enabled on connect if the browser supports it
         :param loop:  Optional event loop to use. Defaults to asyncio.get_event_loop
+        :param kwargs: Additional keyword arguments supplied to Connection
         """
-        super().__init__(ws_url, flatten_sessions, loop)
+        super().__init__(ws_url, flatten_sessions, loop, **kwargs)
         self.Accessibility: Accessibility = Accessibility(self)
         self.Animation: Animation = Animation(self)
         self.ApplicationCache: ApplicationCache = ApplicationCache(self)
@@ -203,20 +205,22 @@ class ClientDynamic(Connection):
     def __init__(
         self,
         ws_url: Optional[str] = None,
-        flatten_sessions: bool = False,
+        flatten_sessions: Optional[bool] = False,
         proto_def: Dict = None,
         loop: Optional[AbstractEventLoop] = None,
+        **kwargs: Any,
     ) -> None:
         """Construct a new instance of ClientDynamic.
 
         :param ws_url: The WS endpoint of the remote instance
         :param flatten_sessions: Enables "flat" access to the session via specifying sessionId
-        attribute in the commands
+        attribute in the commands. If None it is enabled on connect if the browser supports it
         :param proto_def: Optional protocol domain classes to be used rather than
         the pre-generated ones
         :param loop:  Optional event loop to use. Defaults to asyncio.get_event_loop
+        :param kwargs: Additional keyword arguments supplied to Connection
         """
-        super().__init__(ws_url, flatten_sessions, loop)
+        super().__init__(ws_url, flatten_sessions, loop, **kwargs)
         self._proto_def: Dict = proto_def
         for domain, clazz in proto_def.items():
             setattr(self, domain, clazz(self))
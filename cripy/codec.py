@@ -0,0 +1,398 @@
+import json
+import re
+from collections import OrderedDict
+from typing import Any, ClassVar, Dict, Hashable, List, Optional, Pattern, Type, Union
+
+from .errors import ClientError
+
+__all__ = [
+    "Codec",
+    "CodecArg",
+    "OrjsonCodec",
+    "RawJSON",
+    "RawJSONCache",
+    "StdlibCodec",
+    "UJSONCodec",
+    "available_codecs",
+    "default_codec",
+    "get_codec",
+]
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+#: matches the escaped form of a UTF-16 surrogate code unit (\uD800 - \uDFFF)
+SURROGATE_ESCAPE: Pattern = re.compile(r"\\u[dD][89a-fA-F]")
+SURROGATE_ESCAPE_B: Pattern = re.compile(rb"\\u[dD][89a-fA-F]")
+
+
+def has_surrogate_escapes(data: Union[str, bytes]) -> bool:
+    """Returns T/F indicating if the supplied JSON text contains escaped
+    UTF-16 surrogates
+
+    :param data: The JSON text
+    :return: T/F indicating if an escaped surrogate is present
+    """
+    if isinstance(data, str):
+        return SURROGATE_ESCAPE.search(data) is not None
+    return SURROGATE_ESCAPE_B.search(data) is not None
+
+
+class RawJSON:
+    """A pre-encoded JSON value.
+
+    When used as the value of a command parameter the codecs splice the JSON text in
+    verbatim rather than encoding the value every time the command is sent. The orjson
+    and ujson codecs splice it natively, wherever it is in a message, the standard library
+    json codec only splices the values of the top level parameters of a command.
+    """
+
+    __slots__ = ["json", "_escaped"]
+
+    def __init__(self, json_text: Union[str, bytes]) -> None:
+        """Create a new RawJSON
+
+        :param json_text: The valid JSON text of the value
+        """
+        if isinstance(json_text, bytes):
+            json_text = json_text.decode("utf-8")
+        self.json: str = json_text
+        self._escaped: Optional[str] = None
+
+    @classmethod
+    def encode(cls, value: Any, codec: "CodecArg" = None) -> "RawJSON":
+        """Encodes the supplied value once, for use as a parameter of many commands
+
+        :param value: The value to be encoded
+        :param codec: Optional codec (instance or name) used to encode it.
+        Defaults to the fastest available
+        :return: The pre-encoded value
+        """
+        return cls(get_codec(codec).dumps(value))
+
+    def escaped(self, codec: "Codec") -> str:
+        """Returns the JSON text escaped for inclusion in a JSON string, computed once
+
+        :param codec: The codec used to escape the JSON text
+        :return: The escaped JSON text without the surrounding quotes
+        """
+        if self._escaped is None:
+            self._escaped = codec.dumps(self.json)[1:-1]
+        return self._escaped
+
+    def __json__(self) -> str:
+        """Returns the JSON text, used by ujson to splice it in"""
+        return self.json
+
+    def __len__(self) -> int:
+        return len(self.json)
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(length={len(self.json)})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class Codec:
+    """Base class for the JSON codecs used to encode the messages sent to and
+    decode the messages received from the remote browser.
+
+    Implementations must accept both str and bytes when decoding so that
+    transports can hand over the frames they receive without converting them.
+    """
+
+    __slots__: List[str] = []
+
+    name: ClassVar[str] = "codec"
+
+    def dumps(self, obj: Any) -> str:
+        """Encodes the supplied object to a JSON string
+
+        :param obj: The object to be encoded
+        :return: The JSON encoded object
+        """
+        raise NotImplementedError()
+
+    def dumpb(self, obj: Any) -> bytes:
+        """Encodes the supplied object to UTF-8 encoded JSON
+
+        :param obj: The object to be encoded
+        :return: The JSON encoded object
+        """
+        return self.dumps(obj).encode("utf-8")
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        """Decodes the supplied JSON text
+
+        :param data: The JSON text to be decoded
+        :return: The decoded object
+        """
+        raise NotImplementedError()
+
+    def dumps_message(self, msg: Dict) -> str:
+        """Encodes the supplied CDP message to a JSON string, splicing in
+        the JSON text of its RawJSON parameters
+
+        :param msg: The message to be encoded
+        :return: The JSON encoded message
+        """
+        try:
+            return self.dumps(msg)
+        except TypeError:
+            # the codec does not support RawJSON natively
+            params = msg.get("params")
+            if not params:
+                raise
+            return "".join(self._splice(msg, params, False))
+
+    def dumps_message_literal(self, msg: Dict) -> Union[str, RawJSON]:
+        """Encodes the supplied CDP message for use as a string parameter of another
+        message, e.g. the message of Target.sendMessageToTarget.
+
+        If the message has RawJSON parameters the result is a RawJSON holding the JSON string
+        literal of the encoded message, built using the cached escaped text of the parameters,
+        otherwise it is the encoded message itself.
+
+        :param msg: The message to be encoded
+        :return: The encoded message
+        """
+        params = msg.get("params")
+        if params:
+            for value in params.values():
+                if type(value) is RawJSON:
+                    return RawJSON(f'"{"".join(self._splice(msg, params, True))}"')
+        return self.dumps(msg)
+
+    def _splice(self, msg: Dict, params: Dict, escape: bool) -> List[str]:
+        """Encodes the supplied message piece by piece, splicing in the JSON text
+        of its RawJSON parameters
+
+        :param msg: The message to be encoded
+        :param params: The parameters of the message
+        :param escape: Should the pieces be escaped for inclusion in a JSON string
+        :return: The pieces of the encoded message
+        """
+        dumps = self.dumps
+        head = dumps({key: value for key, value in msg.items() if key != "params"})
+        piece = f'{head[:-1]},"params":{{'
+        pieces = []
+        sep = ""
+        for key, value in params.items():
+            piece += f"{sep}{dumps(key)}:"
+            sep = ","
+            if type(value) is RawJSON:
+                pieces.append(dumps(piece)[1:-1] if escape else piece)
+                pieces.append(value.escaped(self) if escape else value.json)
+                piece = ""
+            else:
+                piece += dumps(value)
+        piece += "}}"
+        pieces.append(dumps(piece)[1:-1] if escape else piece)
+        return pieces
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}()"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class StdlibCodec(Codec):
+    """Codec using the standard library json module"""
+
+    __slots__: List[str] = []
+
+    name: ClassVar[str] = "json"
+
+    def dumps(self, obj: Any) -> str:
+        return json.dumps(obj, separators=(",", ":"))
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return json.loads(data)
+
+
+class UJSONCodec(Codec):
+    """Codec using ujson.
+
+    ujson either rejects strings containing escaped surrogates or, in the versions
+    still supporting Python 3.6, silently drops lone surrogates. Messages containing
+    them are detected before decoding and decoded using the standard library json
+    module, as are the messages ujson rejects.
+    """
+
+    __slots__: List[str] = []
+
+    name: ClassVar[str] = "ujson"
+
+    def dumps(self, obj: Any) -> str:
+        try:
+            return ujson.dumps(obj)
+        except (OverflowError, ValueError):
+            return json.dumps(obj, separators=(",", ":"))
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        if has_surrogate_escapes(data):
+            return json.loads(data)
+        try:
+            return ujson.loads(data)
+        except ValueError:
+            return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    """Codec using orjson.
+
+    orjson decodes surrogate pairs natively but rejects lone surrogates
+    (e.g. a JavaScript string sliced in the middle of a pair) which
+    are only valid in JSON text, those rare messages are decoded using
+    the standard library json module.
+    """
+
+    __slots__: List[str] = []
+
+    name: ClassVar[str] = "orjson"
+
+    def dumps(self, obj: Any) -> str:
+        return self.dumpb(obj).decode("utf-8")
+
+    def dumpb(self, obj: Any) -> bytes:
+        try:
+            return orjson.dumps(obj, default=_orjson_default)
+        except TypeError:
+            return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        try:
+            return orjson.loads(data)
+        except ValueError:
+            return json.loads(data)
+
+
+def _orjson_default(obj: Any) -> Any:
+    """Splices in the JSON text of RawJSON values, if the version of orjson supports it"""
+    if type(obj) is RawJSON and _orjson_fragment is not None:
+        return _orjson_fragment(obj.json)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+_orjson_fragment: Optional[Any] = getattr(orjson, "Fragment", None)
+
+CodecArg = Optional[Union[str, Codec]]
+
+_codec_classes: Dict[str, Type[Codec]] = {StdlibCodec.name: StdlibCodec}
+if ujson is not None:
+    _codec_classes[UJSONCodec.name] = UJSONCodec
+if orjson is not None:
+    _codec_classes[OrjsonCodec.name] = OrjsonCodec
+
+_default_codec: Optional[Codec] = None
+
+
+def available_codecs() -> Dict[str, Type[Codec]]:
+    """Returns the codecs that can be used in the current environment
+
+    :return: A dictionary of codec name to codec class
+    """
+    return dict(_codec_classes)
+
+
+def default_codec() -> Codec:
+    """Returns the fastest codec available in the current environment.
+
+    The preference order is orjson, ujson and then the standard library json module.
+
+    :return: The default codec
+    """
+    global _default_codec
+    if _default_codec is None:
+        for name in (OrjsonCodec.name, UJSONCodec.name, StdlibCodec.name):
+            clazz = _codec_classes.get(name)
+            if clazz is not None:
+                _default_codec = clazz()
+                break
+    return _default_codec
+
+
+def get_codec(codec: CodecArg = None) -> Codec:
+    """Resolves the supplied codec argument to a codec instance
+
+    :param codec: Either a codec instance, the name of a codec or None for the default codec
+    :return: The codec instance
+    """
+    if codec is None:
+        return default_codec()
+    if isinstance(codec, Codec):
+        return codec
+    clazz = _codec_classes.get(codec)
+    if clazz is None:
+        raise ClientError(
+            f"The {codec} codec is not available, choose one of {list(_codec_classes)}"
+        )
+    return clazz()
+
+
+class RawJSONCache:
+    """A least recently used cache of the pre-encoded form of parameter values
+    that are sent repeatedly, e.g. the source of a script added to every new document.
+
+    The cached values must be hashable, e.g. str, and are never mutated.
+    """
+
+    __slots__ = ["_codec", "_entries", "max_entries", "hits", "misses"]
+
+    def __init__(self, codec: CodecArg = None, max_entries: int = 32) -> None:
+        """Create a new RawJSONCache
+
+        :param codec: Optional codec (instance or name) used to encode the values.
+        Defaults to the fastest available
+        :param max_entries: The maximum number of values cached
+        """
+        self._codec: Codec = get_codec(codec)
+        self._entries: "OrderedDict[Hashable, RawJSON]" = OrderedDict()
+        self.max_entries: int = max_entries
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, value: Hashable) -> RawJSON:
+        """Returns the pre-encoded form of the supplied value, encoding it if it is not cached
+
+        :param value: The value
+        :return: The pre-encoded value
+        """
+        # keyed by type as well since e.g. 1 == True
+        key = (type(value), value)
+        entries = self._entries
+        raw = entries.get(key)
+        if raw is not None:
+            entries.move_to_end(key)
+            self.hits += 1
+            return raw
+        self.misses += 1
+        raw = entries[key] = RawJSON(self._codec.dumps(value))
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        return raw
+
+    def clear(self) -> None:
+        """Removes all cached values"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(entries={len(self._entries)}, "
+            f"max_entries={self.max_entries})"
+        )
+
+    def __repr__(self) -> str:
+        return self.__str__()
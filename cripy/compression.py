@@ -0,0 +1,357 @@
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from websockets.extensions.base import Extension
+from websockets.extensions.permessage_deflate import (
+    ClientPerMessageDeflateFactory,
+    PerMessageDeflate,
+)
+
+from .errors import ClientError
+
+__all__ = [
+    "CompressionArg",
+    "CompressionStats",
+    "Deflate",
+    "DeflateMessages",
+    "get_compression",
+]
+
+#: The trailer of a sync flush, removed from compressed messages (RFC 7692 section 7.2.1)
+SYNC_FLUSH_TRAILER: bytes = b"\x00\x00\xff\xff"
+#: The opcodes of the control frames (close, ping and pong), never compressed
+CTRL_OPCODES: Tuple[int, ...] = (0x8, 0x9, 0xA)
+
+
+class CompressionStats:
+    """Counts the bytes of the messages exchanged over a compressed connection,
+    before (raw) and after (wire) compression. Messages the remote end chose
+    not to compress count equally towards both.
+    """
+
+    __slots__ = [
+        "messages_received",
+        "messages_sent",
+        "received_raw",
+        "received_wire",
+        "sent_raw",
+        "sent_wire",
+    ]
+
+    def __init__(self) -> None:
+        self.messages_received: int = 0
+        self.messages_sent: int = 0
+        self.received_raw: int = 0
+        self.received_wire: int = 0
+        self.sent_raw: int = 0
+        self.sent_wire: int = 0
+
+    def received(self, raw: int, wire: int, messages: int = 1) -> None:
+        """Counts received bytes
+
+        :param raw: The number of bytes once decompressed
+        :param wire: The number of bytes received
+        :param messages: The number of messages completed by the bytes
+        """
+        self.messages_received += messages
+        self.received_raw += raw
+        self.received_wire += wire
+
+    def sent(self, raw: int, wire: int, messages: int = 1) -> None:
+        """Counts sent bytes
+
+        :param raw: The number of bytes before compression
+        :param wire: The number of bytes sent
+        :param messages: The number of messages completed by the bytes
+        """
+        self.messages_sent += messages
+        self.sent_raw += raw
+        self.sent_wire += wire
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """Returns a snapshot of the counters, including the ratio of wire
+        to raw bytes received (lower is better)
+
+        :return: A dictionary of counter name to value
+        """
+        return {
+            "compression_messages_received": self.messages_received,
+            "compression_messages_sent": self.messages_sent,
+            "compression_received_raw": self.received_raw,
+            "compression_received_wire": self.received_wire,
+            "compression_sent_raw": self.sent_raw,
+            "compression_sent_wire": self.sent_wire,
+            "compression_received_ratio": (
+                self.received_wire / self.received_raw if self.received_raw else 1.0
+            ),
+        }
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(received_raw={self.received_raw}, "
+            f"received_wire={self.received_wire}, sent_raw={self.sent_raw}, "
+            f"sent_wire={self.sent_wire})"
+        )
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class Deflate:
+    """Options of the permessage-deflate websocket extension (RFC 7692).
+
+    Compression pays off when the browser is on another host and the responses
+    are large (DOM snapshots, screenshots), on localhost it only costs CPU.
+    The browser decides how it compresses its messages, the level only applies
+    to the messages sent, server_max_window_bits bounds the memory used to decompress
+    the messages received.
+    """
+
+    __slots__ = [
+        "client_max_window_bits",
+        "client_no_context_takeover",
+        "level",
+        "memory_level",
+        "server_max_window_bits",
+        "server_no_context_takeover",
+    ]
+
+    def __init__(
+        self,
+        level: int = 6,
+        client_max_window_bits: int = 15,
+        server_max_window_bits: Optional[int] = None,
+        client_no_context_takeover: bool = False,
+        server_no_context_takeover: bool = False,
+        memory_level: int = 8,
+    ) -> None:
+        """Create a new Deflate
+
+        :param level: The zlib compression level (0-9) of the messages sent
+        :param client_max_window_bits: The base two logarithm of the window size (8-15) used
+        to compress the messages sent
+        :param server_max_window_bits: Optional window size (8-15) the browser must compress
+        its messages with. Defaults to the browsers choice
+        :param client_no_context_takeover: Compress every message sent independently, using
+        less memory at the cost of the compression ratio
+        :param server_no_context_takeover: Ask the browser to compress every message
+        independently
+        :param memory_level: The zlib memory level (1-9) used to compress the messages sent
+        """
+        for name, bits in (
+            ("client_max_window_bits", client_max_window_bits),
+            ("server_max_window_bits", server_max_window_bits),
+        ):
+            if bits is not None and not 8 <= bits <= 15:
+                raise ClientError(f"{name} must be between 8 and 15, got {bits}")
+        if not 0 <= level <= 9:
+            raise ClientError(f"level must be between 0 and 9, got {level}")
+        self.level: int = level
+        self.client_max_window_bits: int = client_max_window_bits
+        self.server_max_window_bits: Optional[int] = server_max_window_bits
+        self.client_no_context_takeover: bool = client_no_context_takeover
+        self.server_no_context_takeover: bool = server_no_context_takeover
+        self.memory_level: int = memory_level
+
+    def offer(self) -> str:
+        """Returns the value of the Sec-WebSocket-Extensions request header
+
+        :return: The extension offer
+        """
+        params: List[str] = ["permessage-deflate"]
+        if self.server_no_context_takeover:
+            params.append("server_no_context_takeover")
+        if self.client_no_context_takeover:
+            params.append("client_no_context_takeover")
+        if self.server_max_window_bits is not None:
+            params.append(f"server_max_window_bits={self.server_max_window_bits}")
+        params.append(f"client_max_window_bits={self.client_max_window_bits}")
+        return "; ".join(params)
+
+    def accept(self, header: Optional[str]) -> Optional["DeflateMessages"]:
+        """Processes the Sec-WebSocket-Extensions response header
+
+        :param header: The value of the header if it was present
+        :return: The compressor of the negotiated extension or None if the server declined it
+        """
+        if not header:
+            return None
+        for extension in header.split(","):
+            name, *raw_params = [part.strip() for part in extension.split(";")]
+            if name != "permessage-deflate":
+                raise ClientError(f"Unexpected websocket extension {name}")
+            params: Dict[str, Optional[str]] = {}
+            for param in raw_params:
+                key, _, value = param.partition("=")
+                params[key.strip()] = value.strip().strip('"') or None
+            client_bits = int(params.get("client_max_window_bits") or 15)
+            return DeflateMessages(
+                self,
+                server_no_context_takeover="server_no_context_takeover" in params,
+                client_no_context_takeover=self.client_no_context_takeover
+                or "client_no_context_takeover" in params,
+                server_max_window_bits=int(params.get("server_max_window_bits") or 15),
+                client_max_window_bits=min(client_bits, self.client_max_window_bits),
+            )
+        return None
+
+    def websockets_extension(
+        self, stats: CompressionStats
+    ) -> ClientPerMessageDeflateFactory:
+        """Returns the extension factory implementing the options for the websockets library
+
+        :param stats: The stats the extension counts the messages bytes in
+        :return: The extension factory
+        """
+        return _CountingPerMessageDeflateFactory(
+            stats,
+            server_no_context_takeover=self.server_no_context_takeover,
+            client_no_context_takeover=self.client_no_context_takeover,
+            server_max_window_bits=self.server_max_window_bits,
+            client_max_window_bits=self.client_max_window_bits,
+            compress_settings={"level": self.level, "memLevel": self.memory_level},
+        )
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}({self.offer()}, level={self.level})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class DeflateMessages:
+    """Compresses and decompresses the messages of a connection using the
+    negotiated permessage-deflate parameters, counting their bytes
+    """
+
+    __slots__ = [
+        "_compressor",
+        "_decompressor",
+        "_options",
+        "client_max_window_bits",
+        "client_no_context_takeover",
+        "server_max_window_bits",
+        "server_no_context_takeover",
+        "stats",
+    ]
+
+    def __init__(
+        self,
+        options: Deflate,
+        server_no_context_takeover: bool,
+        client_no_context_takeover: bool,
+        server_max_window_bits: int,
+        client_max_window_bits: int,
+    ) -> None:
+        self._options: Deflate = options
+        self.server_no_context_takeover: bool = server_no_context_takeover
+        self.client_no_context_takeover: bool = client_no_context_takeover
+        self.server_max_window_bits: int = server_max_window_bits
+        self.client_max_window_bits: int = client_max_window_bits
+        self.stats: CompressionStats = CompressionStats()
+        self._compressor: Any = None
+        self._decompressor: Any = None
+
+    def compress(self, data: bytes) -> bytes:
+        """Compresses a message sent
+
+        :param data: The message
+        :return: The compressed message
+        """
+        compressor = self._compressor
+        if compressor is None or self.client_no_context_takeover:
+            compressor = self._compressor = zlib.compressobj(
+                self._options.level,
+                zlib.DEFLATED,
+                -self.client_max_window_bits,
+                self._options.memory_level,
+            )
+        compressed = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if compressed.endswith(SYNC_FLUSH_TRAILER):
+            compressed = compressed[:-4]
+        self.stats.sent(len(data), len(compressed))
+        return compressed
+
+    def decompress(self, data: bytes, max_size: Optional[int] = None) -> bytes:
+        """Decompresses a message received
+
+        :param data: The compressed message
+        :param max_size: Optional maximum size of the decompressed message
+        :return: The message
+        """
+        decompressor = self._decompressor
+        if decompressor is None or self.server_no_context_takeover:
+            decompressor = self._decompressor = zlib.decompressobj(
+                -self.server_max_window_bits
+            )
+        message = decompressor.decompress(data + SYNC_FLUSH_TRAILER, max_size or 0)
+        if decompressor.unconsumed_tail:
+            raise ValueError(f"Decompressed message larger than {max_size} bytes")
+        self.stats.received(len(message), len(data))
+        return message
+
+
+class _CountingPerMessageDeflate(PerMessageDeflate):
+    """The websockets permessage-deflate extension, counting the messages bytes"""
+
+    def __init__(self, stats: CompressionStats, *args: Any) -> None:
+        super().__init__(*args)
+        self.stats: CompressionStats = stats
+
+    def decode(self, frame: Any, *, max_size: Optional[int] = None) -> Any:
+        if frame.opcode in CTRL_OPCODES:
+            return frame
+        wire = len(frame.data)
+        frame = super().decode(frame, max_size=max_size)
+        self.stats.received(len(frame.data), wire, 1 if frame.fin else 0)
+        return frame
+
+    def encode(self, frame: Any) -> Any:
+        if frame.opcode in CTRL_OPCODES:
+            return frame
+        raw = len(frame.data)
+        frame = super().encode(frame)
+        self.stats.sent(raw, len(frame.data), 1 if frame.fin else 0)
+        return frame
+
+
+class _CountingPerMessageDeflateFactory(ClientPerMessageDeflateFactory):
+    """Creates the counting permessage-deflate extension once negotiated"""
+
+    def __init__(self, stats: CompressionStats, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.stats: CompressionStats = stats
+
+    def process_response_params(
+        self,
+        params: Sequence[Tuple[str, Optional[str]]],
+        accepted_extensions: Sequence[Extension],
+    ) -> PerMessageDeflate:
+        extension = super().process_response_params(params, accepted_extensions)
+        return _CountingPerMessageDeflate(
+            self.stats,
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            extension.compress_settings,
+        )
+
+
+CompressionArg = Union[None, bool, Deflate]
+
+
+def get_compression(compression: CompressionArg = None) -> Optional[Deflate]:
+    """Resolves the supplied compression argument to the compression options
+
+    :param compression: Either Deflate options, True for the default options or
+    None/False for no compression
+    :return: The compression options or None if messages are not compressed
+    """
+    if compression is None or compression is False:
+        return None
+    if compression is True:
+        return Deflate()
+    if isinstance(compression, Deflate):
+        return compression
+    raise ClientError(f"Unsupported compression {compression!r}, expected Deflate")
@@ -1,18 +1,67 @@
 import logging
-from asyncio import AbstractEventLoop, Event, Task, get_event_loop, sleep
+import re
+from asyncio import (
+    AbstractEventLoop,
+    Event,
+    Future,
+    Task,
+    ensure_future,
+    get_event_loop,
+)
+from concurrent.futures import Executor
 from inspect import isawaitable
-import json
-from typing import Any, Callable, ClassVar, Dict, Optional, TYPE_CHECKING, Type, Union
+from itertools import chain
+from time import perf_counter
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Pattern,
+    TYPE_CHECKING,
+    Tuple,
+    Type,
+    Union,
+)
 
 from async_timeout import timeout
 from pyee2 import EventEmitterS
-from ujson import dumps, loads
-from websockets import ConnectionClosed, WebSocketClientProtocol, connect
+from websockets import ConnectionClosed
 
+from .batch import Batch
 from .cdp_result_future import CDPResultFuture
 from .cdp_session import CDPSession
-from .errors import NetworkError, create_protocol_error
-from .events import ConnectionEvents
+from .codec import Codec, CodecArg, RawJSON, RawJSONCache, get_codec
+from .compression import CompressionArg, Deflate, get_compression
+from .dispatcher import DEFAULT_MAX_EVENT_QUEUE, EventDispatcher
+from .errors import (
+    ClientError,
+    CommandTimeoutError,
+    NetworkError,
+    ProtocolError,
+    TransportError,
+    create_protocol_error,
+)
+from .events import ConnectionEvents, TARGET_EVENTS
+from .frames import FrameInfo, frame_has_error, scan_envelope, scan_frame
+from .listeners import (
+    ListenerAccounting,
+    ListenerAccountingArg,
+    get_listener_accounting,
+)
+from .metrics import Metrics, MetricsArg, get_metrics
+from .nowait import NOWAIT_ID_FLAG, NowaitSender
+from .offload import DecodeOffloader
+from .recording import RecorderArg, RecordingTransport, WireRecorder, get_recorder
+from .scheduler import OutboundScheduler, Priority, check_priority
+from .reducers import EventReducer, FlushCallback, Fold, ReducerKey
+from .streams import DEFAULT_STREAM_SIZE, CoalesceKey, EventStream, StreamPolicy
+from .subscriptions import DispatchTable, Subscription, SubscriptionListener, Where
+from .transport import DEFAULT_MAX_QUEUE, Transport, TransportArg, get_transport
+from .window import CommandWindow
 
 if TYPE_CHECKING:  # pragma: no cover
     from cripy import ConnectionType, SessionType  # noqa: F401
@@ -21,22 +70,68 @@ __all__ = ["Connection"]
 
 logger = logging.getLogger(__name__)
 
+SEND_MESSAGE_TO_TARGET: str = "Target.sendMessageToTarget"
+RECEIVED_MESSAGE_FROM_TARGET: str = "Target.receivedMessageFromTarget"
+#: The first Chrome version in which flat sessions are considered stable
+FLAT_SESSIONS_MIN_CHROME_VERSION: int = 77
+CHROME_VERSION: Pattern = re.compile(r"Chrome/(\d+)\.")
+#: The exceptions raised by the websocket or pipe transports once closed
+CONNECTION_CLOSED_ERRORS: Tuple[Type[Exception], ...] = (
+    ConnectionClosed,
+    ConnectionError,
+)
+
 
 class Connection(EventEmitterS):
     """Chrome DevTools Protocol Connection Class.
 
-    This class provides the websocket communication for using the CDP.
+    This class provides the websocket (or pipe) communication for using the CDP.
     """
 
     __slots__ = [
+        "_blocked_streams",
         "_callbacks",
         "_closeCallback",
         "_closed",
+        "_codec",
+        "_compression",
+        "_command_timeout",
+        "_commands_cancelled",
+        "_commands_timed_out",
         "_connected",
+        "_dispatcher",
+        "_domain_priorities",
+        "_drop_unobserved_events",
+        "_events_dropped",
+        "_events_unobserved",
         "_flatten_sessions",
+        "_frames_sent",
         "_lastId",
+        "_max_message_size",
+        "_listener_accounting",
+        "_max_queue",
+        "_metrics",
+        "_nowait_discarded",
+        "_nowait_error_hook",
+        "_nowait_errors",
+        "_nowait_methods",
+        "_nowait_sender",
+        "_nowait_sent",
+        "_offloader",
+        "_orphaned_responses",
+        "_raw_json_cache",
+        "_recorder",
         "_recv_task",
+        "_scheduler",
+        "_send_wakeup",
+        "_session_max_in_flight",
+        "_session_subscriptions",
         "_sessions",
+        "_subscriptions",
+        "_transport_class",
+        "_window",
+        "_writer_task",
+        "_writer_wakeups",
         "_ws",
         "_ws_url",
     ]
@@ -46,30 +141,159 @@ class Connection(EventEmitterS):
     def __init__(
         self,
         ws_url: Optional[str] = None,
-        flatten_sessions: bool = False,
+        flatten_sessions: Optional[bool] = False,
         loop: Optional[AbstractEventLoop] = None,
+        codec: CodecArg = None,
+        drop_unobserved_events: bool = True,
+        command_timeout: Optional[float] = None,
+        max_in_flight: Optional[int] = None,
+        session_max_in_flight: Optional[int] = None,
+        domain_priorities: Optional[Dict[str, int]] = None,
+        nowait_error_hook: Optional[Callable[[ProtocolError], Any]] = None,
+        websocket_transport: TransportArg = None,
+        max_message_size: Optional[int] = None,
+        max_queue: Optional[int] = DEFAULT_MAX_QUEUE,
+        compression: CompressionArg = None,
+        offload_decode_size: Optional[int] = None,
+        decode_executor: Optional[Executor] = None,
+        defer_events: bool = False,
+        max_event_queue: int = DEFAULT_MAX_EVENT_QUEUE,
+        metrics: MetricsArg = None,
+        listener_accounting: ListenerAccountingArg = None,
+        recorder: RecorderArg = None,
     ) -> None:
         """Construct a new instance of the CDP Client.
 
         :param ws_url: The WS endpoint of the remote instance.
         If a ws url is not supplied it is expected to be supplied via connect.
         :param flatten_sessions: Enables "flat" access to the session via specifying sessionId
-        attribute in the commands
+        attribute in the commands. If None flat session mode is used if the remote browser
+        supports it, which is determined once connected
         :param loop:  Optional event loop to use. Defaults to asyncio.get_event_loop
+        :param codec: Optional JSON codec (instance or name) used to encode and decode
+        messages by the connection and its sessions. Defaults to the fastest available
+        :param drop_unobserved_events: Should events that have no listeners on the
+        connection or the session they are for be dropped before being decoded. If false
+        they are only counted. Defaults to true
+        :param command_timeout: Optional default number of seconds commands sent using
+        the connection or its sessions have to receive a response. Defaults to no timeout
+        :param max_in_flight: Optional maximum number of commands, sent using the connection
+        or its sessions, awaiting a response. Commands sent while the maximum is reached
+        are held until a response is received. Defaults to no maximum
+        :param session_max_in_flight: Optional maximum number of commands awaiting a response
+        for each session created by the connection. Defaults to no maximum
+        :param domain_priorities: Optional mapping of domain name (e.g. Input) to the
+        priority class (see Priority) of the commands of that domain sent using the connection
+        or its sessions. Commands of domains not in the mapping have the Normal priority
+        :param nowait_error_hook: Optional function called with the ProtocolError of
+        commands, sent using send_nowait by the connection or its sessions, that failed
+        :param websocket_transport: Optional websocket transport (class or name) used to
+        connect, one of websockets, aiohttp or raw. Defaults to websockets
+        :param max_message_size: Optional maximum size in bytes of a received message.
+        Defaults to no maximum
+        :param max_queue: Optional maximum number of received messages buffered by the websocket
+        before reading from the socket is paused, None for no maximum. Defaults to 128
+        :param compression: Optional permessage-deflate compression of the websocket
+        messages, either Deflate options or True for the default options. Only worth it
+        for remote browsers. Defaults to no compression
+        :param offload_decode_size: Optional size in bytes from which received messages
+        are decoded by the decode executor rather than on the event loop. The messages
+        of a session keep their order. Defaults to decoding every message on the
+        event loop
+        :param decode_executor: Optional executor large messages are decoded by, a
+        ProcessPoolExecutor keeps the parsing of large strings (response bodies,
+        screenshots) off the event loop but the objects of a message are always built
+        while holding the GIL. Defaults to the loops default executor
+        :param defer_events: Should events be delivered by a dispatcher task rather than
+        while receiving them, so that command responses are resolved without waiting for
+        the listeners of the events received before them. Defaults to false
+        :param max_event_queue: The maximum number of events waiting to be delivered when
+        events are deferred, once reached the remote browser is not read from until the
+        listeners catch up. Defaults to 4096
+        :param metrics: Optional Metrics, or True for new metrics, recording what the connection
+        and its sessions are doing. Defaults to no metrics
+        :param listener_accounting: Optional ListenerAccounting, or True for accounting without
+        slow listener detection, timing every listener of the events received by the connection
+        and its sessions. Defaults to no accounting
+        :param recorder: Optional WireRecorder, or the path of a recording, every frame
+        sent and received by the connection is appended to. Recordings are replayed
+        using a ReplayTransport. Defaults to no recording
         """
         if loop is None:
             loop = get_event_loop()
         super().__init__(loop=loop)
         self._connected: bool = False
         self._closed: bool = False
-        self._flatten_sessions: bool = flatten_sessions
+        self._flatten_sessions: Optional[bool] = flatten_sessions
         self._ws_url: str = ws_url
+        self._codec: Codec = get_codec(codec)
+        self._drop_unobserved_events: bool = drop_unobserved_events
+        self._events_dropped: int = 0
+        self._events_unobserved: int = 0
+        self._command_timeout: Optional[float] = command_timeout
+        self._commands_timed_out: int = 0
+        self._commands_cancelled: int = 0
+        self._orphaned_responses: int = 0
+        self._window: CommandWindow = CommandWindow(loop, max_in_flight)
+        self._session_max_in_flight: Optional[int] = session_max_in_flight
         self._lastId: int = 0
         self._callbacks: Dict[int, CDPResultFuture] = {}
         self._sessions: Dict[str, "SessionType"] = {}
-        self._ws: Optional[WebSocketClientProtocol] = None
+        self._ws: Optional[Transport] = None
         self._recv_task: Optional[Task] = None
+        self._writer_task: Optional[Task] = None
+        self._scheduler: OutboundScheduler = OutboundScheduler()
+        self._domain_priorities: Dict[str, int] = {
+            domain: check_priority(priority)
+            for domain, priority in (domain_priorities or {}).items()
+        }
+        self._send_wakeup: Event = Event(loop=loop)
+        self._frames_sent: int = 0
+        self._writer_wakeups: int = 0
         self._closeCallback: Optional[Callable[[], Any]] = None
+        self._nowait_error_hook: Optional[
+            Callable[[ProtocolError], Any]
+        ] = nowait_error_hook
+        #: id -> method of the nowait commands, only tracked if there is an error hook
+        self._nowait_methods: Dict[int, str] = {}
+        self._nowait_sender: NowaitSender = NowaitSender(self)
+        self._nowait_sent: int = 0
+        self._nowait_discarded: int = 0
+        self._nowait_errors: int = 0
+        self._raw_json_cache: RawJSONCache = RawJSONCache(self._codec)
+        self._transport_class: Type[Transport] = get_transport(websocket_transport)
+        self._max_message_size: Optional[int] = max_message_size
+        self._max_queue: Optional[int] = max_queue
+        self._compression: Optional[Deflate] = get_compression(compression)
+        self._metrics: Optional[Metrics] = get_metrics(metrics)
+        if self._metrics is not None:
+            self._metrics.set_gauge("in_flight", lambda: self._window.in_flight)
+            self._metrics.set_gauge("send_queue_depth", lambda: len(self._scheduler))
+        self._listener_accounting: Optional[
+            ListenerAccounting
+        ] = get_listener_accounting(listener_accounting)
+        self._recorder: Optional[WireRecorder] = get_recorder(recorder)
+        # created by the first subscribe
+        self._subscriptions: Optional[DispatchTable] = None
+        # the subscriptions to the events of every session,
+        # created by the first subscribe_sessions
+        self._session_subscriptions: Optional[DispatchTable] = None
+        # the full streams of the connection or its sessions that block reading
+        self._blocked_streams: List[EventStream] = []
+        self._dispatcher: Optional[EventDispatcher] = (
+            EventDispatcher(loop, max_event_queue, self._deliver_event)
+            if defer_events
+            else None
+        )
+        self._offloader: Optional[DecodeOffloader] = None
+        if offload_decode_size is not None:
+            self._offloader = DecodeOffloader(
+                loop,
+                self._codec.loads,
+                self._dispatch_decoded,
+                offload_decode_size,
+                decode_executor,
+            )
 
     @staticmethod
     def from_session(session: "SessionType") -> "ConnectionType":
@@ -90,16 +314,361 @@ class Connection(EventEmitterS):
         """Returns the event loop the connection is using"""
         return self._loop
 
+    @property
+    def codec(self) -> Codec:
+        """Returns the JSON codec used by the connection"""
+        return self._codec
+
     @property
     def ws_url(self) -> str:
         """Get connected WebSocket url"""
         return self._ws_url
 
+    @property
+    def flatten_sessions(self) -> Optional[bool]:
+        """Returns T/F indicating if flat session mode is used, None if it
+        is yet to be determined"""
+        return self._flatten_sessions
+
     @property
     def closed(self) -> bool:
         """Returns T/F indicating if the connection is closed"""
         return self._closed
 
+    @property
+    def metrics(self) -> Optional[Metrics]:
+        """Returns the metrics of the connection, None if it has none"""
+        return self._metrics
+
+    @property
+    def recorder(self) -> Optional[WireRecorder]:
+        """Returns the recorder of the connection, None if it is not recording"""
+        return self._recorder
+
+    @property
+    def listener_accounting(self) -> Optional[ListenerAccounting]:
+        """Returns the listener accounting of the connection, None if it has none"""
+        return self._listener_accounting
+
+    @property
+    def raw_json_cache(self) -> RawJSONCache:
+        """Returns the cache of pre-encoded parameter values used by raw_json"""
+        return self._raw_json_cache
+
+    def raw_json(self, value: Any) -> RawJSON:
+        """Returns the pre-encoded form of a parameter value that is sent repeatedly,
+        caching it so that it is encoded once rather than every time it is sent.
+        The value must be hashable, e.g. a str
+
+        :param value: The parameter value
+        :return: The pre-encoded value
+        """
+        return self._raw_json_cache.get(value)
+
+    @property
+    def command_timeout(self) -> Optional[float]:
+        """Returns the default number of seconds commands have to receive a response"""
+        return self._command_timeout
+
+    @command_timeout.setter
+    def command_timeout(self, value: Optional[float]) -> None:
+        """Sets the default number of seconds commands have to receive a response.
+        Applies to commands sent after it was set
+
+        :param value: The timeout in seconds or None for no timeout
+        """
+        self._command_timeout = value
+
+    @property
+    def max_in_flight(self) -> Optional[int]:
+        """Returns the maximum number of commands awaiting a response"""
+        return self._window.limit
+
+    @max_in_flight.setter
+    def max_in_flight(self, value: Optional[int]) -> None:
+        """Sets the maximum number of commands awaiting a response
+
+        :param value: The maximum or None for no maximum
+        """
+        self._window.limit = value
+
+    @property
+    def nowait(self) -> NowaitSender:
+        """Returns a stand in for the connection that sends commands using send_nowait,
+        for use with the generated domain classes"""
+        return self._nowait_sender
+
+    @property
+    def nowait_error_hook(self) -> Optional[Callable[[ProtocolError], Any]]:
+        """Returns the function called with the errors of commands sent using send_nowait"""
+        return self._nowait_error_hook
+
+    @nowait_error_hook.setter
+    def nowait_error_hook(self, hook: Optional[Callable[[ProtocolError], Any]]) -> None:
+        """Sets the function called with the errors of commands sent using send_nowait.
+        Applies to commands sent after it was set
+
+        :param hook: The function or None to silently discard the errors
+        """
+        self._nowait_error_hook = hook
+        if hook is None:
+            self._nowait_methods.clear()
+
+    @property
+    def in_flight(self) -> int:
+        """Returns the number of commands awaiting a response"""
+        return self._window.in_flight
+
+    @property
+    def send_queue_depth(self) -> int:
+        """Returns the number of encoded messages waiting to be written to the remote browser"""
+        return len(self._scheduler)
+
+    def set_domain_priority(self, domain: str, priority: Optional[int]) -> None:
+        """Sets the priority class of the commands of the supplied domain that are
+        sent using the connection or its sessions and have no priority of their own
+
+        :param domain: The name of the domain (e.g. Input)
+        :param priority: The priority class (see Priority) or None to restore the Normal
+        priority
+        """
+        if priority is None:
+            self._domain_priorities.pop(domain, None)
+        else:
+            self._domain_priorities[domain] = check_priority(priority)
+
+    def subscribe(
+        self,
+        pattern: str,
+        listener: Optional[SubscriptionListener] = None,
+        where: Optional[Where] = None,
+        once: bool = False,
+    ) -> Union[Callable[[], None], Future]:
+        """Subscribes to the events received by the connection whose method matches the pattern
+        and params match the filter. The filter is compiled once and evaluated before the
+        listener is called, events no one subscribed to or listens for are not decoded
+        when the connection drops unobserved events.
+
+        Filters map the name of a param, dotted for nested params
+        (e.g. response.mimeType), to its expected value: a function applied to the value,
+        a compiled regular expression searched in it, a set, frozenset, tuple or list of
+        the allowed values or the value itself. A function of the params can be used
+        instead of a mapping
+
+        :param pattern: The method of the events (e.g. Network.responseReceived),
+        Domain.* for every event of a domain or * for every event
+        :param listener: Optional listener called with the params of the events, or with
+        their method and params for Domain.* and *. If None the first matching event
+        resolves the returned future
+        :param where: Optional filter of the events
+        :param once: Should the listener be removed after its first event
+        :return: A function removing the subscription if a listener was supplied,
+        otherwise a future resolving with the params of the event or,
+        for Domain.* and *, its method and params
+        """
+        if self._subscriptions is None:
+            self._subscriptions = DispatchTable()
+        return self._subscriptions.subscribe(self._loop, pattern, listener, where, once)
+
+    def subscribe_sessions(
+        self,
+        pattern: str,
+        listener: SubscriptionListener,
+        where: Optional[Where] = None,
+        target_types: Optional[Iterable[str]] = None,
+        once: bool = False,
+    ) -> Callable[[], None]:
+        """Subscribes to the events received by every session of the connection,
+        including those attached later, whose method matches the pattern and params match
+        the filter (see subscribe). The listener is called with a SessionEvent carrying
+        the session, its id, target type, the method and params of the event.
+
+        The events are routed by the connection as its sessions receive them, nothing is
+        registered per session so attaching and detaching sessions costs nothing more
+
+        :param pattern: The method of the events (e.g. Network.responseReceived),
+        Domain.* for every event of a domain or * for every event
+        :param listener: The listener, called with a SessionEvent
+        :param where: Optional filter of the params of the events
+        :param target_types: Optional types of the targets whose sessions events are
+        delivered (e.g. ["page"]). Defaults to the sessions of every target
+        :param once: Should the listener be removed after its first event
+        :return: A function removing the subscription
+        """
+        if self._session_subscriptions is None:
+            self._session_subscriptions = DispatchTable()
+        subscriptions = self._session_subscriptions
+        subscription = subscriptions.add(
+            Subscription(pattern, listener, where, once, target_types)
+        )
+        return lambda: subscriptions.remove(subscription)
+
+    def wait_for(
+        self,
+        method: str,
+        predicate: Optional[Where] = None,
+        timeout: Optional[float] = None,
+    ) -> Future:
+        """Returns a future resolving with the params of the first event of the method
+        received by the connection that matches the predicate, a function of the params or
+        a filter (see subscribe). The waiter is removed once the future is done,
+        including when it is cancelled or times out.
+
+        Waiters whose filter requires a param to equal a value,
+        e.g. {"requestId": request_id}, are indexed by that value so that every event
+        is checked against its waiters only
+
+        :param method: The method of the event (e.g. Page.loadEventFired)
+        :param predicate: Optional function of the params or filter the event must match
+        :param timeout: Optional number of seconds after which the future fails
+        with EventTimeoutError
+        :return: The future
+        """
+        if self._subscriptions is None:
+            self._subscriptions = DispatchTable()
+        return self._subscriptions.wait(self._loop, method, predicate, timeout)
+
+    def reduce(
+        self,
+        pattern: str,
+        fold: Fold,
+        key: Optional[ReducerKey] = None,
+        initial: Any = None,
+        on_flush: Optional[FlushCallback] = None,
+        interval: Optional[float] = None,
+        where: Optional[Where] = None,
+    ) -> EventReducer:
+        """Folds the events received by the connection whose method matches the pattern
+        and params match the filter (see subscribe) into a state per key, handing the
+        states of the keys that received events to on_flush every interval seconds,
+        when flushed or when closed. Replaces a listener call per event with a callback
+        per flush, e.g. the bytes received per request:
+            reduce("Network.dataReceived", total("dataLength"),
+                   key=lambda event: event["requestId"])
+
+        :param pattern: The method of the events, Domain.* or *
+        :param fold: Function folding an event into the state of its key,
+        see cripy.reducers count, total and latest
+        :param key: Optional function of an event returning the key its state is kept under.
+        Defaults to a single state for every event
+        :param initial: Optional state of a new key or function creating it, e.g. list
+        :param on_flush: Optional function called with the dictionary of key to state
+        when flushed
+        :param interval: Optional number of seconds between automatic flushes
+        :param where: Optional filter of the events
+        :return: The reducer, flush() flushes on demand and close() unsubscribes
+        """
+        return EventReducer(
+            self, pattern, fold, key, initial, on_flush, interval, where
+        )
+
+    def stream(
+        self,
+        pattern: str,
+        maxsize: int = DEFAULT_STREAM_SIZE,
+        policy: str = StreamPolicy.DropOldest,
+        where: Optional[Where] = None,
+        key: Optional[CoalesceKey] = None,
+    ) -> EventStream:
+        """Returns an async iterator over the events received by the connection whose method
+        matches the pattern and params match the filter, see subscribe. The events are buffered
+        until consumed, the policy decides what happens once maxsize events are buffered:
+        drop_oldest discards the oldest, block stops reading from the remote browser until
+        the consumer catches up and coalesce keeps only the latest event per key.
+
+        The stream unsubscribes when its async with block is left, it is closed or
+        the connection disconnects. EventStream.stats() reports its drops and lag
+
+        :param pattern: The method of the events, Domain.* or *
+        :param maxsize: The maximum number of buffered events
+        :param policy: One of drop_oldest (default), block or coalesce, see StreamPolicy
+        :param where: Optional filter of the events
+        :param key: Optional function of the event returning the key events are coalesced by.
+        Defaults to coalescing every event into the latest one
+        :return: The stream
+        """
+        return EventStream(self, self, pattern, maxsize, policy, where, key)
+
+    def on(
+        self, event: str, listener: Optional[Callable[..., Any]] = None
+    ) -> Callable[..., Any]:
+        """Register a listener for an event, see EventEmitterS.on. The listener is timed
+        if the connection accounts listeners
+
+        :param event: The event to register the listener for
+        :param listener: The listener to be called when the event is emitted
+        :return: The listener or listener wrapper when used as a decorator
+        """
+        accounting = self._listener_accounting
+        if listener is None or accounting is None:
+            return super().on(event, listener)
+        super().on(event, accounting.timed(event, listener))
+        return listener
+
+    def once(
+        self, event: str, listener: Optional[Callable[..., Any]] = None
+    ) -> Callable[..., Any]:
+        """Register a one time listener for an event, see EventEmitterS.once. The listener
+        is timed if the connection accounts listeners
+
+        :param event: The event to register the listener for
+        :param listener: The listener to be called when the event is emitted
+        :return: The listener or listener wrapper when used as a decorator
+        """
+        accounting = self._listener_accounting
+        if listener is None or accounting is None:
+            return super().once(event, listener)
+        super().once(event, accounting.timed(event, listener))
+        return listener
+
+    def listener_report(self, top: int = 10) -> List[Dict[str, Union[str, int, float]]]:
+        """Returns the listeners of the events received by the connection and its sessions
+        that took the most time in total, requires the connection to account listeners
+
+        :param top: The number of listeners reported
+        :return: The event, listener name, calls, slow calls, total, max and mean
+        seconds of the listeners
+        """
+        if self._listener_accounting is None:
+            raise ClientError(
+                "The connection does not account listeners, create it with listener_accounting"
+            )
+        return self._listener_accounting.report(top)
+
+    def stats(self) -> Dict[str, Union[int, float, None]]:
+        """Returns a snapshot of the connections internal counters
+
+        :return: A dictionary of counter name to value
+        """
+        stats = self._window.stats()
+        stats.update(
+            {
+                "send_queue_depth": len(self._scheduler),
+                "send_queue_peak": self._scheduler.peak,
+                "frames_sent": self._frames_sent,
+                "writer_wakeups": self._writer_wakeups,
+                "events_dropped": self._events_dropped,
+                "events_unobserved": self._events_unobserved,
+                "commands_pending": len(self._callbacks)
+                + sum(len(s._callbacks) for s in self._sessions.values()),
+                "commands_timed_out": self._commands_timed_out,
+                "commands_cancelled": self._commands_cancelled,
+                "orphaned_responses": self._orphaned_responses,
+                "nowait_sent": self._nowait_sent,
+                "nowait_discarded": self._nowait_discarded,
+                "nowait_errors": self._nowait_errors,
+            }
+        )
+        stats.update(self._scheduler.stats())
+        compression_stats = getattr(self._ws, "compression_stats", None)
+        if compression_stats is not None:
+            stats.update(compression_stats.stats())
+        if self._offloader is not None:
+            stats.update(self._offloader.stats())
+        if self._dispatcher is not None:
+            stats.update(self._dispatcher.stats())
+        return stats
+
     def add_session(self, session: "SessionType") -> None:
         """Adds the supplied session to the tracked sessions
 
@@ -120,49 +689,107 @@ class Connection(EventEmitterS):
         """
         return self._sessions.get(session_id)
 
-    def send(self, method: str, params: Optional[Dict] = None) -> CDPResultFuture:
+    def send(
+        self,
+        method: str,
+        params: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        priority: Optional[int] = None,
+    ) -> CDPResultFuture:
         """Send a command to the remote chrome instance.
 
         :param str method: The method to be used
         :param dict params: The optional parameters (arguments) for the command
+        :param timeout: Optional number of seconds the command has to receive a response.
+        Defaults to the connections command timeout
+        :param priority: Optional priority class (see Priority) of the command.
+        Defaults to the priority of the commands domain
         :return: A future that resolves once the commands response is received
         """
         if self._lastId and not self._connected:
             raise NetworkError("Connection is closed")
-        if params is None:
-            params = {}
-        _id = self._raw_send({"method": method, "params": params})
-        callback = CDPResultFuture(method, loop=self._loop)
-        self._callbacks[_id] = callback
+        callback = self._new_callback(method, timeout)
+        self._submit(callback, method, params, priority)
         return callback
 
+    def batch(
+        self, timeout: Optional[float] = None, priority: Optional[int] = None
+    ) -> Batch:
+        """Returns a new batch of commands to be sent using the connection.
+
+        The commands of the batch are written in one burst once it is executed,
+        either explicitly or when leaving its async context, and their results
+        are available in the order the commands were added.
+
+        :param timeout: Optional number of seconds the batch has to receive all responses.
+        Defaults to the connections command timeout
+        :param priority: Optional priority class (see Priority) of the batches commands.
+        Defaults to the priority of each commands domain
+        :return: The new batch
+        """
+        return Batch(self, self, timeout, priority)
+
+    def send_nowait(
+        self,
+        method: str,
+        params: Optional[Dict] = None,
+        priority: Optional[int] = None,
+    ) -> int:
+        """Send a command to the remote chrome instance without awaiting its response.
+
+        No future is created for the command, its result is discarded and if it
+        fails the error is supplied to the nowait error hook, if there is one.
+        The command does not occupy a slot in the command windows.
+
+        :param method: The method to be used
+        :param params: The optional parameters (arguments) for the command
+        :param priority: Optional priority class (see Priority) of the command.
+        Defaults to the priority of the commands domain
+        :return: The id of the command
+        """
+        if self._lastId and not self._connected:
+            raise NetworkError("Connection is closed")
+        return self._send_nowait(
+            {"method": method, "params": params if params is not None else {}},
+            self._command_priority(method, priority),
+        )
+
     async def connect(
-        self, ws_url: Optional[str] = None, flatten_sessions: Optional[bool] = None
+        self,
+        ws_url: Optional[str] = None,
+        flatten_sessions: Optional[bool] = None,
+        transport: Optional[Transport] = None,
     ) -> None:
         """Connect to the remote websocket endpoint
 
         :param ws_url: The websocket URL to connect to
-        :param flatten_sessions: Should flat session mode be used
+        :param flatten_sessions: Should flat session mode be used. If flat session mode
+        was left undetermined when the connection was created it is enabled if the remote
+        browser supports it
+        :param transport: Optional already connected transport, e.g. a PipeTransport,
+        used instead of connecting to the websocket endpoint using the connections
+        websocket transport
         """
         if ws_url is not None:
             self._ws_url = ws_url
         if flatten_sessions is not None:
             self._flatten_sessions = flatten_sessions
-        self._ws = await connect(
-            self._ws_url,
-            ping_interval=None,  # chrome no ping pong and websockets closes down on no pong :'(
-            ping_timeout=None,
-            max_size=None,
-            compression=None,
-            max_queue=2 ** 7,
-            loop=self._loop,
-        )
+        if transport is not None:
+            self._ws = transport
+        else:
+            self._ws = await self._transport_class.connect(
+                self._ws_url,
+                self._loop,
+                self._max_message_size,
+                self._max_queue,
+                self._compression,
+            )
+        if self._recorder is not None:
+            self._ws = RecordingTransport(self._ws, self._recorder)
         self._closed = False
-        # ensure that _recv_loop gets going
-        ready_event = Event(loop=self._loop)
-        self._recv_task = self._loop.create_task(self._recv_loop())
-        self.once(ConnectionEvents.Ready, lambda: ready_event.set())
-        await ready_event.wait()
+        await self._start_loops()
+        if self._flatten_sessions is None:
+            self._flatten_sessions = await self._supports_flat_sessions()
 
     async def create_session(self, target_id: str) -> CDPSession:
         """Attach to the target specified by the supplied target id and creates new CDPSession for
@@ -189,6 +816,37 @@ class Connection(EventEmitterS):
         self._connected = False
         await self._on_close()
 
+    async def _supports_flat_sessions(self) -> bool:
+        """Determines if the remote browser supports flat session mode using
+        the version of the browser
+
+        :return: T/F indicating if flat sessions are supported
+        """
+        try:
+            version = await self.send("Browser.getVersion")
+        except (NetworkError, ProtocolError):
+            return False
+        match = CHROME_VERSION.search(version.get("product", ""))
+        return (
+            match is not None
+            and int(match.group(1)) >= FLAT_SESSIONS_MIN_CHROME_VERSION
+        )
+
+    async def _start_loops(self) -> None:
+        """Starts the receive and writer loops once the websocket connection
+        has been established, resolving once the receive loop is running.
+        """
+        # ensure that _recv_loop gets going
+        ready_event = Event(loop=self._loop)
+        self._recv_task = self._loop.create_task(self._recv_loop())
+        self.once(ConnectionEvents.Ready, lambda: ready_event.set())
+        await ready_event.wait()
+        self._writer_task = self._loop.create_task(self._writer_loop())
+        if self._dispatcher is not None:
+            self._dispatcher.start()
+        if self._metrics is not None:
+            self._metrics.start(self._loop)
+
     async def _recv_loop(self) -> None:
         """Loop that listens for messages from the remote chrome instance and handles them.
 
@@ -200,20 +858,33 @@ class Connection(EventEmitterS):
         self_on_message = self._on_message
         logger_info = logger.info
         connected = self.__connected
+        dispatcher = self._dispatcher
+        metrics = self._metrics
+        blocked_streams = self._blocked_streams
 
         while 1:
             try:
                 resp = await self_ws_recv()
                 if resp:
+                    if metrics is not None:
+                        metrics.message_received(len(resp))
                     self_on_message(resp)
-            except (ConnectionClosed, ConnectionResetError):
+                if dispatcher is not None and dispatcher.full:
+                    await dispatcher.wait_for_space()
+                if blocked_streams:
+                    await self._wait_for_streams()
+            except TransportError as e:
+                logger.error(f"connection failed: {e}")
+                break
+            except CONNECTION_CLOSED_ERRORS:
                 logger_info("connection closed")
                 break
             if not connected():
                 break
 
         if self._connected:
-            await self.dispose()  # pragma: no cover
+            # disposing cancels this task, so it is done by another
+            self._loop.create_task(self.dispose())
 
     def __connected(self) -> bool:
         """Helper method for _recv_loop
@@ -221,23 +892,38 @@ class Connection(EventEmitterS):
         """
         return self._connected
 
-    async def _send_async(self, msg: str, callback_id: int) -> None:
-        """Actually send the msg to remote instance.
+    async def _writer_loop(self) -> None:
+        """Loop that writes the queued messages to the remote browser instance.
 
-        :param msg: The msg to send
-        :param callback_id: The id identifying the callback associated with the msg
+        Every wakeup drains the entire send queue so that bursts of commands are
+        written by this single task rather than one task per message. The order
+        the queued messages are written in is decided by the outbound scheduler.
         """
-        while not self._connected:
-            await sleep(0)  # pragma: no cover
+        queue = self._scheduler
+        pop = queue.pop
+        wakeup = self._send_wakeup
+        ws_send = self._ws.send
+        metrics = self._metrics
 
-        try:
-            await self._ws.send(msg)
-        except ConnectionClosed:
-            logger.error("connection unexpectedly closed")
-            callback = self._callbacks.get(callback_id, None)
-            if callback and not callback.done():
-                callback.set_result(None)
-                await self.dispose()
+        while self._connected:
+            if not queue:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+            self._writer_wakeups += 1
+            try:
+                while queue:
+                    frame = pop()
+                    await ws_send(frame)
+                    self._frames_sent += 1
+                    if metrics is not None:
+                        metrics.message_sent(len(frame))
+            except CONNECTION_CLOSED_ERRORS:
+                logger.error("connection unexpectedly closed")
+                queue.clear()
+                if self._connected:
+                    self._loop.create_task(self.dispose())
+                break
 
     async def _on_close(self) -> None:
         """Closes the websocket connection and cleans up internals.
@@ -249,31 +935,27 @@ class Connection(EventEmitterS):
         if self._closed:  # pragma: no cover
             return
         self._closed = True
+        if self._dispatcher is not None:
+            # deliver the events received before the sessions are closed
+            await self._dispatcher.close()
+        if self._metrics is not None:
+            self._metrics.stop()
 
-        for cb in self._callbacks.values():
+        for cb in chain(self._callbacks.values(), self._window.clear()):
+            cb.clear_timeout()
             if not cb.done():  # pragma: no cover
                 cb.set_exception(NetworkError(f"{cb.method}: Target closed."))
         self._callbacks.clear()
+        self._nowait_methods.clear()
+        if self._offloader is not None:
+            self._offloader.clear()
 
         for session in self._sessions.values():
             session.on_closed()
         self._sessions.clear()
 
-        # close connection
-        if self._ws and not self._ws.closed:
-            try:
-                async with timeout(15, loop=self._loop):
-                    await self._ws.close()
-            except Exception:  # pragma: no cover
-                pass
-
-        if self._recv_task is not None and not self._recv_task.done():
-            self._recv_task.cancel()
-            try:
-                async with timeout(15, loop=self._loop):
-                    await self._recv_task
-            except Exception:  # pragma: no cover
-                pass
+        await self._close_transport()
+        self._scheduler.clear()
 
         if self._closeCallback:
             ret = self._closeCallback()
@@ -286,20 +968,49 @@ class Connection(EventEmitterS):
 
         self.emit(ConnectionEvents.Disconnected)
 
-    def _raw_send(self, msg: Dict) -> int:
+    async def _close_transport(self) -> None:
+        """Closes the websocket (or pipe) and stops the receive and writer loops"""
+        if self._ws and not self._ws.closed:
+            try:
+                async with timeout(15):
+                    await self._ws.close()
+            except Exception:  # pragma: no cover
+                pass
+
+        for task in (self._recv_task, self._writer_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    async with timeout(15):
+                        await task
+                except Exception:  # pragma: no cover
+                    pass
+        if self._recorder is not None:
+            self._recorder.close()
+
+    def _raw_send(
+        self, msg: Dict, priority: int = Priority.Normal, id_flag: int = 0
+    ) -> int:
         """Sends a message to the remote browser returning
         the id of the message
 
         :param msg: The message to be sent
+        :param priority: The priority class of the message
+        :param id_flag: Bits to be set in the id of the message
         :return: The id of the message sent
         """
         self._lastId += 1
-        _id = self._lastId
+        _id = self._lastId | id_flag
         msg["id"] = _id
-        self._loop.create_task(self._send_async(dumps(msg), _id))
+        session_id = msg.get("sessionId")
+        if session_id is None and msg["method"] == SEND_MESSAGE_TO_TARGET:
+            session_id = msg["params"].get("sessionId")
+        self._scheduler.push(self._codec.dumps_message(msg), session_id, priority)
+        if not self._send_wakeup.is_set():
+            self._send_wakeup.set()
         return _id
 
-    def _on_message(self, message: str) -> None:
+    def _on_message(self, message: Union[str, bytes]) -> None:
         """Handles a message received from the remote browser instance.
 
         If the message contains a callback id, the future associated with the id has
@@ -307,16 +1018,75 @@ class Connection(EventEmitterS):
         Otherwise the if the method is for a target the message is forwarded to the CDPSession
         and if it is not for a target it is emitted.
 
-        :param message: The JSON message string.
+        :param message: The JSON message text.
         """
-        # In some cases (e.g. while decoding a string with surrogate pairs)
-        # ujson.loads throws ValueError.
-        # Then trying to use standart json.loads method.
-        try:
-            msg = loads(message)
-        except ValueError:
-            msg = json.loads(message)
+        info = scan_frame(message)
+        if info is not None:
+            if info[1] is not None:
+                if (
+                    info[1] == RECEIVED_MESSAGE_FROM_TARGET
+                    and not self._flatten_sessions
+                    and self._forward_envelope(message)
+                ):
+                    return
+                if not self._wants_event(info[1], info[2]):
+                    self._events_unobserved += 1
+                    if self._drop_unobserved_events:
+                        self._events_dropped += 1
+                        return
+            elif info[0] & NOWAIT_ID_FLAG:
+                if not self._wants_nowait_response(message, info[0]):
+                    return
+            elif not self._wants_response(info[0], info[2]):
+                # late response for a command that timed out or was cancelled
+                self._orphaned_responses += 1
+                return
+        if self._offloader is not None and self._offload_message(message, info):
+            return
+        if self._metrics is not None:
+            self._dispatch_message(self._timed_loads(message))
+        else:
+            self._dispatch_message(self._codec.loads(message))
 
+    def _offload_message(
+        self, message: Union[str, bytes], info: Optional[FrameInfo]
+    ) -> bool:
+        """Hands a message to the decode offloader if it is large or messages received
+        before it are being decoded. Messages that attach or detach sessions, are for
+        sessions that are not yet known or could not be scanned keep their order
+        relative to all messages
+
+        :param message: The raw message
+        :param info: The id, method and sessionId of the message if it could be scanned
+        :return: T/F indicating if the offloader took charge of the message
+        """
+        if info is None:
+            return self._offloader.push(message, None, barrier=True)
+        session_id = info[2] if self._flatten_sessions else None
+        barrier = info[1] in TARGET_EVENTS or (
+            session_id is not None and session_id not in self._sessions
+        )
+        return self._offloader.push(message, session_id, barrier)
+
+    def _dispatch_decoded(self, msg: Any, session_id: Optional[str]) -> None:
+        """Dispatches a message decoded by the decode offloader
+
+        :param msg: The decoded message
+        :param session_id: The id of the session the message is forwarded to if it was nested
+        in a Target.receivedMessageFromTarget event, otherwise None
+        """
+        if session_id is None:
+            self._dispatch_message(msg)
+            return
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.on_message(msg)
+
+    def _dispatch_message(self, msg: Dict) -> None:
+        """Dispatches a decoded message to the future, session or listeners it is for
+
+        :param msg: The decoded message
+        """
         self._log_msg(msg)
         if not self._flatten_sessions:
             return self._on_message_non_flat(msg)
@@ -341,15 +1111,10 @@ class Connection(EventEmitterS):
             if session:
                 session.on_message(msg)
             return
-        if _id and _id in self._callbacks:
-            callback = self._callbacks.pop(_id)
-            if not callback.done():
-                if "error" in msg:
-                    callback.set_exception(create_protocol_error(callback.method, msg))
-                else:
-                    callback.set_result(msg.get("result"))
+        if _id is not None:
+            self._resolve_callback(self._callbacks, _id, msg)
             return
-        self.emit(method, params)
+        self._emit_event(self, method, params)
 
     def _on_message_non_flat(self, msg: Dict) -> None:
         """Handles a message received from the remote browser instance when
@@ -363,13 +1128,8 @@ class Connection(EventEmitterS):
         :param msg: The JSON message string.
         """
         _id = msg.get("id")
-        if _id and _id in self._callbacks:
-            callback = self._callbacks.pop(_id)
-            if callback and not callback.done():
-                if "error" in msg:
-                    callback.set_exception(create_protocol_error(callback.method, msg))
-                else:
-                    callback.set_result(msg.get("result"))
+        if _id is not None:
+            self._resolve_callback(self._callbacks, _id, msg)
             return
         params = msg.get("params", {})
         method = msg.get("method", "")
@@ -385,7 +1145,335 @@ class Connection(EventEmitterS):
                 session.on_closed()
                 del self._sessions[session_id]
             return
-        self.emit(method, params)
+        self._emit_event(self, method, params)
+
+    def _forward_envelope(self, message: Union[str, bytes]) -> bool:
+        """Forwards the message of a raw Target.receivedMessageFromTarget event to
+        the session it is for, without decoding the event, if the frame can be scanned
+        and no one is listening for all messages.
+
+        Only the JSON string literal of the message is decoded, leaving the message
+        itself encoded so that the session can decide if it must be decoded.
+
+        :param message: The raw event
+        :return: T/F indicating if the event was handled
+        """
+        if self.has_listeners(ConnectionEvents.AllMessages):
+            return False
+        envelope = scan_envelope(message)
+        if envelope is None:
+            return False
+        if self._offloader is not None and self._offloader.push(
+            envelope[1], envelope[0], nested=True, session_id=envelope[0]
+        ):
+            return True
+        session = self._sessions.get(envelope[0])
+        if session is not None:
+            session.on_message(self._codec.loads(envelope[1]))
+        return True
+
+    def _emit_event(self, emitter: EventEmitterS, event: str, *args: Any) -> None:
+        """Emits an event received from the remote browser by the connection or one of
+        its sessions, deferring its delivery to the event dispatcher if events are deferred
+
+        :param emitter: The connection or session emitting the event
+        :param event: The name of the event
+        :param args: The arguments of the event
+        """
+        if self._dispatcher is not None and not self._closed:
+            self._dispatcher.push(emitter, event, *args)
+        else:
+            self._deliver_event(emitter, event, args)
+
+    def _deliver_event(
+        self, emitter: EventEmitterS, event: str, args: Tuple[Any, ...]
+    ) -> None:
+        """Emits an event and dispatches it to the subscriptions of the emitter and,
+        for the events of sessions, to the subscriptions to the events of every session,
+        timing its listeners if the connection has metrics or accounts listeners
+
+        :param emitter: The connection or session emitting the event
+        :param event: The name of the event
+        :param args: The arguments of the event
+        """
+        metrics = self._metrics
+        accounting = self._listener_accounting
+        start = perf_counter() if metrics is not None else 0.0
+        emitter.emit(event, *args)
+        if args:
+            subscriptions = emitter._subscriptions
+            if subscriptions is not None:
+                subscriptions.dispatch(emitter, event, args[0], accounting)
+            if self._session_subscriptions is not None and emitter is not self:
+                self._session_subscriptions.dispatch(
+                    self, event, args[0], accounting, emitter
+                )
+        if metrics is not None:
+            metrics.event(event, perf_counter() - start)
+
+    def _timed_loads(self, message: Union[str, bytes]) -> Any:
+        """Decodes a message, recording the time it took in the connections metrics.
+        Used by the connection and its sessions when they have metrics
+
+        :param message: The raw message
+        :return: The decoded message
+        """
+        start = perf_counter()
+        msg = self._codec.loads(message)
+        self._metrics.decoded(len(message), perf_counter() - start)
+        return msg
+
+    def _wants_event(self, method: str, session_id: Optional[str]) -> bool:
+        """Returns T/F indicating if an event must be decoded because the connection
+        handles it or someone is listening for it
+
+        :param method: The method of the event
+        :param session_id: The id of the session the event is for, if any
+        :return: T/F indicating if the event is wanted
+        """
+        if method in TARGET_EVENTS or self.has_listeners(ConnectionEvents.AllMessages):
+            return True
+        if session_id is not None and self._flatten_sessions:
+            session = self._sessions.get(session_id)
+            if session is None:
+                # the session may be attached by a message that is being decoded
+                return bool(self._offloader)
+            return session._observes(method)
+        return self._observes(method)
+
+    def _block_on(self, stream: EventStream) -> None:
+        """Stops reading from the remote browser until the full blocking stream
+        is consumed from or closed
+
+        :param stream: The stream
+        """
+        if stream not in self._blocked_streams:
+            self._blocked_streams.append(stream)
+
+    async def _wait_for_streams(self) -> None:
+        """Resolves once none of the blocking streams of the connection or its sessions
+        are full"""
+        blocked = self._blocked_streams
+        while blocked:
+            stream = blocked[0]
+            await stream.wait_for_space()
+            if blocked and blocked[0] is stream:
+                blocked.pop(0)
+
+    def _observes(self, method: str) -> bool:
+        """Returns T/F indicating if someone listens for or subscribed to an event
+
+        :param method: The method of the event
+        :return: T/F indicating if the event is observed
+        """
+        return self.has_listeners(method) or (
+            self._subscriptions is not None and self._subscriptions.wants(method)
+        )
+
+    def _wants_response(self, _id: int, session_id: Optional[str]) -> bool:
+        """Returns T/F indicating if a response must be decoded because a command
+        is waiting for it or someone is listening for all messages
+
+        :param _id: The id of the response
+        :param session_id: The id of the session the response is for, if any
+        :return: T/F indicating if the response is wanted
+        """
+        if self.has_listeners(ConnectionEvents.AllMessages):
+            return True
+        if session_id is not None and self._flatten_sessions:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return bool(self._offloader)
+            return _id in session._callbacks
+        return _id in self._callbacks
+
+    def _wants_nowait_response(self, message: Union[str, bytes], _id: int) -> bool:
+        """Returns T/F indicating if the response of a command sent using send_nowait
+        must be decoded because it may be an error or someone is listening for all messages.
+        Responses that are not wanted are discarded
+
+        :param message: The raw response message
+        :param _id: The id of the response
+        :return: T/F indicating if the response is wanted
+        """
+        if self.has_listeners(ConnectionEvents.AllMessages) or frame_has_error(message):
+            return True
+        if self._nowait_methods:
+            self._nowait_methods.pop(_id, None)
+        self._nowait_discarded += 1
+        return False
+
+    def _new_callback(self, method: str, timeout: Optional[float]) -> CDPResultFuture:
+        """Creates the future that will be resolved with the response of a command.
+
+        Used by the connection and its sessions, the future removes itself from
+        the futures awaiting a response when it times out or is cancelled.
+
+        :param method: The method of the command
+        :param timeout: The number of seconds the command has to receive a response.
+        If None the connections command timeout is used
+        :return: The new future
+        """
+        callback = CDPResultFuture(method, loop=self._loop)
+        callback.owner = self
+        if timeout is None:
+            timeout = self._command_timeout
+        if timeout is not None:
+            callback.timeout_handle = self._loop.call_later(
+                timeout, self._on_callback_timeout, callback, timeout
+            )
+        return callback
+
+    def _submit(
+        self,
+        callback: CDPResultFuture,
+        method: str,
+        params: Optional[Dict],
+        priority: Optional[int],
+    ) -> None:
+        """Submits a command to the connections command window
+
+        :param callback: The future, or batch item, resolved with the commands response
+        :param method: The method of the command
+        :param params: The optional parameters of the command
+        :param priority: The priority class the command was sent with, if any
+        """
+        priority = self._command_priority(method, priority)
+        self._window.submit(
+            callback,
+            priority,
+            self._send_command,
+            self._callbacks,
+            {"method": method, "params": params if params is not None else {}},
+            callback,
+            priority,
+        )
+
+    def _command_priority(self, method: str, priority: Optional[int]) -> int:
+        """Returns the priority class of a command
+
+        :param method: The method of the command
+        :param priority: The priority class the command was sent with, if any
+        :return: The supplied priority class or the priority class of the commands domain
+        """
+        if priority is not None:
+            return check_priority(priority)
+        if self._domain_priorities:
+            return self._domain_priorities.get(
+                method.partition(".")[0], Priority.Normal
+            )
+        return Priority.Normal
+
+    def _send_nowait(self, msg: Dict, priority: int) -> int:
+        """Sends the supplied command message, of the connection or a flat session,
+        flagging its id as not awaiting a response
+
+        :param msg: The command message
+        :param priority: The priority class of the command
+        :return: The id of the command
+        """
+        _id = self._raw_send(msg, priority, NOWAIT_ID_FLAG)
+        if self._nowait_error_hook is not None:
+            self._nowait_methods[_id] = msg["method"]
+        self._nowait_sent += 1
+        return _id
+
+    def _send_command(
+        self,
+        callbacks: Dict[int, CDPResultFuture],
+        msg: Dict,
+        callback: CDPResultFuture,
+        priority: int = Priority.Normal,
+    ) -> None:
+        """Sends the supplied command message and registers its future as awaiting
+        the response
+
+        :param callbacks: The dictionary of id to future the future is to be registered in
+        :param msg: The command message
+        :param callback: The future of the command
+        :param priority: The priority class of the command
+        """
+        _id = self._raw_send(msg, priority)
+        if self._metrics is not None:
+            callback.sent_at = perf_counter()
+        callback.id = _id
+        callback.registry = callbacks
+        callbacks[_id] = callback
+
+    def _resolve_callback(
+        self, callbacks: Dict[int, CDPResultFuture], _id: int, msg: Dict
+    ) -> None:
+        """Resolves the future registered for the supplied response message.
+        Responses nobody is waiting for are counted as orphaned and discarded
+
+        :param callbacks: The dictionary of id to future the future is registered in
+        :param _id: The id of the response
+        :param msg: The response message
+        """
+        if _id & NOWAIT_ID_FLAG:
+            self._on_nowait_response(self._nowait_methods, _id, msg)
+            return
+        callback = callbacks.pop(_id, None)
+        if callback is None:
+            self._orphaned_responses += 1
+            return
+        if self._metrics is not None and callback.sent_at:
+            self._metrics.command(
+                callback.method, perf_counter() - callback.sent_at, "error" in msg
+            )
+        callback.release_windows()
+        callback.resolve(msg)
+
+    def _on_nowait_response(self, methods: Dict[int, str], _id: int, msg: Dict) -> None:
+        """Handles the response of a command sent using send_nowait, supplying
+        the error to the nowait error hook if the command failed
+
+        :param methods: The dictionary of id to method the command may be registered in
+        :param _id: The id of the response
+        :param msg: The response message
+        """
+        method = methods.pop(_id, None)
+        if "error" not in msg:
+            self._nowait_discarded += 1
+            return
+        self._nowait_errors += 1
+        hook = self._nowait_error_hook
+        if hook is None:
+            return
+        ret = hook(create_protocol_error(method or f"id {_id}", msg))
+        if isawaitable(ret):
+            ensure_future(ret, loop=self._loop)
+
+    def _on_callback_timeout(self, callback: CDPResultFuture, timeout: float) -> None:
+        """Fails the supplied future once its command has not received a response
+        within its timeout
+
+        :param callback: The future of the command that timed out
+        :param timeout: The timeout of the command
+        """
+        callback.timeout_handle = None
+        if callback.done():
+            return
+        if callback.id is not None and callback.registry.pop(callback.id, None) is None:
+            return
+        callback.release_windows()
+        self._commands_timed_out += 1
+        callback.set_exception(
+            CommandTimeoutError(
+                f"{callback.method}: No response received within {timeout} seconds"
+            )
+        )
+
+    def _forget_callback(self, callback: CDPResultFuture) -> None:
+        """Removes the supplied future from the futures awaiting a response
+        once it has been cancelled
+
+        :param callback: The cancelled future
+        """
+        if callback.id is not None and callback.registry.pop(callback.id, None) is None:
+            return
+        callback.release_windows()
+        self._commands_cancelled += 1
 
     def _new_session(self, target_type: str, session_id: str) -> CDPSession:
         """Creates a new session connected to the target
@@ -0,0 +1,173 @@
+from asyncio import AbstractEventLoop, Event, Task, sleep
+from collections import deque
+from time import monotonic, perf_counter
+from typing import Any, Callable, Deque, Dict, Optional, Tuple, Union
+
+from pyee2 import EventEmitterS
+
+__all__ = ["DEFAULT_MAX_EVENT_QUEUE", "EventDispatcher"]
+
+#: The default maximum number of events queued for delivery
+DEFAULT_MAX_EVENT_QUEUE: int = 4096
+#: The number of seconds the dispatcher delivers events for before yielding to the event loop
+DISPATCH_SLICE: float = 0.0005
+
+QueuedEvent = Tuple[EventEmitterS, str, Tuple[Any, ...], float]
+EmitFn = Callable[[EventEmitterS, str, Tuple[Any, ...]], None]
+
+
+def emit_event(emitter: EventEmitterS, event: str, args: Tuple[Any, ...]) -> None:
+    emitter.emit(event, *args)
+
+
+class EventDispatcher:
+    """Delivers the events received by a connection from a task of its own so that
+    the receive loop resolves command responses without waiting for listeners.
+
+    Events are delivered in the order they were received, which keeps the order
+    of the events of every session. The queue is bounded, once full the receive
+    loop stops reading from the remote browser until the dispatcher catches up.
+    """
+
+    __slots__ = [
+        "_emit",
+        "_loop",
+        "_queue",
+        "_space",
+        "_task",
+        "_wakeup",
+        "delivered",
+        "full_waits",
+        "lag_max",
+        "lag_total",
+        "max_size",
+        "peak",
+    ]
+
+    def __init__(
+        self,
+        loop: AbstractEventLoop,
+        max_size: int = DEFAULT_MAX_EVENT_QUEUE,
+        emit: Optional[EmitFn] = None,
+    ) -> None:
+        """Create a new EventDispatcher
+
+        :param loop: The event loop the events are delivered on
+        :param max_size: The maximum number of queued events
+        :param emit: Optional function emitting an event, called with the emitter, the name
+        of the event and its arguments. Defaults to calling the emitters emit
+        """
+        self._loop: AbstractEventLoop = loop
+        self._emit: EmitFn = emit if emit is not None else emit_event
+        self._queue: Deque[QueuedEvent] = deque()
+        self._wakeup: Event = Event(loop=loop)
+        self._space: Event = Event(loop=loop)
+        self._task: Optional[Task] = None
+        self.max_size: int = max_size
+        self.peak: int = 0
+        self.delivered: int = 0
+        self.full_waits: int = 0
+        self.lag_total: float = 0.0
+        self.lag_max: float = 0.0
+
+    @property
+    def full(self) -> bool:
+        """Returns T/F indicating if the maximum number of events are queued"""
+        return len(self._queue) >= self.max_size
+
+    def start(self) -> None:
+        """Starts the task delivering the queued events"""
+        if self._task is None or self._task.done():
+            self._task = self._loop.create_task(self._run())
+
+    def push(self, emitter: EventEmitterS, event: str, *args: Any) -> None:
+        """Queues an event for delivery
+
+        :param emitter: The connection or session the event is emitted by
+        :param event: The name of the event
+        :param args: The arguments of the event
+        """
+        queue = self._queue
+        queue.append((emitter, event, args, monotonic()))
+        if len(queue) > self.peak:
+            self.peak = len(queue)
+        if not self._wakeup.is_set():
+            self._wakeup.set()
+
+    async def wait_for_space(self) -> None:
+        """Resolves once the queue is no longer full"""
+        self.full_waits += 1
+        while self.full:
+            self._space.clear()
+            await self._space.wait()
+
+    def flush(self) -> None:
+        """Delivers all the queued events immediately"""
+        queue = self._queue
+        while queue:
+            self._deliver(queue.popleft())
+        self._space.set()
+
+    async def close(self) -> None:
+        """Stops the delivery task, delivering the events that are still queued"""
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+        self.flush()
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """Returns a snapshot of the counters. The lag of an event is the time
+        between its receipt and its delivery
+
+        :return: A dictionary of counter name to value
+        """
+        return {
+            "event_queue_depth": len(self._queue),
+            "event_queue_peak": self.peak,
+            "event_queue_full_waits": self.full_waits,
+            "events_delivered": self.delivered,
+            "event_lag_total": self.lag_total,
+            "event_lag_max": self.lag_max,
+        }
+
+    async def _run(self) -> None:
+        queue = self._queue
+        wakeup = self._wakeup
+        deliver = self._deliver
+        while 1:
+            if not queue:
+                self._space.set()
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+            end = perf_counter() + DISPATCH_SLICE
+            while queue:
+                deliver(queue.popleft())
+                if perf_counter() >= end:
+                    break
+            if len(queue) < self.max_size:
+                self._space.set()
+            # let the receive loop resolve the responses received meanwhile
+            await sleep(0)
+
+    def _deliver(self, queued: QueuedEvent) -> None:
+        emitter, event, args, queued_at = queued
+        lag = monotonic() - queued_at
+        self.lag_total += lag
+        if lag > self.lag_max:
+            self.lag_max = lag
+        self.delivered += 1
+        self._emit(emitter, event, args)
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(queued={len(self._queue)}, max_size={self.max_size})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
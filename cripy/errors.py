@@ -1,6 +1,13 @@
 from typing import Dict
 
-__all__ = ["ClientError", "NetworkError", "ProtocolError"]
+__all__ = [
+    "ClientError",
+    "CommandTimeoutError",
+    "EventTimeoutError",
+    "NetworkError",
+    "ProtocolError",
+    "TransportError",
+]
 
 
 class NetworkError(Exception):
@@ -15,6 +22,19 @@ class ProtocolError(Exception):
     """Exception used to indicate that a CDP command has received an error"""
 
 
+class CommandTimeoutError(NetworkError):
+    """Exception used to indicate that a CDP command did not receive a response in time"""
+
+
+class EventTimeoutError(NetworkError):
+    """Exception used to indicate that an awaited CDP event was not received in time"""
+
+
+class TransportError(NetworkError, ConnectionError):
+    """Exception raised by a transport that can not be used anymore,
+    disposing the connection just like the transport being closed"""
+
+
 def create_protocol_error(method: str, msg: Dict) -> ProtocolError:
     error = msg["error"]
     data = error.get("data")
@@ -1,6 +1,15 @@
-from typing import ClassVar
+from typing import ClassVar, FrozenSet
 
-__all__ = ["ConnectionEvents", "SessionEvents"]
+__all__ = ["ConnectionEvents", "SessionEvents", "TARGET_EVENTS"]
+
+#: Events the connection and sessions handle themselves and must therefore always decode
+TARGET_EVENTS: FrozenSet[str] = frozenset(
+    (
+        "Target.attachedToTarget",
+        "Target.detachedFromTarget",
+        "Target.receivedMessageFromTarget",
+    )
+)
 
 
 class ConnectionEvents:
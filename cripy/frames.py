@@ -0,0 +1,191 @@
+from typing import Optional, Tuple, Union
+
+__all__ = [
+    "EnvelopeInfo",
+    "FrameInfo",
+    "frame_has_error",
+    "scan_envelope",
+    "scan_frame",
+]
+
+#: The (id, method, sessionId) of a frame
+FrameInfo = Tuple[Optional[int], Optional[str], Optional[str]]
+#: The (sessionId, JSON string literal of the message) of a
+#: Target.receivedMessageFromTarget frame
+EnvelopeInfo = Tuple[str, Union[str, bytes]]
+
+METHOD_PREFIX: str = '{"method":"'
+METHOD_PREFIX_B: bytes = METHOD_PREFIX.encode("utf-8")
+ID_PREFIX: str = '{"id":'
+ID_PREFIX_B: bytes = ID_PREFIX.encode("utf-8")
+SESSION_ID_KEY: str = ',"sessionId":"'
+SESSION_ID_KEY_B: bytes = SESSION_ID_KEY.encode("utf-8")
+FRAME_END: str = '"}'
+FRAME_END_B: bytes = FRAME_END.encode("utf-8")
+QUOTE_B: bytes = b'"'
+ERROR_KEY: str = '"error":{'
+ERROR_KEY_B: bytes = ERROR_KEY.encode("utf-8")
+ENVELOPE_PREFIX: str = (
+    '{"method":"Target.receivedMessageFromTarget","params":{"sessionId":"'
+)
+ENVELOPE_PREFIX_B: bytes = ENVELOPE_PREFIX.encode("utf-8")
+MESSAGE_KEY: str = '","message":"'
+MESSAGE_KEY_B: bytes = MESSAGE_KEY.encode("utf-8")
+TARGET_ID_KEY: str = '","targetId":"'
+TARGET_ID_KEY_B: bytes = TARGET_ID_KEY.encode("utf-8")
+ENVELOPE_END: str = '"}}'
+ENVELOPE_END_B: bytes = ENVELOPE_END.encode("utf-8")
+
+
+def scan_frame(frame: Union[str, bytes]) -> Optional[FrameInfo]:
+    """Extracts the id, method and sessionId of a raw CDP message without decoding it.
+
+    Chrome serializes messages with either the id (responses) or the method (events)
+    as the first key and the sessionId, when present, as the last key. Frames
+    not following that layout are not scanned and None is returned, in which case
+    the frame must be fully decoded in order to be inspected.
+
+    :param frame: The raw JSON message text
+    :return: The id, method and sessionId of the message or None if the frame
+    could not be scanned
+    """
+    if isinstance(frame, bytes):
+        return _scan_bytes(frame)
+    _id = method = session_id = None
+    if frame.startswith(METHOD_PREFIX):
+        start = len(METHOD_PREFIX)
+        end = frame.find('"', start)
+        if end == -1:
+            return None
+        method = frame[start:end]
+    elif frame.startswith(ID_PREFIX):
+        start = len(ID_PREFIX)
+        end = start
+        flen = len(frame)
+        while end < flen and frame[end].isdigit():
+            end += 1
+        if end == start:
+            return None
+        _id = int(frame[start:end])
+    else:
+        return None
+    if frame.endswith(FRAME_END):
+        sidx = frame.rfind(SESSION_ID_KEY)
+        if sidx != -1:
+            maybe_sid = frame[sidx + len(SESSION_ID_KEY) : -len(FRAME_END)]
+            if '"' not in maybe_sid:
+                session_id = maybe_sid
+    return _id, method, session_id
+
+
+def frame_has_error(frame: Union[str, bytes]) -> bool:
+    """Returns T/F indicating if the raw CDP message may be an error response.
+
+    False positives, e.g. a result containing an error object, are possible
+    but a response that is an error is never reported as not being one.
+
+    :param frame: The raw JSON message text
+    :return: T/F indicating if the message may be an error response
+    """
+    if isinstance(frame, bytes):
+        return ERROR_KEY_B in frame
+    return ERROR_KEY in frame
+
+
+def scan_envelope(frame: Union[str, bytes]) -> Optional[EnvelopeInfo]:
+    """Extracts the sessionId and the message of a raw Target.receivedMessageFromTarget
+    event without decoding it.
+
+    The message is returned as the JSON string literal found in the frame, decoding
+    the literal yields the JSON text of the message. Chrome serializes the params of
+    the event in the order sessionId, message and targetId. Frames not following
+    that layout, including those of flat sessions, are not scanned and None is returned.
+
+    :param frame: The raw JSON message text
+    :return: The sessionId and message literal of the event or None if the frame
+    could not be scanned
+    """
+    if isinstance(frame, bytes):
+        return _scan_envelope_bytes(frame)
+    return _scan_envelope_str(frame)
+
+
+def _scan_envelope_str(frame: str) -> Optional[EnvelopeInfo]:
+    """Implementation of scan_envelope for str frames
+
+    :param frame: The raw JSON message text
+    :return: The sessionId and message literal of the event or None if the frame
+    could not be scanned
+    """
+    if not frame.startswith(ENVELOPE_PREFIX):
+        return None
+    start = len(ENVELOPE_PREFIX)
+    sid_end = frame.find(MESSAGE_KEY, start)
+    if sid_end == -1:
+        return None
+    # the literal includes its quotes, a quote inside it is always escaped
+    # so the key following it can not be found within it
+    literal_start = sid_end + len(MESSAGE_KEY) - 1
+    literal_end = frame.rfind(TARGET_ID_KEY, literal_start)
+    if literal_end == -1:
+        if not frame.endswith(ENVELOPE_END):
+            return None
+        literal_end = len(frame) - len(ENVELOPE_END)
+    return frame[start:sid_end], frame[literal_start : literal_end + 1]
+
+
+def _scan_envelope_bytes(frame: bytes) -> Optional[EnvelopeInfo]:
+    """Implementation of scan_envelope for bytes frames
+
+    :param frame: The raw JSON message bytes
+    :return: The sessionId and message literal of the event or None if the frame
+    could not be scanned
+    """
+    if not frame.startswith(ENVELOPE_PREFIX_B):
+        return None
+    start = len(ENVELOPE_PREFIX_B)
+    sid_end = frame.find(MESSAGE_KEY_B, start)
+    if sid_end == -1:
+        return None
+    literal_start = sid_end + len(MESSAGE_KEY_B) - 1
+    literal_end = frame.rfind(TARGET_ID_KEY_B, literal_start)
+    if literal_end == -1:
+        if not frame.endswith(ENVELOPE_END_B):
+            return None
+        literal_end = len(frame) - len(ENVELOPE_END_B)
+    session_id = frame[start:sid_end].decode("utf-8")
+    return session_id, frame[literal_start : literal_end + 1]
+
+
+def _scan_bytes(frame: bytes) -> Optional[FrameInfo]:
+    """Implementation of scan_frame for bytes frames
+
+    :param frame: The raw JSON message bytes
+    :return: The id, method and sessionId of the message or None if the frame
+    could not be scanned
+    """
+    _id = method = session_id = None
+    if frame.startswith(METHOD_PREFIX_B):
+        start = len(METHOD_PREFIX_B)
+        end = frame.find(QUOTE_B, start)
+        if end == -1:
+            return None
+        method = frame[start:end].decode("utf-8")
+    elif frame.startswith(ID_PREFIX_B):
+        start = len(ID_PREFIX_B)
+        end = start
+        flen = len(frame)
+        while end < flen and 48 <= frame[end] <= 57:
+            end += 1
+        if end == start:
+            return None
+        _id = int(frame[start:end])
+    else:
+        return None
+    if frame.endswith(FRAME_END_B):
+        sidx = frame.rfind(SESSION_ID_KEY_B)
+        if sidx != -1:
+            maybe_sid = frame[sidx + len(SESSION_ID_KEY_B) : -len(FRAME_END_B)]
+            if QUOTE_B not in maybe_sid:
+                session_id = maybe_sid.decode("utf-8")
+    return _id, method, session_id
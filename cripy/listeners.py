@@ -0,0 +1,270 @@
+import logging
+from asyncio import Future, ensure_future
+from functools import partial
+from inspect import isawaitable
+from time import perf_counter
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple, Union
+
+from pyee2 import EventEmitterS
+
+from .errors import ClientError
+from .events import ConnectionEvents, SessionEvents
+
+__all__ = [
+    "ListenerAccounting",
+    "ListenerAccountingArg",
+    "SlowListenerCallback",
+    "get_listener_accounting",
+    "listener_name",
+]
+
+logger = logging.getLogger(__name__)
+
+#: The events of the connection and its sessions themselves, their listeners are not timed
+UNTIMED_EVENTS: FrozenSet[str] = frozenset(
+    (
+        "error",
+        ConnectionEvents.AllMessages,
+        ConnectionEvents.Disconnected,
+        ConnectionEvents.Ready,
+        SessionEvents.Disconnected,
+    )
+)
+
+#: Called with the event, the listener and the seconds it took once a listener was slow
+SlowListenerCallback = Callable[[str, Callable[..., Any], float], Any]
+
+
+def listener_name(listener: Callable[..., Any]) -> str:
+    """Returns a name identifying a listener in reports, its qualified name and
+    where it was defined, e.g. on_request (crawler.py:42)
+
+    :param listener: The listener
+    :return: The name of the listener
+    """
+    while isinstance(listener, partial):
+        listener = listener.func
+    func = getattr(listener, "__func__", listener)
+    name = getattr(func, "__qualname__", None) or repr(func)
+    code = getattr(func, "__code__", None)
+    if code is None:
+        return name
+    return f"{name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+
+
+class ListenerStats:
+    """The time a listener spent handling an event"""
+
+    __slots__ = ["calls", "max", "slow", "total"]
+
+    def __init__(self) -> None:
+        self.calls: int = 0
+        self.slow: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+
+class ListenerAccounting:
+    """Accounts the wall time the listeners of the events received by a connection,
+    and its sessions, take per listener and per event method.
+
+    Only the synchronous part of a listener is timed, which is the time the connection
+    is blocked by it; the awaitables returned by listeners are scheduled as usual.
+    Listeners taking longer than the slow threshold are reported to the slow listener
+    callback, if there is one.
+    """
+
+    __slots__ = ["_events", "_listeners", "on_slow", "slow_threshold"]
+
+    def __init__(
+        self,
+        slow_threshold: Optional[float] = None,
+        on_slow: Optional[SlowListenerCallback] = None,
+    ) -> None:
+        """Create a new ListenerAccounting
+
+        :param slow_threshold: Optional number of seconds from which a listener is slow
+        :param on_slow: Optional function called with the event, the listener and the
+        number of seconds it took every time a listener is slow
+        """
+        self.slow_threshold: Optional[float] = slow_threshold
+        self.on_slow: Optional[SlowListenerCallback] = on_slow
+        #: (event, listener name) -> stats
+        self._listeners: Dict[Tuple[str, str], ListenerStats] = {}
+        #: event -> stats of all its listeners
+        self._events: Dict[str, ListenerStats] = {}
+
+    def timed(self, event: str, listener: Callable[..., Any]) -> Callable[..., Any]:
+        """Returns the listener wrapped to account the time it takes to handle an event.
+        The connection and its sessions register the wrapped listeners, which hash and
+        compare equal to the listener so that it can be removed as usual
+
+        :param event: The name of the event
+        :param listener: The listener
+        :return: The wrapped listener, or the listener if the event is one of the
+        connection or session itself
+        """
+        if event in UNTIMED_EVENTS:
+            return listener
+        return _TimedListener(self, event, listener)
+
+    def account(self, event: str, listener: Callable[..., Any], seconds: float) -> None:
+        """Accounts the time a listener not registered with an emitter, e.g. the listener of a
+        subscription, took to handle an event
+
+        :param event: The name of the event
+        :param listener: The listener
+        :param seconds: The number of seconds the listener took
+        """
+        event_stats = self._events.get(event)
+        if event_stats is None:
+            event_stats = self._events[event] = ListenerStats()
+        self._account(event, listener, event_stats, seconds)
+
+    def report(self, top: int = 10) -> List[Dict[str, Union[str, int, float]]]:
+        """Returns the listeners that took the most time in total, slowest first
+
+        :param top: The number of listeners reported
+        :return: The event, listener name, calls, slow calls, total, max and mean seconds
+        of the listeners
+        """
+        ranked = sorted(
+            self._listeners.items(), key=lambda item: item[1].total, reverse=True
+        )
+        return [
+            {
+                "event": event,
+                "listener": name,
+                "calls": stats.calls,
+                "slow": stats.slow,
+                "total": stats.total,
+                "max": stats.max,
+                "mean": stats.total / stats.calls,
+            }
+            for (event, name), stats in ranked[:top]
+        ]
+
+    def events(self) -> Dict[str, Dict[str, Union[int, float]]]:
+        """Returns the time the listeners of every event method took
+
+        :return: A dictionary of event to its calls, slow calls, total and max seconds
+        """
+        return {
+            event: {
+                "calls": stats.calls,
+                "slow": stats.slow,
+                "total": stats.total,
+                "max": stats.max,
+            }
+            for event, stats in self._events.items()
+        }
+
+    def reset(self) -> None:
+        """Clears the accounted times"""
+        self._listeners.clear()
+        self._events.clear()
+
+    def _account(
+        self,
+        event: str,
+        listener: Callable[..., Any],
+        event_stats: ListenerStats,
+        seconds: float,
+    ) -> None:
+        key = (event, listener_name(listener))
+        stats = self._listeners.get(key)
+        if stats is None:
+            stats = self._listeners[key] = ListenerStats()
+        slow = self.slow_threshold is not None and seconds >= self.slow_threshold
+        for counted in (stats, event_stats):
+            counted.calls += 1
+            counted.total += seconds
+            if seconds > counted.max:
+                counted.max = seconds
+            if slow:
+                counted.slow += 1
+        if slow and self.on_slow is not None:
+            try:
+                ret = self.on_slow(event, listener, seconds)
+                if isawaitable(ret):
+                    ensure_future(ret).add_done_callback(_log_slow_error)
+            except Exception:
+                logger.exception("the slow listener callback failed")
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(listeners={len(self._listeners)}, "
+            f"slow_threshold={self.slow_threshold})"
+        )
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class _TimedListener:
+    """A listener accounting the time it takes to handle an event"""
+
+    __slots__ = ["accounting", "event", "listener"]
+
+    def __init__(
+        self, accounting: ListenerAccounting, event: str, listener: Callable[..., Any]
+    ) -> None:
+        self.accounting: ListenerAccounting = accounting
+        self.event: str = event
+        self.listener: Callable[..., Any] = listener
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        start = perf_counter()
+        try:
+            return self.listener(*args, **kwargs)
+        finally:
+            self.accounting.account(self.event, self.listener, perf_counter() - start)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, _TimedListener):
+            other = other.listener
+        return self.listener == other
+
+    def __hash__(self) -> int:
+        return hash(self.listener)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(event={self.event}, listener={self.listener!r})"
+        )
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+def _emit_error(emitter: EventEmitterS, future: Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        emitter.emit("error", future.exception())
+
+
+def _log_slow_error(future: Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("the slow listener callback failed", exc_info=future.exception())
+
+
+ListenerAccountingArg = Union[None, bool, ListenerAccounting]
+
+
+def get_listener_accounting(
+    accounting: ListenerAccountingArg = None,
+) -> Optional[ListenerAccounting]:
+    """Resolves the supplied listener accounting argument
+
+    :param accounting: Either a ListenerAccounting instance, True for accounting without
+    slow listener detection or None/False for no accounting
+    :return: The listener accounting or None if listeners are not accounted
+    """
+    if accounting is None or accounting is False:
+        return None
+    if accounting is True:
+        return ListenerAccounting()
+    if isinstance(accounting, ListenerAccounting):
+        return accounting
+    raise ClientError(
+        f"Unsupported listener accounting {accounting!r}, expected ListenerAccounting"
+    )
@@ -0,0 +1,390 @@
+import logging
+from asyncio import AbstractEventLoop, Task, sleep
+from math import frexp
+from time import monotonic, perf_counter
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from .errors import ClientError
+
+__all__ = ["Histogram", "Metrics", "MetricsArg", "MetricsHook", "get_metrics"]
+
+logger = logging.getLogger(__name__)
+
+#: The number of power of two buckets of a histogram, the last one counting every
+#: value above 2^30us (~18 minutes)
+HISTOGRAM_BUCKETS: int = 32
+#: The default number of seconds between two samples of the event loop lag
+DEFAULT_LOOP_LAG_INTERVAL: float = 0.1
+
+
+class Histogram:
+    """A histogram of durations, bucketed by powers of two microseconds.
+
+    Recording a value is a handful of arithmetic operations, the percentiles of
+    the snapshot are the upper bounds of the buckets they fall in.
+    """
+
+    __slots__ = ["buckets", "count", "max", "min", "total"]
+
+    def __init__(self) -> None:
+        self.buckets: List[int] = [0] * HISTOGRAM_BUCKETS
+        self.count: int = 0
+        self.total: float = 0.0
+        self.min: float = 0.0
+        self.max: float = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Records a duration
+
+        :param seconds: The duration in seconds
+        """
+        if not self.count or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.count += 1
+        self.total += seconds
+        bucket = frexp(seconds * 1e6)[1] if seconds >= 1e-6 else 0
+        self.buckets[min(bucket, HISTOGRAM_BUCKETS - 1)] += 1
+
+    def percentile(self, percent: float) -> float:
+        """Returns the upper bound of the bucket the percentile falls in, capped by the maximum
+
+        :param percent: The percentile (0-100)
+        :return: The percentile in seconds, 0 if nothing was recorded
+        """
+        if not self.count:
+            return 0.0
+        rank = self.count * percent / 100
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min((1 << bucket) / 1e6, self.max)
+        return self.max  # pragma: no cover
+
+    def snapshot(self) -> Dict[str, Union[int, float]]:
+        """Returns the count, total, min, mean, max, p50, p90 and p99 of the recorded durations
+
+        :return: A dictionary of statistic name to value, durations in seconds
+        """
+        return {
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(count={self.count}, max={self.max})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class MetricsHook:
+    """Receives every measurement recorded by a Metrics instance, as it is recorded,
+    e.g. to export them. Subclasses override the methods of the measurements they
+    are interested in, the methods are called synchronously and must be quick
+    """
+
+    def on_command(self, method: str, seconds: float, failed: bool) -> None:
+        """Called with the latency of a command once it received its response
+
+        :param method: The method of the command
+        :param seconds: The time between the command being sent and its response received
+        :param failed: T/F indicating if the response is an error
+        """
+
+    def on_event(self, method: str, listener_seconds: float) -> None:
+        """Called once an event received from the remote browser was emitted
+
+        :param method: The method of the event
+        :param listener_seconds: The time its listeners took
+        """
+
+    def on_message_received(self, size: int) -> None:
+        """Called with the size of every message received
+
+        :param size: The size of the message, in bytes or characters for text frames
+        """
+
+    def on_message_sent(self, size: int) -> None:
+        """Called with the size of every message sent
+
+        :param size: The size of the message, in bytes or characters for text frames
+        """
+
+    def on_decode(self, size: int, seconds: float) -> None:
+        """Called with the time taken to decode a message on the event loop
+
+        :param size: The size of the message
+        :param seconds: The time it took to decode it
+        """
+
+    def on_loop_lag(self, seconds: float) -> None:
+        """Called with every sample of the event loop lag
+
+        :param seconds: How much later than requested the sampler was woken up
+        """
+
+
+class MethodStats:
+    """The counters of a command or event method"""
+
+    __slots__ = ["count", "errors", "histogram"]
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.errors: int = 0
+        self.histogram: Histogram = Histogram()
+
+
+class Metrics:
+    """Counters and histograms of what a connection and its sessions are doing.
+
+    Metrics are off unless a connection is created with them, when off the
+    instrumented code paths only check that the connections metrics are None.
+    Recorded are the latency of commands per method, the in flight commands, the
+    messages and bytes received and sent, the events per method and the time
+    their listeners took, the time spent decoding messages on the event loop and
+    the lag of the event loop, sampled by a task of the metrics
+    """
+
+    __slots__ = [
+        "_gauges",
+        "_hooks",
+        "_lag_task",
+        "bytes_received",
+        "bytes_sent",
+        "commands",
+        "decode",
+        "decoded_bytes",
+        "events",
+        "listeners",
+        "loop_lag",
+        "loop_lag_interval",
+        "messages_received",
+        "messages_sent",
+        "started",
+    ]
+
+    def __init__(
+        self, loop_lag_interval: Optional[float] = DEFAULT_LOOP_LAG_INTERVAL
+    ) -> None:
+        """Create a new Metrics
+
+        :param loop_lag_interval: The number of seconds between two samples of the
+        event loop lag, None to not sample it. Defaults to 0.1
+        """
+        self.loop_lag_interval: Optional[float] = loop_lag_interval
+        self._hooks: List[MetricsHook] = []
+        self._gauges: Dict[str, Callable[[], Union[int, float]]] = {}
+        self._lag_task: Optional[Task] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Clears every counter and histogram"""
+        self.started: float = monotonic()
+        self.messages_received: int = 0
+        self.bytes_received: int = 0
+        self.messages_sent: int = 0
+        self.bytes_sent: int = 0
+        self.decoded_bytes: int = 0
+        self.commands: Dict[str, MethodStats] = {}
+        self.events: Dict[str, MethodStats] = {}
+        self.decode: Histogram = Histogram()
+        self.listeners: Histogram = Histogram()
+        self.loop_lag: Histogram = Histogram()
+
+    def add_hook(self, hook: MetricsHook) -> None:
+        """Adds a hook receiving every measurement as it is recorded
+
+        :param hook: The hook
+        """
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: MetricsHook) -> None:
+        """Removes a hook added using add_hook
+
+        :param hook: The hook
+        """
+        self._hooks.remove(hook)
+
+    def set_gauge(self, name: str, gauge: Callable[[], Union[int, float]]) -> None:
+        """Registers a function whose value is included in the snapshots
+
+        :param name: The name of the value in the snapshots
+        :param gauge: The function returning the current value
+        """
+        self._gauges[name] = gauge
+
+    def start(self, loop: AbstractEventLoop) -> None:
+        """Starts sampling the lag of the supplied event loop, if it is sampled
+
+        :param loop: The event loop
+        """
+        if self.loop_lag_interval is not None and (
+            self._lag_task is None or self._lag_task.done()
+        ):
+            self._lag_task = loop.create_task(self._sample_loop_lag())
+
+    def stop(self) -> None:
+        """Stops sampling the lag of the event loop"""
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+
+    def command(self, method: str, seconds: float, failed: bool) -> None:
+        """Records the latency of a command
+
+        :param method: The method of the command
+        :param seconds: The time between the command being sent and its response received
+        :param failed: T/F indicating if the response is an error
+        """
+        stats = self.commands.get(method)
+        if stats is None:
+            stats = self.commands[method] = MethodStats()
+        stats.count += 1
+        if failed:
+            stats.errors += 1
+        stats.histogram.observe(seconds)
+        if self._hooks:
+            self._notify("on_command", method, seconds, failed)
+
+    def event(self, method: str, listener_seconds: float) -> None:
+        """Records an event that was emitted
+
+        :param method: The method of the event
+        :param listener_seconds: The time its listeners took
+        """
+        stats = self.events.get(method)
+        if stats is None:
+            stats = self.events[method] = MethodStats()
+        stats.count += 1
+        stats.histogram.observe(listener_seconds)
+        self.listeners.observe(listener_seconds)
+        if self._hooks:
+            self._notify("on_event", method, listener_seconds)
+
+    def message_received(self, size: int) -> None:
+        """Records a message received
+
+        :param size: The size of the message
+        """
+        self.messages_received += 1
+        self.bytes_received += size
+        if self._hooks:
+            self._notify("on_message_received", size)
+
+    def message_sent(self, size: int) -> None:
+        """Records a message sent
+
+        :param size: The size of the message
+        """
+        self.messages_sent += 1
+        self.bytes_sent += size
+        if self._hooks:
+            self._notify("on_message_sent", size)
+
+    def decoded(self, size: int, seconds: float) -> None:
+        """Records the time taken to decode a message on the event loop
+
+        :param size: The size of the message
+        :param seconds: The time it took to decode it
+        """
+        self.decoded_bytes += size
+        self.decode.observe(seconds)
+        if self._hooks:
+            self._notify("on_decode", size, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns a snapshot of the metrics. The rates are per second since the metrics
+        were created or reset, durations are in seconds
+
+        :return: A dictionary of metric name to value
+        """
+        elapsed = max(monotonic() - self.started, 1e-9)
+        snapshot: Dict[str, Any] = {
+            "elapsed": elapsed,
+            "messages_received": self.messages_received,
+            "bytes_received": self.bytes_received,
+            "messages_sent": self.messages_sent,
+            "bytes_sent": self.bytes_sent,
+            "commands": {
+                method: dict(
+                    stats.histogram.snapshot(), count=stats.count, errors=stats.errors
+                )
+                for method, stats in self.commands.items()
+            },
+            "events": {
+                method: {
+                    "count": stats.count,
+                    "rate": stats.count / elapsed,
+                    "listener_total": stats.histogram.total,
+                    "listener_max": stats.histogram.max,
+                }
+                for method, stats in self.events.items()
+            },
+            "decode": dict(self.decode.snapshot(), bytes=self.decoded_bytes),
+            "listeners": self.listeners.snapshot(),
+            "loop_lag": self.loop_lag.snapshot(),
+        }
+        for name, gauge in self._gauges.items():
+            snapshot[name] = gauge()
+        return snapshot
+
+    async def _sample_loop_lag(self) -> None:
+        interval = self.loop_lag_interval
+        while 1:
+            start = perf_counter()
+            await sleep(interval)
+            lag = max(perf_counter() - start - interval, 0.0)
+            self.loop_lag.observe(lag)
+            if self._hooks:
+                self._notify("on_loop_lag", lag)
+
+    def _notify(self, callback: str, *args: Any) -> None:
+        """Calls a callback of every hook. A failing hook is logged and never
+        interrupts the code recording the measurement
+
+        :param callback: The name of the callback, e.g. on_command
+        :param args: The arguments of the callback
+        """
+        for hook in self._hooks:
+            try:
+                getattr(hook, callback)(*args)
+            except Exception:
+                logger.exception("the metrics hook %r failed in %s", hook, callback)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(messages_received={self.messages_received}, "
+            f"messages_sent={self.messages_sent})"
+        )
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+MetricsArg = Union[None, bool, Metrics]
+
+
+def get_metrics(metrics: MetricsArg = None) -> Optional[Metrics]:
+    """Resolves the supplied metrics argument
+
+    :param metrics: Either a Metrics instance, True for new metrics with the default
+    options or None/False for no metrics
+    :return: The metrics or None if metrics are off
+    """
+    if metrics is None or metrics is False:
+        return None
+    if metrics is True:
+        return Metrics()
+    if isinstance(metrics, Metrics):
+        return metrics
+    raise ClientError(f"Unsupported metrics {metrics!r}, expected Metrics")
@@ -0,0 +1,50 @@
+from typing import Any, Dict, Optional, TYPE_CHECKING, Union
+
+if TYPE_CHECKING:  # pragma: no cover
+    from cripy import ConnectionType, SessionType  # noqa: F401
+
+__all__ = ["NOWAIT_ID_FLAG", "NowaitSender"]
+
+#: Set in the ids of the commands sent without awaiting their response so
+#: that their responses can be recognized, and discarded, by id alone
+NOWAIT_ID_FLAG: int = 1 << 30
+
+
+class NowaitSender:
+    """Stands in for a connection or session, sending the commands of the
+    generated domain classes using send_nowait rather than send.
+
+    Everything else is delegated to the wrapped connection or session.
+    """
+
+    __slots__ = ["_client"]
+
+    def __init__(self, client: Union["ConnectionType", "SessionType"]) -> None:
+        """Create a new NowaitSender
+
+        :param client: The connection or session used to send the commands
+        """
+        self._client: Union["ConnectionType", "SessionType"] = client
+
+    # typed Any, rather than int, as the domain classes type the return value of
+    # their commands as that of the send method of a connection or session
+    def send(
+        self, method: str, params: Optional[Dict] = None, priority: Optional[int] = None
+    ) -> Any:
+        """Sends the command without awaiting its response
+
+        :param method: The method of the command
+        :param params: The optional parameters of the command
+        :param priority: Optional priority class of the command
+        :return: The id of the command
+        """
+        return self._client.send_nowait(method, params, priority)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(client={self._client})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
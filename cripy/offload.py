@@ -0,0 +1,230 @@
+import logging
+from asyncio import AbstractEventLoop, Future
+from collections import deque
+from concurrent.futures import Executor
+from time import perf_counter
+from typing import Any, Callable, Deque, Dict, Optional, Set, Tuple, Union
+
+__all__ = ["DecodeOffloader", "decode_message"]
+
+logger = logging.getLogger(__name__)
+
+
+def decode_message(
+    loads: Callable[[Union[str, bytes]], Any], data: Union[str, bytes], nested: bool
+) -> Tuple[Any, float]:
+    """Decodes a large message, run by the executor messages are offloaded to.
+
+    :param loads: The loads function of the codec, must be picklable for process pools
+    :param data: The JSON text of the message
+    :param nested: Is the JSON text a JSON string literal of the message (non-flat
+    session envelopes)
+    :return: The decoded message and the number of seconds spent decoding it
+    """
+    start = perf_counter()
+    msg = loads(loads(data)) if nested else loads(data)
+    return msg, perf_counter() - start
+
+
+class PendingMessage:
+    """A message whose dispatch must wait for its decoding or the messages before it"""
+
+    __slots__ = ["barrier", "future", "held", "key", "msg", "session_id"]
+
+    def __init__(
+        self,
+        key: Optional[str],
+        barrier: bool,
+        session_id: Optional[str],
+        msg: Any = None,
+        future: Optional[Future] = None,
+    ) -> None:
+        #: the id of the session whose messages this message is ordered with
+        self.key: Optional[str] = key
+        #: must every message received before and after it keep their order relative to it
+        self.barrier: bool = barrier
+        #: the id of the session a nested message is forwarded to
+        self.session_id: Optional[str] = session_id
+        self.msg: Any = msg
+        self.future: Optional[Future] = future
+        self.held: bool = False
+
+    @property
+    def decoded(self) -> bool:
+        return self.future is None or self.future.done()
+
+
+class DecodeOffloader:
+    """Decodes the messages larger than a threshold using an executor rather
+    than on the event loop, keeping the order messages are dispatched in.
+
+    Messages are ordered per session: while a message is being decoded the messages
+    of the same session received after it are held back, those of the other
+    sessions are dispatched immediately. Barrier messages, e.g. those that attach
+    or detach sessions, wait for all the messages before them and hold back all
+    the messages after them.
+    """
+
+    __slots__ = [
+        "_dispatch",
+        "_executor",
+        "_loads",
+        "_loop",
+        "_pending",
+        "decoded_bytes",
+        "decoded_seconds",
+        "decoded_seconds_max",
+        "decodes",
+        "held",
+        "threshold",
+    ]
+
+    def __init__(
+        self,
+        loop: AbstractEventLoop,
+        loads: Callable[[Union[str, bytes]], Any],
+        dispatch: Callable[[Any, Optional[str]], None],
+        threshold: int,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        """Create a new DecodeOffloader
+
+        :param loop: The event loop messages are dispatched on
+        :param loads: The loads function of the codec
+        :param dispatch: Function called with the decoded messages, in order, and the id
+        of the session nested messages are forwarded to
+        :param threshold: The size in bytes (or characters) from which messages are offloaded
+        :param executor: Optional executor messages are decoded by. Defaults to the
+        loops default executor
+        """
+        self._loop: AbstractEventLoop = loop
+        self._loads: Callable[[Union[str, bytes]], Any] = loads
+        self._dispatch: Callable[[Any, Optional[str]], None] = dispatch
+        self._executor: Optional[Executor] = executor
+        self._pending: Deque[PendingMessage] = deque()
+        self.threshold: int = threshold
+        self.decodes: int = 0
+        self.decoded_bytes: int = 0
+        self.decoded_seconds: float = 0.0
+        self.decoded_seconds_max: float = 0.0
+        self.held: int = 0
+
+    def push(
+        self,
+        data: Union[str, bytes],
+        key: Optional[str],
+        barrier: bool = False,
+        nested: bool = False,
+        session_id: Optional[str] = None,
+    ) -> bool:
+        """Takes charge of a message if it must be offloaded or messages are pending.
+        Messages it does not take charge of are decoded and dispatched by the caller.
+        Small nested messages are dispatched as their JSON text rather than decoded
+
+        :param data: The JSON text of the message
+        :param key: The id of the session whose messages the message is ordered with
+        :param barrier: Must the order of the message relative to all others be kept
+        :param nested: Is the JSON text a JSON string literal of the message
+        :param session_id: The id of the session a nested message is forwarded to
+        :return: T/F indicating if the offloader took charge of the message
+        """
+        if len(data) >= self.threshold:
+            future = self._loop.run_in_executor(
+                self._executor, decode_message, self._loads, data, nested
+            )
+            self._pending.append(
+                PendingMessage(key, barrier, session_id, future=future)
+            )
+            self.decoded_bytes += len(data)
+            future.add_done_callback(self._on_decoded)
+            return True
+        if not self._pending:
+            return False
+        # the JSON text of a small nested message is left for its session to scan
+        msg = self._loads(data)
+        self._pending.append(PendingMessage(key, barrier, session_id, msg=msg))
+        self.drain()
+        return True
+
+    def drain(self) -> None:
+        """Dispatches, in order, the pending messages that are decoded and are not
+        held back by the messages before them"""
+        pending = self._pending
+        held: Deque[PendingMessage] = deque()
+        blocked: Set[Optional[str]] = set()
+        all_blocked = False
+        while pending:
+            entry = pending.popleft()
+            if (
+                all_blocked
+                or entry.key in blocked
+                or not entry.decoded
+                or (entry.barrier and held)
+            ):
+                held.append(entry)
+                if entry.future is None and not entry.held:
+                    entry.held = True
+                    self.held += 1
+                if entry.barrier:
+                    all_blocked = True
+                else:
+                    blocked.add(entry.key)
+                continue
+            if entry.future is not None:
+                try:
+                    entry.msg, seconds = entry.future.result()
+                except Exception:
+                    logger.exception("failed to decode an offloaded message")
+                    continue
+                self.decodes += 1
+                self.decoded_seconds += seconds
+                if seconds > self.decoded_seconds_max:
+                    self.decoded_seconds_max = seconds
+            self._dispatch(entry.msg, entry.session_id)
+            if self._pending is not pending:  # cleared while dispatching
+                return
+        pending.extend(held)
+
+    def clear(self) -> None:
+        """Discards the pending messages"""
+        pending, self._pending = self._pending, deque()
+        for entry in pending:
+            if entry.future is not None:
+                entry.future.cancel()
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """Returns a snapshot of the counters. The seconds are the time the executor
+        spent decoding the offloaded messages, outside of the callbacks of the event
+        loop. They are not event loop time saved, decoding in a thread holds the GIL
+        the event loop needs to run. The messages held are those whose dispatch waited
+        for the decoding of a message received before them
+
+        :return: A dictionary of counter name to value
+        """
+        return {
+            "decodes_offloaded": self.decodes,
+            "decode_offloaded_bytes": self.decoded_bytes,
+            "decode_offloaded_seconds": self.decoded_seconds,
+            "decode_offloaded_seconds_max": self.decoded_seconds_max,
+            "decode_messages_held": self.held,
+            "decode_pending": len(self._pending),
+        }
+
+    def _on_decoded(self, future: Future) -> None:
+        if not future.cancelled():
+            self.drain()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __bool__(self) -> bool:
+        return len(self._pending) > 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(threshold={self.threshold}, "
+            f"pending={len(self._pending)})"
+        )
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -0,0 +1,202 @@
+import asyncio
+import fcntl
+import os
+import sys
+from asyncio import (
+    AbstractEventLoop,
+    BaseTransport,
+    IncompleteReadError,
+    LimitOverrunError,
+    StreamReader,
+    StreamReaderProtocol,
+    StreamWriter,
+)
+from asyncio.subprocess import Process
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from .errors import TransportError
+from .transport import Transport
+
+__all__ = ["PIPE_DELIMITER", "PipeTransport", "launch_chrome_pipe"]
+
+#: The byte terminating every message sent over a remote debugging pipe
+PIPE_DELIMITER: bytes = b"\0"
+#: The file descriptors, in the browser process, of the pipe the browser
+#: reads commands from and the pipe the browser writes messages to
+BROWSER_READ_FD: int = 3
+BROWSER_WRITE_FD: int = 4
+
+
+class PipeTransport(Transport):
+    """Transport speaking the Chrome DevTools Protocol over a pair of pipes,
+    as done by Chrome when launched with --remote-debugging-pipe.
+
+    Messages are JSON text terminated by a NUL byte and are received as bytes.
+    An opened transport is supplied to Connection.connect in place of the websocket.
+    """
+
+    __slots__ = ["_closed", "_loop", "_read_transport", "_reader", "_writer"]
+
+    def __init__(
+        self,
+        reader: StreamReader,
+        read_transport: BaseTransport,
+        writer: StreamWriter,
+        loop: AbstractEventLoop,
+    ) -> None:
+        """Create a new PipeTransport. Use PipeTransport.open to create one from
+        the file descriptors of the pipes
+
+        :param reader: The stream the messages are read from
+        :param read_transport: The transport of the pipe the messages are read from
+        :param writer: The stream the messages are written to
+        :param loop: The event loop the streams are using
+        """
+        self._reader: StreamReader = reader
+        self._read_transport: BaseTransport = read_transport
+        self._writer: StreamWriter = writer
+        self._loop: AbstractEventLoop = loop
+        self._closed: bool = False
+
+    @classmethod
+    async def open(
+        cls,
+        read_fd: int,
+        write_fd: int,
+        loop: Optional[AbstractEventLoop] = None,
+        max_size: Optional[int] = None,
+    ) -> "PipeTransport":
+        """Creates a new PipeTransport using the supplied file descriptors,
+        which are owned (closed) by the transport from then on
+
+        :param read_fd: The file descriptor messages are received from
+        :param write_fd: The file descriptor messages are sent to
+        :param loop: Optional event loop to use. Defaults to asyncio.get_event_loop
+        :param max_size: Optional maximum size of a received message in bytes.
+        Defaults to no maximum
+        :return: The new transport
+        """
+        if loop is None:
+            loop = asyncio.get_event_loop()
+        reader = StreamReader(
+            limit=max_size if max_size is not None else sys.maxsize, loop=loop
+        )
+        read_transport, _ = await loop.connect_read_pipe(
+            lambda: StreamReaderProtocol(reader, loop=loop), os.fdopen(read_fd, "rb", 0)
+        )
+        transport, protocol = await loop.connect_write_pipe(
+            lambda: StreamReaderProtocol(StreamReader(loop=loop), loop=loop),
+            os.fdopen(write_fd, "wb", 0),
+        )
+        return cls(
+            reader, read_transport, StreamWriter(transport, protocol, None, loop), loop
+        )
+
+    @property
+    def closed(self) -> bool:
+        """Returns T/F indicating if the transport is closed"""
+        return self._closed
+
+    async def send(self, data: Union[str, bytes]) -> None:
+        """Sends a message
+
+        :param data: The JSON text of the message
+        """
+        if self._closed:
+            raise ConnectionResetError("The pipe is closed")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        writer = self._writer
+        writer.write(data)
+        writer.write(PIPE_DELIMITER)
+        await writer.drain()
+
+    async def recv(self) -> bytes:
+        """Receives the next message
+
+        :return: The JSON text of the message, without its delimiter
+        """
+        try:
+            data = await self._reader.readuntil(PIPE_DELIMITER)
+        except IncompleteReadError:
+            raise ConnectionResetError("The pipe was closed by the remote end")
+        except LimitOverrunError as e:
+            raise TransportError(
+                f"Received a message larger than the maximum size: {e}"
+            )
+        return data[:-1]
+
+    async def close(self) -> None:
+        """Closes both pipes"""
+        self._closed = True
+        self._writer.close()
+        self._read_transport.close()
+        self._reader.feed_eof()
+
+
+def _move_pipe_fds(read_fd: int, write_fd: int) -> None:
+    """Runs in the forked child before executing the browser, placing the browsers
+    ends of the pipes at the file descriptors the browser expects them to be at.
+
+    :param read_fd: The end of the pipe the browser reads commands from
+    :param write_fd: The end of the pipe the browser writes messages to
+    """
+    # move both out of the way first as either may currently be 3 or 4
+    read_fd = fcntl.fcntl(read_fd, fcntl.F_DUPFD, 10)
+    write_fd = fcntl.fcntl(write_fd, fcntl.F_DUPFD, 10)
+    os.dup2(read_fd, BROWSER_READ_FD)
+    os.dup2(write_fd, BROWSER_WRITE_FD)
+    os.close(read_fd)
+    os.close(write_fd)
+
+
+async def launch_chrome_pipe(
+    executable: str,
+    args: Optional[Sequence[str]] = None,
+    loop: Optional[AbstractEventLoop] = None,
+    env: Optional[Dict[str, str]] = None,
+    max_size: Optional[int] = None,
+) -> Tuple[Process, PipeTransport]:
+    """Launches Chrome with --remote-debugging-pipe, returning the browser process
+    and the transport connected to it
+
+    :param executable: The path to the Chrome executable, or any program speaking
+    the protocol over file descriptors 3 (input) and 4 (output)
+    :param args: Optional additional command line arguments of the browser
+    :param loop: Optional event loop to use. Defaults to asyncio.get_event_loop
+    :param env: Optional environment variables of the browser. Defaults to the current
+    environment
+    :param max_size: Optional maximum size of a received message in bytes.
+    Defaults to no maximum
+    :return: The browser process and the transport connected to it
+    """
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    cmd: List[str] = [executable]
+    if args:
+        cmd.extend(arg for arg in args if arg != "--remote-debugging-pipe")
+    cmd.append("--remote-debugging-pipe")
+    # commands flow parent -> browser over the first pipe,
+    # messages browser -> parent over the second
+    browser_read, parent_write = os.pipe()
+    parent_read, browser_write = os.pipe()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            env=env,
+            loop=loop,
+            pass_fds=(BROWSER_READ_FD, BROWSER_WRITE_FD),
+            preexec_fn=lambda: _move_pipe_fds(browser_read, browser_write),
+        )
+    except Exception:
+        for fd in (parent_read, parent_write):
+            os.close(fd)
+        raise
+    finally:
+        os.close(browser_read)
+        os.close(browser_write)
+    transport = await PipeTransport.open(
+        parent_read, parent_write, loop=loop, max_size=max_size
+    )
+    return process, transport
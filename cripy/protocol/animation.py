@@ -3,6 +3,7 @@ from typing import Awaitable, Any, Callable, Dict, List, Optional, Union, TYPE_C
 
 if TYPE_CHECKING:
     from cripy import ConnectionType, SessionType
+    from cripy.nowait import NowaitSender
 
 __all__ = ["Animation"]
 
@@ -17,14 +18,28 @@ class Animation:
     See `https://chromedevtools.github.io/devtools-protocol/tot/Animation`
     """
 
-    __slots__ = ["client"]
+    __slots__ = ["_nowait", "client"]
 
-    def __init__(self, client: Union["ConnectionType", "SessionType"]) -> None:
+    def __init__(
+        self, client: Union["ConnectionType", "SessionType", "NowaitSender"]
+    ) -> None:
         """Initialize a new instance of Animation
 
         :param client: The client instance to be used to communicate with the remote browser instance
         """
-        self.client: Union["ConnectionType", "SessionType"] = client
+        self.client: Union["ConnectionType", "SessionType", "NowaitSender"] = client
+        self._nowait: Optional["Animation"] = None
+
+    @property
+    def nowait(self) -> "Animation":
+        """Returns a view of Animation whose commands are sent without awaiting
+        their responses, the commands of the view return the id of the command sent
+
+        :return: The view of Animation
+        """
+        if self._nowait is None:
+            self._nowait = Animation(self.client.nowait)
+        return self._nowait
 
     def disable(self) -> Awaitable[Dict]:
         """
@@ -156,7 +171,9 @@ class Animation:
         )
 
     def animationCanceled(
-        self, listener: Optional[Callable[[Dict[str, Any]], Any]] = None
+        self,
+        listener: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        where: Optional[Union[Dict[str, Any], Callable[[Dict], bool]]] = None,
     ) -> Any:
         """
         Event for when an animation has been cancelled.
@@ -164,26 +181,24 @@ class Animation:
         See `https://chromedevtools.github.io/devtools-protocol/tot/Animation#event-animationCanceled`
 
         :param listener: Optional listener function
+        :param where: Optional filter of the events, a mapping of param name to expected value
+        or a function of the params of the event. See Connection.subscribe
         :return: If a listener was supplied the return value is a callable that
         will remove the supplied listener otherwise a future that resolves
-        with the value of the event
+        with the value of the event, cancelling it stops waiting for the event
         """
         event_name = "Animation.animationCanceled"
         if listener is None:
-            future = self.client.loop.create_future()
-
-            def _listener(event: Optional[Dict] = None) -> None:
-                future.set_result(event)
-
-            self.client.once(event_name, _listener)
-
-            return future
-
+            return self.client.wait_for(event_name, where)
+        if where is not None:
+            return self.client.subscribe(event_name, listener, where)
         self.client.on(event_name, listener)
         return lambda: self.client.remove_listener(event_name, listener)
 
     def animationCreated(
-        self, listener: Optional[Callable[[Dict[str, Any]], Any]] = None
+        self,
+        listener: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        where: Optional[Union[Dict[str, Any], Callable[[Dict], bool]]] = None,
     ) -> Any:
         """
         Event for each animation that has been created.
@@ -191,26 +206,24 @@ class Animation:
         See `https://chromedevtools.github.io/devtools-protocol/tot/Animation#event-animationCreated`
 
         :param listener: Optional listener function
+        :param where: Optional filter of the events, a mapping of param name to expected value
+        or a function of the params of the event. See Connection.subscribe
         :return: If a listener was supplied the return value is a callable that
         will remove the supplied listener otherwise a future that resolves
-        with the value of the event
+        with the value of the event, cancelling it stops waiting for the event
         """
         event_name = "Animation.animationCreated"
         if listener is None:
-            future = self.client.loop.create_future()
-
-            def _listener(event: Optional[Dict] = None) -> None:
-                future.set_result(event)
-
-            self.client.once(event_name, _listener)
-
-            return future
-
+            return self.client.wait_for(event_name, where)
+        if where is not None:
+            return self.client.subscribe(event_name, listener, where)
         self.client.on(event_name, listener)
         return lambda: self.client.remove_listener(event_name, listener)
 
     def animationStarted(
-        self, listener: Optional[Callable[[Dict[str, Any]], Any]] = None
+        self,
+        listener: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        where: Optional[Union[Dict[str, Any], Callable[[Dict], bool]]] = None,
     ) -> Any:
         """
         Event for animation that has been started.
@@ -218,20 +231,16 @@ class Animation:
         See `https://chromedevtools.github.io/devtools-protocol/tot/Animation#event-animationStarted`
 
         :param listener: Optional listener function
+        :param where: Optional filter of the events, a mapping of param name to expected value
+        or a function of the params of the event. See Connection.subscribe
         :return: If a listener was supplied the return value is a callable that
         will remove the supplied listener otherwise a future that resolves
-        with the value of the event
+        with the value of the event, cancelling it stops waiting for the event
         """
         event_name = "Animation.animationStarted"
         if listener is None:
-            future = self.client.loop.create_future()
-
-            def _listener(event: Optional[Dict] = None) -> None:
-                future.set_result(event)
-
-            self.client.once(event_name, _listener)
-
-            return future
-
+            return self.client.wait_for(event_name, where)
+        if where is not None:
+            return self.client.subscribe(event_name, listener, where)
         self.client.on(event_name, listener)
         return lambda: self.client.remove_listener(event_name, listener)
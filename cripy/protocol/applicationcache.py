@@ -3,6 +3,7 @@ from typing import Awaitable, Any, Callable, Dict, List, Optional, Union, TYPE_C
 
 if TYPE_CHECKING:
     from cripy import ConnectionType, SessionType
+    from cripy.nowait import NowaitSender
 
 __all__ = ["ApplicationCache"]
 
@@ -14,14 +15,28 @@ class ApplicationCache:
     See `https://chromedevtools.github.io/devtools-protocol/tot/ApplicationCache`
     """
 
-    __slots__ = ["client"]
+    __slots__ = ["_nowait", "client"]
 
-    def __init__(self, client: Union["ConnectionType", "SessionType"]) -> None:
+    def __init__(
+        self, client: Union["ConnectionType", "SessionType", "NowaitSender"]
+    ) -> None:
         """Initialize a new instance of ApplicationCache
 
         :param client: The client instance to be used to communicate with the remote browser instance
         """
-        self.client: Union["ConnectionType", "SessionType"] = client
+        self.client: Union["ConnectionType", "SessionType", "NowaitSender"] = client
+        self._nowait: Optional["ApplicationCache"] = None
+
+    @property
+    def nowait(self) -> "ApplicationCache":
+        """Returns a view of ApplicationCache whose commands are sent without awaiting
+        their responses, the commands of the view return the id of the command sent
+
+        :return: The view of ApplicationCache
+        """
+        if self._nowait is None:
+            self._nowait = ApplicationCache(self.client.nowait)
+        return self._nowait
 
     def enable(self) -> Awaitable[Dict]:
         """
@@ -71,51 +86,47 @@ class ApplicationCache:
         )
 
     def applicationCacheStatusUpdated(
-        self, listener: Optional[Callable[[Dict[str, Any]], Any]] = None
+        self,
+        listener: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        where: Optional[Union[Dict[str, Any], Callable[[Dict], bool]]] = None,
     ) -> Any:
         """
         See `https://chromedevtools.github.io/devtools-protocol/tot/ApplicationCache#event-applicationCacheStatusUpdated`
 
         :param listener: Optional listener function
+        :param where: Optional filter of the events, a mapping of param name to expected value
+        or a function of the params of the event. See Connection.subscribe
         :return: If a listener was supplied the return value is a callable that
         will remove the supplied listener otherwise a future that resolves
-        with the value of the event
+        with the value of the event, cancelling it stops waiting for the event
         """
         event_name = "ApplicationCache.applicationCacheStatusUpdated"
         if listener is None:
-            future = self.client.loop.create_future()
-
-            def _listener(event: Optional[Dict] = None) -> None:
-                future.set_result(event)
-
-            self.client.once(event_name, _listener)
-
-            return future
-
+            return self.client.wait_for(event_name, where)
+        if where is not None:
+            return self.client.subscribe(event_name, listener, where)
         self.client.on(event_name, listener)
         return lambda: self.client.remove_listener(event_name, listener)
 
     def networkStateUpdated(
-        self, listener: Optional[Callable[[Dict[str, Any]], Any]] = None
+        self,
+        listener: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        where: Optional[Union[Dict[str, Any], Callable[[Dict], bool]]] = None,
     ) -> Any:
         """
         See `https://chromedevtools.github.io/devtools-protocol/tot/ApplicationCache#event-networkStateUpdated`
 
         :param listener: Optional listener function
+        :param where: Optional filter of the events, a mapping of param name to expected value
+        or a function of the params of the event. See Connection.subscribe
         :return: If a listener was supplied the return value is a callable that
         will remove the supplied listener otherwise a future that resolves
-        with the value of the event
+        with the value of the event, cancelling it stops waiting for the event
         """
         event_name = "ApplicationCache.networkStateUpdated"
         if listener is None:
-            future = self.client.loop.create_future()
-
-            def _listener(event: Optional[Dict] = None) -> None:
-                future.set_result(event)
-
-            self.client.once(event_name, _listener)
-
-            return future
-
+            return self.client.wait_for(event_name, where)
+        if where is not None:
+            return self.client.subscribe(event_name, listener, where)
         self.client.on(event_name, listener)
         return lambda: self.client.remove_listener(event_name, listener)
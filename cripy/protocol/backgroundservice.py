@@ -3,6 +3,7 @@ from typing import Awaitable, Any, Callable, Dict, List, Optional, Union, TYPE_C
 
 if TYPE_CHECKING:
     from cripy import ConnectionType, SessionType
+    from cripy.nowait import NowaitSender
 
 __all__ = ["BackgroundService"]
 
@@ -15,14 +16,28 @@ class BackgroundService:
     See `https://chromedevtools.github.io/devtools-protocol/tot/BackgroundService`
     """
 
-    __slots__ = ["client"]
+    __slots__ = ["_nowait", "client"]
 
-    def __init__(self, client: Union["ConnectionType", "SessionType"]) -> None:
+    def __init__(
+        self, client: Union["ConnectionType", "SessionType", "NowaitSender"]
+    ) -> None:
         """Initialize a new instance of BackgroundService
 
         :param client: The client instance to be used to communicate with the remote browser instance
         """
-        self.client: Union["ConnectionType", "SessionType"] = client
+        self.client: Union["ConnectionType", "SessionType", "NowaitSender"] = client
+        self._nowait: Optional["BackgroundService"] = None
+
+    @property
+    def nowait(self) -> "BackgroundService":
+        """Returns a view of BackgroundService whose commands are sent without awaiting
+        their responses, the commands of the view return the id of the command sent
+
+        :return: The view of BackgroundService
+        """
+        if self._nowait is None:
+            self._nowait = BackgroundService(self.client.nowait)
+        return self._nowait
 
     def startObserving(self, service: str) -> Awaitable[Dict]:
         """
@@ -75,7 +90,9 @@ class BackgroundService:
         return self.client.send("BackgroundService.clearEvents", {"service": service})
 
     def recordingStateChanged(
-        self, listener: Optional[Callable[[Dict[str, Any]], Any]] = None
+        self,
+        listener: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        where: Optional[Union[Dict[str, Any], Callable[[Dict], bool]]] = None,
     ) -> Any:
         """
         Called when the recording state for the service has been updated.
@@ -83,26 +100,24 @@ class BackgroundService:
         See `https://chromedevtools.github.io/devtools-protocol/tot/BackgroundService#event-recordingStateChanged`
 
         :param listener: Optional listener function
+        :param where: Optional filter of the events, a mapping of param name to expected value
+        or a function of the params of the event. See Connection.subscribe
         :return: If a listener was supplied the return value is a callable that
         will remove the supplied listener otherwise a future that resolves
-        with the value of the event
+        with the value of the event, cancelling it stops waiting for the event
         """
         event_name = "BackgroundService.recordingStateChanged"
         if listener is None:
-            future = self.client.loop.create_future()
-
-            def _listener(event: Optional[Dict] = None) -> None:
-                future.set_result(event)
-
-            self.client.once(event_name, _listener)
-
-            return future
-
+            return self.client.wait_for(event_name, where)
+        if where is not None:
+            return self.client.subscribe(event_name, listener, where)
         self.client.on(event_name, listener)
         return lambda: self.client.remove_listener(event_name, listener)
 
     def backgroundServiceEventReceived(
-        self, listener: Optional[Callable[[Dict[str, Any]], Any]] = None
+        self,
+        listener: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        where: Optional[Union[Dict[str, Any], Callable[[Dict], bool]]] = None,
     ) -> Any:
         """
         Called with all existing backgroundServiceEvents when enabled, and all new
@@ -111,20 +126,16 @@ class BackgroundService:
         See `https://chromedevtools.github.io/devtools-protocol/tot/BackgroundService#event-backgroundServiceEventReceived`
 
         :param listener: Optional listener function
+        :param where: Optional filter of the events, a mapping of param name to expected value
+        or a function of the params of the event. See Connection.subscribe
         :return: If a listener was supplied the return value is a callable that
         will remove the supplied listener otherwise a future that resolves
-        with the value of the event
+        with the value of the event, cancelling it stops waiting for the event
         """
         event_name = "BackgroundService.backgroundServiceEventReceived"
         if listener is None:
-            future = self.client.loop.create_future()
-
-            def _listener(event: Optional[Dict] = None) -> None:
-                future.set_result(event)
-
-            self.client.once(event_name, _listener)
-
-            return future
-
+            return self.client.wait_for(event_name, where)
+        if where is not None:
+            return self.client.subscribe(event_name, listener, where)
         self.client.on(event_name, listener)
         return lambda: self.client.remove_listener(event_name, listener)
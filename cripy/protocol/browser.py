@@ -3,6 +3,7 @@ from typing import Awaitable, Any, Dict, List, Optional, Union, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from cripy import ConnectionType, SessionType
+    from cripy.nowait import NowaitSender
 
 __all__ = ["Browser"]
 
@@ -14,14 +15,28 @@ class Browser:
     See `https://chromedevtools.github.io/devtools-protocol/tot/Browser`
     """
 
-    __slots__ = ["client"]
+    __slots__ = ["_nowait", "client"]
 
-    def __init__(self, client: Union["ConnectionType", "SessionType"]) -> None:
+    def __init__(
+        self, client: Union["ConnectionType", "SessionType", "NowaitSender"]
+    ) -> None:
         """Initialize a new instance of Browser
 
         :param client: The client instance to be used to communicate with the remote browser instance
         """
-        self.client: Union["ConnectionType", "SessionType"] = client
+        self.client: Union["ConnectionType", "SessionType", "NowaitSender"] = client
+        self._nowait: Optional["Browser"] = None
+
+    @property
+    def nowait(self) -> "Browser":
+        """Returns a view of Browser whose commands are sent without awaiting
+        their responses, the commands of the view return the id of the command sent
+
+        :return: The view of Browser
+        """
+        if self._nowait is None:
+            self._nowait = Browser(self.client.nowait)
+        return self._nowait
 
     def grantPermissions(
         self,
@@ -3,6 +3,7 @@ from typing import Awaitable, Any, Callable, Dict, List, Optional, Union, TYPE_C
 
 if TYPE_CHECKING:
     from cripy import ConnectionType, SessionType
+    from cripy.nowait import NowaitSender
 
 __all__ = ["Cast"]
 
@@ -16,14 +17,28 @@ class Cast:
     See `https://chromedevtools.github.io/devtools-protocol/tot/Cast`
     """
 
-    __slots__ = ["client"]
+    __slots__ = ["_nowait", "client"]
 
-    def __init__(self, client: Union["ConnectionType", "SessionType"]) -> None:
+    def __init__(
+        self, client: Union["ConnectionType", "SessionType", "NowaitSender"]
+    ) -> None:
         """Initialize a new instance of Cast
 
         :param client: The client instance to be used to communicate with the remote browser instance
         """
-        self.client: Union["ConnectionType", "SessionType"] = client
+        self.client: Union["ConnectionType", "SessionType", "NowaitSender"] = client
+        self._nowait: Optional["Cast"] = None
+
+    @property
+    def nowait(self) -> "Cast":
+        """Returns a view of Cast whose commands are sent without awaiting
+        their responses, the commands of the view return the id of the command sent
+
+        :return: The view of Cast
+        """
+        if self._nowait is None:
+            self._nowait = Cast(self.client.nowait)
+        return self._nowait
 
     def enable(self, presentationUrl: Optional[str] = None) -> Awaitable[Dict]:
         """
@@ -88,7 +103,9 @@ class Cast:
         return self.client.send("Cast.stopCasting", {"sinkName": sinkName})
 
     def sinksUpdated(
-        self, listener: Optional[Callable[[Dict[str, Any]], Any]] = None
+        self,
+        listener: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        where: Optional[Union[Dict[str, Any], Callable[[Dict], bool]]] = None,
     ) -> Any:
         """
         This is fired whenever the list of available sinks changes. A sink is a
@@ -97,26 +114,24 @@ class Cast:
         See `https://chromedevtools.github.io/devtools-protocol/tot/Cast#event-sinksUpdated`
 
         :param listener: Optional listener function
+        :param where: Optional filter of the events, a mapping of param name to expected value
+        or a function of the params of the event. See Connection.subscribe
         :return: If a listener was supplied the return value is a callable that
         will remove the supplied listener otherwise a future that resolves
-        with the value of the event
+        with the value of the event, cancelling it stops waiting for the event
         """
         event_name = "Cast.sinksUpdated"
         if listener is None:
-            future = self.client.loop.create_future()
-
-            def _listener(event: Optional[Dict] = None) -> None:
-                future.set_result(event)
-
-            self.client.once(event_name, _listener)
-
-            return future
-
+            return self.client.wait_for(event_name, where)
+        if where is not None:
+            return self.client.subscribe(event_name, listener, where)
         self.client.on(event_name, listener)
         return lambda: self.client.remove_listener(event_name, listener)
 
     def issueUpdated(
-        self, listener: Optional[Callable[[Dict[str, Any]], Any]] = None
+        self,
+        listener: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        where: Optional[Union[Dict[str, Any], Callable[[Dict], bool]]] = None,
     ) -> Any:
         """
         This is fired whenever the outstanding issue/error message changes.
@@ -125,20 +140,16 @@ class Cast:
         See `https://chromedevtools.github.io/devtools-protocol/tot/Cast#event-issueUpdated`
 
         :param listener: Optional listener function
+        :param where: Optional filter of the events, a mapping of param name to expected value
+        or a function of the params of the event. See Connection.subscribe
         :return: If a listener was supplied the return value is a callable that
         will remove the supplied listener otherwise a future that resolves
-        with the value of the event
+        with the value of the event, cancelling it stops waiting for the event
         """
         event_name = "Cast.issueUpdated"
         if listener is None:
-            future = self.client.loop.create_future()
-
-            def _listener(event: Optional[Dict] = None) -> None:
-                future.set_result(event)
-
-            self.client.once(event_name, _listener)
-
-            return future
-
+            return self.client.wait_for(event_name, where)
+        if where is not None:
+            return self.client.subscribe(event_name, listener, where)
         self.client.on(event_name, listener)
         return lambda: self.client.remove_listener(event_name, listener)
@@ -3,6 +3,7 @@ from typing import Awaitable, Any, Callable, Dict, List, Optional, Union, TYPE_C
 
 if TYPE_CHECKING:
     from cripy import ConnectionType, SessionType
+    from cripy.nowait import NowaitSender
 
 __all__ = ["Emulation"]
 
@@ -19,14 +20,28 @@ class Emulation:
     See `https://chromedevtools.github.io/devtools-protocol/tot/Emulation`
     """
 
-    __slots__ = ["client"]
+    __slots__ = ["_nowait", "client"]
 
-    def __init__(self, client: Union["ConnectionType", "SessionType"]) -> None:
+    def __init__(
+        self, client: Union["ConnectionType", "SessionType", "NowaitSender"]
+    ) -> None:
         """Initialize a new instance of Emulation
 
         :param client: The client instance to be used to communicate with the remote browser instance
         """
-        self.client: Union["ConnectionType", "SessionType"] = client
+        self.client: Union["ConnectionType", "SessionType", "NowaitSender"] = client
+        self._nowait: Optional["Emulation"] = None
+
+    @property
+    def nowait(self) -> "Emulation":
+        """Returns a view of Emulation whose commands are sent without awaiting
+        their responses, the commands of the view return the id of the command sent
+
+        :return: The view of Emulation
+        """
+        if self._nowait is None:
+            self._nowait = Emulation(self.client.nowait)
+        return self._nowait
 
     def canEmulate(self) -> Awaitable[Dict]:
         """
@@ -395,7 +410,9 @@ class Emulation:
         return self.client.send("Emulation.setUserAgentOverride", msg)
 
     def virtualTimeBudgetExpired(
-        self, listener: Optional[Callable[[Any], Any]] = None
+        self,
+        listener: Optional[Callable[[Any], Any]] = None,
+        where: Optional[Union[Dict[str, Any], Callable[[Dict], bool]]] = None,
     ) -> Any:
         """
         Notification sent after the virtual time budget for the current VirtualTimePolicy has run out.
@@ -403,20 +420,16 @@ class Emulation:
         See `https://chromedevtools.github.io/devtools-protocol/tot/Emulation#event-virtualTimeBudgetExpired`
 
         :param listener: Optional listener function
+        :param where: Optional filter of the events, a mapping of param name to expected value
+        or a function of the params of the event. See Connection.subscribe
         :return: If a listener was supplied the return value is a callable that
         will remove the supplied listener otherwise a future that resolves
-        with the value of the event
+        with the value of the event, cancelling it stops waiting for the event
         """
         event_name = "Emulation.virtualTimeBudgetExpired"
         if listener is None:
-            future = self.client.loop.create_future()
-
-            def _listener(event: Optional[Dict] = None) -> None:
-                future.set_result(event)
-
-            self.client.once(event_name, _listener)
-
-            return future
-
+            return self.client.wait_for(event_name, where)
+        if where is not None:
+            return self.client.subscribe(event_name, listener, where)
         self.client.on(event_name, listener)
         return lambda: self.client.remove_listener(event_name, listener)
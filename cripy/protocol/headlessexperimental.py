@@ -3,6 +3,7 @@ from typing import Awaitable, Any, Callable, Dict, List, Optional, Union, TYPE_C
 
 if TYPE_CHECKING:
     from cripy import ConnectionType, SessionType
+    from cripy.nowait import NowaitSender
 
 __all__ = ["HeadlessExperimental"]
 
@@ -19,14 +20,28 @@ class HeadlessExperimental:
     See `https://chromedevtools.github.io/devtools-protocol/tot/HeadlessExperimental`
     """
 
-    __slots__ = ["client"]
+    __slots__ = ["_nowait", "client"]
 
-    def __init__(self, client: Union["ConnectionType", "SessionType"]) -> None:
+    def __init__(
+        self, client: Union["ConnectionType", "SessionType", "NowaitSender"]
+    ) -> None:
         """Initialize a new instance of HeadlessExperimental
 
         :param client: The client instance to be used to communicate with the remote browser instance
         """
-        self.client: Union["ConnectionType", "SessionType"] = client
+        self.client: Union["ConnectionType", "SessionType", "NowaitSender"] = client
+        self._nowait: Optional["HeadlessExperimental"] = None
+
+    @property
+    def nowait(self) -> "HeadlessExperimental":
+        """Returns a view of HeadlessExperimental whose commands are sent without awaiting
+        their responses, the commands of the view return the id of the command sent
+
+        :return: The view of HeadlessExperimental
+        """
+        if self._nowait is None:
+            self._nowait = HeadlessExperimental(self.client.nowait)
+        return self._nowait
 
     def beginFrame(
         self,
@@ -87,7 +102,9 @@ class HeadlessExperimental:
         return self.client.send("HeadlessExperimental.enable", {})
 
     def needsBeginFramesChanged(
-        self, listener: Optional[Callable[[Dict[str, Any]], Any]] = None
+        self,
+        listener: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        where: Optional[Union[Dict[str, Any], Callable[[Dict], bool]]] = None,
     ) -> Any:
         """
         Issued when the target starts or stops needing BeginFrames.
@@ -95,20 +112,16 @@ class HeadlessExperimental:
         See `https://chromedevtools.github.io/devtools-protocol/tot/HeadlessExperimental#event-needsBeginFramesChanged`
 
         :param listener: Optional listener function
+        :param where: Optional filter of the events, a mapping of param name to expected value
+        or a function of the params of the event. See Connection.subscribe
         :return: If a listener was supplied the return value is a callable that
         will remove the supplied listener otherwise a future that resolves
-        with the value of the event
+        with the value of the event, cancelling it stops waiting for the event
         """
         event_name = "HeadlessExperimental.needsBeginFramesChanged"
         if listener is None:
-            future = self.client.loop.create_future()
-
-            def _listener(event: Optional[Dict] = None) -> None:
-                future.set_result(event)
-
-            self.client.once(event_name, _listener)
-
-            return future
-
+            return self.client.wait_for(event_name, where)
+        if where is not None:
+            return self.client.subscribe(event_name, listener, where)
         self.client.on(event_name, listener)
         return lambda: self.client.remove_listener(event_name, listener)
@@ -3,6 +3,7 @@ from typing import Awaitable, Any, Dict, List, Optional, Union, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from cripy import ConnectionType, SessionType
+    from cripy.nowait import NowaitSender
 
 __all__ = ["IO"]
 
@@ -14,14 +15,28 @@ class IO:
     See `https://chromedevtools.github.io/devtools-protocol/tot/IO`
     """
 
-    __slots__ = ["client"]
+    __slots__ = ["_nowait", "client"]
 
-    def __init__(self, client: Union["ConnectionType", "SessionType"]) -> None:
+    def __init__(
+        self, client: Union["ConnectionType", "SessionType", "NowaitSender"]
+    ) -> None:
         """Initialize a new instance of IO
 
         :param client: The client instance to be used to communicate with the remote browser instance
         """
-        self.client: Union["ConnectionType", "SessionType"] = client
+        self.client: Union["ConnectionType", "SessionType", "NowaitSender"] = client
+        self._nowait: Optional["IO"] = None
+
+    @property
+    def nowait(self) -> "IO":
+        """Returns a view of IO whose commands are sent without awaiting
+        their responses, the commands of the view return the id of the command sent
+
+        :return: The view of IO
+        """
+        if self._nowait is None:
+            self._nowait = IO(self.client.nowait)
+        return self._nowait
 
     def close(self, handle: str) -> Awaitable[Dict]:
         """
@@ -3,6 +3,7 @@ from typing import Awaitable, Any, Dict, List, Optional, Union, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from cripy import ConnectionType, SessionType
+    from cripy.nowait import NowaitSender
 
 __all__ = ["SystemInfo"]
 
@@ -15,14 +16,28 @@ class SystemInfo:
     See `https://chromedevtools.github.io/devtools-protocol/tot/SystemInfo`
     """
 
-    __slots__ = ["client"]
+    __slots__ = ["_nowait", "client"]
 
-    def __init__(self, client: Union["ConnectionType", "SessionType"]) -> None:
+    def __init__(
+        self, client: Union["ConnectionType", "SessionType", "NowaitSender"]
+    ) -> None:
         """Initialize a new instance of SystemInfo
 
         :param client: The client instance to be used to communicate with the remote browser instance
         """
-        self.client: Union["ConnectionType", "SessionType"] = client
+        self.client: Union["ConnectionType", "SessionType", "NowaitSender"] = client
+        self._nowait: Optional["SystemInfo"] = None
+
+    @property
+    def nowait(self) -> "SystemInfo":
+        """Returns a view of SystemInfo whose commands are sent without awaiting
+        their responses, the commands of the view return the id of the command sent
+
+        :return: The view of SystemInfo
+        """
+        if self._nowait is None:
+            self._nowait = SystemInfo(self.client.nowait)
+        return self._nowait
 
     def getInfo(self) -> Awaitable[Dict]:
         """
@@ -3,6 +3,7 @@ from typing import Awaitable, Dict, List, Optional, Union, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from cripy import ConnectionType, SessionType
+    from cripy.nowait import NowaitSender
 
 __all__ = ["Testing"]
 
@@ -13,10 +14,24 @@ class Testing:
 domains.
     """
 
-    __slots__ = ["client"]
+    __slots__ = ["_nowait", "client"]
 
-    def __init__(self, client: Union["ConnectionType", "SessionType"]) -> None:
-        self.client: Union["ConnectionType", "SessionType"] = client
+    def __init__(
+        self, client: Union["ConnectionType", "SessionType", "NowaitSender"]
+    ) -> None:
+        self.client: Union["ConnectionType", "SessionType", "NowaitSender"] = client
+        self._nowait: Optional["Testing"] = None
+
+    @property
+    def nowait(self) -> "Testing":
+        """Returns a view of Testing whose commands are sent without awaiting
+        their responses, the commands of the view return the id of the command sent
+
+        :return: The view of Testing
+        """
+        if self._nowait is None:
+            self._nowait = Testing(self.client.nowait)
+        return self._nowait
 
     def generateTestReport(
         self, message: str, group: Optional[str] = None
@@ -0,0 +1,453 @@
+import struct
+from asyncio import AbstractEventLoop, Event, get_event_loop, sleep
+from time import monotonic
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Union
+
+from .compression import CompressionStats, Deflate
+from .errors import ClientError
+from .frames import scan_frame
+from .transport import DEFAULT_MAX_QUEUE, Transport
+
+__all__ = [
+    "RecorderArg",
+    "RecordingTransport",
+    "ReplayTransport",
+    "WireRecord",
+    "WireRecorder",
+    "get_recorder",
+    "read_wire_records",
+]
+
+#: The bytes every recording starts with, the last one being the version of the format
+WIRE_MAGIC: bytes = b"CRIPYWIRE\x01"
+#: The header of a record: flags, length of the session id, seconds since
+#: the recording started, length of the frame
+RECORD_HEADER: struct.Struct = struct.Struct("<BBdI")
+#: Flag set for frames received from the remote browser, unset for sent ones
+FLAG_RECEIVED: int = 1
+#: Flag set for frames that are bytes, unset for text frames
+FLAG_BINARY: int = 2
+SESSION_ID_KEY: str = '"sessionId":"'
+SESSION_ID_KEY_B: bytes = SESSION_ID_KEY.encode("utf-8")
+
+
+def frame_session_id(frame: Union[str, bytes]) -> Optional[str]:
+    """Returns the id of the session a raw frame is for, found without decoding it.
+    The sessionId of flat session frames is the last key of the frame, the one of
+    the frames of non flat sessions is the first parameter of the envelope
+
+    :param frame: The raw JSON message
+    :return: The session id or None if the frame is not for a session
+    """
+    info = scan_frame(frame)
+    if info is not None and info[2] is not None:
+        return info[2]
+    if isinstance(frame, bytes):
+        start = frame.find(SESSION_ID_KEY_B)
+        if start == -1:
+            return None
+        start += len(SESSION_ID_KEY_B)
+        end = frame.find(b'"', start)
+        if end == -1:
+            return None
+        return frame[start:end].decode("utf-8")
+    start = frame.find(SESSION_ID_KEY)
+    if start == -1:
+        return None
+    start += len(SESSION_ID_KEY)
+    end = frame.find('"', start)
+    if end == -1:
+        return None
+    return frame[start:end]
+
+
+class WireRecord:
+    """A frame sent to or received from the remote browser"""
+
+    __slots__ = ["data", "received", "session_id", "timestamp"]
+
+    def __init__(
+        self,
+        data: Union[str, bytes],
+        received: bool,
+        timestamp: float,
+        session_id: Optional[str] = None,
+    ) -> None:
+        """Create a new WireRecord
+
+        :param data: The raw frame
+        :param received: T/F indicating if the frame was received rather than sent
+        :param timestamp: The number of seconds since the recording started
+        :param session_id: The id of the session the frame is for, if any
+        """
+        self.data: Union[str, bytes] = data
+        self.received: bool = received
+        self.timestamp: float = timestamp
+        self.session_id: Optional[str] = session_id
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(received={self.received}, timestamp={self.timestamp}, "
+            f"session_id={self.session_id}, size={len(self.data)})"
+        )
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class WireRecorder:
+    """Appends every frame a connection sends and receives to a recording file,
+    with the monotonic number of seconds since the recorder was created and the
+    id of the session the frame is for.
+
+    Records are a fixed size header followed by the session id and the frame, written
+    through a buffered file so recording costs a copy per frame. A closed recorder
+    re-opens its file on the next record, appending to it.
+    """
+
+    __slots__ = ["_file", "bytes", "path", "records", "started"]
+
+    def __init__(self, path: str) -> None:
+        """Create a new WireRecorder
+
+        :param path: The path of the recording, appended to if it exists
+        """
+        self.path: str = path
+        self.started: float = monotonic()
+        self.records: int = 0
+        self.bytes: int = 0
+        self._file: Optional[BinaryIO] = None
+
+    @property
+    def closed(self) -> bool:
+        """Returns T/F indicating if the file of the recorder is closed"""
+        return self._file is None
+
+    def record(self, data: Union[str, bytes], received: bool) -> None:
+        """Appends a frame to the recording
+
+        :param data: The raw frame
+        :param received: T/F indicating if the frame was received rather than sent
+        """
+        file = self._file
+        if file is None:
+            file = self._open()
+        flags = FLAG_RECEIVED if received else 0
+        if isinstance(data, bytes):
+            flags |= FLAG_BINARY
+            payload = data
+        else:
+            payload = data.encode("utf-8")
+        session_id = frame_session_id(data)
+        sid = session_id.encode("utf-8")[:255] if session_id else b""
+        file.write(
+            RECORD_HEADER.pack(
+                flags, len(sid), monotonic() - self.started, len(payload)
+            )
+        )
+        if sid:
+            file.write(sid)
+        file.write(payload)
+        self.records += 1
+        self.bytes += len(payload)
+
+    def flush(self) -> None:
+        """Writes the buffered records to the file"""
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        """Closes the file of the recorder"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open(self) -> BinaryIO:
+        file = open(self.path, "ab")
+        if file.tell() == 0:
+            file.write(WIRE_MAGIC)
+        self._file = file
+        return file
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(path={self.path}, records={self.records})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+def read_wire_records(path: str) -> Iterator[WireRecord]:
+    """Reads the records of a recording made by a WireRecorder, in the order they were recorded
+
+    :param path: The path of the recording
+    :return: An iterator of the records
+    """
+    header_size = RECORD_HEADER.size
+    unpack = RECORD_HEADER.unpack
+    with open(path, "rb") as file:
+        if file.read(len(WIRE_MAGIC)) != WIRE_MAGIC:
+            raise ClientError(f"{path} is not a wire recording")
+        while 1:
+            header = file.read(header_size)
+            if len(header) < header_size:
+                return
+            flags, sid_len, timestamp, size = unpack(header)
+            session_id = file.read(sid_len).decode("utf-8") if sid_len else None
+            data = file.read(size)
+            if len(data) < size:
+                return  # truncated by a recording that did not finish
+            yield WireRecord(
+                data if flags & FLAG_BINARY else data.decode("utf-8"),
+                bool(flags & FLAG_RECEIVED),
+                timestamp,
+                session_id,
+            )
+
+
+class RecordingTransport(Transport):
+    """Transport recording the frames exchanged by another transport. Used by
+    connections created with a recorder, which wrap their transport once connected
+    """
+
+    __slots__ = ["_record", "_recorder", "_transport"]
+
+    def __init__(self, transport: Transport, recorder: WireRecorder) -> None:
+        """Create a new RecordingTransport
+
+        :param transport: The connected transport
+        :param recorder: The recorder the frames are appended to
+        """
+        self._transport: Transport = transport
+        self._recorder: WireRecorder = recorder
+        self._record = recorder.record
+
+    @classmethod
+    async def connect(
+        cls,
+        url: str,
+        loop: AbstractEventLoop,
+        max_size: Optional[int] = None,
+        max_queue: Optional[int] = DEFAULT_MAX_QUEUE,
+        compression: Optional[Deflate] = None,
+    ) -> "RecordingTransport":
+        raise ClientError(
+            "A RecordingTransport wraps a connected transport, "
+            "create the connection with a recorder"
+        )
+
+    @property
+    def transport(self) -> Transport:
+        """Returns the recorded transport"""
+        return self._transport
+
+    @property
+    def closed(self) -> bool:
+        return self._transport.closed
+
+    @property
+    def compression_stats(self) -> Optional[CompressionStats]:
+        return getattr(self._transport, "compression_stats", None)
+
+    async def recv(self) -> Union[str, bytes]:
+        data = await self._transport.recv()
+        if data:
+            self._record(data, True)
+        return data
+
+    async def send(self, data: Union[str, bytes]) -> None:
+        self._record(data, False)
+        await self._transport.send(data)
+
+    async def close(self) -> None:
+        try:
+            await self._transport.close()
+        finally:
+            self._recorder.close()
+
+
+class ReplayTransport(Transport):
+    """Transport feeding the frames received in a recording to a connection,
+    no browser involved.
+
+    The received frames are replayed at full speed or, when a speed is supplied, at the
+    pace they were recorded at. By default a received frame is held until the connection
+    sent as many frames as were sent before it in the recording, so the responses of a
+    replayed script arrive after its commands. A script sending the same commands in the
+    same order as the recorded one receives the recorded responses, the ids of the commands
+    of a connection being deterministic. Once every frame was replayed the transport
+    behaves as if the browser closed the connection, unless it is to stay open.
+    """
+
+    __slots__ = [
+        "_closed",
+        "_expected_sends",
+        "_follow_sends",
+        "_index",
+        "_loop",
+        "_records",
+        "_sent",
+        "_sent_event",
+        "_speed",
+        "_start",
+        "_stay_open",
+        "replayed",
+    ]
+
+    def __init__(
+        self,
+        recording: Union[str, Iterable[WireRecord]],
+        speed: Optional[float] = None,
+        follow_sends: bool = True,
+        stay_open: bool = False,
+        loop: Optional[AbstractEventLoop] = None,
+    ) -> None:
+        """Create a new ReplayTransport
+
+        :param recording: The path of a recording or its records
+        :param speed: Optional factor applied to the recorded pace, e.g. 1 for the recorded
+        timing and 2 for twice as fast. Defaults to replaying at full speed
+        :param follow_sends: Should received frames be held until the frames sent before them
+        in the recording were sent. Defaults to true
+        :param stay_open: Should the transport stay open once every frame was replayed,
+        rather than behaving as if the browser closed the connection. Defaults to false
+        :param loop: Optional event loop to use. Defaults to asyncio.get_event_loop
+        """
+        if speed is not None and speed <= 0:
+            raise ClientError(f"The replay speed must be positive, got {speed}")
+        self._loop: AbstractEventLoop = loop or get_event_loop()
+        if isinstance(recording, str):
+            recording = read_wire_records(recording)
+        self._records: List[WireRecord] = _monotonic_records(recording)
+        self._speed: Optional[float] = speed
+        self._follow_sends: bool = follow_sends
+        self._stay_open: bool = stay_open
+        self._index: int = 0
+        self._sent: int = 0
+        self._expected_sends: int = 0
+        self._sent_event: Event = Event(loop=self._loop)
+        self._start: Optional[float] = None
+        self._closed: bool = False
+        self.replayed: int = 0
+
+    @classmethod
+    async def connect(
+        cls,
+        url: str,
+        loop: AbstractEventLoop,
+        max_size: Optional[int] = None,
+        max_queue: Optional[int] = DEFAULT_MAX_QUEUE,
+        compression: Optional[Deflate] = None,
+    ) -> "ReplayTransport":
+        """Creates a transport replaying the recording at the supplied path at full speed
+
+        :param url: The path of the recording
+        :param loop: The event loop to use
+        :param max_size: Unused
+        :param max_queue: Unused
+        :param compression: Unused
+        :return: The transport
+        """
+        return cls(url, loop=loop)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def finished(self) -> bool:
+        """Returns T/F indicating if every received frame of the recording was replayed"""
+        return self._index >= len(self._records)
+
+    async def recv(self) -> Union[str, bytes]:
+        records = self._records
+        while not self._closed and self._index < len(records):
+            record = records[self._index]
+            self._index += 1
+            if not record.received:
+                self._expected_sends += 1
+                continue
+            if self._follow_sends:
+                while self._sent < self._expected_sends and not self._closed:
+                    self._sent_event.clear()
+                    await self._sent_event.wait()
+            if self._speed is not None and not self._closed:
+                await self._pace(record.timestamp)
+            if self._closed:
+                break
+            self.replayed += 1
+            return record.data
+        if self._stay_open:
+            while not self._closed:
+                self._sent_event.clear()
+                await self._sent_event.wait()
+        self._closed = True
+        raise ConnectionError("The replay is over")
+
+    async def send(self, data: Union[str, bytes]) -> None:
+        if self._closed:
+            raise ConnectionError("The replay is over")
+        self._sent += 1
+        self._sent_event.set()
+
+    async def close(self) -> None:
+        self._closed = True
+        self._sent_event.set()
+
+    async def _pace(self, timestamp: float) -> None:
+        """Waits until the recorded time of a frame, scaled by the speed, elapsed
+        since the replay started. Time spent waiting for sends shifts the replay
+
+        :param timestamp: The recorded time of the frame
+        """
+        now = self._loop.time()
+        at = timestamp / self._speed
+        if self._start is None or now - self._start > at:
+            self._start = now - at
+            return
+        await sleep(self._start + at - now)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(replayed={self.replayed}, "
+            f"records={len(self._records)}, closed={self._closed})"
+        )
+
+
+def _monotonic_records(records: Iterable[WireRecord]) -> List[WireRecord]:
+    """Returns the records with timestamps made monotonic across the recordings
+    appended to the same file, each one restarting at zero
+
+    :param records: The records
+    :return: The list of records
+    """
+    result = []
+    offset = last = 0.0
+    for record in records:
+        if record.timestamp + offset < last:
+            offset = last - record.timestamp
+        if offset:
+            record = WireRecord(
+                record.data,
+                record.received,
+                record.timestamp + offset,
+                record.session_id,
+            )
+        last = record.timestamp
+        result.append(record)
+    return result
+
+
+RecorderArg = Union[None, str, WireRecorder]
+
+
+def get_recorder(recorder: RecorderArg = None) -> Optional[WireRecorder]:
+    """Resolves the supplied recorder argument
+
+    :param recorder: Either a WireRecorder, the path of a recording or None for no recording
+    :return: The recorder or None if frames are not recorded
+    """
+    if recorder is None or isinstance(recorder, WireRecorder):
+        return recorder
+    if isinstance(recorder, str):
+        return WireRecorder(recorder)
+    raise ClientError(f"Unsupported recorder {recorder!r}, expected WireRecorder")
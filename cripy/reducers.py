@@ -0,0 +1,201 @@
+from asyncio import AbstractEventLoop, Handle, ensure_future
+from functools import partial
+from inspect import isawaitable
+from typing import Any, Callable, Dict, Hashable, Optional, TYPE_CHECKING, Union, cast
+
+from .errors import ClientError
+from .listeners import _emit_error
+from .subscriptions import Where
+
+if TYPE_CHECKING:  # pragma: no cover
+    from cripy import ConnectionType, SessionType  # noqa: F401
+
+__all__ = [
+    "EventReducer",
+    "FlushCallback",
+    "Fold",
+    "ReducerKey",
+    "count",
+    "latest",
+    "total",
+]
+
+#: Folds an event into the state of its key, called with the state, None for a new key
+#: unless there is an initial state, and the event. Returns the new state
+Fold = Callable[[Any, Any], Any]
+#: Called with the state of every key that received events since the previous flush
+FlushCallback = Callable[[Dict[Hashable, Any]], Any]
+#: Returns the key the state of an event is kept under
+ReducerKey = Callable[[Any], Hashable]
+
+
+def count(state: Optional[int], event: Any) -> int:
+    """Counts the events of a key"""
+    return 1 if state is None else state + 1
+
+
+def latest(state: Any, event: Any) -> Any:
+    """Keeps the last event of a key"""
+    return event
+
+
+def total(param: str) -> Fold:
+    """Returns a fold summing a numeric param of the events of a key,
+    e.g. total("dataLength") for the bytes received per request
+
+    :param param: The name of the param
+    :return: The fold
+    """
+
+    def fold(state: Optional[float], event: Dict) -> float:
+        value = event.get(param, 0)
+        return value if state is None else state + value
+
+    return fold
+
+
+class EventReducer:
+    """Folds the events received by a connection or session into a state per key,
+    rather than calling a listener per event, and hands the states to a callback
+    when flushed.
+
+    The events matching the pattern and filter, see Connection.subscribe, are folded
+    as they are dispatched. The states are flushed every interval seconds, if there is
+    an interval, on calling flush and when the reducer is closed or the connection or
+    session disconnects. A flush hands the states of the keys that received events
+    since the previous flush to the callback and starts over from empty states.
+
+    Events are the params of the events or, for wildcard patterns, their method and params
+    """
+
+    __slots__ = [
+        "_emitter",
+        "_fold",
+        "_handle",
+        "_initial",
+        "_key",
+        "_loop",
+        "_remove",
+        "_states",
+        "closed",
+        "events",
+        "flushes",
+        "interval",
+        "on_flush",
+        "pattern",
+    ]
+
+    def __init__(
+        self,
+        emitter: Union["ConnectionType", "SessionType"],
+        pattern: str,
+        fold: Fold,
+        key: Optional[ReducerKey] = None,
+        initial: Any = None,
+        on_flush: Optional[FlushCallback] = None,
+        interval: Optional[float] = None,
+        where: Optional[Where] = None,
+    ) -> None:
+        """Create a new EventReducer
+
+        :param emitter: The connection or session whose events are folded
+        :param pattern: The method of the events, Domain.* or *
+        :param fold: Function folding an event into the state of its key,
+        see count, total and latest
+        :param key: Optional function of an event returning the key its state is kept under.
+        Defaults to a single state for every event (keyed None)
+        :param initial: Optional state of a new key or function creating it, e.g. list
+        :param on_flush: Optional function called with the states when flushed
+        :param interval: Optional number of seconds between automatic flushes
+        :param where: Optional filter of the events
+        """
+        if interval is not None and interval <= 0:
+            raise ClientError(
+                f"The flush interval of a reducer must be positive, got {interval}"
+            )
+        self._emitter: Union["ConnectionType", "SessionType"] = emitter
+        self._loop: AbstractEventLoop = emitter.loop
+        self.pattern: str = pattern
+        self._fold: Fold = fold
+        self._key: Optional[ReducerKey] = key
+        self._initial: Any = initial
+        self.on_flush: Optional[FlushCallback] = on_flush
+        self.interval: Optional[float] = interval
+        self._states: Dict[Hashable, Any] = {}
+        self._handle: Optional[Handle] = None
+        self.closed: bool = False
+        self.events: int = 0
+        self.flushes: int = 0
+        self._remove: Callable[[], None] = cast(
+            Callable[[], None], emitter.subscribe(pattern, self._reduce, where)
+        )
+        emitter.once(emitter.Events.Disconnected, self.close)
+        if interval is not None:
+            self._handle = self._loop.call_later(interval, self._tick)
+
+    @property
+    def states(self) -> Dict[Hashable, Any]:
+        """Returns the states folded since the last flush, without flushing them"""
+        return self._states
+
+    def flush(self) -> Dict[Hashable, Any]:
+        """Hands the states folded since the previous flush to the flush callback,
+        if there are any, and starts over from empty states
+
+        :return: The flushed states
+        """
+        states, self._states = self._states, {}
+        if not states or self.on_flush is None:
+            return states
+        self.flushes += 1
+        emitter = self._emitter
+        try:
+            result = self.on_flush(states)
+            if isawaitable(result):
+                future = ensure_future(result, loop=self._loop)
+                if emitter.has_listeners("error"):
+                    future.add_done_callback(partial(_emit_error, emitter))
+        except Exception as e:
+            if emitter.has_listeners("error"):
+                emitter.emit("error", e)
+        return states
+
+    def close(self) -> Dict[Hashable, Any]:
+        """Unsubscribes and stops the automatic flushes, flushing the remaining states
+
+        :return: The flushed states
+        """
+        if self.closed:
+            return {}
+        self.closed = True
+        self._remove()
+        self._emitter.remove_listener(self._emitter.Events.Disconnected, self.close)
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        return self.flush()
+
+    def _reduce(self, *args: Any) -> None:
+        """The listener of the subscription, folds an event into the state of its key"""
+        event = args[0] if len(args) == 1 else args
+        key = None if self._key is None else self._key(event)
+        states = self._states
+        state = states.get(key)
+        if state is None and key not in states:
+            initial = self._initial
+            state = initial() if callable(initial) else initial
+        states[key] = self._fold(state, event)
+        self.events += 1
+
+    def _tick(self) -> None:
+        self._handle = self._loop.call_later(self.interval, self._tick)
+        self.flush()
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(pattern={self.pattern}, "
+            f"keys={len(self._states)}, interval={self.interval})"
+        )
+
+    def __repr__(self) -> str:
+        return self.__str__()
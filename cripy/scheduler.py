@@ -0,0 +1,179 @@
+from collections import deque
+from time import monotonic
+from typing import ClassVar, Deque, Dict, List, Optional, Tuple, Union
+
+from .errors import ClientError
+
+__all__ = ["OutboundScheduler", "Priority", "check_priority"]
+
+
+class Priority:
+    """The priority classes of commands.
+
+    Commands of a higher priority class (lower value) are always written before
+    the commands of lower priority classes that are waiting to be written.
+    """
+
+    Interactive: ClassVar[int] = 0
+    Normal: ClassVar[int] = 1
+    Bulk: ClassVar[int] = 2
+
+    names: ClassVar[Tuple[str, ...]] = ("interactive", "normal", "bulk")
+
+
+QueuedFrame = Tuple[Union[str, bytes], float]
+
+
+def check_priority(priority: int) -> int:
+    """Returns the supplied priority class if it is one of Priority
+
+    :param priority: The priority class
+    :return: The priority class
+    """
+    if not isinstance(priority, int) or not 0 <= priority < len(Priority.names):
+        raise ClientError(
+            f"Unknown priority class {priority!r}, expected one of Priority "
+            f"(0-{len(Priority.names) - 1})"
+        )
+    return priority
+
+
+class Lane:
+    """The frames of a single priority class, queued per session"""
+
+    __slots__ = [
+        "name",
+        "queues",
+        "turns",
+        "size",
+        "sent",
+        "wait_time_total",
+        "wait_time_max",
+    ]
+
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        #: session id -> the frames queued for the session
+        self.queues: Dict[Optional[str], Deque[QueuedFrame]] = {}
+        #: the ids of the sessions with queued frames in the order they are served
+        self.turns: Deque[Optional[str]] = deque()
+        self.size: int = 0
+        self.sent: int = 0
+        self.wait_time_total: float = 0.0
+        self.wait_time_max: float = 0.0
+
+    def push(
+        self, frame: Union[str, bytes], session_id: Optional[str], now: float
+    ) -> None:
+        queue = self.queues.get(session_id)
+        if queue is None:
+            queue = self.queues[session_id] = deque()
+            self.turns.append(session_id)
+        queue.append((frame, now))
+        self.size += 1
+
+    def pop(self, now: float) -> Union[str, bytes]:
+        """Removes the next frame of the session whose turn it is, the session
+        then moves to the back of the line
+
+        :param now: The current time
+        :return: The frame to be written
+        """
+        turns = self.turns
+        session_id = turns.popleft()
+        queue = self.queues[session_id]
+        frame, queued_at = queue.popleft()
+        if queue:
+            turns.append(session_id)
+        else:
+            del self.queues[session_id]
+        self.size -= 1
+        self.sent += 1
+        waited = now - queued_at
+        self.wait_time_total += waited
+        if waited > self.wait_time_max:
+            self.wait_time_max = waited
+        return frame
+
+    def clear(self) -> None:
+        self.queues.clear()
+        self.turns.clear()
+        self.size = 0
+
+
+class OutboundScheduler:
+    """Orders the frames waiting to be written to the remote browser.
+
+    Frames are queued in priority lanes, the highest priority lane that has
+    frames is always served first. Within a lane the sessions the frames are for
+    are served round robin, one frame at a time, so that a session queuing many
+    frames can not starve the other sessions. The frames of a session within
+    a lane keep their order.
+    """
+
+    __slots__ = ["_lanes", "_size", "peak"]
+
+    def __init__(self) -> None:
+        self._lanes: List[Lane] = [Lane(name) for name in Priority.names]
+        self._size: int = 0
+        self.peak: int = 0
+
+    def push(
+        self,
+        frame: Union[str, bytes],
+        session_id: Optional[str] = None,
+        priority: int = Priority.Normal,
+    ) -> None:
+        """Queues a frame to be written
+
+        :param frame: The encoded message
+        :param session_id: The id of the session the frame is for, None for the connection
+        :param priority: The priority class of the frame
+        """
+        self._lanes[check_priority(priority)].push(frame, session_id, monotonic())
+        self._size += 1
+        if self._size > self.peak:
+            self.peak = self._size
+
+    def pop(self) -> Union[str, bytes]:
+        """Removes and returns the next frame to be written.
+
+        Must only be called when the scheduler is not empty
+        """
+        for lane in self._lanes:
+            if lane.size:
+                self._size -= 1
+                return lane.pop(monotonic())
+        raise IndexError("pop from an empty OutboundScheduler")
+
+    def clear(self) -> None:
+        """Removes all queued frames"""
+        for lane in self._lanes:
+            lane.clear()
+        self._size = 0
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """Returns a snapshot of the per lane counters
+
+        :return: A dictionary of counter name to value
+        """
+        stats: Dict[str, Union[int, float]] = {}
+        for lane in self._lanes:
+            prefix = f"lane_{lane.name}"
+            stats[f"{prefix}_queued"] = lane.size
+            stats[f"{prefix}_sent"] = lane.sent
+            stats[f"{prefix}_wait_time_total"] = lane.wait_time_total
+            stats[f"{prefix}_wait_time_max"] = lane.wait_time_max
+        return stats
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(size={self._size})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
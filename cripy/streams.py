@@ -0,0 +1,300 @@
+from asyncio import AbstractEventLoop, Future
+from collections import OrderedDict, deque
+from time import monotonic
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    Optional,
+    Sized,
+    TYPE_CHECKING,
+    Tuple,
+    Union,
+    cast,
+)
+
+from .errors import ClientError
+from .subscriptions import Where
+
+if TYPE_CHECKING:  # pragma: no cover
+    from cripy import ConnectionType, SessionType  # noqa: F401
+
+__all__ = ["CoalesceKey", "DEFAULT_STREAM_SIZE", "EventStream", "StreamPolicy"]
+
+#: The default maximum number of events an EventStream buffers
+DEFAULT_STREAM_SIZE: int = 1024
+
+#: Function returning the key events are coalesced by, called with the event, its params
+#: or a (method, params) tuple for wildcard patterns, like the fold of an EventReducer
+CoalesceKey = Callable[[Any], Hashable]
+#: The sole key of the events of a stream coalesced without a key function
+LATEST: str = "latest"
+
+
+class StreamPolicy:
+    """What an EventStream does with the events received while its buffer is full"""
+
+    #: Discard the oldest buffered event to make room
+    DropOldest: str = "drop_oldest"
+    #: Stop reading from the remote browser until the consumer catches up
+    Block: str = "block"
+    #: Replace the buffered event with the same key, see EventStream
+    Coalesce: str = "coalesce"
+
+    ALL: Tuple[str, ...] = (DropOldest, Block, Coalesce)
+
+
+class EventStream:
+    """An async iterator over the events received by a connection or session.
+
+    The events matching the pattern and filter, see Connection.subscribe, are buffered
+    until consumed, at most maxsize of them. Once the buffer is full the policy decides:
+        - drop_oldest: the oldest buffered event is discarded
+        - block: the connection stops reading from the remote browser until the
+          consumer takes an event, events already received are still buffered
+        - coalesce: events replace the buffered event with the same key, the params by default
+          reduce to the latest event. Coalescing applies whether the buffer is full or not,
+          events of a new key discard the oldest buffered event once it is full
+
+    The stream unsubscribes when closed: on leaving its async with block, by calling close
+    or once the connection or session disconnects and the buffered events were consumed.
+    """
+
+    __slots__ = [
+        "_by_key",
+        "_closed",
+        "_coalesce",
+        "_connection",
+        "_emitter",
+        "_ended",
+        "_events",
+        "_key",
+        "_loop",
+        "_remove",
+        "_space",
+        "_waiter",
+        "coalesced",
+        "delivered",
+        "dropped",
+        "full_waits",
+        "lag_max",
+        "lag_total",
+        "maxsize",
+        "pattern",
+        "peak",
+        "policy",
+        "received",
+    ]
+
+    def __init__(
+        self,
+        emitter: Union["ConnectionType", "SessionType"],
+        connection: "ConnectionType",
+        pattern: str,
+        maxsize: int = DEFAULT_STREAM_SIZE,
+        policy: str = StreamPolicy.DropOldest,
+        where: Optional[Where] = None,
+        key: Optional[CoalesceKey] = None,
+    ) -> None:
+        """Create a new EventStream
+
+        :param emitter: The connection or session whose events are streamed
+        :param connection: The connection at the root of the emitter, the one
+        that stops reading while a blocking stream is full
+        :param pattern: The method of the events, Domain.* or *
+        :param maxsize: The maximum number of buffered events
+        :param policy: What to do once the buffer is full, one of StreamPolicy.ALL
+        :param where: Optional filter of the events
+        :param key: Optional function returning the key events are coalesced by,
+        only used by the coalesce policy
+        """
+        if policy not in StreamPolicy.ALL:
+            raise ClientError(
+                f"Unsupported stream policy {policy!r}, expected one of {StreamPolicy.ALL}"
+            )
+        if maxsize < 1:
+            raise ClientError(
+                f"The maxsize of a stream must be positive, got {maxsize}"
+            )
+        self._emitter: Union["ConnectionType", "SessionType"] = emitter
+        self._connection: "ConnectionType" = connection
+        self._loop: AbstractEventLoop = emitter.loop
+        self.pattern: str = pattern
+        self.maxsize: int = maxsize
+        self.policy: str = policy
+        self._key: Optional[CoalesceKey] = key
+        self._coalesce: bool = policy == StreamPolicy.Coalesce
+        #: the buffered events and the time they were received, unless coalesced
+        self._events: Deque[Tuple[Any, float]] = deque()
+        #: coalesce key -> the buffered event and the time it was received
+        self._by_key: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._waiter: Optional[Future] = None
+        self._space: Optional[Future] = None
+        self._closed: bool = False
+        # the emitter disconnected, the stream ends once the buffer is consumed
+        self._ended: bool = False
+        self.received: int = 0
+        self.delivered: int = 0
+        self.dropped: int = 0
+        self.coalesced: int = 0
+        self.full_waits: int = 0
+        self.peak: int = 0
+        self.lag_total: float = 0.0
+        self.lag_max: float = 0.0
+        # subscribing with a listener returns the function removing the subscription
+        self._remove: Callable[[], None] = cast(
+            Callable[[], None], emitter.subscribe(pattern, self._push, where)
+        )
+        emitter.once(emitter.Events.Disconnected, self._on_disconnected)
+
+    @property
+    def closed(self) -> bool:
+        """Returns T/F indicating if the stream no longer receives events"""
+        return self._closed or self._ended
+
+    @property
+    def depth(self) -> int:
+        """Returns the number of buffered events"""
+        return len(self._by_key) if self._coalesce else len(self._events)
+
+    def close(self) -> None:
+        """Unsubscribes, ending the iteration. Buffered events are discarded"""
+        if self._closed:
+            return
+        self._closed = True
+        self._unsubscribe()
+        self._events.clear()
+        self._by_key.clear()
+        self._wake()
+        self._release()
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """Returns a snapshot of the counters of the stream. The lag of an event is
+        the time between its receipt and its consumption
+
+        :return: A dictionary of counter name to value
+        """
+        return {
+            "received": self.received,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "depth": self.depth,
+            "peak": self.peak,
+            "full_waits": self.full_waits,
+            "lag_max": self.lag_max,
+            "lag_mean": self.lag_total / self.delivered if self.delivered else 0.0,
+        }
+
+    def __aiter__(self) -> "EventStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        """Returns the next event, waiting for one if none is buffered. The event is
+        its params or, for wildcard patterns, its method and params
+
+        :return: The next event
+        """
+        buffer: Sized = self._by_key if self._coalesce else self._events
+        while not buffer:
+            if self._closed or self._ended:
+                raise StopAsyncIteration
+            self._waiter = self._loop.create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        if self._coalesce:
+            event, received_at = self._by_key.popitem(last=False)[1]
+        else:
+            event, received_at = self._events.popleft()
+        lag = monotonic() - received_at
+        self.lag_total += lag
+        if lag > self.lag_max:
+            self.lag_max = lag
+        self.delivered += 1
+        if self._space is not None and len(buffer) < self.maxsize:
+            self._release()
+        return event
+
+    async def wait_for_space(self) -> None:
+        """Resolves once the buffer is no longer full or the stream is closed.
+        Used by the connection to stop reading while a blocking stream is full"""
+        while not self._closed and self.depth >= self.maxsize:
+            if self._space is None:
+                self.full_waits += 1
+                self._space = self._loop.create_future()
+            await self._space
+
+    def _push(self, *args: Any) -> None:
+        """The listener of the subscription, buffers an event"""
+        event = args[0] if len(args) == 1 else args
+        self.received += 1
+        now = monotonic()
+        if self._coalesce:
+            by_key = self._by_key
+            key = LATEST if self._key is None else self._key(event)
+            if key in by_key:
+                # keep the receipt time of the replaced event,
+                # the consumer is that far behind
+                by_key[key] = (event, by_key[key][1])
+                self.coalesced += 1
+                self._wake()
+                return
+            if len(by_key) >= self.maxsize:
+                by_key.popitem(last=False)
+                self.dropped += 1
+            by_key[key] = (event, now)
+            depth = len(by_key)
+        else:
+            events = self._events
+            full = len(events) >= self.maxsize
+            if full and self.policy == StreamPolicy.DropOldest:
+                events.popleft()
+                self.dropped += 1
+            events.append((event, now))
+            if full and self.policy == StreamPolicy.Block:
+                self._connection._block_on(self)
+            depth = len(events)
+        if depth > self.peak:
+            self.peak = depth
+        self._wake()
+
+    def _on_disconnected(self, *args: Any) -> None:
+        self._ended = True
+        self._unsubscribe()
+        self._wake()
+        self._release()
+
+    def _unsubscribe(self) -> None:
+        self._remove()
+        self._emitter.remove_listener(
+            self._emitter.Events.Disconnected, self._on_disconnected
+        )
+
+    def _wake(self) -> None:
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def _release(self) -> None:
+        space, self._space = self._space, None
+        if space is not None and not space.done():
+            space.set_result(None)
+
+    async def __aenter__(self) -> "EventStream":
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(pattern={self.pattern}, "
+            f"policy={self.policy}, depth={self.depth})"
+        )
+
+    def __repr__(self) -> str:
+        return self.__str__()
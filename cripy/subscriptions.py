@@ -0,0 +1,618 @@
+from asyncio import AbstractEventLoop, Future, Handle, ensure_future
+from functools import partial
+from inspect import isawaitable
+from time import perf_counter
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    TYPE_CHECKING,
+    Tuple,
+    Union,
+)
+
+from pyee2 import EventEmitterS
+
+from .errors import ClientError, EventTimeoutError
+from .listeners import ListenerAccounting, _emit_error
+
+if TYPE_CHECKING:  # pragma: no cover
+    from cripy import SessionType  # noqa: F401
+
+__all__ = [
+    "DispatchTable",
+    "SessionEvent",
+    "Subscription",
+    "Waiter",
+    "Where",
+    "compile_where",
+    "is_wildcard",
+]
+
+#: A filter of events: a mapping of param name, dotted for nested params (e.g. response.status),
+#: to the expected value or a function applied to the params of the event
+Where = Union[Dict[str, Any], Callable[[Dict], bool]]
+#: Called with the params of an event, or with the method and params for wildcard subscriptions
+SubscriptionListener = Callable[..., Any]
+
+MISSING = object()
+
+
+def is_wildcard(pattern: str) -> bool:
+    """Returns T/F indicating if a subscription pattern matches the events of a
+    domain (e.g. Network.*) or every event (*) rather than a single event
+
+    :param pattern: The pattern
+    :return: T/F indicating if the pattern is a wildcard
+    """
+    return pattern == "*" or pattern.endswith(".*")
+
+
+def compile_test(expected: Any) -> Callable[[Any], bool]:
+    """Compiles the expected value of a param into a test of the value of the param.
+    Functions are applied to the value, compiled regular expressions are searched in
+    strings, the value of a set, frozenset, tuple or list must be one of its members
+    and other values must be equal
+
+    :param expected: The expected value
+    :return: The test
+    """
+    if isinstance(expected, Pattern):
+        search = expected.search
+        return lambda value: isinstance(value, str) and search(value) is not None
+    if isinstance(expected, (set, frozenset, tuple, list)):
+        members = expected
+        return lambda value: value in members
+    if callable(expected):
+        return expected
+    return lambda value: value == expected
+
+
+def is_index_value(expected: Any) -> bool:
+    """Returns T/F indicating if the expected value of a param is compared by equality
+    and can therefore be looked up by the value of the param
+
+    :param expected: The expected value
+    :return: T/F indicating if the expected value can be indexed
+    """
+    if isinstance(expected, (Pattern, set, frozenset, tuple, list)) or callable(
+        expected
+    ):
+        return False
+    try:
+        hash(expected)
+    except TypeError:
+        return False
+    return True
+
+
+def compile_where(where: Where) -> Callable[[Dict], bool]:
+    """Compiles a filter of events into a predicate of the params of an event,
+    once when subscribing rather than on every event
+
+    :param where: The filter, see Where
+    :return: The predicate
+    """
+    if callable(where):
+        return where
+    if not isinstance(where, dict) or not where:
+        raise ClientError(
+            f"Unsupported event filter {where!r}, expected a non-empty dict or a function"
+        )
+    tests: List[Tuple[Tuple[str, ...], Callable[[Any], bool]]] = [
+        (tuple(name.split(".")), compile_test(expected))
+        for name, expected in where.items()
+    ]
+    if len(tests) == 1 and len(tests[0][0]) == 1:
+        (key,), test = tests[0]
+
+        def single_key_predicate(params: Dict) -> bool:
+            value = params.get(key, MISSING) if params else MISSING
+            return value is not MISSING and test(value)
+
+        return single_key_predicate
+
+    def predicate(params: Dict) -> bool:
+        for path, test in tests:
+            value = params
+            for key in path:
+                if not isinstance(value, dict):
+                    return False
+                value = value.get(key, MISSING)
+                if value is MISSING:
+                    return False
+            if not test(value):
+                return False
+        return True
+
+    return predicate
+
+
+class SessionEvent:
+    """An event received by one of the sessions of a connection, as delivered
+    to the connection wide subscriptions to the events of every session"""
+
+    __slots__ = ["method", "params", "session"]
+
+    def __init__(self, session: "SessionType", method: str, params: Any) -> None:
+        """Create a new SessionEvent
+
+        :param session: The session that received the event
+        :param method: The method of the event
+        :param params: The params of the event
+        """
+        self.session: "SessionType" = session
+        self.method: str = method
+        self.params: Any = params
+
+    @property
+    def session_id(self) -> str:
+        """Returns the id of the session that received the event"""
+        return self.session.session_id
+
+    @property
+    def target_type(self) -> str:
+        """Returns the type of the target of the session that received the event"""
+        return self.session.target_type
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(method={self.method}, "
+            f"sessionId={self.session.session_id}, target={self.session.target_type})"
+        )
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class Subscription:
+    """A listener of the events matching a pattern and, optionally, a filter"""
+
+    __slots__ = ["listener", "once", "pattern", "predicate", "target_types", "wildcard"]
+
+    def __init__(
+        self,
+        pattern: str,
+        listener: SubscriptionListener,
+        where: Optional[Where] = None,
+        once: bool = False,
+        target_types: Optional[Iterable[str]] = None,
+    ) -> None:
+        """Create a new Subscription
+
+        :param pattern: The method of the events (e.g. Network.responseReceived), Domain.* for
+        every event of a domain or * for every event
+        :param listener: The listener, called with the params of the events or, for
+        wildcard patterns, with their method and params. Subscriptions to the events of
+        every session are called with a SessionEvent instead
+        :param where: Optional filter of the events
+        :param once: Should the subscription be removed after its first event
+        :param target_types: Optional types of the targets (e.g. page) whose sessions events are
+        delivered, only used by the subscriptions to the events of every session
+        """
+        self.pattern: str = pattern
+        self.listener: SubscriptionListener = listener
+        self.predicate: Optional[Callable[[Dict], bool]] = (
+            compile_where(where) if where is not None else None
+        )
+        self.once: bool = once
+        self.wildcard: bool = is_wildcard(pattern)
+        self.target_types: Optional[FrozenSet[str]] = (
+            frozenset(target_types) if target_types is not None else None
+        )
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(pattern={self.pattern}, once={self.once})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class Waiter:
+    """A future waiting for the first event of a method matching a predicate"""
+
+    __slots__ = ["future", "handle", "index_key", "method", "predicate"]
+
+    def __init__(
+        self,
+        method: str,
+        future: Future,
+        predicate: Optional[Callable[[Dict], bool]] = None,
+        index_key: Optional[Tuple[str, Hashable]] = None,
+    ) -> None:
+        """Create a new Waiter
+
+        :param method: The method of the event waited for
+        :param future: The future resolved with the params of the event
+        :param predicate: Optional predicate of the params the event must match
+        :param index_key: Optional name and value of the param the waiter is indexed by,
+        the event must have that value in addition to matching the predicate
+        """
+        self.method: str = method
+        self.future: Future = future
+        self.predicate: Optional[Callable[[Dict], bool]] = predicate
+        self.index_key: Optional[Tuple[str, Hashable]] = index_key
+        self.handle: Optional[Handle] = None
+
+    def resolve(self, params: Any) -> None:
+        """Resolves the future with the params of the event if they match the predicate.
+        Exceptions raised by the predicate fail the future
+
+        :param params: The params of the event
+        """
+        future = self.future
+        if future.done():
+            return
+        try:
+            if self.predicate is None or self.predicate(params):
+                future.set_result(params)
+        except Exception as e:
+            future.set_exception(e)
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(method={self.method}, index_key={self.index_key})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class MethodWaiters:
+    """The waiters of an event method, indexed by the value of a param when their filter
+    requires one (e.g. {"requestId": ...}) so that an event only reaches the waiters it can
+    resolve rather than every waiter of its method"""
+
+    __slots__ = ["indexed", "others"]
+
+    def __init__(self) -> None:
+        #: param name -> value -> waiters, dicts are used as ordered sets
+        self.indexed: Dict[str, Dict[Hashable, Dict[Waiter, None]]] = {}
+        #: the waiters not indexed by a param
+        self.others: Dict[Waiter, None] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.indexed) or bool(self.others)
+
+    def __len__(self) -> int:
+        return len(self.others) + sum(
+            len(waiters)
+            for by_value in self.indexed.values()
+            for waiters in by_value.values()
+        )
+
+    def __iter__(self) -> Iterator[Waiter]:
+        yield from self.others
+        for by_value in self.indexed.values():
+            for waiters in by_value.values():
+                yield from waiters
+
+    def add(self, waiter: Waiter) -> None:
+        """Adds a waiter
+
+        :param waiter: The waiter
+        """
+        if waiter.index_key is None:
+            self.others[waiter] = None
+            return
+        name, value = waiter.index_key
+        self.indexed.setdefault(name, {}).setdefault(value, {})[waiter] = None
+
+    def remove(self, waiter: Waiter) -> None:
+        """Removes a waiter, if it was not already
+
+        :param waiter: The waiter
+        """
+        if waiter.index_key is None:
+            self.others.pop(waiter, None)
+            return
+        name, value = waiter.index_key
+        by_value = self.indexed.get(name)
+        if by_value is None:
+            return
+        waiters = by_value.get(value)
+        if waiters is None:
+            return
+        waiters.pop(waiter, None)
+        if not waiters:
+            del by_value[value]
+            if not by_value:
+                del self.indexed[name]
+
+    def resolve(self, params: Any) -> None:
+        """Resolves the waiters the params of an event match
+
+        :param params: The params of the event
+        """
+        if self.indexed and isinstance(params, dict):
+            for name, by_value in list(self.indexed.items()):
+                value = params.get(name, MISSING)
+                if value is MISSING:
+                    continue
+                try:
+                    waiters = by_value.get(value)
+                except TypeError:  # unhashable value, no waiter expects it
+                    continue
+                if waiters:
+                    for waiter in list(waiters):
+                        waiter.resolve(params)
+        if self.others:
+            for waiter in list(self.others):
+                waiter.resolve(params)
+
+
+class DispatchTable:
+    """The subscriptions of a connection or session, indexed by event method and domain.
+
+    Used by the connection to decide if an event is observed before decoding it and to
+    deliver the events to the subscriptions whose filters they match, evaluating
+    the filters before any listener runs
+    """
+
+    __slots__ = ["_all", "_domains", "_methods", "_waiters"]
+
+    def __init__(self) -> None:
+        #: method -> its subscriptions
+        self._methods: Dict[str, Tuple[Subscription, ...]] = {}
+        #: domain -> the subscriptions to all of its events
+        self._domains: Dict[str, Tuple[Subscription, ...]] = {}
+        #: the subscriptions to every event
+        self._all: Tuple[Subscription, ...] = ()
+        #: method -> the futures waiting for it
+        self._waiters: Dict[str, MethodWaiters] = {}
+
+    def __len__(self) -> int:
+        return (
+            sum(len(subs) for subs in self._methods.values())
+            + sum(len(subs) for subs in self._domains.values())
+            + len(self._all)
+            + sum(len(waiters) for waiters in self._waiters.values())
+        )
+
+    def add(self, subscription: Subscription) -> Subscription:
+        """Adds a subscription
+
+        :param subscription: The subscription
+        :return: The subscription
+        """
+        pattern = subscription.pattern
+        if pattern == "*":
+            self._all += (subscription,)
+        elif subscription.wildcard:
+            domain = pattern[:-2]
+            self._domains[domain] = self._domains.get(domain, ()) + (subscription,)
+        else:
+            self._methods[pattern] = self._methods.get(pattern, ()) + (subscription,)
+        return subscription
+
+    def remove(self, subscription: Subscription) -> None:
+        """Removes a subscription, if it was not already
+
+        :param subscription: The subscription
+        """
+        pattern = subscription.pattern
+        if pattern == "*":
+            self._all = tuple(s for s in self._all if s is not subscription)
+            return
+        if subscription.wildcard:
+            index, key = self._domains, pattern[:-2]
+        else:
+            index, key = self._methods, pattern
+        remaining = tuple(s for s in index.get(key, ()) if s is not subscription)
+        if remaining:
+            index[key] = remaining
+        else:
+            index.pop(key, None)
+
+    def clear(self) -> None:
+        """Removes every subscription"""
+        self._methods.clear()
+        self._domains.clear()
+        self._all = ()
+        waiters = [waiter for method in self._waiters.values() for waiter in method]
+        self._waiters.clear()
+        for waiter in waiters:
+            waiter.future.cancel()
+
+    def wants(self, method: str) -> bool:
+        """Returns T/F indicating if a subscription matches the method of an event
+
+        :param method: The method of the event
+        :return: T/F indicating if the event is subscribed to
+        """
+        if method in self._methods or method in self._waiters or self._all:
+            return True
+        return bool(self._domains) and method[: method.find(".")] in self._domains
+
+    def matching(self, method: str) -> Tuple[Subscription, ...]:
+        """Returns the subscriptions matching the method of an event, the subscriptions
+        to the method first followed by those to its domain and to every event
+
+        :param method: The method of the event
+        :return: The matching subscriptions
+        """
+        subscriptions = self._methods.get(method, ())
+        if self._domains:
+            subscriptions += self._domains.get(method[: method.find(".")], ())
+        if self._all:
+            subscriptions += self._all
+        return subscriptions
+
+    def dispatch(
+        self,
+        emitter: EventEmitterS,
+        method: str,
+        params: Any,
+        accounting: Optional[ListenerAccounting] = None,
+        session: Optional["SessionType"] = None,
+    ) -> bool:
+        """Delivers an event to the subscriptions matching its method whose filters
+        it matches. Behaves like the emit of the emitter: exceptions raised by listeners
+        or filters are emitted as error events if someone is listening for them and
+        the awaitables returned by listeners are scheduled
+
+        :param emitter: The connection or session that received the event
+        :param method: The method of the event
+        :param params: The params of the event
+        :param accounting: Optional listener accounting the listeners are timed by
+        :param session: The session that received the event when dispatching to the
+        connection wide subscriptions to the events of every session, their listeners
+        are called with a SessionEvent
+        :return: T/F indicating if a subscription matched the event
+        """
+        waiters = self._waiters.get(method)
+        if waiters is not None:
+            waiters.resolve(params)
+        subscriptions = self.matching(method)
+        if not subscriptions:
+            return waiters is not None
+        session_event = None
+        for subscription in subscriptions:
+            predicate = subscription.predicate
+            listener = subscription.listener
+            start = perf_counter()
+            try:
+                if session is not None:
+                    target_types = subscription.target_types
+                    if (
+                        target_types is not None
+                        and session.target_type not in target_types
+                    ):
+                        continue
+                if predicate is not None and not predicate(params):
+                    continue
+                if session is not None and session_event is None:
+                    session_event = SessionEvent(session, method, params)
+                if subscription.once:
+                    self.remove(subscription)
+                if session_event is not None:
+                    result = listener(session_event)
+                elif subscription.wildcard:
+                    result = listener(method, params)
+                else:
+                    result = listener(params)
+                if isawaitable(result):
+                    future = ensure_future(result, loop=emitter._loop)
+                    if emitter.has_listeners("error"):
+                        future.add_done_callback(partial(_emit_error, emitter))
+            except Exception as e:
+                if emitter.has_listeners("error"):
+                    emitter.emit("error", e)
+            if accounting is not None:
+                accounting.account(method, listener, perf_counter() - start)
+        return True
+
+    def subscribe(
+        self,
+        loop: AbstractEventLoop,
+        pattern: str,
+        listener: Optional[SubscriptionListener] = None,
+        where: Optional[Where] = None,
+        once: bool = False,
+    ) -> Union[Callable[[], None], Future]:
+        """Subscribes to the events matching the pattern and filter
+
+        :param loop: The event loop futures are created with
+        :param pattern: The method of the events, Domain.* or *
+        :param listener: Optional listener, if None the first matching event resolves
+        the returned future
+        :param where: Optional filter of the events
+        :param once: Should the listener be removed after its first event
+        :return: A function removing the subscription if a listener was supplied,
+        otherwise a future resolving with the params of the event, or its method
+        and params for wildcard patterns
+        """
+        if listener is None and not is_wildcard(pattern):
+            return self.wait(loop, pattern, where)
+        if listener is None:
+            future = loop.create_future()
+
+            def resolve(*args: Any) -> None:
+                if not future.done():
+                    future.set_result(args if len(args) > 1 else args[0])
+
+            subscription = self.add(Subscription(pattern, resolve, where, True))
+            future.add_done_callback(lambda f: self.remove(subscription))
+            return future
+        subscription = self.add(Subscription(pattern, listener, where, once))
+        return lambda: self.remove(subscription)
+
+    def wait(
+        self,
+        loop: AbstractEventLoop,
+        method: str,
+        where: Optional[Where] = None,
+        timeout: Optional[float] = None,
+    ) -> Future:
+        """Returns a future resolving with the params of the first event of the method
+        matching the filter. The waiter is removed once the future is done, including
+        when it is cancelled or times out.
+
+        Waiters whose filter requires a param to equal a value are indexed by that value,
+        an event is only checked against the waiters of the value of its param
+
+        :param loop: The event loop the future is created with
+        :param method: The method of the event
+        :param where: Optional filter of the event
+        :param timeout: Optional number of seconds after which the future fails
+        with EventTimeoutError
+        :return: The future
+        """
+        if is_wildcard(method):
+            raise ClientError(
+                f"Waiting for {method} requires the method of an event, "
+                "use subscribe for patterns"
+            )
+        index_key = None
+        predicate = None
+        if where is not None:
+            if isinstance(where, dict) and where:
+                rest = dict(where)
+                for name, expected in where.items():
+                    if "." not in name and is_index_value(expected):
+                        index_key = (name, rest.pop(name))
+                        break
+                if rest:
+                    predicate = compile_where(rest)
+            else:
+                predicate = compile_where(where)
+        future = loop.create_future()
+        waiter = Waiter(method, future, predicate, index_key)
+        waiters = self._waiters.get(method)
+        if waiters is None:
+            waiters = self._waiters[method] = MethodWaiters()
+        waiters.add(waiter)
+        if timeout is not None:
+            waiter.handle = loop.call_later(timeout, self._expire, waiter, timeout)
+        future.add_done_callback(lambda f: self._remove_waiter(waiter))
+        return future
+
+    def _remove_waiter(self, waiter: Waiter) -> None:
+        if waiter.handle is not None:
+            waiter.handle.cancel()
+            waiter.handle = None
+        waiters = self._waiters.get(waiter.method)
+        if waiters is not None:
+            waiters.remove(waiter)
+            if not waiters:
+                del self._waiters[waiter.method]
+
+    @staticmethod
+    def _expire(waiter: Waiter, timeout: float) -> None:
+        if not waiter.future.done():
+            waiter.future.set_exception(
+                EventTimeoutError(
+                    f"Timed out waiting for {waiter.method} after {timeout} seconds"
+                )
+            )
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(subscriptions={len(self)})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -0,0 +1,661 @@
+import os
+import struct
+import zlib
+from asyncio import (
+    AbstractEventLoop,
+    BaseTransport,
+    Future,
+    Protocol,
+    Transport as SocketTransport,
+)
+from base64 import b64encode
+from collections import deque
+from hashlib import sha1
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Coroutine,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Type,
+    Union,
+    cast,
+)
+from urllib.parse import urlparse
+
+from aiohttp import ClientSession, WSMsgType
+from websockets import WebSocketClientProtocol, connect
+
+from .compression import CompressionStats, Deflate, DeflateMessages
+from .errors import ClientError, NetworkError, TransportError
+
+try:
+    from websockets.speedups import apply_mask
+except ImportError:  # pragma: no cover
+    from websockets.utils import apply_mask
+
+__all__ = [
+    "AiohttpTransport",
+    "RawWebSocketTransport",
+    "Transport",
+    "TransportArg",
+    "WebSocketsTransport",
+    "available_transports",
+    "get_transport",
+]
+
+#: The default maximum number of received messages buffered before reading is paused
+DEFAULT_MAX_QUEUE: int = 2 ** 7
+
+
+class Transport:
+    """Base class of the transports used by a connection to exchange messages
+    with the remote browser.
+
+    Transports raise a ConnectionError (or websockets.ConnectionClosed) from
+    send and recv once the connection is closed, or a TransportError once it
+    failed and can not be used anymore.
+    """
+
+    __slots__: List[str] = []
+
+    #: The name used to select a websocket transport, see get_transport
+    name: ClassVar[str] = ""
+
+    @classmethod
+    async def connect(
+        cls,
+        url: str,
+        loop: AbstractEventLoop,
+        max_size: Optional[int] = None,
+        max_queue: Optional[int] = DEFAULT_MAX_QUEUE,
+        compression: Optional[Deflate] = None,
+    ) -> "Transport":
+        """Connects to the remote websocket endpoint
+
+        :param url: The websocket URL to connect to
+        :param loop: The event loop to use
+        :param max_size: Optional maximum size of a received message in bytes.
+        Defaults to no maximum
+        :param max_queue: Optional maximum number of received messages buffered before
+        reading from the socket is paused. None for no maximum
+        :param compression: Optional permessage-deflate options, offered to the remote end
+        :return: The connected transport
+        """
+        raise NotImplementedError  # pragma: no cover
+
+    @property
+    def closed(self) -> bool:
+        """Returns T/F indicating if the transport is closed"""
+        raise NotImplementedError  # pragma: no cover
+
+    @property
+    def compression_stats(self) -> Optional[CompressionStats]:
+        """Returns the compression stats of the transport if compression was negotiated"""
+        return None
+
+    async def recv(self) -> Union[str, bytes]:
+        """Receives the next message
+
+        :return: The JSON text of the message
+        """
+        raise NotImplementedError  # pragma: no cover
+
+    async def send(self, data: Union[str, bytes]) -> None:
+        """Sends a message
+
+        :param data: The JSON text of the message
+        """
+        raise NotImplementedError  # pragma: no cover
+
+    async def close(self) -> None:
+        """Closes the transport"""
+        raise NotImplementedError  # pragma: no cover
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(closed={self.closed})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class WebSocketsTransport(Transport):
+    """Websocket transport using the websockets library. Received messages are str"""
+
+    __slots__ = ["_compression_stats", "_ws", "_ws_recv", "_ws_send"]
+
+    name: ClassVar[str] = "websockets"
+
+    def __init__(
+        self,
+        ws: WebSocketClientProtocol,
+        compression_stats: Optional[CompressionStats] = None,
+    ) -> None:
+        """Create a new WebSocketsTransport
+
+        :param ws: The connected websocket
+        :param compression_stats: The stats counted by the compression extension if
+        it was offered
+        """
+        self._ws: WebSocketClientProtocol = ws
+        self._compression_stats: Optional[CompressionStats] = compression_stats
+        self._ws_recv: Callable[[], Coroutine[Any, Any, Union[str, bytes]]] = ws.recv
+        self._ws_send: Callable[
+            [Union[str, bytes]], Coroutine[Any, Any, None]
+        ] = ws.send
+
+    @classmethod
+    async def connect(
+        cls,
+        url: str,
+        loop: AbstractEventLoop,
+        max_size: Optional[int] = None,
+        max_queue: Optional[int] = DEFAULT_MAX_QUEUE,
+        compression: Optional[Deflate] = None,
+    ) -> "WebSocketsTransport":
+        stats = extensions = None
+        if compression is not None:
+            stats = CompressionStats()
+            extensions = [compression.websockets_extension(stats)]
+        ws = await connect(
+            url,
+            ping_interval=None,  # chrome no ping pong and websockets closes down on no pong :'(
+            ping_timeout=None,
+            max_size=max_size,
+            compression=None,
+            extensions=extensions,
+            max_queue=max_queue,
+            loop=loop,
+        )
+        return cls(ws, stats if ws.extensions else None)
+
+    @property
+    def closed(self) -> bool:
+        return self._ws.closed
+
+    @property
+    def compression_stats(self) -> Optional[CompressionStats]:
+        return self._compression_stats
+
+    # recv and send return the coroutines of the websockets bound methods,
+    # saving a coroutine per message
+    def recv(self) -> Coroutine[Any, Any, Union[str, bytes]]:
+        return self._ws_recv()
+
+    def send(self, data: Union[str, bytes]) -> Coroutine[Any, Any, None]:
+        return self._ws_send(data)
+
+    async def close(self) -> None:
+        await self._ws.close()
+
+
+class AiohttpTransport(Transport):
+    """Websocket transport using aiohttp. Received messages are str.
+
+    The number of received messages buffered is bounded by aiohttp and max_queue is not used.
+    Compression is not supported, aiohttp neither exposes the compression level nor the size
+    of the compressed messages.
+    """
+
+    __slots__ = ["_session", "_ws"]
+
+    name: ClassVar[str] = "aiohttp"
+
+    def __init__(self, session: ClientSession, ws: Any) -> None:
+        """Create a new AiohttpTransport
+
+        :param session: The session owning the websocket, closed with the transport
+        :param ws: The connected aiohttp.ClientWebSocketResponse
+        """
+        self._session: ClientSession = session
+        self._ws: Any = ws
+
+    @classmethod
+    async def connect(
+        cls,
+        url: str,
+        loop: AbstractEventLoop,
+        max_size: Optional[int] = None,
+        max_queue: Optional[int] = DEFAULT_MAX_QUEUE,
+        compression: Optional[Deflate] = None,
+    ) -> "AiohttpTransport":
+        if compression is not None:
+            raise ClientError(
+                "The aiohttp transport does not support compression, "
+                "use the websockets or raw transport"
+            )
+        session = ClientSession(loop=loop)
+        try:
+            ws = await session.ws_connect(
+                url,
+                autoping=True,
+                heartbeat=None,
+                compress=0,
+                max_msg_size=max_size or 0,
+            )
+        except Exception:
+            await session.close()
+            raise
+        return cls(session, ws)
+
+    @property
+    def closed(self) -> bool:
+        # the session must be closed even if the websocket was closed by the remote end
+        return self._ws.closed and self._session.closed
+
+    async def recv(self) -> Union[str, bytes]:
+        msg = await self._ws.receive()
+        if msg.type is WSMsgType.TEXT or msg.type is WSMsgType.BINARY:
+            return msg.data
+        if msg.type is WSMsgType.ERROR:
+            raise TransportError(f"Websocket error: {msg.data}")
+        raise ConnectionResetError("The websocket connection was closed")
+
+    async def send(self, data: Union[str, bytes]) -> None:
+        if self._ws.closed:
+            raise ConnectionResetError("The websocket connection is closed")
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        await self._ws.send_str(data)
+
+    async def close(self) -> None:
+        try:
+            await self._ws.close()
+        finally:
+            await self._session.close()
+
+
+#: https://tools.ietf.org/html/rfc6455#section-1.3
+WS_GUID: bytes = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_CONTINUATION: int = 0x0
+OP_TEXT: int = 0x1
+OP_BINARY: int = 0x2
+OP_CLOSE: int = 0x8
+OP_PING: int = 0x9
+OP_PONG: int = 0xA
+FIN: int = 0x80
+RSV1: int = 0x40
+CLOSE_NORMAL: bytes = struct.pack("!H", 1000)
+CLOSE_PROTOCOL_ERROR: bytes = struct.pack("!H", 1002)
+CLOSE_TOO_BIG: bytes = struct.pack("!H", 1009)
+
+
+class RawWebSocketTransport(Transport, Protocol):
+    """Minimal websocket client transport (RFC 6455) that returns the payloads of
+    received frames as bytes, without decoding them, so that they are handed
+    straight to the codec.
+
+    Received messages are buffered until read, reading from the socket is paused
+    while max_queue messages are buffered. permessage-deflate is the only extension supported.
+    """
+
+    __slots__ = [
+        "_buffer",
+        "_closed",
+        "_compressed",
+        "_compression",
+        "_deflate",
+        "_drain_waiter",
+        "_fragments",
+        "_fragments_size",
+        "_handshake",
+        "_loop",
+        "_max_queue",
+        "_max_size",
+        "_messages",
+        "_paused",
+        "_transport",
+        "_waiter",
+    ]
+
+    name: ClassVar[str] = "raw"
+
+    def __init__(
+        self,
+        loop: AbstractEventLoop,
+        max_size: Optional[int] = None,
+        max_queue: Optional[int] = DEFAULT_MAX_QUEUE,
+        compression: Optional[Deflate] = None,
+    ) -> None:
+        """Create a new RawWebSocketTransport. Use RawWebSocketTransport.connect to
+        create a connected one
+
+        :param loop: The event loop to use
+        :param max_size: Optional maximum size of a received message in bytes.
+        Defaults to no maximum
+        :param max_queue: Optional maximum number of received messages buffered before
+        reading from the socket is paused. None for no maximum
+        :param compression: Optional permessage-deflate options, offered during the handshake
+        """
+        self._loop: AbstractEventLoop = loop
+        self._max_size: Optional[int] = max_size
+        self._max_queue: Optional[int] = max_queue
+        # set once connected, see connection_made
+        self._transport: SocketTransport
+        self._buffer: bytearray = bytearray()
+        self._fragments: List[bytes] = []
+        #: the number of bytes of the fragments of the message being received
+        self._fragments_size: int = 0
+        self._messages: Deque[bytes] = deque()
+        self._waiter: Optional[Future] = None
+        self._drain_waiter: Optional[Future] = None
+        #: resolved with the head of the HTTP response once it is received, the bytes
+        #: following it stay buffered until the handshake is validated
+        self._handshake: Optional[Future] = loop.create_future()
+        self._paused: bool = False
+        self._closed: bool = False
+        self._compression: Optional[Deflate] = compression
+        #: the compressor of the messages, if compression was negotiated
+        self._deflate: Optional[DeflateMessages] = None
+        #: is the message being received compressed
+        self._compressed: int = 0
+
+    @classmethod
+    async def connect(
+        cls,
+        url: str,
+        loop: AbstractEventLoop,
+        max_size: Optional[int] = None,
+        max_queue: Optional[int] = DEFAULT_MAX_QUEUE,
+        compression: Optional[Deflate] = None,
+    ) -> "RawWebSocketTransport":
+        parsed = urlparse(url)
+        if parsed.scheme not in ("ws", "wss") or not parsed.hostname:
+            raise ClientError(f"The supplied URL was not a WS url: url = {url}")
+        secure = parsed.scheme == "wss"
+        port = parsed.port or (443 if secure else 80)
+        _, self = await loop.create_connection(
+            lambda: cls(loop, max_size, max_queue, compression),
+            parsed.hostname,
+            port,
+            ssl=secure or None,
+        )
+        resource = parsed.path or "/"
+        if parsed.query:
+            resource += f"?{parsed.query}"
+        await self._do_handshake(parsed.netloc, resource)
+        return self
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def compression_stats(self) -> Optional[CompressionStats]:
+        return self._deflate.stats if self._deflate is not None else None
+
+    async def recv(self) -> bytes:
+        messages = self._messages
+        while not messages:
+            if self._closed:
+                raise ConnectionResetError("The websocket connection was closed")
+            self._waiter = self._loop.create_future()
+            await self._waiter
+        if self._paused and len(messages) <= self._max_queue:
+            self._paused = False
+            self._transport.resume_reading()
+        return messages.popleft()
+
+    async def send(self, data: Union[str, bytes]) -> None:
+        if self._closed:
+            raise ConnectionResetError("The websocket connection is closed")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        # Chrome only accepts text frames
+        if self._deflate is not None:
+            self._write_frame(OP_TEXT, self._deflate.compress(data), RSV1)
+        else:
+            self._write_frame(OP_TEXT, data)
+        if self._drain_waiter is not None:
+            await self._drain_waiter
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._write_frame(OP_CLOSE, CLOSE_NORMAL)
+        self._transport.close()
+        self._set_closed()
+
+    async def _do_handshake(self, host: str, resource: str) -> None:
+        """Performs the opening handshake
+
+        :param host: The value of the Host header
+        :param resource: The path and query of the websocket endpoint
+        """
+        key = b64encode(os.urandom(16))
+        offer = b""
+        if self._compression is not None:
+            offer = b"Sec-WebSocket-Extensions: %s\r\n" % (
+                self._compression.offer().encode("ascii")
+            )
+        self._transport.write(
+            b"GET %s HTTP/1.1\r\nHost: %s\r\nUpgrade: websocket\r\n"
+            b"Connection: Upgrade\r\nSec-WebSocket-Key: %s\r\n"
+            b"Sec-WebSocket-Version: 13\r\n%s\r\n"
+            % (resource.encode("utf-8"), host.encode("utf-8"), key, offer)
+        )
+        head = await self._handshake
+        lines = head.decode("latin-1").split("\r\n")
+        headers: Dict[str, str] = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        accept = b64encode(sha1(key + WS_GUID).digest()).decode("ascii")
+        if (
+            lines[0].split(" ", 2)[1:2] != ["101"]
+            or headers.get("sec-websocket-accept") != accept
+        ):
+            self._transport.close()
+            raise NetworkError(f"Websocket handshake failed: {lines[0]}")
+        extensions = headers.get("sec-websocket-extensions")
+        if extensions:
+            if self._compression is None:
+                self._transport.close()
+                raise NetworkError(f"Unexpected websocket extensions {extensions}")
+            self._deflate = self._compression.accept(extensions)
+        self._handshake = None
+        # frames received with or since the response were buffered
+        if self._buffer:
+            self._read_frames()
+
+    def _write_frame(self, opcode: int, payload: bytes, rsv1: int = 0) -> None:
+        """Writes a masked frame
+
+        :param opcode: The opcode of the frame
+        :param payload: The unmasked payload of the frame
+        :param rsv1: The RSV1 bit, set on compressed messages
+        """
+        first = 0x80 | rsv1 | opcode
+        length = len(payload)
+        if length < 126:
+            header = struct.pack("!BB", first, 0x80 | length)
+        elif length < 65536:
+            header = struct.pack("!BBH", first, 0xFE, length)
+        else:
+            header = struct.pack("!BBQ", first, 0xFF, length)
+        mask = os.urandom(4)
+        self._transport.writelines((header, mask, apply_mask(payload, mask)))
+
+    def _on_frame(self, first: int, payload: bytes) -> None:
+        """Handles a received frame
+
+        :param first: The first byte of the frame (FIN, RSV1-3 and the opcode)
+        :param payload: The payload of the frame
+        """
+        opcode = first & 0x0F
+        if opcode == OP_TEXT or opcode == OP_BINARY or opcode == OP_CONTINUATION:
+            if opcode != OP_CONTINUATION:
+                self._compressed = first & RSV1
+            fragments = self._fragments
+            if fragments or not first & FIN:
+                self._fragments_size += len(payload)
+                if self._max_size is not None and self._fragments_size > self._max_size:
+                    fragments.clear()
+                    self._fragments_size = 0
+                    self._fail(CLOSE_TOO_BIG)
+                    return
+                fragments.append(payload)
+                if not first & FIN:
+                    return
+                payload = b"".join(fragments)
+                fragments.clear()
+                self._fragments_size = 0
+            if self._compressed:
+                if self._deflate is None:
+                    self._fail(CLOSE_PROTOCOL_ERROR)
+                    return
+                try:
+                    payload = self._deflate.decompress(payload, self._max_size)
+                except ValueError:
+                    self._fail(CLOSE_TOO_BIG)
+                    return
+                except zlib.error:
+                    self._fail(CLOSE_PROTOCOL_ERROR)
+                    return
+            elif self._deflate is not None:
+                self._deflate.stats.received(len(payload), len(payload))
+            messages = self._messages
+            messages.append(payload)
+            waiter = self._waiter
+            if waiter is not None:
+                self._waiter = None
+                if not waiter.done():
+                    waiter.set_result(None)
+            max_queue = self._max_queue
+            if max_queue is not None and len(messages) > max_queue and not self._paused:
+                self._paused = True
+                self._transport.pause_reading()
+        elif opcode == OP_PING:
+            self._write_frame(OP_PONG, payload)
+        elif opcode == OP_CLOSE:
+            if not self._closed:
+                self._write_frame(OP_CLOSE, payload[:2])
+            self._transport.close()
+
+    def _fail(self, code: bytes) -> None:
+        """Closes the connection because of an error
+
+        :param code: The close code
+        """
+        self._write_frame(OP_CLOSE, code)
+        self._transport.close()
+
+    def connection_made(self, transport: BaseTransport) -> None:
+        self._transport = cast(SocketTransport, transport)
+
+    def data_received(self, data: bytes) -> None:
+        buffer = self._buffer
+        buffer += data
+        handshake = self._handshake
+        if handshake is not None:
+            if not handshake.done():
+                end = buffer.find(b"\r\n\r\n")
+                if end != -1:
+                    handshake.set_result(bytes(buffer[:end]))
+                    del buffer[: end + 4]
+            return
+        self._read_frames()
+
+    def _read_frames(self) -> None:
+        """Handles the complete frames in the receive buffer"""
+        buffer = self._buffer
+        size = len(buffer)
+        pos = 0
+        max_size = self._max_size
+        closing = self._transport.is_closing
+        while size - pos >= 2 and not closing():
+            first = buffer[pos]
+            length = buffer[pos + 1] & 0x7F
+            start = pos + 2
+            if length == 126:
+                if size - pos < 4:
+                    break
+                length = int.from_bytes(buffer[start : start + 2], "big")
+                start += 2
+            elif length == 127:
+                if size - pos < 10:
+                    break
+                length = int.from_bytes(buffer[start : start + 8], "big")
+                start += 8
+            if max_size is not None and length > max_size:
+                self._fail(CLOSE_TOO_BIG)
+                buffer.clear()
+                return
+            end = start + length
+            if end > size:
+                break
+            self._on_frame(first, bytes(buffer[start:end]))
+            pos = end
+        if pos:
+            del buffer[:pos]
+
+    def eof_received(self) -> None:
+        self._transport.close()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        handshake = self._handshake
+        if handshake is not None and not handshake.done():
+            handshake.set_exception(
+                ConnectionResetError("The connection was closed during the handshake")
+            )
+        self._set_closed()
+        if self._drain_waiter is not None and not self._drain_waiter.done():
+            self._drain_waiter.set_result(None)
+
+    def pause_writing(self) -> None:
+        self._drain_waiter = self._loop.create_future()
+
+    def resume_writing(self) -> None:
+        waiter = self._drain_waiter
+        self._drain_waiter = None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def _set_closed(self) -> None:
+        """Marks the transport as closed, waking up the task waiting for a message"""
+        self._closed = True
+        waiter = self._waiter
+        if waiter is not None:
+            self._waiter = None
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+_transport_classes: Dict[str, Type[Transport]] = {
+    WebSocketsTransport.name: WebSocketsTransport,
+    AiohttpTransport.name: AiohttpTransport,
+    RawWebSocketTransport.name: RawWebSocketTransport,
+}
+
+TransportArg = Union[None, str, Type[Transport]]
+
+
+def available_transports() -> Dict[str, Type[Transport]]:
+    """Returns the websocket transports that can be used to connect
+
+    :return: A dictionary of transport name to transport class
+    """
+    return dict(_transport_classes)
+
+
+def get_transport(transport: TransportArg = None) -> Type[Transport]:
+    """Resolves the supplied transport argument to a transport class
+
+    :param transport: Either a transport class, the name of a transport or None for
+    the default (websockets) transport
+    :return: The transport class
+    """
+    if transport is None:
+        return WebSocketsTransport
+    if isinstance(transport, type) and issubclass(transport, Transport):
+        return transport
+    clazz = _transport_classes.get(transport)
+    if clazz is None:
+        raise ClientError(
+            f"The {transport} transport is not available, "
+            f"choose one of {list(_transport_classes)}"
+        )
+    return clazz
@@ -0,0 +1,164 @@
+from asyncio import AbstractEventLoop
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from .cdp_result_future import CDPResultFuture
+from .scheduler import Priority
+
+__all__ = ["CommandWindow"]
+
+WaitingCommand = Tuple[CDPResultFuture, Callable[..., Any], Tuple[Any, ...], float]
+
+
+class CommandWindow:
+    """Bounds the number of commands in flight.
+
+    Commands submitted while the window is full are held until the response of an
+    in flight command frees a slot. Held commands are admitted by priority class,
+    like the lanes of the outbound scheduler, in submission order within a class.
+    Every command is tracked, regardless of the window having a limit or not,
+    so that the in flight counts are always available.
+    """
+
+    __slots__ = [
+        "_limit",
+        "_loop",
+        "in_flight",
+        "in_flight_peak",
+        "waiting",
+        "waiting_count",
+        "waiting_peak",
+        "waits",
+        "wait_time_max",
+        "wait_time_total",
+    ]
+
+    def __init__(self, loop: AbstractEventLoop, limit: Optional[int] = None) -> None:
+        """Create a new CommandWindow
+
+        :param loop: The event loop used for timing how long commands waited
+        :param limit: The maximum number of commands in flight. Defaults to no limit
+        """
+        self._loop: AbstractEventLoop = loop
+        self._limit: Optional[int] = limit
+        self.in_flight: int = 0
+        self.in_flight_peak: int = 0
+        #: the commands held per priority class
+        self.waiting: List[Deque[WaitingCommand]] = [deque() for _ in Priority.names]
+        self.waiting_count: int = 0
+        self.waiting_peak: int = 0
+        self.waits: int = 0
+        self.wait_time_total: float = 0.0
+        self.wait_time_max: float = 0.0
+
+    @property
+    def limit(self) -> Optional[int]:
+        """Returns the maximum number of commands in flight"""
+        return self._limit
+
+    @limit.setter
+    def limit(self, value: Optional[int]) -> None:
+        """Sets the maximum number of commands in flight, dispatching waiting commands
+        if the window grew
+
+        :param value: The new maximum or None for no limit
+        """
+        self._limit = value
+        self._drain()
+
+    def submit(
+        self,
+        callback: CDPResultFuture,
+        priority: int,
+        dispatch: Callable[..., Any],
+        *args: Any,
+    ) -> None:
+        """Dispatches the command associated with the supplied future if the window
+        has room otherwise holds it until it does.
+
+        :param callback: The future of the command
+        :param priority: The priority class of the command
+        :param dispatch: The function that sends the command
+        :param args: The arguments for the dispatch function
+        """
+        if self._limit is None or self.in_flight < self._limit:
+            self._admit(callback)
+            dispatch(*args)
+            return
+        self.waiting[priority].append((callback, dispatch, args, self._loop.time()))
+        self.waiting_count += 1
+        if self.waiting_count > self.waiting_peak:
+            self.waiting_peak = self.waiting_count
+
+    def release(self) -> None:
+        """Frees the slot of a command that is no longer in flight"""
+        self.in_flight -= 1
+        if self.waiting_count:
+            self._drain()
+
+    def clear(self) -> List[CDPResultFuture]:
+        """Removes all waiting commands
+
+        :return: The futures of the commands that were waiting
+        """
+        callbacks = [command[0] for waiting in self.waiting for command in waiting]
+        for waiting in self.waiting:
+            waiting.clear()
+        self.waiting_count = 0
+        return callbacks
+
+    def stats(self) -> Dict[str, Union[int, float, None]]:
+        """Returns a snapshot of the windows counters
+
+        :return: A dictionary of counter name to value
+        """
+        return {
+            "max_in_flight": self._limit,
+            "in_flight": self.in_flight,
+            "in_flight_peak": self.in_flight_peak,
+            "window_waiting": self.waiting_count,
+            "window_waiting_peak": self.waiting_peak,
+            "window_waits": self.waits,
+            "window_wait_time_total": self.wait_time_total,
+            "window_wait_time_max": self.wait_time_max,
+        }
+
+    def _admit(self, callback: CDPResultFuture) -> None:
+        """Accounts for the command associated with the supplied future being in flight
+
+        :param callback: The future of the command
+        """
+        self.in_flight += 1
+        if self.in_flight > self.in_flight_peak:
+            self.in_flight_peak = self.in_flight
+        callback.windows.append(self)
+
+    def _drain(self) -> None:
+        """Dispatches waiting commands, highest priority class first, while the window
+        has room"""
+        limit = self._limit
+        for waiting in self.waiting:
+            while waiting:
+                if limit is not None and self.in_flight >= limit:
+                    return
+                callback, dispatch, args, queued_at = waiting.popleft()
+                self.waiting_count -= 1
+                if callback.done():
+                    # timed out or cancelled while waiting
+                    continue
+                waited = self._loop.time() - queued_at
+                self.waits += 1
+                self.wait_time_total += waited
+                if waited > self.wait_time_max:
+                    self.wait_time_max = waited
+                self._admit(callback)
+                dispatch(*args)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(limit={self._limit}, in_flight={self.in_flight}, "
+            f"waiting={self.waiting_count})"
+        )
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -1,12 +1,18 @@
 from .chrome import launch_chrome
+from .fake_browser import FakeBrowser, FakeProtocolError
 from .utils import (
     Cleaner,
     evaluation_result,
     make_target_selector,
     get_target_from_list,
 )
+from .ws import FakeWebSocket, attach_fake_ws
 
 __all__ = [
+    "attach_fake_ws",
+    "FakeBrowser",
+    "FakeProtocolError",
+    "FakeWebSocket",
     "launch_chrome",
     "Cleaner",
     "evaluation_result",
@@ -0,0 +1,659 @@
+"""Hermetic fake of the remote debugging endpoints of Chrome, for tests and benchmarks
+that must not depend on a real browser.
+
+Serves /json/version, /json/list, /json/protocol, /json/new, /json/close and
+/json/activate over HTTP and the browser and page websocket endpoints. The Target
+domain is implemented for both flat and non-flat sessions (attach, detach,
+sendMessageToTarget, create/close/get targets). Commands without a responder are
+responded to with an empty result, responders are registered per method and event
+generators emit synthetic events at a configurable rate and payload size.
+
+Runs as a script: python tests/helpers/fake_browser.py [port]
+"""
+import asyncio
+import json
+import os
+import sys
+from asyncio import AbstractEventLoop, Queue, Task
+from collections import Counter
+from inspect import isawaitable
+from typing import Any, Callable, Dict, List, Optional, Union
+from uuid import uuid4
+
+from aiohttp import WSMsgType, web
+
+__all__ = [
+    "DEFAULT_PRODUCT",
+    "EventGenerator",
+    "FakeBrowser",
+    "FakeChannel",
+    "FakeProtocolError",
+    "FakeTarget",
+    "Responder",
+]
+
+#: The product reported by Browser.getVersion and /json/version, recent enough for flat sessions
+DEFAULT_PRODUCT: str = "HeadlessChrome/120.0.6099.0"
+DEFAULT_PROTOCOL_PATH: str = os.path.join(
+    os.path.dirname(__file__), "..", "..", "data", "protocol.json"
+)
+
+#: Called with the params of a command and the channel it was received on, returns the
+#: result of the command (or an awaitable resolving to it) or raises FakeProtocolError
+Responder = Callable[[Dict, "FakeChannel"], Any]
+
+
+def dumps(msg: Dict) -> str:
+    return json.dumps(msg, separators=(",", ":"))
+
+
+def new_id() -> str:
+    return uuid4().hex.upper()
+
+
+class FakeProtocolError(Exception):
+    """Raised by responders to respond to a command with an error"""
+
+    def __init__(self, message: str, code: int = -32000) -> None:
+        super().__init__(message)
+        self.message: str = message
+        self.code: int = code
+
+
+class FakeTarget:
+    """A target (page, iframe, worker...) of the fake browser"""
+
+    def __init__(
+        self,
+        browser: "FakeBrowser",
+        target_type: str = "page",
+        url: str = "about:blank",
+    ) -> None:
+        self.browser: FakeBrowser = browser
+        self.id: str = new_id()
+        self.type: str = target_type
+        self.url: str = url
+        self.title: str = url
+        #: the page websocket connections and the sessions attached to the target
+        self.channels: List[FakeChannel] = []
+
+    @property
+    def ws_url(self) -> str:
+        return f"{self.browser.ws_base}/devtools/{self.type}/{self.id}"
+
+    def info(self) -> Dict:
+        """Returns the TargetInfo of the target"""
+        return {
+            "targetId": self.id,
+            "type": self.type,
+            "title": self.title,
+            "url": self.url,
+            "attached": any(isinstance(c, FakeSession) for c in self.channels),
+            "browserContextId": "DEFAULT",
+        }
+
+    def json_info(self) -> Dict:
+        """Returns the description of the target listed by /json/list"""
+        return {
+            "description": "",
+            "devtoolsFrontendUrl": f"/devtools/inspector.html?ws={self.ws_url[5:]}",
+            "id": self.id,
+            "title": self.title,
+            "type": self.type,
+            "url": self.url,
+            "webSocketDebuggerUrl": self.ws_url,
+        }
+
+    def emit(self, method: str, params: Optional[Dict] = None) -> None:
+        """Emits an event to every connection and session of the target
+
+        :param method: The method of the event
+        :param params: The params of the event
+        """
+        for channel in self.channels:
+            channel.emit(method, params)
+
+
+class FakeChannel:
+    """Something commands are received on and messages are sent to: a websocket
+    connection, to the browser or to a page, or a session attached to a target
+    """
+
+    def __init__(self, browser: "FakeBrowser", target: Optional[FakeTarget]) -> None:
+        self.browser: FakeBrowser = browser
+        self.target: Optional[FakeTarget] = target
+        #: session id -> the sessions attached using this channel
+        self.sessions: Dict[str, FakeSession] = {}
+        self.discover: bool = False
+
+    @property
+    def root(self) -> "FakeConnection":
+        """The websocket connection the channel belongs to"""
+        raise NotImplementedError
+
+    def send(self, msg: Dict) -> None:
+        raise NotImplementedError
+
+    def emit(self, method: str, params: Optional[Dict] = None) -> None:
+        """Sends an event to the client
+
+        :param method: The method of the event
+        :param params: The params of the event
+        """
+        self.send({"method": method, "params": params if params is not None else {}})
+
+    def detach_all(self) -> None:
+        for session in list(self.sessions.values()):
+            session.detach()
+
+
+class FakeConnection(FakeChannel):
+    """A websocket connection to the browser endpoint or to the endpoint of a page"""
+
+    def __init__(
+        self,
+        browser: "FakeBrowser",
+        target: Optional[FakeTarget],
+        ws: web.WebSocketResponse,
+    ) -> None:
+        super().__init__(browser, target)
+        self.ws: web.WebSocketResponse = ws
+        self.queue: Queue = Queue()
+        #: session id -> every flat session of the connection, including nested ones
+        self.flat_sessions: Dict[str, FakeSession] = {}
+
+    @property
+    def root(self) -> "FakeConnection":
+        return self
+
+    def send(self, msg: Dict) -> None:
+        self.queue.put_nowait(dumps(msg))
+
+    async def write_loop(self) -> None:
+        queue = self.queue
+        while 1:
+            data = await queue.get()
+            if data is None or self.ws.closed:
+                return
+            await self.ws.send_str(data)
+
+
+class FakeSession(FakeChannel):
+    """A session attached to a target, flat sessions send their messages with their
+    sessionId, the messages of the others are wrapped in Target.receivedMessageFromTarget
+    """
+
+    def __init__(
+        self,
+        browser: "FakeBrowser",
+        target: FakeTarget,
+        parent: FakeChannel,
+        flat: bool,
+    ) -> None:
+        super().__init__(browser, target)
+        self.id: str = new_id()
+        self.parent: FakeChannel = parent
+        self.flat: bool = flat
+        if flat:
+            self.root.flat_sessions[self.id] = self
+
+    @property
+    def root(self) -> FakeConnection:
+        return self.parent.root
+
+    def send(self, msg: Dict) -> None:
+        if self.flat:
+            msg["sessionId"] = self.id
+            self.root.send(msg)
+        else:
+            self.parent.send(
+                {
+                    "method": "Target.receivedMessageFromTarget",
+                    "params": {
+                        "sessionId": self.id,
+                        "message": dumps(msg),
+                        "targetId": self.target.id,
+                    },
+                }
+            )
+
+    def detach(self) -> None:
+        self.detach_all()
+        self.parent.sessions.pop(self.id, None)
+        self.root.flat_sessions.pop(self.id, None)
+        if self in self.target.channels:
+            self.target.channels.remove(self)
+        self.parent.emit(
+            "Target.detachedFromTarget",
+            {"sessionId": self.id, "targetId": self.target.id},
+        )
+
+
+class EventGenerator:
+    """Emits a synthetic event to a target at a fixed rate until stopped or the
+    number of events is reached. Events are emitted in batches when the rate
+    exceeds what the event loop can schedule one by one
+    """
+
+    def __init__(
+        self,
+        target: FakeTarget,
+        method: str,
+        rate: float,
+        payload_size: int = 0,
+        total: Optional[int] = None,
+        params: Optional[Dict] = None,
+    ) -> None:
+        self.target: FakeTarget = target
+        self.method: str = method
+        self.rate: float = rate
+        self.total: Optional[int] = total
+        self.params: Dict = dict(params or {})
+        if payload_size:
+            self.params["data"] = "x" * payload_size
+        self.emitted: int = 0
+        self.task: Optional[Task] = None
+
+    def start(self, loop: AbstractEventLoop) -> "EventGenerator":
+        self.task = loop.create_task(self._run(loop))
+        return self
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    @property
+    def done(self) -> bool:
+        return self.task is None or self.task.done()
+
+    async def _run(self, loop: AbstractEventLoop) -> None:
+        start = loop.time()
+        interval = min(1 / self.rate, 0.01)
+        while self.total is None or self.emitted < self.total:
+            due = int((loop.time() - start) * self.rate) + 1
+            if self.total is not None:
+                due = min(due, self.total)
+            while self.emitted < due:
+                self.target.emit(self.method, dict(self.params, seq=self.emitted))
+                self.emitted += 1
+            await asyncio.sleep(interval)
+
+
+class FakeBrowser:
+    """The fake browser, started with start (or async with) and stopped with stop.
+
+    Connect to it using its http_url, e.g. connect(browser.http_url), its browser
+    websocket endpoint ws_url or the ws_url of one of its targets.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        product: str = DEFAULT_PRODUCT,
+        pages: int = 1,
+        strict: bool = False,
+        protocol_path: str = DEFAULT_PROTOCOL_PATH,
+        loop: Optional[AbstractEventLoop] = None,
+    ) -> None:
+        """Create a new FakeBrowser
+
+        :param host: The host to listen on
+        :param port: The port to listen on, 0 for any free port
+        :param product: The product reported by Browser.getVersion
+        :param pages: The number of page targets the browser starts with
+        :param strict: Should commands without a responder fail, as unknown methods do in Chrome,
+        rather than be responded to with an empty result
+        :param protocol_path: The path of the protocol descriptor served by /json/protocol
+        :param loop: The event loop to use
+        """
+        self.loop: AbstractEventLoop = loop or asyncio.get_event_loop()
+        self.host: str = host
+        self.port: int = port
+        self.product: str = product
+        self.strict: bool = strict
+        self.protocol_path: str = protocol_path
+        self.id: str = new_id()
+        self.targets: Dict[str, FakeTarget] = {}
+        self.connections: List[FakeConnection] = []
+        self.responders: Dict[str, Responder] = {}
+        self.generators: List[EventGenerator] = []
+        #: method -> number of commands received
+        self.commands: Counter = Counter()
+        self._protocol: Optional[bytes] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._tasks: List[Task] = []
+        for _ in range(pages):
+            self.add_target()
+        self.responders.update(
+            {
+                "Browser.getVersion": self._get_version,
+                "Target.attachToTarget": self._attach_to_target,
+                "Target.detachFromTarget": self._detach_from_target,
+                "Target.getTargets": lambda params, channel: {
+                    "targetInfos": [t.info() for t in self.targets.values()]
+                },
+                "Target.getTargetInfo": self._get_target_info,
+                "Target.createTarget": lambda params, channel: {
+                    "targetId": self.add_target(url=params.get("url", "about:blank")).id
+                },
+                "Target.closeTarget": lambda params, channel: {
+                    "success": self.close_target(params["targetId"])
+                },
+                "Target.setDiscoverTargets": self._set_discover_targets,
+            }
+        )
+
+    @property
+    def http_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def ws_base(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    @property
+    def ws_url(self) -> str:
+        """The websocket endpoint of the browser"""
+        return f"{self.ws_base}/devtools/browser/{self.id}"
+
+    @property
+    def page(self) -> FakeTarget:
+        """The first page target"""
+        return next(t for t in self.targets.values() if t.type == "page")
+
+    async def start(self) -> "FakeBrowser":
+        app = web.Application()
+        app.router.add_get("/json/version", self._json_version)
+        app.router.add_get("/json", self._json_list)
+        app.router.add_get("/json/list", self._json_list)
+        app.router.add_get("/json/protocol", self._json_protocol)
+        app.router.add_route("*", "/json/new", self._json_new)
+        app.router.add_get("/json/close/{target_id}", self._json_close)
+        app.router.add_get("/json/activate/{target_id}", self._json_activate)
+        app.router.add_get("/devtools/{kind}/{target_id}", self._websocket)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        for generator in self.generators:
+            generator.stop()
+        for connection in list(self.connections):
+            await connection.ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "FakeBrowser":
+        return await self.start()
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.stop()
+
+    def respond(self, method: str, responder: Union[Responder, Dict]) -> None:
+        """Registers how a command is responded to
+
+        :param method: The method of the command
+        :param responder: The result of the command or a function returning it
+        """
+        if isinstance(responder, dict):
+            result = responder
+            self.responders[method] = lambda params, channel: result
+        else:
+            self.responders[method] = responder
+
+    def add_target(
+        self, target_type: str = "page", url: str = "about:blank"
+    ) -> FakeTarget:
+        """Adds a target, emitting Target.targetCreated to the channels discovering targets
+
+        :param target_type: The type of the target
+        :param url: The URL of the target
+        :return: The new target
+        """
+        target = FakeTarget(self, target_type, url)
+        self.targets[target.id] = target
+        self._emit_discovered("Target.targetCreated", {"targetInfo": target.info()})
+        return target
+
+    def close_target(self, target_id: str) -> bool:
+        """Closes a target, detaching its sessions and closing its page connections
+
+        :param target_id: The id of the target
+        :return: T/F indicating if the target existed
+        """
+        target = self.targets.pop(target_id, None)
+        if target is None:
+            return False
+        for channel in list(target.channels):
+            if isinstance(channel, FakeSession):
+                channel.detach()
+            else:
+                self.loop.create_task(channel.ws.close())
+        self._emit_discovered("Target.targetDestroyed", {"targetId": target_id})
+        return True
+
+    def emit(self, method: str, params: Optional[Dict] = None) -> None:
+        """Emits an event to every connection to the browser endpoint
+
+        :param method: The method of the event
+        :param params: The params of the event
+        """
+        for connection in self.connections:
+            if connection.target is None:
+                connection.emit(method, params)
+
+    def generate(
+        self,
+        method: str,
+        rate: float,
+        payload_size: int = 0,
+        total: Optional[int] = None,
+        target: Optional[FakeTarget] = None,
+        params: Optional[Dict] = None,
+    ) -> EventGenerator:
+        """Starts emitting a synthetic event to the connections and sessions of a target.
+        The params of the events are the supplied params, a data string of the payload
+        size and the sequence number (seq) of the event
+
+        :param method: The method of the event
+        :param rate: The number of events per second
+        :param payload_size: The number of characters of the data param, 0 for none
+        :param total: Optional number of events after which the generator stops
+        :param target: The target, defaults to the first page
+        :param params: Optional additional params of the events
+        :return: The started generator
+        """
+        generator = EventGenerator(
+            target or self.page, method, rate, payload_size, total, params
+        )
+        self.generators.append(generator)
+        return generator.start(self.loop)
+
+    async def handle(self, msg: Dict, channel: FakeChannel) -> None:
+        """Handles a message received on a channel
+
+        :param msg: The decoded message
+        :param channel: The channel it was received on
+        """
+        session_id = msg.pop("sessionId", None)
+        if session_id is not None:
+            session = channel.root.flat_sessions.get(session_id)
+            if session is None:
+                channel.send(
+                    {
+                        "id": msg.get("id"),
+                        "error": {"code": -32001, "message": "Session not found"},
+                        "sessionId": session_id,
+                    }
+                )
+                return
+            channel = session
+        method = msg.get("method", "")
+        params = msg.get("params") or {}
+        self.commands[method] += 1
+        response: Dict[str, Any] = {"id": msg.get("id")}
+        if method == "Target.sendMessageToTarget":
+            session = channel.sessions.get(params.get("sessionId"))
+            if session is not None:
+                await self.handle(json.loads(params["message"]), session)
+                response["result"] = {}
+            else:
+                response["error"] = {
+                    "code": -32602,
+                    "message": "No session with given id",
+                }
+            channel.send(response)
+            return
+        responder = self.responders.get(method)
+        try:
+            if responder is None:
+                if self.strict:
+                    raise FakeProtocolError(f"'{method}' wasn't found", -32601)
+                result = {}
+            else:
+                result = responder(params, channel)
+                if isawaitable(result):
+                    result = await result
+            response["result"] = result if result is not None else {}
+        except FakeProtocolError as e:
+            response["error"] = {"code": e.code, "message": e.message}
+        channel.send(response)
+
+    def _get_version(self, params: Dict, channel: FakeChannel) -> Dict:
+        return {
+            "protocolVersion": "1.3",
+            "product": self.product,
+            "revision": "@fake",
+            "userAgent": f"Mozilla/5.0 {self.product}",
+            "jsVersion": "12.0",
+        }
+
+    def _get_target_info(self, params: Dict, channel: FakeChannel) -> Dict:
+        target_id = params.get("targetId")
+        target = self.targets.get(target_id) if target_id else channel.target
+        if target is None:
+            raise FakeProtocolError("No target with given id found")
+        return {"targetInfo": target.info()}
+
+    def _attach_to_target(self, params: Dict, channel: FakeChannel) -> Dict:
+        target = self.targets.get(params.get("targetId"))
+        if target is None:
+            raise FakeProtocolError("No target with given id found")
+        session = FakeSession(self, target, channel, bool(params.get("flatten")))
+        channel.sessions[session.id] = session
+        target.channels.append(session)
+        channel.emit(
+            "Target.attachedToTarget",
+            {
+                "sessionId": session.id,
+                "targetInfo": target.info(),
+                "waitingForDebugger": False,
+            },
+        )
+        return {"sessionId": session.id}
+
+    def _detach_from_target(self, params: Dict, channel: FakeChannel) -> Dict:
+        session = channel.sessions.get(params.get("sessionId"))
+        if session is None:
+            raise FakeProtocolError("No session with given id")
+        session.detach()
+        return {}
+
+    def _set_discover_targets(self, params: Dict, channel: FakeChannel) -> Dict:
+        channel.discover = bool(params.get("discover"))
+        if channel.discover:
+            for target in self.targets.values():
+                channel.emit("Target.targetCreated", {"targetInfo": target.info()})
+        return {}
+
+    def _emit_discovered(self, method: str, params: Dict) -> None:
+        for connection in self.connections:
+            if connection.discover:
+                connection.emit(method, params)
+
+    async def _json_version(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "Browser": self.product,
+                "Protocol-Version": "1.3",
+                "User-Agent": f"Mozilla/5.0 {self.product}",
+                "V8-Version": "12.0",
+                "WebKit-Version": "537.36",
+                "webSocketDebuggerUrl": self.ws_url,
+            }
+        )
+
+    async def _json_list(self, request: web.Request) -> web.Response:
+        return web.json_response([t.json_info() for t in self.targets.values()])
+
+    async def _json_protocol(self, request: web.Request) -> web.Response:
+        if self._protocol is None:
+            with open(self.protocol_path, "rb") as file:
+                self._protocol = file.read()
+        return web.Response(body=self._protocol, content_type="application/json")
+
+    async def _json_new(self, request: web.Request) -> web.Response:
+        target = self.add_target(url=request.query_string or "about:blank")
+        return web.json_response(target.json_info())
+
+    async def _json_close(self, request: web.Request) -> web.Response:
+        if self.close_target(request.match_info["target_id"]):
+            return web.Response(text="Target is closing")
+        return web.Response(text="No such target id", status=404)
+
+    async def _json_activate(self, request: web.Request) -> web.Response:
+        if request.match_info["target_id"] in self.targets:
+            return web.Response(text="Target activated")
+        return web.Response(text="No such target id", status=404)
+
+    async def _websocket(self, request: web.Request) -> web.WebSocketResponse:
+        kind, target_id = request.match_info["kind"], request.match_info["target_id"]
+        target = None
+        if kind != "browser":
+            target = self.targets.get(target_id)
+            if target is None:
+                raise web.HTTPNotFound()
+        elif target_id != self.id:
+            raise web.HTTPNotFound()
+        ws = web.WebSocketResponse(max_msg_size=0, compress=False)
+        await ws.prepare(request)
+        connection = FakeConnection(self, target, ws)
+        self.connections.append(connection)
+        if target is not None:
+            target.channels.append(connection)
+        writer = self.loop.create_task(connection.write_loop())
+        try:
+            async for frame in ws:
+                if frame.type == WSMsgType.TEXT:
+                    await self.handle(json.loads(frame.data), connection)
+                elif frame.type == WSMsgType.BINARY:
+                    await self.handle(
+                        json.loads(frame.data.decode("utf-8")), connection
+                    )
+        finally:
+            connection.detach_all()
+            self.connections.remove(connection)
+            if target is not None and connection in target.channels:
+                target.channels.remove(connection)
+            connection.queue.put_nowait(None)
+            await writer
+        return ws
+
+
+async def main(port: int) -> None:
+    browser = await FakeBrowser(port=port).start()
+    print(f"fake browser listening on {browser.http_url}", flush=True)
+    while 1:
+        await asyncio.sleep(3600)
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 9222)
+    )
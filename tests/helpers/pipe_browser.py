@@ -0,0 +1,59 @@
+"""Fake browser speaking the protocol over file descriptors 3 and 4, as Chrome
+does when launched with --remote-debugging-pipe.
+
+Runs as a script: python tests/helpers/pipe_browser.py --remote-debugging-pipe
+
+Commands:
+    - Browser.getVersion: responds with a Chrome 120 product
+    - Test.echo: responds with the commands params
+    - Test.emit: emits the event {"method": params.method, "params": params.params} then responds
+    - Test.fail: responds with an error
+everything else is responded to with an empty result.
+"""
+import json
+import os
+
+BROWSER_READ_FD = 3
+BROWSER_WRITE_FD = 4
+
+
+def write(msg: dict) -> None:
+    data = json.dumps(msg, separators=(",", ":")).encode("utf-8") + b"\0"
+    while data:
+        data = data[os.write(BROWSER_WRITE_FD, data) :]
+
+
+def respond(msg: dict) -> None:
+    method = msg.get("method")
+    params = msg.get("params") or {}
+    response = {"id": msg["id"]}
+    if "sessionId" in msg:
+        response["sessionId"] = msg["sessionId"]
+    if method == "Browser.getVersion":
+        response["result"] = {"product": "HeadlessChrome/120.0.6099.0"}
+    elif method == "Test.echo":
+        response["result"] = params
+    elif method == "Test.emit":
+        write({"method": params["method"], "params": params.get("params", {})})
+        response["result"] = {}
+    elif method == "Test.fail":
+        response["error"] = {"code": -32000, "message": "Test failure"}
+    else:
+        response["result"] = {}
+    write(response)
+
+
+def main() -> None:
+    buffer = b""
+    while 1:
+        chunk = os.read(BROWSER_READ_FD, 65536)
+        if not chunk:
+            break
+        buffer += chunk
+        *messages, buffer = buffer.split(b"\0")
+        for message in messages:
+            respond(json.loads(message.decode("utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import asyncio
+from asyncio import AbstractEventLoop
+from typing import Any, List, Optional, Union
+
+from websockets import ConnectionClosed
+
+from cripy import Connection
+
+__all__ = ["FakeWebSocket", "attach_fake_ws"]
+
+
+class FakeWebSocket:
+    """Minimal stand in for websockets.WebSocketClientProtocol that records
+    the frames sent to it and lets tests feed the frames it receives.
+    """
+
+    def __init__(self, loop: Optional[AbstractEventLoop] = None) -> None:
+        self.loop: AbstractEventLoop = loop or asyncio.get_event_loop()
+        self.sent: List[Union[str, bytes]] = []
+        self.closed: bool = False
+        self._incoming: asyncio.Queue = asyncio.Queue(loop=self.loop)
+
+    async def send(self, data: Union[str, bytes]) -> None:
+        if self.closed:
+            raise ConnectionClosed(1006, "")
+        self.sent.append(data)
+
+    async def recv(self) -> Any:
+        msg = await self._incoming.get()
+        if msg is None:
+            raise ConnectionClosed(1000, "")
+        return msg
+
+    def feed(self, data: Union[str, bytes]) -> None:
+        self._incoming.put_nowait(data)
+
+    async def close(self) -> None:
+        self.closed = True
+        self._incoming.put_nowait(None)
+
+
+async def attach_fake_ws(conn: Connection) -> FakeWebSocket:
+    ws = FakeWebSocket(conn.loop)
+    conn._ws = ws
+    await conn._start_loops()
+    return ws
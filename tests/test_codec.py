@@ -0,0 +1,145 @@
+from asyncio import AbstractEventLoop, sleep
+
+import pytest
+
+from cripy import ClientError, Connection
+from cripy.codec import (
+    Codec,
+    RawJSON,
+    RawJSONCache,
+    StdlibCodec,
+    available_codecs,
+    default_codec,
+    get_codec,
+    has_surrogate_escapes,
+)
+from .helpers import attach_fake_ws
+
+codec_names = sorted(available_codecs())
+
+
+class TestCodecs:
+    @pytest.mark.parametrize("name", codec_names)
+    def test_decodes_str_and_bytes(self, name: str):
+        codec = get_codec(name)
+        assert codec.loads('{"id":1,"result":{}}') == {"id": 1, "result": {}}
+        assert codec.loads(b'{"id":1,"result":{}}') == {"id": 1, "result": {}}
+
+    @pytest.mark.parametrize("name", codec_names)
+    def test_decodes_surrogates(self, name: str):
+        codec = get_codec(name)
+        assert codec.loads('{"v":"\\ud83d\\ude00"}') == {"v": "\U0001F600"}
+        assert codec.loads(b'{"v":"\\ud83d\\ude00"}') == {"v": "\U0001F600"}
+        assert codec.loads('{"v":"\\ud800"}') == {"v": "\ud800"}
+
+    def test_detects_surrogate_escapes(self):
+        assert has_surrogate_escapes('{"v":"\\ud800"}')
+        assert has_surrogate_escapes(b'{"v":"\\uDC00"}')
+        assert not has_surrogate_escapes('{"v":"\\u0041\\u00e9"}')
+        assert not has_surrogate_escapes(b'{"v":"\xf0\x9f\x98\x80"}')
+
+    @pytest.mark.skipif("ujson" not in codec_names, reason="ujson is not installed")
+    def test_ujson_never_decodes_surrogate_escapes(self, monkeypatch):
+        import cripy.codec
+
+        def ujson_loads(data):
+            # ujson 4.x silently drops lone surrogates, it must never see them
+            raise AssertionError("ujson decoded a message with escaped surrogates")
+
+        monkeypatch.setattr(cripy.codec.ujson, "loads", ujson_loads)
+        codec = get_codec("ujson")
+        assert codec.loads('{"v":"\\ud800"}') == {"v": "\ud800"}
+        assert codec.loads(b'{"v":"\\ud83d\\ude00"}') == {"v": "\U0001F600"}
+
+    @pytest.mark.parametrize("name", codec_names)
+    def test_encodes_compact(self, name: str):
+        codec = get_codec(name)
+        msg = {"id": 1, "method": "Page.navigate", "params": {"url": "about:blank"}}
+        assert codec.loads(codec.dumps(msg)) == msg
+        assert codec.loads(codec.dumpb(msg)) == msg
+        assert " " not in codec.dumps(msg)
+        assert codec.loads(codec.dumps({"v": "\ud800"})) == {"v": "\ud800"}
+
+    @pytest.mark.parametrize("name", codec_names)
+    def test_splices_raw_json(self, name: str):
+        codec = get_codec(name)
+        value = {"source": 'const a = "\u00e9/\n";', "n": [1, 2]}
+        msg = {
+            "method": "Page.addScriptToEvaluateOnNewDocument",
+            "params": {"source": RawJSON.encode(value, codec), "worldName": "w"},
+            "id": 1,
+        }
+        expected = dict(msg, params={"source": value, "worldName": "w"})
+        assert codec.loads(codec.dumps_message(msg)) == expected
+        literal = codec.dumps_message_literal(msg)
+        assert isinstance(literal, RawJSON)
+        assert codec.loads(codec.loads(literal.json)) == expected
+        envelope = {
+            "method": "Target.sendMessageToTarget",
+            "params": {"sessionId": "S1", "message": literal},
+            "id": 2,
+        }
+        sent = codec.loads(codec.dumps_message(envelope))
+        assert codec.loads(sent["params"]["message"]) == expected
+
+    def test_raw_json_cache(self):
+        cache = RawJSONCache(max_entries=2)
+        script = "window.instrumented = true;"
+        raw = cache.get(script)
+        assert raw.json == '"window.instrumented = true;"'
+        assert cache.get(script) is raw
+        assert cache.get(1).json == "1"
+        assert cache.get(True).json == "true"
+        assert len(cache) == 2
+        assert cache.get(script) is not raw
+        assert (cache.hits, cache.misses) == (1, 4)
+
+    def test_get_codec(self):
+        assert get_codec() is default_codec()
+        stdlib = StdlibCodec()
+        assert get_codec(stdlib) is stdlib
+        with pytest.raises(ClientError):
+            get_codec("nope")
+
+
+class TestConnectionCodec:
+    @pytest.mark.asyncio
+    async def test_connection_uses_supplied_codec(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop, codec="json")
+        assert isinstance(conn.codec, Codec)
+        assert conn.codec.name == "json"
+        ws = await attach_fake_ws(conn)
+        future = conn.send("Runtime.evaluate", {"expression": "'\U0001F600'"})
+        await sleep(0)
+        assert ws.sent == [
+            '{"method":"Runtime.evaluate","params":{"expression":"\'\\ud83d\\ude00\'"},"id":1}'
+        ]
+        ws.feed(b'{"id":1,"result":{"value":"\\ud83d\\ude00"}}')
+        assert await future == {"value": "\U0001F600"}
+        await conn.dispose()
+
+
+class TestRawJSONSessions:
+    @pytest.mark.asyncio
+    async def test_non_flat_session_splices_raw_json(
+        self, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(loop=event_loop)
+        ws = await attach_fake_ws(conn)
+        session = conn._new_session("page", "S1")
+        conn.add_session(session)
+        body = "QUJD" * 1000
+        session.send(
+            "Fetch.fulfillRequest",
+            {"requestId": "r1", "responseCode": 200, "body": session.raw_json(body)},
+        )
+        await sleep(0)
+        envelope = conn.codec.loads(ws.sent[0])
+        assert envelope["params"]["sessionId"] == "S1"
+        assert conn.codec.loads(envelope["params"]["message"]) == {
+            "method": "Fetch.fulfillRequest",
+            "params": {"requestId": "r1", "responseCode": 200, "body": body},
+            "id": 1,
+        }
+        assert session.raw_json(body) is conn.raw_json(body)
+        await conn.dispose()
@@ -0,0 +1,804 @@
+from asyncio import AbstractEventLoop, CancelledError, sleep
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from time import perf_counter
+from typing import Tuple
+
+import pytest
+import ujson
+
+from cripy import (
+    ClientError,
+    CommandTimeoutError,
+    Connection,
+    Priority,
+    ProtocolError,
+)
+from cripy.protocol.dom import DOM
+from cripy.protocol.page import Page
+from .helpers import attach_fake_ws
+
+
+def attached_to_target(session_id: str) -> str:
+    return (
+        '{"method":"Target.attachedToTarget","params":{"sessionId":"%s",'
+        '"targetInfo":{"type":"page"},"waitingForDebugger":false}}' % session_id
+    )
+
+
+class TestConnectionWriter:
+    @pytest.mark.asyncio
+    async def test_commands_sent_before_connect_are_written_in_order(
+        self, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(loop=event_loop)
+        conn.send("Page.enable")
+        assert conn.send_queue_depth == 1
+        ws = await attach_fake_ws(conn)
+        conn.send("Network.enable")
+        await sleep(0)
+        assert [ujson.loads(frame)["method"] for frame in ws.sent] == [
+            "Page.enable",
+            "Network.enable",
+        ]
+        assert conn.send_queue_depth == 0
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_burst_is_written_by_single_wakeup(
+        self, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(loop=event_loop)
+        ws = await attach_fake_ws(conn)
+        for _ in range(100):
+            conn.send("Runtime.evaluate", {"expression": "1"})
+        assert conn.send_queue_depth == 100
+        await sleep(0)
+        stats = conn.stats()
+        assert len(ws.sent) == 100
+        assert stats["frames_sent"] == 100
+        assert stats["send_queue_peak"] == 100
+        assert stats["writer_wakeups"] == 1
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_pending_commands_fail_on_dispose(
+        self, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(loop=event_loop)
+        await attach_fake_ws(conn)
+        future = conn.send("Page.enable")
+        await conn.dispose()
+        with pytest.raises(Exception):
+            await future
+        assert conn.send_queue_depth == 0
+
+
+class TestUnobservedEvents:
+    @pytest.mark.asyncio
+    async def test_unobserved_events_are_dropped(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop)
+        ws = await attach_fake_ws(conn)
+        seen = []
+
+        def listener(event):
+            seen.append(event)
+
+        conn.on("Page.loadEventFired", listener)
+        ws.feed('{"method":"Network.dataReceived","params":{"dataLength":1}}')
+        ws.feed('{"method":"Page.loadEventFired","params":{"timestamp":1}}')
+        await sleep(0)
+        await sleep(0)
+        assert seen == [{"timestamp": 1}]
+        stats = conn.stats()
+        assert stats["events_unobserved"] == 1
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_unobserved_events_only_counted(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop, drop_unobserved_events=False)
+        ws = await attach_fake_ws(conn)
+        messages = []
+
+        def listener(msg):
+            messages.append(msg)
+
+        conn.on(Connection.Events.AllMessages, listener)
+        ws.feed('{"method":"Network.dataReceived","params":{"dataLength":1}}')
+        await sleep(0)
+        assert len(messages) == 1
+        conn.remove_listener(Connection.Events.AllMessages, listener)
+        ws.feed('{"method":"Network.dataReceived","params":{"dataLength":1}}')
+        await sleep(0)
+        stats = conn.stats()
+        assert stats["events_dropped"] == 0
+        assert stats["events_unobserved"] == 1
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_session_events_dropped_without_session_listener(
+        self, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(loop=event_loop, flatten_sessions=True)
+        ws = await attach_fake_ws(conn)
+        ws.feed(attached_to_target("S1"))
+        await sleep(0)
+        session = conn.session("S1")
+        assert session is not None
+        seen = []
+
+        def listener(event):
+            seen.append(event)
+
+        session.on("Network.dataReceived", listener)
+        ws.feed(
+            '{"method":"Network.dataReceived","params":{"dataLength":1},"sessionId":"S1"}'
+        )
+        ws.feed('{"method":"Page.loadEventFired","params":{},"sessionId":"S1"}')
+        await sleep(0)
+        assert seen == [{"dataLength": 1}]
+        assert conn.stats()["events_dropped"] == 1
+        await conn.dispose()
+
+
+class TestCommandTimeouts:
+    @pytest.mark.asyncio
+    async def test_command_times_out(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop)
+        ws = await attach_fake_ws(conn)
+        future = conn.send("Page.navigate", {"url": "about:blank"}, timeout=0.01)
+        with pytest.raises(CommandTimeoutError):
+            await future
+        assert not conn._callbacks
+        ws.feed('{"id":1,"result":{}}')
+        await sleep(0)
+        stats = conn.stats()
+        assert stats["commands_timed_out"] == 1
+        assert stats["orphaned_responses"] == 1
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_connection_default_timeout(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop, command_timeout=0.01)
+        await attach_fake_ws(conn)
+        with pytest.raises(CommandTimeoutError):
+            await conn.send("Page.navigate", {"url": "about:blank"})
+        conn.command_timeout = None
+        future = conn.send("Page.enable")
+        await sleep(0.02)
+        assert not future.done()
+        future.cancel()
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_command_is_forgotten(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop)
+        ws = await attach_fake_ws(conn)
+        future = conn.send("Page.enable")
+        answered = conn.send("Network.enable", timeout=10)
+        future.cancel()
+        assert list(conn._callbacks) == [2]
+        ws.feed('{"id":1,"result":{}}')
+        ws.feed('{"id":2,"result":{}}')
+        assert await answered == {}
+        assert answered.timeout_handle is None
+        stats = conn.stats()
+        assert stats["commands_cancelled"] == 1
+        assert stats["orphaned_responses"] == 1
+        assert stats["commands_pending"] == 0
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_awaiting_task_forgets_command(
+        self, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(loop=event_loop)
+        await attach_fake_ws(conn)
+        future = conn.send("Page.enable")
+
+        async def result() -> dict:
+            return await future
+
+        task = event_loop.create_task(result())
+        await sleep(0)
+        # Task.cancel passes a message on to the future it awaits on python 3.9+
+        task.cancel()
+        with pytest.raises(CancelledError):
+            await task
+        assert future.cancelled()
+        assert not conn._callbacks
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_session_command_times_out(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop, flatten_sessions=True)
+        ws = await attach_fake_ws(conn)
+        ws.feed(attached_to_target("S1"))
+        await sleep(0)
+        session = conn.session("S1")
+        with pytest.raises(CommandTimeoutError):
+            await session.send("Page.enable", timeout=0.01)
+        assert not session._callbacks
+        ws.feed('{"id":1,"result":{},"sessionId":"S1"}')
+        await sleep(0)
+        assert conn.stats()["orphaned_responses"] == 1
+        await conn.dispose()
+
+
+class TestInFlightWindow:
+    @pytest.mark.asyncio
+    async def test_commands_wait_for_window(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop, max_in_flight=2)
+        ws = await attach_fake_ws(conn)
+        futures = [conn.send("DOM.describeNode", {"nodeId": i}) for i in range(5)]
+        await sleep(0)
+        assert len(ws.sent) == 2
+        assert conn.in_flight == 2
+        for _id in range(1, 6):
+            ws.feed('{"id":%d,"result":{}}' % _id)
+        for future in futures:
+            assert await future == {}
+        assert [ujson.loads(frame)["params"]["nodeId"] for frame in ws.sent] == [
+            0,
+            1,
+            2,
+            3,
+            4,
+        ]
+        stats = conn.stats()
+        assert stats["in_flight"] == 0
+        assert stats["in_flight_peak"] == 2
+        assert stats["window_waiting_peak"] == 3
+        assert stats["window_waits"] == 3
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiting_command_is_never_sent(
+        self, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(loop=event_loop, max_in_flight=1)
+        ws = await attach_fake_ws(conn)
+        first = conn.send("Page.enable")
+        waiting = conn.send("Network.enable")
+        waiting.cancel()
+        last = conn.send("Runtime.enable")
+        ws.feed('{"id":1,"result":{}}')
+        await first
+        await sleep(0)
+        assert [ujson.loads(frame)["method"] for frame in ws.sent] == [
+            "Page.enable",
+            "Runtime.enable",
+        ]
+        ws.feed('{"id":2,"result":{}}')
+        await last
+        assert conn.stats()["commands_cancelled"] == 1
+        assert conn.in_flight == 0
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_waiting_commands_are_admitted_by_priority(
+        self, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(loop=event_loop, max_in_flight=1)
+        ws = await attach_fake_ws(conn)
+        conn.send("Page.enable")
+        for i in range(2):
+            conn.send("DOM.describeNode", {"nodeId": i}, priority=Priority.Bulk)
+        conn.send("Input.dispatchMouseEvent", priority=Priority.Interactive)
+        conn.send("Runtime.enable")
+        for _id in range(1, 6):
+            ws.feed('{"id":%d,"result":{}}' % _id)
+            await sleep(0)
+        assert [ujson.loads(frame)["method"] for frame in ws.sent] == [
+            "Page.enable",
+            "Input.dispatchMouseEvent",
+            "Runtime.enable",
+            "DOM.describeNode",
+            "DOM.describeNode",
+        ]
+        assert conn.stats()["window_waiting"] == 0
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_session_window(self, event_loop: AbstractEventLoop):
+        conn = Connection(
+            loop=event_loop, flatten_sessions=True, session_max_in_flight=1
+        )
+        ws = await attach_fake_ws(conn)
+        ws.feed(attached_to_target("S1"))
+        await sleep(0)
+        session = conn.session("S1")
+        assert session.max_in_flight == 1
+        futures = [session.send("DOM.describeNode", {"nodeId": i}) for i in range(3)]
+        conn.send("Browser.getVersion")
+        await sleep(0)
+        assert len(ws.sent) == 2
+        assert session.in_flight == 1
+        assert conn.in_flight == 2
+        session.max_in_flight = None
+        await sleep(0)
+        assert len(ws.sent) == 4
+        assert session.stats()["window_waits"] == 2
+        session.on_closed()
+        for future in futures:
+            with pytest.raises(Exception):
+                await future
+        assert conn.in_flight == 1
+        await conn.dispose()
+
+
+class TestOutboundScheduling:
+    @pytest.mark.asyncio
+    async def test_priority_per_call_and_domain(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop, domain_priorities={"Input": 0})
+        conn.set_domain_priority("Network", Priority.Bulk)
+        ws = await attach_fake_ws(conn)
+        conn.send("Network.getResponseBody", {"requestId": "1"})
+        conn.send("Page.reload")
+        conn.send("Input.dispatchMouseEvent", {"type": "mouseMoved"})
+        conn.send("Runtime.evaluate", {"expression": "1"}, priority=Priority.Bulk)
+        conn.send("Network.enable", priority=Priority.Interactive)
+        await sleep(0)
+        assert [ujson.loads(frame)["method"] for frame in ws.sent] == [
+            "Input.dispatchMouseEvent",
+            "Network.enable",
+            "Page.reload",
+            "Network.getResponseBody",
+            "Runtime.evaluate",
+        ]
+        stats = conn.stats()
+        assert stats["lane_interactive_sent"] == 2
+        with pytest.raises(ClientError):
+            conn.set_domain_priority("Page", 3)
+        with pytest.raises(ClientError):
+            conn.send("Page.enable", priority=-1)
+        assert stats["lane_normal_sent"] == 1
+        assert stats["lane_bulk_sent"] == 2
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_flat_sessions_are_served_round_robin(
+        self, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(loop=event_loop, flatten_sessions=True)
+        ws = await attach_fake_ws(conn)
+        ws.feed(attached_to_target("S1"))
+        ws.feed(attached_to_target("S2"))
+        await sleep(0)
+        s1 = conn.session("S1")
+        s2 = conn.session("S2")
+        for i in range(3):
+            s1.send("DOM.describeNode", {"nodeId": i})
+        s2.send("Page.reload")
+        await sleep(0)
+        assert [ujson.loads(frame)["sessionId"] for frame in ws.sent] == [
+            "S1",
+            "S2",
+            "S1",
+            "S1",
+        ]
+        await conn.dispose()
+
+
+class TestSendNowait:
+    @pytest.mark.asyncio
+    async def test_responses_are_discarded(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop)
+        ws = await attach_fake_ws(conn)
+        page = Page(conn)
+        assert page.nowait is page.nowait
+        assert page.nowait.nowait is page.nowait.nowait
+        _id = page.nowait.screencastFrameAck(1)
+        conn.send_nowait("Runtime.releaseObject", {"objectId": "1"})
+        await sleep(0)
+        assert len(conn._callbacks) == 0
+        assert conn.in_flight == 0
+        sent = [ujson.loads(frame) for frame in ws.sent]
+        assert sent[0] == {
+            "method": "Page.screencastFrameAck",
+            "params": {"sessionId": 1},
+            "id": _id,
+        }
+        for msg in sent:
+            ws.feed('{"id":%d,"result":{}}' % msg["id"])
+        await sleep(0)
+        stats = conn.stats()
+        assert stats["nowait_sent"] == 2
+        assert stats["nowait_discarded"] == 2
+        assert stats["orphaned_responses"] == 0
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_errors_go_to_hook(self, event_loop: AbstractEventLoop):
+        errors = []
+
+        def hook(error: ProtocolError) -> None:
+            errors.append(error)
+
+        conn = Connection(loop=event_loop, nowait_error_hook=hook)
+        ws = await attach_fake_ws(conn)
+        _id = conn.send_nowait("Runtime.releaseObject", {"objectId": "1"})
+        ws.feed(
+            '{"id":%d,"error":{"code":-32000,"message":"Invalid remote object id"}}'
+            % _id
+        )
+        await sleep(0)
+        assert len(errors) == 1
+        assert str(errors[0]) == (
+            "Protocol Error (Runtime.releaseObject): Invalid remote object id"
+        )
+        stats = conn.stats()
+        assert stats["nowait_errors"] == 1
+        assert len(conn._nowait_methods) == 0
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_flat_session(self, event_loop: AbstractEventLoop):
+        errors = []
+
+        def hook(error: ProtocolError) -> None:
+            errors.append(error)
+
+        conn = Connection(
+            loop=event_loop, flatten_sessions=True, nowait_error_hook=hook
+        )
+        ws = await attach_fake_ws(conn)
+        ws.feed(attached_to_target("S1"))
+        await sleep(0)
+        session = conn.session("S1")
+        first = Page(session).nowait.screencastFrameAck(1)
+        second = session.send_nowait("Input.insertText", {"text": "a"})
+        await sleep(0)
+        assert ujson.loads(ws.sent[0])["sessionId"] == "S1"
+        ws.feed('{"id":%d,"result":{},"sessionId":"S1"}' % first)
+        ws.feed(
+            '{"id":%d,"error":{"code":-32602,"message":"Invalid"},"sessionId":"S1"}'
+            % second
+        )
+        await sleep(0)
+        assert [str(error) for error in errors] == [
+            "Protocol Error (Input.insertText): Invalid"
+        ]
+        assert conn.stats()["nowait_discarded"] == 1
+        await conn.dispose()
+
+
+class TestBatch:
+    @pytest.mark.asyncio
+    async def test_results_are_ordered(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop)
+        ws = await attach_fake_ws(conn)
+        batch = conn.batch()
+        dom = DOM(batch)
+        assert dom.describeNode(nodeId=1) == 0
+        assert batch.send("DOM.describeNode", {"nodeId": 2}) == 1
+        assert batch.send("DOM.describeNode", {"nodeId": 3}) == 2
+        execution = event_loop.create_task(batch.execute())
+        await sleep(0)
+        await sleep(0)
+        assert len(ws.sent) == 3
+        assert conn.stats()["writer_wakeups"] == 1
+        ids = [ujson.loads(frame)["id"] for frame in ws.sent]
+        ws.feed('{"id":%d,"result":{"node":3}}' % ids[2])
+        ws.feed('{"id":%d,"error":{"code":-32000,"message":"No node"}}' % ids[1])
+        ws.feed('{"id":%d,"result":{"node":1}}' % ids[0])
+        results = await execution
+        assert results[0] == {"node": 1}
+        assert isinstance(results[1], ProtocolError)
+        assert results[2] == {"node": 3}
+        assert list(batch.errors) == [1]
+        assert conn.in_flight == 0
+        assert len(conn._callbacks) == 0
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_flat_session_batch_context(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop, flatten_sessions=True)
+        ws = await attach_fake_ws(conn)
+        ws.feed(attached_to_target("S1"))
+        await sleep(0)
+        session = conn.session("S1")
+
+        async def respond():
+            while len(ws.sent) < 2:
+                await sleep(0)
+            for frame in ws.sent:
+                msg = ujson.loads(frame)
+                assert msg["sessionId"] == "S1"
+                ws.feed(
+                    '{"id":%d,"result":{"n":%d},"sessionId":"S1"}'
+                    % (msg["id"], msg["params"]["n"])
+                )
+
+        responder = event_loop.create_task(respond())
+        async with session.batch() as batch:
+            batch.send("Runtime.evaluate", {"n": 1})
+            batch.send("Runtime.evaluate", {"n": 2})
+        await responder
+        assert batch.results == [{"n": 1}, {"n": 2}]
+        assert session.in_flight == 0
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_batch_times_out(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop, max_in_flight=1)
+        ws = await attach_fake_ws(conn)
+        batch = conn.batch(timeout=0.05)
+        batch.send("Page.enable")
+        batch.send("Network.enable")
+        execution = event_loop.create_task(batch.execute())
+        await sleep(0)
+        await sleep(0)
+        ws.feed('{"id":%d,"result":{}}' % ujson.loads(ws.sent[0])["id"])
+        results = await execution
+        assert results[0] == {}
+        assert isinstance(results[1], CommandTimeoutError)
+        assert conn.in_flight == 0
+        assert conn.stats()["commands_timed_out"] == 1
+        await conn.dispose()
+
+
+def received_message(session_id: str, message: str) -> str:
+    return ujson.dumps(
+        {
+            "method": "Target.receivedMessageFromTarget",
+            "params": {
+                "sessionId": session_id,
+                "message": message,
+                "targetId": "T-" + session_id,
+            },
+        }
+    )
+
+
+class TestNonFlatSessions:
+    @pytest.mark.asyncio
+    async def test_detects_flat_session_support(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop, flatten_sessions=None)
+        ws = await attach_fake_ws(conn)
+        for product, expected in (
+            ("HeadlessChrome/79.0.3945.0", True),
+            ("Chrome/70.0.3538.77", False),
+            (None, False),
+        ):
+            detection = event_loop.create_task(conn._supports_flat_sessions())
+            await sleep(0)
+            await sleep(0)
+            _id = ujson.loads(ws.sent[-1])["id"]
+            if product is None:
+                ws.feed('{"id":%d,"error":{"code":-32601,"message":"nope"}}' % _id)
+            else:
+                ws.feed('{"id":%d,"result":{"product":"%s"}}' % (_id, product))
+            assert await detection is expected
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_nested_sessions(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop)
+        ws = await attach_fake_ws(conn)
+        outer = conn._new_session("browser", "S1")
+        conn.add_session(outer)
+        inner = outer.create_session("page", "S2")
+        events = []
+
+        def on_load(event):
+            events.append(event)
+
+        inner.on("Page.loadEventFired", on_load)
+        future = inner.send("Runtime.evaluate", {"expression": "1"})
+        await sleep(0)
+        sent = ujson.loads(ws.sent[0])
+        assert sent["method"] == "Target.sendMessageToTarget"
+        assert sent["params"]["sessionId"] == "S1"
+        wrapped = ujson.loads(sent["params"]["message"])
+        assert wrapped["params"]["sessionId"] == "S2"
+        command = ujson.loads(wrapped["params"]["message"])
+        assert command["method"] == "Runtime.evaluate"
+        # envelopes do not wait for their response
+        assert len(conn._callbacks) == 0
+        assert len(outer._callbacks) == 0
+
+        def to_inner(message: str) -> str:
+            return received_message("S1", received_message("S2", message))
+
+        ws.feed(to_inner('{"method":"Network.dataReceived","params":{}}'))
+        ws.feed(to_inner('{"method":"Page.loadEventFired","params":{"timestamp":1}}'))
+        ws.feed(to_inner('{"id":%d,"result":{"value":1}}' % command["id"]))
+        assert await future == {"value": 1}
+        assert events == [{"timestamp": 1}]
+        assert conn.stats()["events_dropped"] == 1
+        await conn.dispose()
+
+
+def gated_executor() -> Tuple[ThreadPoolExecutor, Event]:
+    """Returns a single thread executor that decodes nothing until the event is set"""
+    executor = ThreadPoolExecutor(1)
+    gate = Event()
+    executor.submit(gate.wait)
+    return executor, gate
+
+
+async def offloaded(conn: Connection) -> None:
+    while conn.stats()["decode_pending"]:
+        await sleep(0.01)
+
+
+class TestOffloadedDecoding:
+    @pytest.mark.asyncio
+    async def test_session_order_is_kept(self, event_loop: AbstractEventLoop):
+        executor, gate = gated_executor()
+        conn = Connection(
+            loop=event_loop,
+            flatten_sessions=True,
+            offload_decode_size=1000,
+            decode_executor=executor,
+        )
+        ws = await attach_fake_ws(conn)
+        ws.feed(attached_to_target("S1"))
+        ws.feed(attached_to_target("S2"))
+        await sleep(0)
+        events = []
+        for session_id in ("S1", "S2"):
+            conn.session(session_id).on(
+                "Page.frameNavigated",
+                lambda event, sid=session_id: events.append((sid, event["n"])),
+            )
+        big = "x" * 1000
+        ws.feed(
+            '{"method":"Page.frameNavigated","params":{"n":1,"big":"%s"},"sessionId":"S1"}'
+            % big
+        )
+        for n in (2, 3):
+            for session_id in ("S1", "S2"):
+                ws.feed(
+                    '{"method":"Page.frameNavigated","params":{"n":%d},"sessionId":"%s"}'
+                    % (n, session_id)
+                )
+        for _ in range(5):
+            await sleep(0)
+        # the other session is not held back by the message being decoded
+        assert events == [("S2", 2), ("S2", 3)]
+        gate.set()
+        await offloaded(conn)
+        assert events[2:] == [("S1", 1), ("S1", 2), ("S1", 3)]
+        stats = conn.stats()
+        assert stats["decodes_offloaded"] == 1
+        assert stats["decode_offloaded_bytes"] > 1000
+        assert stats["decode_messages_held"] == 2
+        await conn.dispose()
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_attach_waits_for_pending_messages(
+        self, event_loop: AbstractEventLoop
+    ):
+        executor, gate = gated_executor()
+        conn = Connection(
+            loop=event_loop,
+            flatten_sessions=True,
+            offload_decode_size=1000,
+            decode_executor=executor,
+        )
+        ws = await attach_fake_ws(conn)
+        order = []
+        conn.on("Network.dataReceived", lambda event: order.append("big"))
+        future = conn.send("Page.captureScreenshot")
+        await sleep(0)
+        _id = ujson.loads(ws.sent[0])["id"]
+        ws.feed(
+            '{"method":"Network.dataReceived","params":{"data":"%s"}}' % ("x" * 1000)
+        )
+        ws.feed('{"id":%d,"result":{"data":"%s"}}' % (_id, "y" * 1000))
+        ws.feed(attached_to_target("S3"))
+        # the session is unknown until its attach is dispatched, its events are kept
+        ws.feed('{"method":"Page.loadEventFired","params":{},"sessionId":"S3"}')
+        for _ in range(5):
+            await sleep(0)
+        assert order == [] and conn.session("S3") is None
+        gate.set()
+        assert (await future)["data"] == "y" * 1000
+        await offloaded(conn)
+        assert order == ["big"]
+        assert conn.session("S3") is not None
+        stats = conn.stats()
+        assert stats["decodes_offloaded"] == 2
+        await conn.dispose()
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_nested_messages(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop, offload_decode_size=1000)
+        ws = await attach_fake_ws(conn)
+        session = conn._new_session("page", "S1")
+        conn.add_session(session)
+        events = []
+        session.on("Page.frameNavigated", lambda event: events.append(event["n"]))
+        big = "x" * 1000
+        ws.feed(
+            received_message(
+                "S1",
+                '{"method":"Page.frameNavigated","params":{"n":1,"big":"%s"}}' % big,
+            )
+        )
+        ws.feed(
+            received_message("S1", '{"method":"Page.frameNavigated","params":{"n":2}}')
+        )
+        await sleep(0)
+        await offloaded(conn)
+        assert events == [1, 2]
+        assert conn.stats()["decodes_offloaded"] == 1
+        await conn.dispose()
+
+
+async def delivered(conn: Connection) -> None:
+    while conn.stats()["event_queue_depth"]:
+        await sleep(0)
+
+
+class TestDeferredEvents:
+    @pytest.mark.asyncio
+    async def test_responses_do_not_wait_for_listeners(
+        self, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(loop=event_loop, defer_events=True)
+        ws = await attach_fake_ws(conn)
+        events = []
+
+        def listener(event) -> None:
+            # outlasts a dispatcher slice so the 100 events take many slices
+            end = perf_counter() + 0.0001
+            while perf_counter() < end:
+                pass
+            events.append(event["n"])
+
+        conn.on("Network.dataReceived", listener)
+        future = conn.send("Page.navigate", {"url": "about:blank"})
+        await sleep(0)
+        _id = ujson.loads(ws.sent[0])["id"]
+        for n in range(100):
+            ws.feed('{"method":"Network.dataReceived","params":{"n":%d}}' % n)
+        ws.feed('{"id":%d,"result":{"frameId":"F"}}' % _id)
+        assert await future == {"frameId": "F"}
+        assert len(events) < 100
+        await delivered(conn)
+        assert events == list(range(100))
+        stats = conn.stats()
+        assert stats["events_delivered"] == 100
+        assert stats["event_lag_max"] > 0
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_queue_is_bounded(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop, defer_events=True, max_event_queue=10)
+        ws = await attach_fake_ws(conn)
+        events = []
+        conn.on("Network.dataReceived", lambda event: events.append(event["n"]))
+        for n in range(50):
+            ws.feed('{"method":"Network.dataReceived","params":{"n":%d}}' % n)
+        while len(events) < 50:
+            await sleep(0)
+        assert events == list(range(50))
+        stats = conn.stats()
+        assert stats["event_queue_peak"] == 10
+        assert stats["event_queue_full_waits"] > 0
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_session_disconnect_follows_its_events(
+        self, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(loop=event_loop, flatten_sessions=True, defer_events=True)
+        ws = await attach_fake_ws(conn)
+        ws.feed(attached_to_target("S1"))
+        await sleep(0)
+        session = conn.session("S1")
+        order = []
+        session.on("Page.loadEventFired", lambda event: order.append("load"))
+        session.on(session.Events.Disconnected, lambda: order.append("disconnected"))
+        ws.feed('{"method":"Page.loadEventFired","params":{},"sessionId":"S1"}')
+        ws.feed('{"method":"Target.detachedFromTarget","params":{"sessionId":"S1"}}')
+        ws.feed('{"method":"Page.loadEventFired","params":{},"sessionId":"S1"}')
+        await sleep(0)
+        await delivered(conn)
+        assert order == ["load", "disconnected"]
+        await conn.dispose()
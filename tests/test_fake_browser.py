@@ -0,0 +1,112 @@
+from asyncio import AbstractEventLoop, Future, sleep
+
+import pytest
+from async_timeout import timeout
+
+from cripy import CDP, Client, Connection, ProtocolError, connect
+from .helpers import FakeBrowser, FakeProtocolError
+
+
+class TestFakeBrowserHTTP:
+    @pytest.mark.asyncio
+    async def test_endpoints(self, event_loop: AbstractEventLoop):
+        async with FakeBrowser(loop=event_loop) as browser:
+            url = browser.http_url
+            version = await CDP.Version(frontend_url=url, loop=event_loop)
+            assert version["webSocketDebuggerUrl"] == browser.ws_url
+            targets = await CDP.List(frontend_url=url, loop=event_loop)
+            assert [target["id"] for target in targets] == [browser.page.id]
+            protocol = await CDP.Protocol(frontend_url=url, loop=event_loop)
+            assert "domains" in protocol
+            new = await CDP.New(
+                url="https://example.com", frontend_url=url, loop=event_loop
+            )
+            assert new["url"] == "https://example.com"
+            status, _ = await CDP.Activate(new["id"], frontend_url=url, loop=event_loop)
+            assert status == 200
+            status, _ = await CDP.Close(new["id"], frontend_url=url, loop=event_loop)
+            assert status == 200
+            assert new["id"] not in browser.targets
+
+
+class TestFakeBrowserProtocol:
+    @pytest.mark.asyncio
+    async def test_connect_and_responders(self, event_loop: AbstractEventLoop):
+        async with FakeBrowser(loop=event_loop) as browser:
+            browser.respond("Runtime.evaluate", {"result": {"type": "number"}})
+
+            def fail(params, channel):
+                raise FakeProtocolError("Cannot navigate to invalid URL")
+
+            browser.respond("Page.navigate", fail)
+            client = await connect(browser.http_url, loop=event_loop)
+            assert isinstance(client, Client)
+            assert client.flatten_sessions
+            assert client.ws_url == browser.page.ws_url
+            result = await client.Runtime.evaluate("1")
+            assert result == {"result": {"type": "number"}}
+            with pytest.raises(ProtocolError):
+                await client.Page.navigate("nope")
+            assert browser.commands["Page.navigate"] == 1
+            await client.dispose()
+
+    @pytest.mark.parametrize("flat", [True, False], ids=["flat", "non-flat"])
+    @pytest.mark.asyncio
+    async def test_sessions(self, flat: bool, event_loop: AbstractEventLoop):
+        async with FakeBrowser(loop=event_loop) as browser:
+            browser.respond(
+                "Test.target", lambda params, channel: {"id": channel.target.id}
+            )
+            conn = Connection(browser.ws_url, flatten_sessions=flat, loop=event_loop)
+            await conn.connect()
+            session = await conn.create_session(browser.page.id)
+            assert session.flat_session == flat
+            assert await session.send("Test.target") == {"id": browser.page.id}
+            loaded = Future(loop=event_loop)
+            session.on("Page.loadEventFired", loaded.set_result)
+            browser.page.emit("Page.loadEventFired", {"timestamp": 1})
+            async with timeout(5):
+                assert await loaded == {"timestamp": 1}
+            closed = Future(loop=event_loop)
+            session.on(session.Events.Disconnected, lambda: closed.set_result(True))
+            await session.detach()
+            async with timeout(5):
+                await closed
+            assert not browser.page.channels
+            await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_event_generator(self, event_loop: AbstractEventLoop):
+        async with FakeBrowser(loop=event_loop) as browser:
+            conn = Connection(browser.page.ws_url, loop=event_loop)
+            await conn.connect()
+            received = []
+            conn.on("Network.dataReceived", lambda event: received.append(event))
+            generator = browser.generate(
+                "Network.dataReceived", rate=2000, payload_size=100, total=50
+            )
+            async with timeout(5):
+                while len(received) < 50:
+                    await sleep(0.01)
+            assert generator.done
+            assert [event["seq"] for event in received] == list(range(50))
+            assert len(received[0]["data"]) == 100
+            await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_strict_and_target_discovery(self, event_loop: AbstractEventLoop):
+        async with FakeBrowser(loop=event_loop, strict=True) as browser:
+            conn = Connection(browser.ws_url, loop=event_loop)
+            await conn.connect()
+            with pytest.raises(ProtocolError):
+                await conn.send("Nope.nope")
+            created = []
+            conn.on("Target.targetCreated", lambda event: created.append(event))
+            await conn.send("Target.setDiscoverTargets", {"discover": True})
+            result = await conn.send("Target.createTarget", {"url": "about:blank"})
+            await sleep(0.01)
+            assert [e["targetInfo"]["targetId"] for e in created] == [
+                browser.page.id,
+                result["targetId"],
+            ]
+            await conn.dispose()
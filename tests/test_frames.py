@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from cripy.frames import frame_has_error, scan_envelope, scan_frame
+
+frames = [
+    ('{"id":12,"result":{}}', (12, None, None)),
+    ('{"id":3,"result":{"sessionId":"A"},"sessionId":"S1"}', (3, None, "S1")),
+    (
+        '{"method":"Network.dataReceived","params":{"dataLength":1}}',
+        (None, "Network.dataReceived", None),
+    ),
+    (
+        '{"method":"Page.loadEventFired","params":{"timestamp":1},"sessionId":"S2"}',
+        (None, "Page.loadEventFired", "S2"),
+    ),
+    (
+        '{"method":"Target.detachedFromTarget","params":{"sessionId":"S3"}}',
+        (None, "Target.detachedFromTarget", None),
+    ),
+    (
+        '{"method":"Log.entryAdded","params":{"text":"a\\",\\"sessionId\\":\\"x"}}',
+        (None, "Log.entryAdded", None),
+    ),
+    ('{"params":{},"method":"Page.loadEventFired"}', None),
+    ('{ "id": 1, "result": {} }', None),
+]
+
+
+class TestScanFrame:
+    @pytest.mark.parametrize("frame,expected", frames)
+    def test_scans_str(self, frame: str, expected):
+        assert scan_frame(frame) == expected
+
+    @pytest.mark.parametrize("frame,expected", frames)
+    def test_scans_bytes(self, frame: str, expected):
+        assert scan_frame(frame.encode("utf-8")) == expected
+
+
+class TestFrameHasError:
+    @pytest.mark.parametrize(
+        "frame,expected",
+        [
+            ('{"id":1,"error":{"code":-32000,"message":"x"}}', True),
+            ('{"id":1,"result":{}}', False),
+            ('{"id":1,"result":{"value":"\\"error\\":"}}', False),
+        ],
+    )
+    def test_detects_errors(self, frame: str, expected: bool):
+        assert frame_has_error(frame) is expected
+        assert frame_has_error(frame.encode("utf-8")) is expected
+
+
+class TestScanEnvelope:
+    @pytest.mark.parametrize("target_id", [',"targetId":"T1"', ""])
+    def test_extracts_message_literal(self, target_id: str):
+        message = json.dumps(
+            {"method": "Log.entryAdded", "params": {"text": '","targetId":"\\'}},
+            separators=(",", ":"),
+        )
+        frame = (
+            '{"method":"Target.receivedMessageFromTarget","params":{"sessionId":"S1",'
+            '"message":%s%s}}' % (json.dumps(message), target_id)
+        )
+        for raw in (frame, frame.encode("utf-8")):
+            session_id, literal = scan_envelope(raw)
+            assert session_id == "S1"
+            assert json.loads(literal) == message
+
+    def test_other_layouts_are_not_scanned(self):
+        assert scan_envelope('{"method":"Page.loadEventFired","params":{}}') is None
+        assert (
+            scan_envelope(
+                '{"method":"Target.receivedMessageFromTarget","params":'
+                '{"sessionId":"S1","message":"{}"},"sessionId":"S0"}'
+            )
+            is None
+        )
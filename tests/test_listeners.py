@@ -0,0 +1,149 @@
+from asyncio import AbstractEventLoop, sleep
+from functools import partial
+from time import perf_counter
+
+import pytest
+import ujson
+
+from cripy import ClientError, Connection, ListenerAccounting
+from cripy.listeners import listener_name
+from .helpers import attach_fake_ws
+
+EVENT = '{"method":"Network.dataReceived","params":{"requestId":"1"}}'
+
+
+def busy(seconds: float, *args) -> None:
+    end = perf_counter() + seconds
+    while perf_counter() < end:
+        pass
+
+
+def quick(event) -> None:
+    pass
+
+
+class TestListenerName:
+    def test_functions_and_partials(self):
+        assert listener_name(quick).startswith("quick (test_listeners.py:")
+        assert listener_name(partial(busy, 0.1)).startswith("busy (")
+        assert listener_name(TestListenerName.test_functions_and_partials).startswith(
+            "TestListenerName.test_functions_and_partials ("
+        )
+
+    def test_callable_without_code(self):
+        assert listener_name(print) == "print"
+
+
+class TestListenerAccounting:
+    @pytest.mark.asyncio
+    async def test_off_by_default(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop)
+        assert conn.listener_accounting is None
+        with pytest.raises(ClientError):
+            conn.listener_report()
+        with pytest.raises(ClientError):
+            Connection(loop=event_loop, listener_accounting="yes")
+
+    @pytest.mark.asyncio
+    async def test_report_and_slow_listeners(self, event_loop: AbstractEventLoop):
+        slow = []
+        accounting = ListenerAccounting(
+            slow_threshold=0.005,
+            on_slow=lambda event, listener, seconds: slow.append((event, listener)),
+        )
+        conn = Connection(loop=event_loop, listener_accounting=accounting)
+        ws = await attach_fake_ws(conn)
+        slow_listener = partial(busy, 0.01)
+        conn.on("Network.dataReceived", quick)
+        conn.on("Network.dataReceived", slow_listener)
+        for _ in range(3):
+            ws.feed(EVENT)
+        await sleep(0.01)
+        report = conn.listener_report(top=1)
+        assert len(report) == 1
+        assert report[0]["event"] == "Network.dataReceived"
+        assert report[0]["listener"].startswith("busy (")
+        assert report[0]["calls"] == report[0]["slow"] == 3
+        assert report[0]["mean"] >= 0.01
+        assert [entry["calls"] for entry in conn.listener_report()] == [3, 3]
+        assert slow == [("Network.dataReceived", slow_listener)] * 3
+        events = accounting.events()["Network.dataReceived"]
+        assert events["calls"] == 6
+        assert events["slow"] == 3
+        accounting.reset()
+        assert conn.listener_report() == []
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_behaves_like_emit(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop, listener_accounting=True)
+        ws = await attach_fake_ws(conn)
+        errors = []
+        received = []
+
+        def failing(event) -> None:
+            raise ValueError("listener failed")
+
+        async def later(event) -> None:
+            received.append("async")
+
+        conn.on("error", lambda error: errors.append(error))
+        conn.once("Network.dataReceived", lambda event: received.append(event))
+        conn.on("Network.dataReceived", failing)
+        conn.on("Network.dataReceived", later)
+        ws.feed(EVENT)
+        ws.feed(EVENT)
+        await sleep(0.01)
+        assert received == [{"requestId": "1"}, "async", "async"]
+        assert [str(error) for error in errors] == ["listener failed"] * 2
+        # the once listener was removed after its first call
+        assert conn.listeners("Network.dataReceived") == [failing, later]
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_session_and_deferred_events(self, event_loop: AbstractEventLoop):
+        conn = Connection(
+            loop=event_loop,
+            flatten_sessions=True,
+            defer_events=True,
+            metrics=True,
+            listener_accounting=True,
+        )
+        ws = await attach_fake_ws(conn)
+        session = conn._new_session("page", "S1")
+        conn.add_session(session)
+        session.on("Page.loadEventFired", quick)
+        ws.feed(
+            ujson.dumps(
+                {"method": "Page.loadEventFired", "params": {}, "sessionId": "S1"}
+            )
+        )
+        await sleep(0.01)
+        assert conn.listener_report()[0]["event"] == "Page.loadEventFired"
+        assert conn.metrics.snapshot()["events"]["Page.loadEventFired"]["count"] == 1
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_failing_slow_callback(self, event_loop: AbstractEventLoop):
+        def on_slow(event, listener, seconds) -> None:
+            raise ValueError("callback failed")
+
+        conn = Connection(
+            loop=event_loop, listener_accounting=ListenerAccounting(0.0, on_slow)
+        )
+        ws = await attach_fake_ws(conn)
+        received = []
+
+        def listener(event) -> None:
+            received.append(event)
+
+        assert conn.on("Network.dataReceived", listener) is listener
+        ws.feed(EVENT)
+        ws.feed(EVENT)
+        await sleep(0.01)
+        # the connection keeps reading and the listener can be removed as usual
+        assert len(received) == 2
+        assert conn.listener_report()[0]["slow"] == 2
+        conn.remove_listener("Network.dataReceived", listener)
+        assert not conn.has_listeners("Network.dataReceived")
+        await conn.dispose()
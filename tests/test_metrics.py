@@ -0,0 +1,139 @@
+from asyncio import AbstractEventLoop, sleep
+
+import pytest
+import ujson
+from async_timeout import timeout
+
+from cripy import Connection, Metrics, MetricsHook, ProtocolError
+from cripy.metrics import Histogram
+from .helpers import attach_fake_ws
+
+
+class RecordingHook(MetricsHook):
+    def __init__(self) -> None:
+        self.commands = []
+        self.events = []
+
+    def on_command(self, method: str, seconds: float, failed: bool) -> None:
+        self.commands.append((method, failed))
+
+    def on_event(self, method: str, listener_seconds: float) -> None:
+        self.events.append(method)
+
+
+class TestHistogram:
+    def test_percentiles_are_bucket_upper_bounds(self):
+        histogram = Histogram()
+        for _ in range(90):
+            histogram.observe(0.0001)  # 100us, bucket upper bound 128us
+        for _ in range(10):
+            histogram.observe(0.01)
+        snapshot = histogram.snapshot()
+        assert snapshot["count"] == 100
+        assert snapshot["min"] == 0.0001
+        assert snapshot["max"] == 0.01
+        assert snapshot["p50"] == snapshot["p90"] == 0.000128
+        assert snapshot["p99"] == 0.01
+        assert snapshot["mean"] == pytest.approx(0.00109)
+
+    def test_empty(self):
+        assert Histogram().snapshot()["p99"] == 0.0
+
+
+class TestConnectionMetrics:
+    @pytest.mark.asyncio
+    async def test_off_by_default(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop)
+        assert conn.metrics is None
+        assert "commands" not in conn.stats()
+
+    @pytest.mark.asyncio
+    async def test_records_commands_events_and_messages(
+        self, event_loop: AbstractEventLoop
+    ):
+        metrics = Metrics(loop_lag_interval=0.001)
+        hook = RecordingHook()
+        metrics.add_hook(hook)
+        conn = Connection(loop=event_loop, flatten_sessions=True, metrics=metrics)
+        ws = await attach_fake_ws(conn)
+        conn.on("Network.dataReceived", lambda event: None)
+        ok = conn.send("Page.enable")
+        failed = conn.send("Page.navigate", {"url": ""})
+        await sleep(0)
+        assert conn.metrics.snapshot()["in_flight"] == 2
+        ids = [ujson.loads(frame)["id"] for frame in ws.sent]
+        ws.feed('{"method":"Network.dataReceived","params":{}}')
+        ws.feed('{"method":"Network.dataReceived","params":{}}')
+        ws.feed('{"id":%d,"result":{}}' % ids[0])
+        ws.feed('{"id":%d,"error":{"code":-32000,"message":"nope"}}' % ids[1])
+        await ok
+        with pytest.raises(ProtocolError):
+            await failed
+        await sleep(0.01)
+        snapshot = metrics.snapshot()
+        assert snapshot["messages_sent"] == 2
+        assert snapshot["bytes_sent"] == sum(len(frame) for frame in ws.sent)
+        assert snapshot["messages_received"] == 4
+        assert snapshot["in_flight"] == 0
+        assert snapshot["commands"]["Page.enable"]["count"] == 1
+        assert snapshot["commands"]["Page.navigate"]["errors"] == 1
+        assert snapshot["events"]["Network.dataReceived"]["count"] == 2
+        assert snapshot["events"]["Network.dataReceived"]["rate"] > 0
+        assert snapshot["decode"]["count"] == 4
+        assert snapshot["listeners"]["count"] == 2
+        assert snapshot["loop_lag"]["count"] > 0
+        assert hook.commands == [("Page.enable", False), ("Page.navigate", True)]
+        assert hook.events == ["Network.dataReceived"] * 2
+        await conn.dispose()
+        assert metrics._lag_task is None
+
+    @pytest.mark.asyncio
+    async def test_session_commands_and_decodes(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop, metrics=True)
+        ws = await attach_fake_ws(conn)
+        session = conn._new_session("page", "S1")
+        conn.add_session(session)
+        future = session.send("Runtime.evaluate", {"expression": "1"})
+        await sleep(0)
+        sent = ujson.loads(ws.sent[0])
+        command = ujson.loads(sent["params"]["message"])
+        ws.feed(
+            ujson.dumps(
+                {
+                    "method": "Target.receivedMessageFromTarget",
+                    "params": {
+                        "sessionId": "S1",
+                        "message": '{"id":%d,"result":{}}' % command["id"],
+                        "targetId": "T1",
+                    },
+                }
+            )
+        )
+        await future
+        snapshot = conn.metrics.snapshot()
+        assert snapshot["commands"]["Runtime.evaluate"]["count"] == 1
+        # the envelope is forwarded without being decoded, the message is decoded by the session
+        assert snapshot["decode"]["count"] == 1
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_failing_hook_keeps_connection_reading(
+        self, event_loop: AbstractEventLoop
+    ):
+        class FailingHook(MetricsHook):
+            def on_message_received(self, size: int) -> None:
+                raise ValueError("hook failed")
+
+        conn = Connection(loop=event_loop, metrics=Metrics(loop_lag_interval=None))
+        conn.metrics.add_hook(FailingHook())
+        hook = RecordingHook()
+        conn.metrics.add_hook(hook)
+        ws = await attach_fake_ws(conn)
+        future = conn.send("Page.enable")
+        await sleep(0)
+        ws.feed('{"id":1,"result":{}}')
+        async with timeout(1):
+            assert await future == {}
+        assert hook.commands == [("Page.enable", False)]
+        assert conn.metrics.messages_received == 1
+        await conn.dispose()
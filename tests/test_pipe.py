@@ -0,0 +1,119 @@
+import os
+import sys
+from asyncio import AbstractEventLoop, sleep
+
+import pytest
+from async_timeout import timeout
+
+from cripy import Connection, ConnectionEvents, PipeTransport, connect_pipe
+from cripy.errors import NetworkError, ProtocolError
+
+PIPE_BROWSER = os.path.join(os.path.dirname(__file__), "helpers", "pipe_browser.py")
+
+
+async def transport_pair(loop: AbstractEventLoop):
+    a_read, b_write = os.pipe()
+    b_read, a_write = os.pipe()
+    a = await PipeTransport.open(a_read, a_write, loop=loop)
+    b = await PipeTransport.open(b_read, b_write, loop=loop)
+    return a, b
+
+
+class TestPipeTransport:
+    @pytest.mark.asyncio
+    async def test_messages_are_nul_delimited(self, event_loop: AbstractEventLoop):
+        read_fd, peer_write = os.pipe()
+        peer_read, write_fd = os.pipe()
+        transport = await PipeTransport.open(read_fd, write_fd, loop=event_loop)
+        await transport.send('{"id":1,"method":"Page.enable","params":{}}')
+        await transport.send(b'{"id":2,"method":"DOM.enable","params":{}}')
+        expected = (
+            b'{"id":1,"method":"Page.enable","params":{}}\0'
+            b'{"id":2,"method":"DOM.enable","params":{}}\0'
+        )
+        received = b""
+        while len(received) < len(expected):
+            received += await event_loop.run_in_executor(None, os.read, peer_read, 1024)
+        assert received == expected
+        os.write(peer_write, b'{"id":1,"result":{}}\0{"id":2,"res')
+        assert await transport.recv() == b'{"id":1,"result":{}}'
+        os.write(peer_write, b'ult":{"v":"\\u0000"}}\0')
+        assert await transport.recv() == b'{"id":2,"result":{"v":"\\u0000"}}'
+        os.close(peer_write)
+        with pytest.raises(ConnectionResetError):
+            await transport.recv()
+        await transport.close()
+        assert transport.closed
+        with pytest.raises(ConnectionResetError):
+            await transport.send("{}")
+        os.close(peer_read)
+
+    @pytest.mark.asyncio
+    async def test_connection_uses_pipe_transport(self, event_loop: AbstractEventLoop):
+        transport, browser = await transport_pair(event_loop)
+        conn = Connection(loop=event_loop, flatten_sessions=True)
+        await conn.connect(transport=transport)
+        events = []
+
+        def on_message(msg):
+            events.append(msg)
+
+        conn.on(ConnectionEvents.AllMessages, on_message)
+        future = conn.send("Runtime.evaluate", {"expression": "1"})
+        assert await browser.recv() == (
+            b'{"method":"Runtime.evaluate","params":{"expression":"1"},"id":1}'
+        )
+        await browser.send('{"method":"Page.loadEventFired","params":{}}')
+        await browser.send('{"id":1,"result":{"result":{"value":1}}}')
+        assert await future == {"result": {"value": 1}}
+        assert events[0] == {"method": "Page.loadEventFired", "params": {}}
+        await browser.close()
+        await sleep(0.01)
+        assert conn._closed
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_oversized_message_disposes_connection(
+        self, event_loop: AbstractEventLoop
+    ):
+        a_read, b_write = os.pipe()
+        b_read, a_write = os.pipe()
+        transport = await PipeTransport.open(a_read, a_write, event_loop, max_size=64)
+        browser = await PipeTransport.open(b_read, b_write, loop=event_loop)
+        conn = Connection(loop=event_loop)
+        await conn.connect(transport=transport)
+        future = conn.send("Page.enable")
+        assert await browser.recv()
+        await browser.send('{"id":1,"result":{"data":"%s"}}' % ("x" * 128))
+        with pytest.raises(NetworkError):
+            async with timeout(1):
+                await future
+        assert conn._closed
+        await conn.dispose()
+        await browser.close()
+
+
+class TestConnectPipe:
+    @pytest.mark.asyncio
+    async def test_connect_pipe_to_launched_browser(
+        self, event_loop: AbstractEventLoop
+    ):
+        client = await connect_pipe(sys.executable, [PIPE_BROWSER], loop=event_loop)
+        assert client.flatten_sessions
+        assert await client.send("Test.echo", {"a": [1, "\u00e9"]}) == {
+            "a": [1, "\u00e9"]
+        }
+        events = []
+
+        def on_event(params):
+            events.append(params)
+
+        client.on("Network.dataReceived", on_event)
+        await client.send(
+            "Test.emit", {"method": "Network.dataReceived", "params": {"v": 1}}
+        )
+        assert events == [{"v": 1}]
+        with pytest.raises(ProtocolError):
+            await client.send("Test.fail")
+        await client.dispose()
+        assert client._closed
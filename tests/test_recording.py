@@ -0,0 +1,149 @@
+from asyncio import AbstractEventLoop, Future, sleep
+from time import perf_counter
+
+import pytest
+import ujson
+
+from cripy import ClientError, Connection, ReplayTransport, WireRecorder
+from cripy.recording import WireRecord, frame_session_id, read_wire_records
+from .helpers import FakeWebSocket
+
+EVENT = '{"method":"Network.dataReceived","params":{"requestId":"1"}}'
+SESSION_EVENT = '{"method":"Page.loadEventFired","params":{},"sessionId":"S1"}'
+
+
+async def record_session(conn: Connection) -> FakeWebSocket:
+    ws = FakeWebSocket(conn.loop)
+    await conn.connect(transport=ws)
+    future = conn.send("Page.enable")
+    await sleep(0)
+    _id = ujson.loads(ws.sent[0])["id"]
+    ws.feed(EVENT)
+    ws.feed(SESSION_EVENT)
+    ws.feed('{"id":%d,"result":{"enabled":true}}' % _id)
+    assert await future == {"enabled": True}
+    await conn.dispose()
+    return ws
+
+
+class TestFrameSessionId:
+    def test_flat_envelope_and_none(self):
+        assert frame_session_id(SESSION_EVENT) == "S1"
+        assert frame_session_id(SESSION_EVENT.encode("utf-8")) == "S1"
+        envelope = ujson.dumps(
+            {
+                "method": "Target.receivedMessageFromTarget",
+                "params": {"sessionId": "S2", "message": "{}", "targetId": "T"},
+            }
+        )
+        assert frame_session_id(envelope) == "S2"
+        assert frame_session_id(EVENT) is None
+
+
+class TestWireRecording:
+    @pytest.mark.asyncio
+    async def test_records_sent_and_received_frames(
+        self, event_loop: AbstractEventLoop, tmp_path
+    ):
+        path = str(tmp_path / "wire.rec")
+        conn = Connection(loop=event_loop, flatten_sessions=True, recorder=path)
+        ws = await record_session(conn)
+        assert conn.recorder.closed
+        assert conn.recorder.records == 4
+        records = list(read_wire_records(path))
+        assert [record.received for record in records] == [False, True, True, True]
+        assert [record.data for record in records[:3]] == [
+            ws.sent[0],
+            EVENT,
+            SESSION_EVENT,
+        ]
+        assert ujson.loads(records[3].data)["result"] == {"enabled": True}
+        assert [record.session_id for record in records] == [None, None, "S1", None]
+        timestamps = [record.timestamp for record in records]
+        assert timestamps == sorted(timestamps)
+
+    def test_binary_frames_and_appending(self, tmp_path):
+        path = str(tmp_path / "wire.rec")
+        recorder = WireRecorder(path)
+        recorder.record(EVENT.encode("utf-8"), True)
+        recorder.close()
+        recorder = WireRecorder(path)
+        recorder.record(EVENT, True)  # appended to the existing recording
+        recorder.close()
+        records = list(read_wire_records(path))
+        assert [record.data for record in records] == [EVENT.encode("utf-8"), EVENT]
+
+    def test_not_a_recording(self, tmp_path):
+        path = tmp_path / "wire.rec"
+        path.write_bytes(b"{}")
+        with pytest.raises(ClientError):
+            list(read_wire_records(str(path)))
+        with pytest.raises(ClientError):
+            Connection(recorder=1)
+
+
+class TestReplayTransport:
+    @pytest.mark.asyncio
+    async def test_replays_recorded_session(
+        self, event_loop: AbstractEventLoop, tmp_path
+    ):
+        path = str(tmp_path / "wire.rec")
+        await record_session(
+            Connection(loop=event_loop, flatten_sessions=True, recorder=path)
+        )
+        conn = Connection(loop=event_loop, flatten_sessions=True)
+        session = conn._new_session("page", "S1")
+        conn.add_session(session)
+        received = []
+        conn.on("Network.dataReceived", lambda event: received.append(event))
+        session.on("Page.loadEventFired", lambda event: received.append("load"))
+        closed = Future(loop=event_loop)
+        conn.on(Connection.Events.Disconnected, lambda: closed.set_result(True))
+        transport = ReplayTransport(path, loop=event_loop)
+        await conn.connect(transport=transport)
+        await sleep(0.01)
+        # the events are held until the command sent before them is sent
+        assert received == []
+        assert await conn.send("Page.enable") == {"enabled": True}
+        assert received == [{"requestId": "1"}, "load"]
+        await closed
+        assert transport.finished
+        assert transport.replayed == 3
+
+    @pytest.mark.asyncio
+    async def test_paced_replay(self, event_loop: AbstractEventLoop):
+        records = [
+            WireRecord(EVENT, True, 0.0),
+            WireRecord(EVENT, True, 0.05),
+            # a second recording appended to the same file restarts at zero
+            WireRecord(EVENT, True, 0.0),
+            WireRecord(EVENT, True, 0.05),
+        ]
+        transport = ReplayTransport(records, speed=1, loop=event_loop)
+        start = perf_counter()
+        for _ in range(4):
+            assert await transport.recv() == EVENT
+        assert perf_counter() - start >= 0.095
+        with pytest.raises(ConnectionError):
+            await transport.recv()
+        assert transport.closed
+        fast = ReplayTransport(records, speed=10, loop=event_loop)
+        start = perf_counter()
+        for _ in range(4):
+            await fast.recv()
+        assert perf_counter() - start < 0.05
+        with pytest.raises(ClientError):
+            ReplayTransport(records, speed=0)
+
+    @pytest.mark.asyncio
+    async def test_stay_open(self, event_loop: AbstractEventLoop):
+        transport = ReplayTransport(
+            [WireRecord(EVENT, True, 0.0)], stay_open=True, loop=event_loop
+        )
+        assert await transport.recv() == EVENT
+        recv = event_loop.create_task(transport.recv())
+        await sleep(0.01)
+        assert not recv.done()
+        await transport.close()
+        with pytest.raises(ConnectionError):
+            await recv
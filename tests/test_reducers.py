@@ -0,0 +1,108 @@
+from asyncio import AbstractEventLoop, sleep
+
+import pytest
+from async_timeout import timeout
+
+from cripy import ClientError, Connection, EventReducer
+from cripy.reducers import count, latest, total
+from .helpers import attach_fake_ws
+
+
+def data_received(request_id: str, length: int, session_id: str = "S1") -> str:
+    return (
+        '{"method":"Network.dataReceived","params":{"requestId":"%s","dataLength":%d},'
+        '"sessionId":"%s"}' % (request_id, length, session_id)
+    )
+
+
+async def attach_session(conn: Connection):
+    ws = await attach_fake_ws(conn)
+    ws.feed(
+        '{"method":"Target.attachedToTarget","params":{"sessionId":"S1",'
+        '"targetInfo":{"type":"page"},"waitingForDebugger":false}}'
+    )
+    await sleep(0)
+    return ws, conn.session("S1")
+
+
+class TestEventReducer:
+    @pytest.mark.asyncio
+    async def test_flush_on_demand(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop, flatten_sessions=True)
+        ws, session = await attach_session(conn)
+        flushed = []
+        received = session.reduce(
+            "Network.dataReceived",
+            total("dataLength"),
+            key=lambda event: event["requestId"],
+            on_flush=lambda states: flushed.append(states),
+        )
+        assert isinstance(received, EventReducer)
+        methods = session.reduce("Network.*", count, key=lambda event: event[0])
+        for request_id, length in (("1", 10), ("2", 5), ("1", 20)):
+            ws.feed(data_received(request_id, length))
+        ws.feed(
+            '{"method":"Network.loadingFinished","params":{"requestId":"1"},"sessionId":"S1"}'
+        )
+        await sleep(0)
+        assert received.flush() == {"1": 30, "2": 5}
+        assert flushed == [{"1": 30, "2": 5}]
+        assert received.states == {}
+        # nothing folded since, the callback is not called
+        assert received.flush() == {}
+        assert received.flushes == 1
+        assert received.events == 3
+        assert methods.close() == {
+            "Network.dataReceived": 3,
+            "Network.loadingFinished": 1,
+        }
+        received.close()
+        assert len(session._subscriptions) == 0
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_flush_interval_and_disconnect(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop, flatten_sessions=True)
+        ws, session = await attach_session(conn)
+        flushed = []
+        reducer = session.reduce(
+            "Network.dataReceived",
+            latest,
+            key=lambda event: event["requestId"],
+            on_flush=lambda states: flushed.append(states),
+            interval=0.01,
+            where={"dataLength": lambda length: length > 0},
+        )
+        lengths = session.reduce(
+            "Network.dataReceived",
+            lambda state, event: state + [event["dataLength"]],
+            initial=list,
+        )
+        ws.feed(data_received("1", 1))
+        ws.feed(data_received("1", 0))
+        ws.feed(data_received("1", 2))
+        async with timeout(1):
+            while not flushed:
+                await sleep(0.005)
+        assert flushed == [{"1": {"requestId": "1", "dataLength": 2}}]
+        ws.feed(data_received("2", 3))
+        ws.feed('{"method":"Target.detachedFromTarget","params":{"sessionId":"S1"}}')
+        await sleep(0)
+        assert reducer.closed
+        assert flushed[-1] == {"2": {"requestId": "2", "dataLength": 3}}
+        assert lengths.closed
+        assert lengths.states == {}
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_errors(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop)
+        with pytest.raises(ClientError):
+            conn.reduce("Network.dataReceived", count, interval=0)
+        failures = []
+        conn.on("error", lambda error: failures.append(error))
+        reducer = conn.reduce("Network.dataReceived", count, on_flush=lambda s: 1 / 0)
+        reducer._reduce({"requestId": "1"})
+        assert reducer.close() == {None: 1}
+        assert isinstance(failures[0], ZeroDivisionError)
+        await conn.dispose()
@@ -0,0 +1,52 @@
+import pytest
+
+from cripy import ClientError, Priority
+from cripy.scheduler import OutboundScheduler
+
+
+def drain(scheduler: OutboundScheduler):
+    frames = []
+    while scheduler:
+        frames.append(scheduler.pop())
+    return frames
+
+
+class TestOutboundScheduler:
+    def test_sessions_are_served_round_robin(self):
+        scheduler = OutboundScheduler()
+        for i in range(3):
+            scheduler.push(f"a{i}", "A")
+        scheduler.push("b0", "B")
+        scheduler.push("c0", None)
+        scheduler.push("b1", "B")
+        assert len(scheduler) == 6
+        assert drain(scheduler) == ["a0", "b0", "c0", "a1", "b1", "a2"]
+        assert scheduler.peak == 6
+
+    def test_higher_priority_lanes_are_served_first(self):
+        scheduler = OutboundScheduler()
+        scheduler.push("bulk", "A", Priority.Bulk)
+        scheduler.push("normal", "A")
+        scheduler.push("interactive", "B", Priority.Interactive)
+        assert drain(scheduler) == ["interactive", "normal", "bulk"]
+        stats = scheduler.stats()
+        for lane in ("interactive", "normal", "bulk"):
+            assert stats[f"lane_{lane}_sent"] == 1
+            assert stats[f"lane_{lane}_queued"] == 0
+            assert stats[f"lane_{lane}_wait_time_max"] >= 0
+
+    def test_unknown_priority(self):
+        scheduler = OutboundScheduler()
+        for priority in (-1, 3, None):
+            with pytest.raises(ClientError):
+                scheduler.push("a", "A", priority)
+        assert not scheduler
+
+    def test_clear(self):
+        scheduler = OutboundScheduler()
+        scheduler.push("a", "A", Priority.Bulk)
+        scheduler.push("b", None)
+        scheduler.clear()
+        assert not scheduler
+        scheduler.push("c", "A", Priority.Bulk)
+        assert drain(scheduler) == ["c"]
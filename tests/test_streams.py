@@ -0,0 +1,133 @@
+from asyncio import AbstractEventLoop, sleep
+
+import pytest
+from async_timeout import timeout
+
+from cripy import ClientError, Connection, EventStream, StreamPolicy
+from .helpers import attach_fake_ws
+
+
+def data_received(request_id: str, length: int, session_id: str = None) -> str:
+    msg = '{"method":"Network.dataReceived","params":{"requestId":"%s","dataLength":%d}'
+    msg %= (request_id, length)
+    if session_id is not None:
+        msg += ',"sessionId":"%s"' % session_id
+    return msg + "}"
+
+
+class TestEventStream:
+    @pytest.mark.asyncio
+    async def test_drop_oldest(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop)
+        ws = await attach_fake_ws(conn)
+        async with conn.stream("Network.dataReceived", maxsize=2) as stream:
+            assert isinstance(stream, EventStream)
+            for n in range(4):
+                ws.feed(data_received("1", n))
+            await sleep(0)
+            received = []
+            async with timeout(1):
+                async for event in stream:
+                    received.append(event["dataLength"])
+                    if stream.depth == 0:
+                        break
+            assert received == [2, 3]
+            stats = stream.stats()
+            assert stats["received"] == 4
+            assert stats["delivered"] == 2
+            assert stats["dropped"] == 2
+            assert stats["peak"] == 2
+            assert stats["lag_max"] >= stats["lag_mean"] > 0
+        assert stream.closed
+        assert len(conn._subscriptions) == 0
+        assert not conn.has_listeners(conn.Events.Disconnected)
+        ws.feed(data_received("1", 5))
+        await sleep(0)
+        assert conn.stats()["events_dropped"] == 1
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_coalesce(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop)
+        ws = await attach_fake_ws(conn)
+        by_request = conn.stream(
+            "Network.dataReceived",
+            policy=StreamPolicy.Coalesce,
+            key=lambda event: event["requestId"],
+        )
+        latest = conn.stream("Network.*", policy="coalesce")
+        wildcard = conn.stream(
+            "Network.*", policy="coalesce", key=lambda event: event[1]["requestId"]
+        )
+        for request_id, length in (("1", 1), ("2", 2), ("1", 3)):
+            ws.feed(data_received(request_id, length))
+        await sleep(0)
+        async with timeout(1):
+            assert await by_request.__anext__() == {"requestId": "1", "dataLength": 3}
+            assert await by_request.__anext__() == {"requestId": "2", "dataLength": 2}
+            method, event = await latest.__anext__()
+        assert method == "Network.dataReceived"
+        assert event["dataLength"] == 3
+        assert by_request.stats()["coalesced"] == 1
+        assert latest.stats()["coalesced"] == 2
+        assert wildcard.stats()["coalesced"] == 1
+        by_request.close()
+        latest.close()
+        wildcard.close()
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_block_stops_reading(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop)
+        ws = await attach_fake_ws(conn)
+        stream = conn.stream("Network.dataReceived", maxsize=1, policy="block")
+        for n in range(4):
+            ws.feed(data_received("1", n))
+        await sleep(0.01)
+        assert stream.depth == 2
+        assert ws._incoming.qsize() == 2
+        async with timeout(1):
+            assert (await stream.__anext__())["dataLength"] == 0
+            assert (await stream.__anext__())["dataLength"] == 1
+            await sleep(0.01)
+            assert ws._incoming.qsize() == 0
+            assert [(await stream.__anext__())["dataLength"] for _ in range(2)] == [
+                2,
+                3,
+            ]
+        assert stream.stats()["dropped"] == 0
+        # blocked once reading the second event and once reading the fourth
+        assert stream.stats()["full_waits"] == 2
+        stream.close()
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_session_stream_ends_on_disconnect(
+        self, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(loop=event_loop, flatten_sessions=True)
+        ws = await attach_fake_ws(conn)
+        ws.feed(
+            '{"method":"Target.attachedToTarget","params":{"sessionId":"S1",'
+            '"targetInfo":{"type":"page"},"waitingForDebugger":false}}'
+        )
+        await sleep(0)
+        session = conn.session("S1")
+        stream = session.stream(
+            "Network.dataReceived", where={"dataLength": lambda n: n > 0}
+        )
+        for n in range(3):
+            ws.feed(data_received("1", n, "S1"))
+        ws.feed('{"method":"Target.detachedFromTarget","params":{"sessionId":"S1"}}')
+        async with timeout(1):
+            assert [event["dataLength"] async for event in stream] == [1, 2]
+        assert stream.closed
+        assert len(session._subscriptions) == 0
+        await conn.dispose()
+
+    def test_invalid_arguments(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop)
+        with pytest.raises(ClientError):
+            conn.stream("Network.dataReceived", policy="drop_newest")
+        with pytest.raises(ClientError):
+            conn.stream("Network.dataReceived", maxsize=0)
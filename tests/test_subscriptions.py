@@ -0,0 +1,314 @@
+import re
+from asyncio import AbstractEventLoop, sleep
+
+import pytest
+import ujson
+from async_timeout import timeout
+
+from cripy import ClientError, Connection, EventTimeoutError, SessionEvent
+from cripy.protocol.network import Network
+from cripy.protocol.page import Page
+from cripy.subscriptions import DispatchTable, compile_where
+from .helpers import attach_fake_ws
+
+
+def response_received(request_id: str, type_: str, status: int) -> str:
+    return (
+        '{"method":"Network.responseReceived","params":{"requestId":"%s","type":"%s",'
+        '"response":{"status":%d,"url":"https://example.com/%s"}}}'
+        % (request_id, type_, status, request_id)
+    )
+
+
+class TestCompileWhere:
+    def test_values(self):
+        params = {"type": "Document", "response": {"status": 404, "url": "a.css"}}
+        assert compile_where({"type": "Document"})(params)
+        assert not compile_where({"type": "Script"})(params)
+        assert not compile_where({"missing": None})(params)
+        assert compile_where({"type": {"Document", "Script"}})(params)
+        assert compile_where({"response.status": lambda status: status >= 400})(params)
+        assert compile_where({"response.url": re.compile(r"\.css$")})(params)
+        assert not compile_where({"response.url.nope": 1})(params)
+        assert not compile_where({"type": "Document", "response.status": 200})(params)
+        assert compile_where(lambda p: p["type"] == "Document")(params)
+
+    def test_unsupported(self):
+        with pytest.raises(ClientError):
+            compile_where({})
+        with pytest.raises(ClientError):
+            compile_where("type == Document")
+
+
+class TestDispatchTable:
+    def test_wants_and_matching(self, event_loop: AbstractEventLoop):
+        table = DispatchTable()
+        assert not table.wants("Network.dataReceived")
+        remove_exact = table.subscribe(event_loop, "Network.dataReceived", print)
+        remove_domain = table.subscribe(event_loop, "Network.*", print)
+        assert table.wants("Network.dataReceived")
+        assert table.wants("Network.responseReceived")
+        assert not table.wants("Page.loadEventFired")
+        assert [s.pattern for s in table.matching("Network.dataReceived")] == [
+            "Network.dataReceived",
+            "Network.*",
+        ]
+        remove_all = table.subscribe(event_loop, "*", print)
+        assert table.wants("Page.loadEventFired")
+        assert len(table) == 3
+        for remove in (remove_exact, remove_domain, remove_all):
+            remove()
+        assert len(table) == 0
+        assert not table.wants("Network.dataReceived")
+
+
+class TestSubscriptions:
+    @pytest.mark.asyncio
+    async def test_predicates_and_wildcards(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop)
+        ws = await attach_fake_ws(conn)
+        documents = []
+        errors = []
+        network = []
+        conn.subscribe(
+            "Network.responseReceived",
+            lambda event: documents.append(event["requestId"]),
+            where={"type": "Document"},
+        )
+        conn.subscribe(
+            "Network.responseReceived",
+            lambda event: errors.append(event["requestId"]),
+            where={"response.status": lambda status: status >= 400},
+        )
+        remove = conn.subscribe(
+            "Network.*", lambda method, event: network.append(method)
+        )
+        ws.feed(response_received("1", "Document", 200))
+        ws.feed(response_received("2", "Script", 404))
+        ws.feed('{"method":"Network.dataReceived","params":{"requestId":"1"}}')
+        ws.feed('{"method":"Page.loadEventFired","params":{"timestamp":1}}')
+        await sleep(0)
+        assert documents == ["1"]
+        assert errors == ["2"]
+        assert network == [
+            "Network.responseReceived",
+            "Network.responseReceived",
+            "Network.dataReceived",
+        ]
+        remove()
+        ws.feed('{"method":"Network.dataReceived","params":{"requestId":"2"}}')
+        await sleep(0)
+        assert len(network) == 3
+        stats = conn.stats()
+        assert stats["events_unobserved"] == 2
+        assert stats["events_dropped"] == 2
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_futures_once_and_errors(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop)
+        ws = await attach_fake_ws(conn)
+        failures = []
+        conn.on("error", lambda error: failures.append(error))
+        script = conn.subscribe(
+            "Network.responseReceived", where={"type": {"Script", "Stylesheet"}}
+        )
+        anything = conn.subscribe("*")
+        once = []
+        conn.subscribe(
+            "Network.responseReceived",
+            lambda event: once.append(event["requestId"]),
+            once=True,
+        )
+        conn.subscribe("Network.responseReceived", lambda event: 1 / 0)
+        ws.feed(response_received("1", "Document", 200))
+        ws.feed(response_received("2", "Script", 200))
+        async with timeout(1):
+            event = await script
+            method, first = await anything
+        assert event["requestId"] == "2"
+        assert method == "Network.responseReceived"
+        assert first["requestId"] == "1"
+        assert once == ["1"]
+        assert len(failures) == 2
+        assert all(isinstance(error, ZeroDivisionError) for error in failures)
+        assert len(conn._subscriptions) == 1
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_sessions_and_generated_helpers(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop, flatten_sessions=True)
+        ws = await attach_fake_ws(conn)
+        ws.feed(
+            '{"method":"Target.attachedToTarget","params":{"sessionId":"S1",'
+            '"targetInfo":{"type":"page"},"waitingForDebugger":false}}'
+        )
+        await sleep(0)
+        session = conn.session("S1")
+        network = Network(session)
+        large = []
+        network.dataReceived(
+            lambda event: large.append(event["dataLength"]),
+            where={"dataLength": lambda length: length > 10},
+        )
+        future = network.dataReceived(where={"dataLength": 1})
+        ws.feed(
+            '{"method":"Network.dataReceived","params":{"dataLength":100},"sessionId":"S1"}'
+        )
+        ws.feed(
+            '{"method":"Network.dataReceived","params":{"dataLength":1},"sessionId":"S1"}'
+        )
+        ws.feed('{"method":"Network.dataReceived","params":{"dataLength":1}}')
+        async with timeout(1):
+            assert await future == {"dataLength": 1}
+        assert large == [100]
+        assert conn.stats()["events_dropped"] == 1
+        await conn.dispose()
+
+
+class TestWaitFor:
+    @pytest.mark.asyncio
+    async def test_indexed_waiters(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop)
+        ws = await attach_fake_ws(conn)
+        waiters = {
+            str(n): conn.wait_for("Network.responseReceived", {"requestId": str(n)})
+            for n in range(1000)
+        }
+        errors = conn.wait_for(
+            "Network.responseReceived",
+            {"requestId": "7", "response.status": lambda status: status >= 400},
+        )
+        table = conn._subscriptions
+        assert len(table) == 1001
+        # only the waiters of the request id the event is for are checked
+        assert list(table._waiters["Network.responseReceived"].indexed) == ["requestId"]
+        ws.feed(response_received("7", "Document", 200))
+        ws.feed(response_received("7", "Document", 404))
+        ws.feed(response_received("8", "Script", 200))
+        async with timeout(1):
+            assert (await waiters["7"])["response"]["status"] == 200
+            assert (await errors)["response"]["status"] == 404
+            assert (await waiters["8"])["type"] == "Script"
+        await sleep(0)
+        assert len(table) == 998
+        for future in waiters.values():
+            future.cancel()
+        await sleep(0)
+        assert len(table) == 0
+        assert not table.wants("Network.responseReceived")
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_predicates_timeouts_and_cancellation(
+        self, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(loop=event_loop)
+        ws = await attach_fake_ws(conn)
+        with pytest.raises(EventTimeoutError):
+            await conn.wait_for("Page.loadEventFired", timeout=0.01)
+        loaded = conn.wait_for(
+            "Page.loadEventFired", lambda event: event["timestamp"] > 1
+        )
+        failing = conn.wait_for("Page.loadEventFired", lambda event: event["nope"])
+        ws.feed('{"method":"Page.loadEventFired","params":{"timestamp":1}}')
+        ws.feed('{"method":"Page.loadEventFired","params":{"timestamp":2}}')
+        async with timeout(1):
+            assert await loaded == {"timestamp": 2}
+            with pytest.raises(KeyError):
+                await failing
+        # the one-shot future form of the generated event helpers waits the same way
+        page = Page(conn)
+        cancelled = page.loadEventFired()
+        cancelled.cancel()
+        await sleep(0)
+        assert len(conn._subscriptions) == 0
+        assert conn.stats()["events_dropped"] == 0
+        ws.feed('{"method":"Page.loadEventFired","params":{"timestamp":3}}')
+        await sleep(0)
+        assert conn.stats()["events_dropped"] == 1
+        with pytest.raises(ClientError):
+            conn.wait_for("Page.*")
+        await conn.dispose()
+
+
+class TestSessionSubscriptions:
+    @pytest.mark.asyncio
+    async def test_events_of_every_session(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop, flatten_sessions=True)
+        ws = await attach_fake_ws(conn)
+        responses = []
+        workers = []
+        remove = conn.subscribe_sessions(
+            "Network.responseReceived",
+            lambda event: responses.append(
+                (event.session_id, event.target_type, event.params["requestId"])
+            ),
+            where={"type": "Document"},
+        )
+        conn.subscribe_sessions(
+            "Runtime.*",
+            lambda event: workers.append((event.session_id, event.method)),
+            target_types=["service_worker"],
+        )
+        for session_id, target_type in (("S1", "page"), ("S2", "service_worker")):
+            ws.feed(
+                '{"method":"Target.attachedToTarget","params":{"sessionId":"%s",'
+                '"targetInfo":{"type":"%s"},"waitingForDebugger":false}}'
+                % (session_id, target_type)
+            )
+        await sleep(0)
+        for session_id in ("S1", "S2"):
+            ws.feed(
+                '{"method":"Network.responseReceived","params":{"requestId":"1",'
+                '"type":"Document"},"sessionId":"%s"}' % session_id
+            )
+            ws.feed(
+                '{"method":"Runtime.consoleAPICalled","params":{},"sessionId":"%s"}'
+                % session_id
+            )
+        # events of the connection itself are not fanned in
+        ws.feed(response_received("2", "Document", 200))
+        await sleep(0)
+        assert responses == [("S1", "page", "1"), ("S2", "service_worker", "1")]
+        assert workers == [("S2", "Runtime.consoleAPICalled")]
+        assert not conn.session("S1").has_listeners("Network.responseReceived")
+        remove()
+        ws.feed(
+            '{"method":"Network.responseReceived","params":{"requestId":"3",'
+            '"type":"Document"},"sessionId":"S1"}'
+        )
+        await sleep(0)
+        assert len(responses) == 2
+        # the event of the connection and the response no one observes anymore
+        assert conn.stats()["events_dropped"] == 2
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    async def test_nested_non_flat_sessions(self, event_loop: AbstractEventLoop):
+        conn = Connection(loop=event_loop)
+        ws = await attach_fake_ws(conn)
+        outer = conn._new_session("browser", "S1")
+        conn.add_session(outer)
+        inner = outer.create_session("page", "S2")
+        events = []
+        conn.subscribe_sessions("Page.*", lambda event: events.append(event))
+
+        def wrap(session_id: str, message: str) -> str:
+            return ujson.dumps(
+                {
+                    "method": "Target.receivedMessageFromTarget",
+                    "params": {"sessionId": session_id, "message": message},
+                }
+            )
+
+        ws.feed(wrap("S1", '{"method":"Network.dataReceived","params":{}}'))
+        ws.feed(wrap("S1", wrap("S2", '{"method":"Page.loadEventFired","params":{}}')))
+        await sleep(0)
+        assert len(events) == 1
+        assert isinstance(events[0], SessionEvent)
+        assert events[0].session is inner
+        assert (events[0].session_id, events[0].target_type) == ("S2", "page")
+        assert events[0].method == "Page.loadEventFired"
+        assert conn.stats()["events_dropped"] == 1
+        await conn.dispose()
@@ -0,0 +1,287 @@
+import re
+from asyncio import AbstractEventLoop, sleep
+from base64 import b64encode
+from hashlib import sha1
+from typing import Any, List
+
+import pytest
+import websockets
+from async_timeout import timeout
+from ujson import dumps, loads
+
+from cripy import ClientError, Connection, Deflate, NetworkError
+from cripy.compression import get_compression
+from cripy.transport import (
+    WS_GUID,
+    RawWebSocketTransport,
+    WebSocketsTransport,
+    available_transports,
+    get_transport,
+)
+
+transport_names = sorted(available_transports())
+
+
+async def cdp_server(ws: Any, path: str) -> None:
+    """Answers every command with its params, the Test.* commands
+    make the server misbehave"""
+    try:
+        async for frame in ws:
+            msg = loads(frame)
+            method = msg["method"]
+            if method == "Test.fragmented":
+                text = dumps({"id": msg["id"], "result": msg["params"]})
+                await ws.send([text[:10], text[10:20], text[20:]])
+            elif method == "Test.chunked":
+                data = dumps({"id": msg["id"], "result": msg["params"]}).encode()
+                await ws.send([data[i : i + 100] for i in range(0, len(data), 100)])
+            elif method == "Test.burst":
+                for i in range(msg["params"]["count"]):
+                    await ws.send(dumps({"method": "Test.event", "params": {"i": i}}))
+                await ws.send(dumps({"id": msg["id"], "result": {}}))
+            elif method == "Test.close":
+                await ws.close()
+            else:
+                await ws.send(dumps({"id": msg["id"], "result": msg["params"]}))
+    except websockets.ConnectionClosed:
+        pass
+
+
+class FakeSocket:
+    """Stands in for the socket transport of a RawWebSocketTransport"""
+
+    def __init__(self) -> None:
+        self.written: List[bytes] = []
+        self.closed = False
+
+    def write(self, data: bytes) -> None:
+        self.written.append(data)
+
+    def writelines(self, data: List[bytes]) -> None:
+        self.written.append(b"".join(data))
+
+    def is_closing(self) -> bool:
+        return self.closed
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def server_frame(payload: bytes) -> bytes:
+    return bytes([0x81, len(payload)]) + payload
+
+
+@pytest.fixture
+async def ws_url(event_loop: AbstractEventLoop):
+    server = await websockets.serve(
+        cdp_server, "127.0.0.1", 0, max_size=None, loop=event_loop
+    )
+    yield f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}/devtools/browser/1"
+    server.close()
+    await server.wait_closed()
+
+
+class TestTransports:
+    def test_get_transport(self):
+        assert get_transport() is WebSocketsTransport
+        assert get_transport("raw") is RawWebSocketTransport
+        assert get_transport(RawWebSocketTransport) is RawWebSocketTransport
+        with pytest.raises(ClientError):
+            get_transport("nope")
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("name", transport_names)
+    async def test_connection_over_transport(
+        self, name: str, ws_url: str, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(ws_url, loop=event_loop, websocket_transport=name)
+        await conn.connect(flatten_sessions=True)
+        assert isinstance(conn._ws, get_transport(name))
+        big = "éx" * 100000
+        assert await conn.send("Test.echo", {"v": 1}) == {"v": 1}
+        assert await conn.send("Test.echo", {"v": big}) == {"v": big}
+        assert await conn.send("Test.fragmented", {"v": "abcdefghijklmn"}) == {
+            "v": "abcdefghijklmn"
+        }
+        await conn.dispose()
+        assert conn._ws.closed
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("name", transport_names)
+    async def test_remote_close_closes_connection(
+        self, name: str, ws_url: str, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(ws_url, loop=event_loop, websocket_transport=name)
+        await conn.connect(flatten_sessions=True)
+        conn.send_nowait("Test.close")
+        for _ in range(100):
+            if conn._closed:
+                break
+            await sleep(0.01)
+        assert conn._closed
+        await conn.dispose()
+
+
+class TestRawWebSocketTransport:
+    @pytest.mark.asyncio
+    async def test_receives_bytes_and_pauses_reading(
+        self, ws_url: str, event_loop: AbstractEventLoop
+    ):
+        ws = await RawWebSocketTransport.connect(ws_url, event_loop, max_queue=4)
+        await ws.send('{"id":1,"method":"Test.burst","params":{"count":50}}')
+        for _ in range(100):
+            if ws._paused:
+                break
+            await sleep(0.01)
+        assert ws._paused
+        for i in range(50):
+            assert await ws.recv() == b'{"method":"Test.event","params":{"i":%d}}' % i
+        assert await ws.recv() == b'{"id":1,"result":{}}'
+        assert not ws._paused
+        await ws.close()
+        assert ws.closed
+        with pytest.raises(ConnectionResetError):
+            await ws.recv()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("with_response", [True, False])
+    async def test_frames_received_during_handshake_keep_their_order(
+        self, with_response: bool, event_loop: AbstractEventLoop
+    ):
+        ws = RawWebSocketTransport(event_loop)
+        socket = FakeSocket()
+        ws.connection_made(socket)
+        handshake = event_loop.create_task(ws._do_handshake("localhost", "/"))
+        await sleep(0)
+        key = re.search(rb"Sec-WebSocket-Key: (\S+)", socket.written[0]).group(1)
+        accept = b64encode(sha1(key + WS_GUID).digest())
+        response = (
+            b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+            b"Connection: Upgrade\r\nSec-WebSocket-Accept: %s\r\n\r\n" % accept
+        )
+        if with_response:
+            ws.data_received(response + server_frame(b"1"))
+        else:
+            ws.data_received(response)
+            ws.data_received(server_frame(b"1"))
+        # received before the handshake task resumes
+        ws.data_received(server_frame(b"2"))
+        async with timeout(1):
+            await handshake
+            assert await ws.recv() == b"1"
+            assert await ws.recv() == b"2"
+
+    @pytest.mark.asyncio
+    async def test_max_size_closes(self, ws_url: str, event_loop: AbstractEventLoop):
+        ws = await RawWebSocketTransport.connect(ws_url, event_loop, max_size=1000)
+        await ws.send(dumps({"id": 1, "method": "Test.echo", "params": {"v": 1}}))
+        assert await ws.recv() == b'{"id":1,"result":{"v":1}}'
+        await ws.send(
+            dumps({"id": 2, "method": "Test.echo", "params": {"v": "a" * 2000}})
+        )
+        with pytest.raises(ConnectionResetError):
+            await ws.recv()
+        assert ws.closed
+
+    @pytest.mark.asyncio
+    async def test_max_size_closes_on_fragments(
+        self, ws_url: str, event_loop: AbstractEventLoop
+    ):
+        ws = await RawWebSocketTransport.connect(ws_url, event_loop, max_size=1000)
+        await ws.send(dumps({"id": 1, "method": "Test.chunked", "params": {"v": 1}}))
+        assert await ws.recv() == b'{"id":1,"result":{"v":1}}'
+        await ws.send(
+            dumps({"id": 2, "method": "Test.chunked", "params": {"v": "a" * 2000}})
+        )
+        async with timeout(1):
+            with pytest.raises(ConnectionResetError):
+                await ws.recv()
+        assert ws.closed
+
+
+class TestCompression:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("name", ["raw", "websockets"])
+    async def test_compressed_messages_are_counted(
+        self, name: str, ws_url: str, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(
+            ws_url,
+            loop=event_loop,
+            websocket_transport=name,
+            compression=Deflate(level=9, client_max_window_bits=12),
+        )
+        await conn.connect(flatten_sessions=True)
+        snapshot = {
+            "nodes": [{"nodeName": "DIV", "attributes": ["class", "row"]}] * 5000
+        }
+        assert await conn.send("Test.echo", snapshot) == snapshot
+        assert await conn.send("Test.fragmented", {"v": "abcdefghijklmn"}) == {
+            "v": "abcdefghijklmn"
+        }
+        stats = conn.stats()
+        assert stats["compression_messages_received"] == 2
+        assert stats["compression_messages_sent"] == 2
+        assert stats["compression_received_raw"] > len(dumps(snapshot))
+        assert stats["compression_received_ratio"] < 0.05
+        assert stats["compression_sent_wire"] < stats["compression_sent_raw"] / 20
+        await conn.dispose()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("name", ["raw", "websockets"])
+    async def test_declined_compression(self, name: str, event_loop: AbstractEventLoop):
+        server = await websockets.serve(
+            cdp_server, "127.0.0.1", 0, compression=None, loop=event_loop
+        )
+        port = server.sockets[0].getsockname()[1]
+        conn = Connection(
+            f"ws://127.0.0.1:{port}",
+            loop=event_loop,
+            websocket_transport=name,
+            compression=True,
+        )
+        await conn.connect(flatten_sessions=True)
+        assert await conn.send("Test.echo", {"v": 1}) == {"v": 1}
+        assert "compression_received_raw" not in conn.stats()
+        await conn.dispose()
+        server.close()
+        await server.wait_closed()
+
+    @pytest.mark.asyncio
+    async def test_aiohttp_rejects_compression(
+        self, ws_url: str, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(
+            ws_url, loop=event_loop, websocket_transport="aiohttp", compression=True
+        )
+        with pytest.raises(ClientError):
+            await conn.connect()
+
+    @pytest.mark.asyncio
+    async def test_aiohttp_error_disposes_connection(
+        self, ws_url: str, event_loop: AbstractEventLoop
+    ):
+        conn = Connection(
+            ws_url, loop=event_loop, websocket_transport="aiohttp", max_message_size=64,
+        )
+        await conn.connect(flatten_sessions=True)
+        # the echoed response is larger than the maximum size of a message
+        with pytest.raises(NetworkError):
+            async with timeout(1):
+                await conn.send("Test.echo", {"v": "x" * 128})
+        assert conn._closed
+        await conn.dispose()
+
+    def test_deflate_options(self):
+        assert get_compression(None) is None
+        assert get_compression(False) is None
+        assert isinstance(get_compression(True), Deflate)
+        assert (
+            Deflate(server_max_window_bits=10, server_no_context_takeover=True).offer()
+            == "permessage-deflate; server_no_context_takeover; "
+            "server_max_window_bits=10; client_max_window_bits=15"
+        )
+        with pytest.raises(ClientError):
+            Deflate(client_max_window_bits=7)
+        with pytest.raises(ClientError):
+            Deflate(level=10)